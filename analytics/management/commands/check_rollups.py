@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from analytics.utils.rollups import compare_rollups
+from analytics.utils.rollups import DIMENSIONS
+from analytics.utils.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Compare the monthly rollups of the analytics dashboards with a full recompute"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help="Rebuild the rollups if they differ"
+        )
+
+    def handle(self, *args, **options):
+        differences = compare_rollups()
+        for dims, stored, computed in differences:
+            rollup = ', '.join(f'{d}={v}' for d, v in zip(DIMENSIONS, dims))
+            self.stdout.write(
+                f"{rollup}: stored {stored[0]} / {stored[1]}, "
+                f"computed {computed[0]} / {computed[1]}"
+            )
+        if not differences:
+            self.stdout.write("The rollups are consistent")
+        elif options['fix']:
+            number = rebuild_rollups()
+            self.stdout.write(f"Rebuilt: {number} facts")
+        else:
+            raise CommandError(f"{len(differences)} rollups differ")
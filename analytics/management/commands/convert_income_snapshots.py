@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localtime
+
+from analytics.models import IncomeStatSnapshot
+from analytics.utils.income_snapshots import dump_data
+from analytics.utils.snapshot_pages import parse_page
+
+
+class Command(BaseCommand):
+    help = "Convert the pages of the income snapshots saved as HTML to data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-html', action='store_true',
+            help="Keep the pages of the converted snapshots"
+        )
+
+    def handle(self, *args, **options):
+        converted, skipped = 0, []
+        snapshots = IncomeStatSnapshot.objects.exclude(webpage='')
+        for snapshot in snapshots.iterator():
+            if snapshot.data:
+                continue
+            data = parse_page(
+                snapshot.webpage, localtime(snapshot.creation_date).date()
+            )
+            if data is None:
+                skipped.append(snapshot.id)
+                continue
+            snapshot.data = dump_data(data)
+            update_fields = ['data']
+            if not options['keep_html']:
+                snapshot.webpage = ''
+                update_fields.append('webpage')
+            snapshot.save(update_fields=update_fields)
+            converted += 1
+        self.stdout.write(f"Converted: {converted} snapshots")
+        if skipped:
+            self.stdout.write(
+                "Not converted (kept as HTML): "
+                + ', '.join(str(pk) for pk in skipped)
+            )
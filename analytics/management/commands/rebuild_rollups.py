@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from analytics.utils.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly rollups of the analytics dashboards"
+
+    def handle(self, *args, **options):
+        number = rebuild_rollups()
+        self.stdout.write(f"{number} facts")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from analytics.utils.income_snapshots import save_income_snapshots
+
+
+class Command(BaseCommand):
+    help = "Save the income snapshots of all the departments"
+
+    def handle(self, *args, **options):
+        snapshots = save_income_snapshots()
+        self.stdout.write(f"{len(snapshots)} snapshots")
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_rollups(apps, schema_editor):
+    from collections import defaultdict
+    from decimal import Decimal
+    from analytics.utils.rollups import DIMENSIONS
+    from analytics.utils.rollups import FACT_FIELDS
+    from analytics.utils.rollups import get_facts
+    from analytics.utils.rollups import get_values
+
+    content_type_model = apps.get_model('contenttypes', 'ContentType')
+    fact_model = apps.get_model('analytics', 'RollupFact')
+    rollup_model = apps.get_model('analytics', 'MonthlyRollup')
+    rollups = defaultdict(lambda: [0, Decimal(0)])
+    for label in FACT_FIELDS:
+        model = apps.get_model(label)
+        content_type, _ = content_type_model.objects.get_or_create(
+            app_label='crm', model=model._meta.model_name
+        )
+        facts = []
+        for values in get_values(model, model.objects.all()):
+            for dims, count, amount in get_facts(label, values):
+                facts.append(fact_model(
+                    content_type=content_type, object_id=values['pk'],
+                    **dict(zip(DIMENSIONS, dims)), count=count, amount=amount
+                ))
+                rollups[dims][0] += count
+                rollups[dims][1] += amount
+        fact_model.objects.bulk_create(facts, batch_size=1000)
+    rollup_model.objects.bulk_create(
+        [
+            rollup_model(**dict(zip(DIMENSIONS, dims)), count=count, amount=amount)
+            for dims, (count, amount) in rollups.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('crm', '0007_match_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('metric', models.CharField(choices=[('requests', 'Requests'), ('relevant_requests', 'Relevant requests'), ('won_requests', 'Requests of won deals'), ('lead_source_requests', 'Requests by lead source'), ('deals', 'Deals'), ('won_deals', 'Won deals'), ('income', 'Income'), ('income_state', 'Income in state currency'), ('income_marketing', 'Income in marketing currency')], max_length=20)),
+                ('key', models.PositiveIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('co_owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.group')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Monthly rollup',
+                'verbose_name_plural': 'Monthly rollups',
+                'indexes': [models.Index(fields=['department', 'metric', 'month'], name='monthly_rollup_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupFact',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('metric', models.CharField(choices=[('requests', 'Requests'), ('relevant_requests', 'Relevant requests'), ('won_requests', 'Requests of won deals'), ('lead_source_requests', 'Requests by lead source'), ('deals', 'Deals'), ('won_deals', 'Won deals'), ('income', 'Income'), ('income_state', 'Income in state currency'), ('income_marketing', 'Income in marketing currency')], max_length=20)),
+                ('key', models.PositiveIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('co_owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.group')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Rollup fact',
+                'verbose_name_plural': 'Rollup facts',
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='rollup_fact_object_idx')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
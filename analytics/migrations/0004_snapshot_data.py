@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incomestatsnapshot',
+            name='data',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -17,7 +19,11 @@ class IncomeStatSnapshot(Base1):
             
     webpage = models.TextField(
         blank=True, default='',
-    )        
+    )
+    # zlib-compressed JSON of the income data (see utils/income_snapshots.py)
+    data = models.BinaryField(
+        blank=True, default=b'',
+    )
     update_date = None
 
 
@@ -83,3 +89,85 @@ class ConversionStat(Request):
         proxy = True
         verbose_name = _('Conversion Summary')
         verbose_name_plural = _('Conversion Summary')
+
+
+class RollupBase(models.Model):
+    """
+    A count and an amount of a metric for a month
+    of a department, owner and co-owner (see analytics.utils.rollups).
+    """
+    REQUESTS = 'requests'
+    RELEVANT_REQUESTS = 'relevant_requests'
+    WON_REQUESTS = 'won_requests'
+    LEAD_SOURCE_REQUESTS = 'lead_source_requests'
+    DEALS = 'deals'
+    WON_DEALS = 'won_deals'
+    INCOME = 'income'
+    INCOME_STATE = 'income_state'
+    INCOME_MARKETING = 'income_marketing'
+    METRICS = (
+        (REQUESTS, _("Requests")),
+        (RELEVANT_REQUESTS, _("Relevant requests")),
+        (WON_REQUESTS, _("Requests of won deals")),
+        (LEAD_SOURCE_REQUESTS, _("Requests by lead source")),
+        (DEALS, _("Deals")),
+        (WON_DEALS, _("Won deals")),
+        (INCOME, _("Income")),
+        (INCOME_STATE, _("Income in state currency")),
+        (INCOME_MARKETING, _("Income in marketing currency")),
+    )
+
+    class Meta:
+        abstract = True
+
+    department = models.ForeignKey(
+        'auth.Group', blank=True, null=True,
+        on_delete=models.CASCADE, related_name='+',
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, blank=True, null=True,
+        on_delete=models.SET_NULL, related_name='+',
+    )
+    co_owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, blank=True, null=True,
+        on_delete=models.SET_NULL, related_name='+',
+    )
+    month = models.DateField()
+    metric = models.CharField(max_length=20, choices=METRICS)
+    key = models.PositiveIntegerField(default=0)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+
+
+class RollupFact(RollupBase):
+    """The contribution of an object to the monthly rollups."""
+
+    class Meta:
+        verbose_name = _("Rollup fact")
+        verbose_name_plural = _("Rollup facts")
+        indexes = [
+            models.Index(
+                fields=['content_type', 'object_id'],
+                name='rollup_fact_object_idx'
+            ),
+        ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+    )
+    object_id = models.PositiveIntegerField()
+
+
+class MonthlyRollup(RollupBase):
+    """The sum of the facts of a department, owner, co-owner and month."""
+
+    class Meta:
+        verbose_name = _("Monthly rollup")
+        verbose_name_plural = _("Monthly rollups")
+        indexes = [
+            models.Index(
+                fields=['department', 'metric', 'month'],
+                name='monthly_rollup_idx'
+            ),
+        ]
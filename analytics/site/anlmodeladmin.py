@@ -2,6 +2,7 @@ from dateutil.relativedelta import relativedelta
 
 from django.contrib.admin.views.decorators import staff_member_required
 from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.http.response import HttpResponseRedirect
 from django.template.response import TemplateResponse
@@ -10,8 +11,11 @@ from django.utils.safestring import mark_safe
 from django.utils.timezone import localtime, now
 from django.utils.translation import gettext_lazy as _
 
+from analytics.models import MonthlyRollup
 from analytics.utils.helpers import get_item_list
+from analytics.utils.rollups import get_months
 from crm.site import crmmodeladmin
+from crm.utils.admfilters import ByOwnerFilter
 
 
 class AnlModelAdmin(crmmodeladmin.CrmModelAdmin):
@@ -43,6 +47,8 @@ class AnlModelAdmin(crmmodeladmin.CrmModelAdmin):
         self.today = localtime(now()).replace(hour=0, minute=0, second=0, microsecond=0)
         self.current_month = self.today.month
         self.year_ago_date = localtime(now()) + relativedelta(months=-12)
+        # the months of the charts and "last 365 days" totals read from rollups
+        self.months = get_months(self.today.date())
         self.create_context_data(request, response, queryset)
         return response
 
@@ -75,13 +81,33 @@ class AnlModelAdmin(crmmodeladmin.CrmModelAdmin):
                             response: TemplateResponse, queryset: QuerySet) -> None:
         """Should be realized in child class."""
 
+    def get_rollups(self, request: WSGIRequest,
+                    response: TemplateResponse) -> QuerySet:
+        """Get the rollups of the departments and owner of the changelist."""
+        rollups = self.filter_by_department(request, MonthlyRollup.objects.all())
+        for spec in response.context_data['cl'].filter_specs:
+            if isinstance(spec, ByOwnerFilter):
+                owner = spec.get_owner(request)
+                if owner == 'IsNull':
+                    rollups = rollups.filter(owner=None)
+                elif owner:
+                    rollups = rollups.filter(
+                        Q(owner__username=owner) | Q(co_owner__username=owner)
+                    )
+        return rollups
+
     def check_time_periods(self, queryset: QuerySet) -> list:
         date = self.today.replace(day=1) + relativedelta(months=-11)
         return get_item_list(queryset, date)
 
+    def add_chart_data(self, response: TemplateResponse, title: str, param, max_value) -> None:
+        response.context_data['charts'].append(
+            self.get_chart_data(title, param, max_value)
+        )
+
     @staticmethod
-    def add_chart_data(response: TemplateResponse, title: str, param, max_value) -> None:
-        aa = {
+    def get_chart_data(title: str, param, max_value) -> dict:
+        return {
             'title': title,
             'data': ({
                 'period': x['period'],
@@ -91,7 +117,6 @@ class AnlModelAdmin(crmmodeladmin.CrmModelAdmin):
                     if max_value else 2,
             } for x in param)
         }
-        response.context_data['charts'].append(aa)
 
     @staticmethod
     def get_payment_header():
@@ -3,8 +3,9 @@ from django.db.models.query import QuerySet
 from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
 
+from analytics.models import MonthlyRollup
 from analytics.site.requeststatadmin import BaseRequestStatAdmin
-from analytics.utils.helpers import get_values_over_time
+from analytics.utils.rollups import RollupTotals
 
 
 class ConversionStatAdmin(BaseRequestStatAdmin):
@@ -14,23 +15,21 @@ class ConversionStatAdmin(BaseRequestStatAdmin):
 
     def create_context_data(self, request: WSGIRequest,
                             response: TemplateResponse, queryset: QuerySet) -> None:
-        
-        total_requests = self.get_total_requests(queryset)
-        total_requests_count = total_requests.count()
-        total_won_deals = self.get_total_won_deals(total_requests)
-        total_won_deals_count = total_won_deals.count()
+
+        totals = RollupTotals(
+            self.get_rollups(request, response), self.months[0]
+        )
+        requests, won_requests = MonthlyRollup.REQUESTS, MonthlyRollup.WON_REQUESTS
+        total_requests_count = totals.count(requests)
+        total_won_deals_count = totals.count(won_requests)
         conversion = self.get_conversion(
             total_won_deals_count,
             total_requests_count
         )
 
         # conversions for primary requests
-        primary_requests = total_requests.filter(subsequent=False)
-        primary_requests_count = primary_requests.count()
-        primary_won_deals = total_won_deals.filter(
-            deal__request__in=primary_requests
-        )
-        primary_won_deals_count = primary_won_deals.count()
+        primary_requests_count = totals.count(requests, keys=(0,))
+        primary_won_deals_count = totals.count(won_requests, keys=(0,))
         primary_conversion = self.get_conversion(
             primary_won_deals_count,
             primary_requests_count
@@ -45,14 +44,8 @@ class ConversionStatAdmin(BaseRequestStatAdmin):
         }
 
         # chart: 'Conversion'
-        total_requests_over_time, max_value1 = get_values_over_time(
-            total_requests,
-            'receipt_date'
-        )
-        total_won_deals_over_time, max_value2 = get_values_over_time(
-            total_won_deals,
-            'receipt_date'
-        )
+        total_requests_over_time = totals.get_series(requests, self.months)
+        total_won_deals_over_time = totals.get_series(won_requests, self.months)
         title = _('Conversion') + f' ({conversion} %)'
         conversion_over_time = list(map(
             lambda x, y:
@@ -71,13 +64,11 @@ class ConversionStatAdmin(BaseRequestStatAdmin):
         )
 
         # chart: "Conversion for primary requests"
-        primary_requests_over_time, max_value1 = get_values_over_time(
-            primary_requests,
-            'receipt_date'
+        primary_requests_over_time = totals.get_series(
+            requests, self.months, keys=(0,)
         )
-        primary_won_deals_over_time, max_value2 = get_values_over_time(
-            primary_won_deals,
-            'receipt_date'
+        primary_won_deals_over_time = totals.get_series(
+            won_requests, self.months, keys=(0,)
         )
         primary_conversion_over_time = list(map(
             lambda x, y:
@@ -1,15 +1,15 @@
 from django.core.handlers.wsgi import WSGIRequest
-from django.db.models import Avg
-from django.db.models import DurationField
-from django.db.models import F
 from django.db.models.query import QuerySet
 from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
 
+from analytics.models import MonthlyRollup
 from analytics.site.anlmodeladmin import AnlModelAdmin
-from analytics.utils.helpers import get_values_over_time
+from analytics.utils.rollups import RollupTotals
 from crm.utils.admfilters import ByOwnerFilter
 
+SECONDS_A_DAY = 86400
+
 
 class DealStatAdmin(AnlModelAdmin):
     change_list_template = 'analytics/summary_change_list.html'
@@ -20,25 +20,20 @@ class DealStatAdmin(AnlModelAdmin):
 
     def create_context_data(self, request: WSGIRequest,
                             response: TemplateResponse, queryset: QuerySet) -> None:
-        
-        response.context_data['page_title'] = self.page_title 
-        year_qs = queryset.filter(request__receipt_date__gte=self.year_ago_date)
-        total_deals = year_qs.count()
-        rel_qs = year_qs.filter(relevant=True)
-        total_rel_deals = rel_qs.count()
-        won_qs = queryset.filter(
-            closing_reason__success_reason=True,
-            active=False,
-            closing_date__gte=self.year_ago_date,
-        )
-        avg_win_closing = won_qs.aggregate(
-            days=Avg(
-                F('win_closing_date') - F('creation_date'),
-                output_field=DurationField()
-            )
+
+        response.context_data['page_title'] = self.page_title
+        totals = RollupTotals(
+            self.get_rollups(request, response), self.months[0]
         )
-        days = avg_win_closing['days'].days if avg_win_closing.get('days', None) else 0
-        won_num = won_qs.count()
+        deals, won_deals = MonthlyRollup.DEALS, MonthlyRollup.WON_DEALS
+        total_deals = totals.count(deals)
+        total_rel_deals = totals.count(deals, keys=(1,))
+        won_num = totals.count(won_deals)
+        # won deals with the known date of winning
+        timed_won_num = totals.count(won_deals, keys=(1,))
+        days = int(
+            totals.amount(won_deals, keys=(1,)) / timed_won_num / SECONDS_A_DAY
+        ) if timed_won_num else 0
 
         response.context_data['summary'] = {
             _('Total deals'): total_deals,
@@ -47,39 +42,28 @@ class DealStatAdmin(AnlModelAdmin):
             _('Average days to close successfully (primary)'): days,
         }
         title = _('Total deals') + f' ({total_deals})'
-        summary_over_time_total, max_value = get_values_over_time(
-            year_qs,
-            'request__receipt_date'
-        )
+        summary_over_time_total = totals.get_series(deals, self.months)
+        max_value = max(x['total'] for x in summary_over_time_total)
         self.add_chart_data(
             response, title, summary_over_time_total, max_value
         )
         total_max_value = max_value
-        
-        irrel_qs = year_qs.filter(relevant=False)       
-        title = _('Irrelevant deals') + f' ({irrel_qs.count()})'      
-        relevant_over_time, max_value = get_values_over_time(
-            irrel_qs,
-            'request__receipt_date'
-        )
+
+        title = _('Irrelevant deals') + f' ({totals.count(deals, keys=(0,))})'
+        relevant_over_time = totals.get_series(deals, self.months, keys=(0,))
         self.add_chart_data(
             response, title, relevant_over_time, total_max_value
         )
-        
-        title = _('Relevant deals') + f' ({total_rel_deals})'        
-        relevant_over_time, max_value = get_values_over_time(
-            rel_qs,
-            'request__receipt_date'
-        )
+
+        title = _('Relevant deals') + f' ({total_rel_deals})'
+        relevant_over_time = totals.get_series(deals, self.months, keys=(1,))
         self.add_chart_data(
             response, title, relevant_over_time, total_max_value
         )
-        
-        title = _('Won deals') + f' ({won_num})'        
-        won_deals_over_time, max_value = get_values_over_time(
-            won_qs,
-            'closing_date'
-        )
+
+        title = _('Won deals') + f' ({won_num})'
+        won_deals_over_time = totals.get_series(won_deals, self.months)
+        max_value = max(x['total'] for x in won_deals_over_time)
         self.add_chart_data(
             response, title, won_deals_over_time, max_value
         )
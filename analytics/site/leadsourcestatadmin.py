@@ -1,16 +1,12 @@
 from django.core.handlers.wsgi import WSGIRequest
-from django.db.models import Count
-from django.db.models import F
-from django.db.models import Q
-from django.db.models import Value
 from django.db.models.query import QuerySet
 from django.template.response import TemplateResponse
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
-from analytics.models import RequestStat
+from analytics.models import MonthlyRollup
 from analytics.site.anlmodeladmin import AnlModelAdmin
-from analytics.utils.helpers import get_values_over_time
+from analytics.utils.rollups import RollupTotals
 
 page_title = _("Request source statistics")
 source_table_title = _("Number of requests for each source")
@@ -37,42 +33,41 @@ class LeadSourceStatAdmin(AnlModelAdmin):
         response.context_data['page_title'] = page_title
 
         department_id = request.user.department_id  # NOQA
-        requests = RequestStat.objects.all()
+        rollups = MonthlyRollup.objects.filter(
+            metric=MonthlyRollup.LEAD_SOURCE_REQUESTS
+        )
         if department_id:
-            requests = requests.filter(department_id=department_id)
+            rollups = rollups.filter(department_id=department_id)
+        # the rollups of all the months
+        totals = RollupTotals(rollups)
+        metric = MonthlyRollup.LEAD_SOURCE_REQUESTS
+        sources = list(queryset)
+        source_ids = [source.id for source in sources]
 
-        requests_with_source = requests.filter(lead_source__in=queryset)
-        requests_without_source = requests.filter(lead_source=None)
-        number_requests_with = requests_with_source.count()
-        number_requests_without = requests_without_source.count()
+        number_requests_with = totals.count(metric, keys=source_ids)
+        number_requests_without = totals.count(metric, keys=(0,))
         total_requests_number = number_requests_with + number_requests_without
 
-        year_requests = requests.filter(creation_date__gte=self.year_ago_date)
-        year_requests_with_source = year_requests.filter(lead_source__in=queryset)
-        year_requests_without_source = year_requests.filter(lead_source=None)
-        year_number_requests_with = year_requests_with_source.count()
-        year_number_requests_without = year_requests_without_source.count()
+        year_number_requests_with = totals.count(
+            metric, keys=source_ids, months=self.months
+        )
+        year_number_requests_without = totals.count(
+            metric, keys=(0,), months=self.months
+        )
         year_total_requests_number = year_number_requests_with + year_number_requests_without
 
-        annotate_params = {
-            "request_total": Count(
-                'request', filter=Q(request__in=requests_with_source),
-                distinct=True
-            ),
-            "year_request_total": Count(
-                'request', filter=Q(request__in=year_requests_with_source),
-                distinct=True
+        for source in sources:
+            source.request_total = totals.count(metric, keys=(source.id,))
+            source.year_request_total = totals.count(
+                metric, keys=(source.id,), months=self.months
             )
-        }
-        if total_requests_number:
-            annotate_params['pers'] = F('request_total') / total_requests_number * 100
-        else:
-            annotate_params['pers'] = Value(0)
-        if year_total_requests_number:
-            annotate_params['year_pers'] = F('year_request_total') / year_total_requests_number * 100
-        else:
-            annotate_params['year_pers'] = Value(0)
-        source_qs = queryset.annotate(**annotate_params).order_by('-year_request_total')
+            source.pers = round(
+                source.request_total / total_requests_number * 100
+            ) if total_requests_number else 0
+            source.year_pers = round(
+                source.year_request_total / year_total_requests_number * 100
+            ) if year_total_requests_number else 0
+        sources.sort(key=lambda x: x.year_request_total, reverse=True)
 
         # Add table data
         table = {
@@ -84,7 +79,7 @@ class LeadSourceStatAdmin(AnlModelAdmin):
                     f"{source.year_request_total} ({source.year_pers}%)",
                     f"{source.request_total} ({source.pers}%)"
                 )
-                for source in source_qs
+                for source in sources
             ]
         }
         not_specified_pers = round(
@@ -92,7 +87,7 @@ class LeadSourceStatAdmin(AnlModelAdmin):
         ) if total_requests_number else 0
         year_not_specified_pers = round(
             year_number_requests_without / year_total_requests_number * 100
-        ) if total_requests_number else 0
+        ) if year_total_requests_number else 0
         not_specified_row = (
             not_specified_str,
             f"{year_number_requests_without} ({year_not_specified_pers}%)",
@@ -108,11 +103,11 @@ class LeadSourceStatAdmin(AnlModelAdmin):
         response.context_data['data_tables'] = [table]
 
         # Add chart data if one lead source was selected
-        if queryset.count() == 1:
-            summary_over_time, max_value = get_values_over_time(
-                year_requests_with_source,
-                'receipt_date'
+        if len(sources) == 1:
+            summary_over_time = totals.get_series(
+                metric, self.months, keys=source_ids
             )
+            max_value = max(x['total'] for x in summary_over_time)
             title = _('Relevant requests over month')
             self.add_chart_data(
                 response, title, summary_over_time, max_value
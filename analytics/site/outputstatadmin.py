@@ -4,16 +4,13 @@ from django.core.handlers.wsgi import WSGIRequest
 from django.core.paginator import EmptyPage
 from django.core.paginator import InvalidPage
 from django.core.paginator import Paginator
-from django.db.models import Case
 from django.db.models import CharField
-from django.db.models import DecimalField
 from django.db.models import Exists
 from django.db.models import F
 from django.db.models import OuterRef
 from django.db.models import Q
 from django.db.models import Subquery
 from django.db.models import Sum
-from django.db.models import When
 from django.db.models.functions import Cast
 from django.db.models.query import QuerySet
 from django.template.response import TemplateResponse
@@ -28,12 +25,13 @@ from common.utils.helpers import LEADERS
 from common.utils.helpers import USER_MODEL
 from crm.models import Output
 from crm.models import Payment
-from crm.models import Rate
 from crm.site.shipmentadmin import ORDER_NUMBER_STR
 from crm.utils.admfilters import ChoicesSimpleListFilter
 from crm.utils.admfilters import CrmDateFieldListFilter
+from crm.utils.currency_rates import get_amount_expression
 from crm.utils.helpers import get_owner_header
 from crm.utils.helpers import get_counterparty_header
+from crm.utils.helpers import get_first_payment
 from crm.utils.helpers import get_products_header
 
 payment_date_title = _("Payment date")
@@ -253,25 +251,14 @@ class OutputStatAdmin(AnlModelAdmin):
         )).order_by("-payment_date")
         currency_code, rate_field_name, button_title = get_currency_info(request)
         response.context_data['button_title'] = button_title
-        rate = Rate.objects.filter(
-            currency=OuterRef('currency'),
-            payment_date=Subquery(
-                Payment.objects.filter(
-                    deal=OuterRef(OuterRef('deal')),
-                    status=Payment.RECEIVED
-                ).values('payment_date')[:1]
-            )
-        )
+        # converted at the rate of the date of the (first) received payment
         output_qs = output_qs.annotate(
-            value=Case(
-                When(
-                    Exists(rate),
-                    then=F('amount') * Subquery(rate.values(rate_field_name)[:1]),
-                ),
-                default=F('amount') * F(f'currency__{rate_field_name}'),
-                output_field=DecimalField()
-            ),
-            price=F('value') / F('quantity')
+            value=get_amount_expression(rate_field_name),
+            price=F('value') / F('quantity'),
+            first_order_number=get_first_payment('order_number'),
+        ).select_related(
+            'product', 'deal__owner', 'deal__co_owner', 'deal__lead__country',
+            'deal__contact__company', 'deal__contact__country',
         )
         
         page_num = int(request.GET.get(PAGE_VAR, 0))
@@ -329,8 +316,7 @@ class OutputStatAdmin(AnlModelAdmin):
 
 
 def get_order_number(output):
-    payment = Payment.objects.filter(deal__id=output.deal_id).first()
-    return getattr(payment, "order_number") or LEADERS
+    return output.first_order_number or LEADERS
 
 
 def get_products(output):
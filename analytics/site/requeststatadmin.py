@@ -10,8 +10,9 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import gettext
 
+from analytics.models import MonthlyRollup
 from analytics.site.anlmodeladmin import AnlModelAdmin
-from analytics.utils.helpers import get_values_over_time
+from analytics.utils.rollups import RollupTotals
 from common.models import Department
 from crm.utils.admfilters import ByOwnerFilter
 
@@ -38,20 +39,6 @@ class BaseRequestStatAdmin(AnlModelAdmin):
     def get_conversion(value1: int, value2: int):
         return round(value1 * 100 / value2, 2) if value2 else 0
 
-    def get_total_requests(self, queryset: QuerySet) -> QuerySet:
-        return queryset.filter(
-            receipt_date__gte=self.year_ago_date,
-            duplicate=False
-        ).exclude(lead__disqualified=True)
-
-    @staticmethod
-    def get_total_won_deals(total_requests: QuerySet):
-        return total_requests.filter(
-            Q(deal__closing_reason__success_reason=True) |
-            Q(deal__stage__success_stage=True) |
-            Q(deal__stage__conditional_success_stage=True),
-        ).distinct()
-
 
 class RequestStatAdmin(BaseRequestStatAdmin):
     page_title = _('Request Summary for last 365 days')
@@ -60,29 +47,23 @@ class RequestStatAdmin(BaseRequestStatAdmin):
 
     def create_context_data(self, request: WSGIRequest,
                             response: TemplateResponse, queryset: QuerySet) -> None:
-        total_requests = self.get_total_requests(queryset)
-        total_requests_count = total_requests.count()
-        total_won_deals = self.get_total_won_deals(total_requests)
+        totals = RollupTotals(
+            self.get_rollups(request, response), self.months[0]
+        )
+        requests, won_requests = MonthlyRollup.REQUESTS, MonthlyRollup.WON_REQUESTS
+        total_requests_count = totals.count(requests)
 
         # conversion for primary requests
-        primary_requests = total_requests.filter(subsequent=False)
-        primary_requests_count = primary_requests.count()
-        primary_won_deals = total_won_deals.filter(
-            deal__request__in=primary_requests
-        )
-        primary_won_deals_count = primary_won_deals.count()
+        primary_requests_count = totals.count(requests, keys=(0,))
+        primary_won_deals_count = totals.count(won_requests, keys=(0,))
         primary_conversion = self.get_conversion(
             primary_won_deals_count,
             primary_requests_count
         )
 
         # conversion for subsequent requests
-        subsequent_requests = total_requests.filter(subsequent=True)
-        subsequent_requests_count = subsequent_requests.count()
-        subsequent_won_deals = total_won_deals.filter(
-            deal__request__in=subsequent_requests
-        )
-        subsequent_won_deals_count = subsequent_won_deals.count()
+        subsequent_requests_count = totals.count(requests, keys=(1,))
+        subsequent_won_deals_count = totals.count(won_requests, keys=(1,))
         subsequent_conversion = self.get_conversion(
             subsequent_won_deals_count,
             subsequent_requests_count
@@ -102,22 +83,17 @@ class RequestStatAdmin(BaseRequestStatAdmin):
         requests_by_month_str = _('Requests by month')
         average_value = round(total_requests_count / 12, 1)
         title = f"{requests_by_month_str} ({average_monthly_value_str} {average_value})"
-        summary_over_time_total, max_value = get_values_over_time(
-            total_requests,
-            'receipt_date'
-        )
+        summary_over_time_total = totals.get_series(requests, self.months)
+        max_value = max(x['total'] for x in summary_over_time_total)
         self.add_chart_data(
             response, title, summary_over_time_total, max_value
         )
 
         # chart: 'Relevant requests'
-        relevant_requests = total_requests.filter(deal__relevant=True)
-        relevant_requests_count = relevant_requests.count()
+        relevant_requests = MonthlyRollup.RELEVANT_REQUESTS
+        relevant_requests_count = totals.count(relevant_requests)
         title = gettext('Relevant requests') + f' {relevant_requests_count}'
-        summary_over_time_rel, maximum = get_values_over_time(
-            relevant_requests,
-            'receipt_date'
-        )
+        summary_over_time_rel = totals.get_series(relevant_requests, self.months)
         self.add_chart_data(
             response, title, summary_over_time_rel, max_value
         )
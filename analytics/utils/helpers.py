@@ -2,14 +2,15 @@ from abc import ABC
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from typing import Tuple, Optional
-from django.db.models import Aggregate, CharField, Case, DecimalField, Exists, F, Max, OuterRef, Subquery, Sum, When, Count
+from django.db.models import Aggregate, CharField, Max, Sum, Count
 from django.db.models.functions import Trunc
 from django.db.models.query import QuerySet
 from django.core.handlers.wsgi import WSGIRequest
 from django.conf import settings
 
 from common.utils.helpers import get_today
-from crm.models import Currency, Rate
+from crm.models import Currency
+from crm.utils.currency_rates import get_amount_expression
 
 
 class GroupConcat(Aggregate, ABC):
@@ -76,12 +77,8 @@ def get_currency_info(request: Optional[WSGIRequest] = None) -> Tuple[str, str,
 
 def get_current_currency_amount(payment_queryset: QuerySet, rate_field_name: str) -> Tuple[QuerySet, Decimal]:
     """Calculate the total amount in the specified currency."""
-    rate = Rate.objects.filter(
-        currency=OuterRef('currency'),
-        payment_date=OuterRef('payment_date')
-    )
     payment_queryset = payment_queryset.annotate(
-        value=get_amount_in_currency(rate, rate_field_name)
+        value=get_amount_expression(rate_field_name)
     )
     total_data = payment_queryset.aggregate(amount=Sum('value'))
     total_amount = total_data['amount']
@@ -101,30 +98,16 @@ def get_values_over_time(queryset: QuerySet, field: str) -> tuple:
 def get_income_over_time(payment_queryset: QuerySet, field: str,
                         rate_field_name: str, earliest_date=None) -> tuple:
     """Get income values aggregated over time (by month) in specified currency."""
-    rate = Rate.objects.filter(
-        currency=OuterRef('currency'),
-        payment_date=OuterRef('payment_date')
-    )
     values = payment_queryset.annotate(
         period=Trunc(field, 'month')
     ).values('period').annotate(
         total=Sum(
-            get_amount_in_currency(rate, rate_field_name)
+            get_amount_expression(rate_field_name)
         )
     ).order_by('period')
     return check_time_periods(values, earliest_date), get_maximum(values)
 
 
-def get_amount_in_currency(rate: QuerySet, rate_field_name: str) -> Case:
-    """Create a Case expression for calculating amount in specified currency."""
-    return Case(
-        When(Exists(rate),
-             then=F('amount') * Subquery(rate.values(rate_field_name)[:1])),
-        default=F('amount') * F(f'currency__{rate_field_name}'),
-        output_field=DecimalField()
-    )
-
-
 def get_maximum(values: QuerySet) -> Decimal:
     """Get the maximum value from a values queryset."""
     value = values.aggregate(
@@ -151,3 +134,27 @@ def get_item_list(queryset: QuerySet, date) -> list:
             item_list.insert(i, {'period': date, 'total': Decimal('0')})
         date = date + relativedelta(months=1)
     return item_list
+
+
+def get_months_items(monthly: dict, first_period, last_period=None) -> list:
+    """Get the items of the months after the first period (and up to the last one)."""
+    return [
+        {'period': period, 'total': total}
+        for period, total in sorted(monthly.items())
+        if period > first_period and (last_period is None or period <= last_period)
+    ]
+
+
+def get_rolling_totals(monthly: dict, items: list, months: int = 12) -> list:
+    """Get the items with the totals of the months ending with their period."""
+    return [
+        {
+            **item,
+            'total': sum(
+                (monthly.get(item['period'] + relativedelta(months=-i), 0)
+                 for i in range(months)),
+                Decimal('0')
+            )
+        }
+        for item in items
+    ]
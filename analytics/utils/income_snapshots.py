@@ -0,0 +1,286 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+from typing import Optional
+from dateutil.relativedelta import relativedelta
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.query import QuerySet
+
+from analytics.models import IncomeStat
+from analytics.models import IncomeStatSnapshot
+from analytics.models import MonthlyRollup
+from analytics.utils.helpers import get_currency_info
+from analytics.utils.rollups import get_months
+from analytics.utils.rollups import RollupTotals
+from common.utils.helpers import get_manager_departments
+from common.utils.helpers import get_today
+from common.utils.helpers import LEADERS
+from crm.models import Currency
+from crm.models import Payment
+from crm.utils.currency_rates import get_rate_table
+from crm.utils.currency_rates import RateTable
+from crm.utils.currency_rates import to_decimals
+from crm.utils.helpers import get_deal_products
+from crm.utils.helpers import get_outputs_prefetch
+
+# An income snapshot stores the data of the income summary
+# instead of the rendered page: the income of the months of the current
+# and previous periods, the number of won deals and the rows of the tables
+# of received and expected payments, as zlib-compressed JSON.
+# The page is rendered from the data when the snapshot is viewed.
+# save_income_snapshots() captures the snapshots of all the departments
+# reading each kind of data with one query for all of them.
+
+VERSION = 1
+EXPECTED_STATUSES = (
+    Payment.GUARANTEED, Payment.HIGH_PROBABILITY, Payment.LOW_PROBABILITY
+)
+DEAL_RELATED = ('contact__company__country', 'lead', 'owner', 'co_owner')
+
+
+def get_first_month(today: date) -> date:
+    """Returns the first month of the income of both periods."""
+    return today.replace(day=1) + relativedelta(months=-23)
+
+
+def get_received_payments(payments: QuerySet, rate_field_name: str, today: date,
+                          rate_table: Optional[RateTable] = None) -> list:
+    """Returns the payments received in the current month with their values."""
+    payments = list(payments.filter(
+        status=Payment.RECEIVED,
+        payment_date__month=today.month,
+        payment_date__year=today.year,
+    ).select_related(
+        *(f'deal__{field}' for field in DEAL_RELATED)
+    ).prefetch_related(
+        get_outputs_prefetch('deal__output_set')
+    ).order_by('payment_date'))
+    values = (rate_table or get_rate_table()).convert(
+        [p.currency_id for p in payments], [p.payment_date for p in payments],
+        [p.amount for p in payments], rate_field_name
+    )
+    for p, value in zip(payments, to_decimals(values)):
+        p.value = value
+    return payments
+
+
+def get_expected_payments(queryset: QuerySet, rate_field_name: str,
+                          rate_table: Optional[RateTable] = None) -> list:
+    """
+    Get the expected payments of the deals with their amounts
+    converted at the rate of the payment date (if any) and at the current rate.
+    """
+    payments = list(Payment.objects.filter(
+        deal__in=queryset,
+        status__in=EXPECTED_STATUSES,
+    ).values(
+        'deal_id', 'deal__department_id', 'status', 'payment_date',
+        'currency_id', 'amount', 'through_representation', 'order_number'
+    ).order_by('id'))
+    table = rate_table or get_rate_table()
+    currency_ids = [p['currency_id'] for p in payments]
+    amounts = np.array([p['amount'] for p in payments], dtype=float)
+    values = table.convert(
+        currency_ids, [p['payment_date'] for p in payments], amounts, rate_field_name
+    )
+    current_values = amounts * table.get_current_rates(currency_ids, rate_field_name)
+    for p, value, current_value in zip(
+            payments, to_decimals(values), to_decimals(current_values)):
+        p['value'] = value
+        p['current_value'] = current_value
+    return payments
+
+
+def get_income_data(totals: RollupTotals, payments: Iterable,
+                    expected_payments: list, deals: Iterable,
+                    currency_code: str, rate_field_name: str, today: date,
+                    rates: Optional[dict] = None) -> dict:
+    """
+    Returns the data of the income summary.
+    payments - the received payments of get_received_payments(),
+    expected_payments - the values of get_expected_payments(),
+    deals - the deals of the expected payments (with DEAL_RELATED selected
+    and the outputs prefetched with get_outputs_prefetch()).
+    """
+    income = totals.get_income(rate_field_name, rates)
+    deal_rows = {}
+
+    def get_deal_row(deal) -> dict:
+        if deal.id not in deal_rows:
+            deal_rows[deal.id] = {
+                'deal_id': deal.id,
+                'name': get_deal_name(deal),
+                'products': get_products(deal),
+                'owner': get_owners(deal),
+            }
+        return deal_rows[deal.id]
+
+    deals = list(deals)
+    return {
+        'version': VERSION,
+        'today': today,
+        'currency_code': currency_code,
+        'income': [
+            (month, income.get(month, Decimal(0)))
+            for month in get_months(today, 24)
+        ],
+        'won_deals': totals.count(
+            MonthlyRollup.WON_DEALS, months=get_months(today)
+        ),
+        'received': [
+            {
+                **get_deal_row(p.deal),
+                'value': p.value,
+                'through_representation': p.through_representation,
+                'payment_date': p.payment_date,
+                'order_number': p.order_number,
+            }
+            for p in payments
+        ],
+        'expected': {
+            status: [
+                {**get_deal_row(deal), **row}
+                for deal, row in get_expected_rows(
+                    deals, expected_payments, status, today)
+            ]
+            for status in EXPECTED_STATUSES
+        },
+    }
+
+
+def get_expected_rows(deals: list, expected_payments: list,
+                      status: str, today: date) -> list:
+    """
+    Returns the deals with the sums of the expected payments of the status
+    of the current and two next months: [(deal, {'sums': [...], 'orders': [...]})]
+    A sum is [value, whether through representation].
+    """
+    next_month_date = today.replace(day=1) + relativedelta(months=+1)
+    next_month = next_month_date.month
+    next2_month = (next_month_date + relativedelta(months=+1)).month
+    next3_month_date = next_month_date + relativedelta(months=+2)
+    columns = {}
+    orders = {}
+    for p in expected_payments:
+        if p['status'] != status:
+            continue
+        sums = columns.setdefault(p['deal_id'], [[None, False] for _i in range(3)])
+        if p['payment_date'] < next_month_date:
+            column, value = sums[0], p['value']
+        elif p['payment_date'].month == next_month:
+            column, value = sums[1], p['current_value']
+        elif p['payment_date'].month == next2_month:
+            column, value = sums[2], p['current_value']
+        else:
+            column = value = None
+        if column is not None:
+            column[0] = (column[0] or 0) + (value or 0)
+            column[1] |= p['through_representation']
+        if p['order_number']:
+            orders.setdefault(p['deal_id'], []).append(p['order_number'])
+    deal_ids = {
+        p['deal_id'] for p in expected_payments
+        if p['status'] == status and p['payment_date'] < next3_month_date
+    }
+    return [
+        (d, {'sums': columns[d.id], 'orders': orders.get(d.id, [])})
+        for d in deals if d.id in deal_ids
+    ]
+
+
+def get_deal_name(deal) -> str:
+    if deal.contact:
+        return f'{deal.contact.company}, {deal.contact.company.country}'
+    if deal.lead.company_name:
+        return deal.lead.company_name
+    return deal.lead.first_name
+
+
+def get_owners(deal) -> str:
+    return ', '.join(str(user) for user in (deal.owner, deal.co_owner) if user)
+
+
+def get_products(deal) -> str:
+    return get_deal_products(deal) or LEADERS
+
+
+def dump_data(data: dict) -> bytes:
+    """Returns the data as zlib-compressed JSON."""
+    return zlib.compress(json.dumps(
+        data, cls=DjangoJSONEncoder, separators=(',', ':')
+    ).encode())
+
+
+def load_data(value) -> dict:
+    """Returns the data of dump_data() with its dates and decimals restored."""
+    data = json.loads(zlib.decompress(value))
+    data['today'] = date.fromisoformat(data['today'])
+    data['income'] = {
+        date.fromisoformat(month): Decimal(amount)
+        for month, amount in data['income']
+    }
+    for row in data['received']:
+        row['value'] = Decimal(row['value'] or 0)
+        row['payment_date'] = date.fromisoformat(row['payment_date'])
+    for rows in data['expected'].values():
+        for row in rows:
+            row['sums'] = [
+                [None if value is None else Decimal(value), through_rep]
+                for value, through_rep in row['sums']
+            ]
+    return data
+
+
+def save_income_snapshots(departments: Optional[Iterable] = None) -> list:
+    """
+    Saves the income snapshots of the departments (of the departments
+    with managers by default) for all the owners.
+    """
+    if departments is None:
+        departments = get_manager_departments()
+    department_ids = [d.id for d in departments]
+    today = get_today()
+    currency_code, rate_field_name, _title = get_currency_info()
+    deals = IncomeStat.objects.filter(department_id__in=department_ids)
+
+    totals = RollupTotals.by_department(
+        MonthlyRollup.objects.filter(department_id__in=department_ids),
+        get_first_month(today)
+    )
+    rates = dict(Currency.objects.values_list('id', rate_field_name))
+    rate_table = get_rate_table()
+    payments = defaultdict(list)
+    for p in get_received_payments(
+            Payment.objects.filter(deal__in=deals), rate_field_name,
+            today, rate_table):
+        payments[p.deal.department_id].append(p)
+    expected_payments = defaultdict(list)
+    for p in get_expected_payments(deals, rate_field_name, rate_table):
+        expected_payments[p['deal__department_id']].append(p)
+    expected_deals = defaultdict(list)
+    for deal in deals.filter(
+        pk__in={
+            p['deal_id'] for values in expected_payments.values() for p in values
+        }
+    ).select_related(*DEAL_RELATED).prefetch_related(
+        get_outputs_prefetch()
+    ).order_by('-pk'):     # as in the changelist
+        expected_deals[deal.department_id].append(deal)
+
+    snapshots = [
+        IncomeStatSnapshot(
+            department_id=department_id,
+            data=dump_data(get_income_data(
+                totals.get(department_id, RollupTotals()),
+                payments[department_id], expected_payments[department_id],
+                expected_deals[department_id], currency_code,
+                rate_field_name, today, rates
+            )),
+        )
+        for department_id in department_ids
+    ]
+    return IncomeStatSnapshot.objects.bulk_create(snapshots)
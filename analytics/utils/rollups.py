@@ -0,0 +1,434 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from dateutil.relativedelta import relativedelta
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models.query import QuerySet
+from django.utils.timezone import get_default_timezone
+from django.utils.timezone import localtime
+
+from analytics.models import MonthlyRollup
+from analytics.models import RollupFact
+from crm.models import Currency
+from crm.models import Payment
+from crm.utils.currency_rates import QUANTUM
+
+# The dashboards of the analytics app read the monthly counters
+# (MonthlyRollup) of the departments and owners instead of counting
+# the requests, deals and payments on every page view.
+# Every object contributes facts (RollupFact) to the rollups.
+# When an object, or an object its facts depend on, is saved or deleted,
+# its facts are recomputed and the differences are added to the rollups.
+# Changes made with QuerySet.update() are not seen by the signals;
+# the "check_rollups" command compares the rollups with a full recompute
+# and rebuilds them with --fix.
+
+BATCH_SIZE = 1000
+DIMENSIONS = ('department_id', 'owner_id', 'co_owner_id', 'month', 'metric', 'key')
+
+# fields of the values from which the facts of the objects are computed
+FACT_FIELDS = {
+    'crm.Request': (
+        'department_id', 'owner_id', 'co_owner_id', 'creation_date',
+        'receipt_date', 'duplicate', 'subsequent', 'lead_source_id',
+        'lead__disqualified', 'deal__relevant',
+        'deal__closing_reason__success_reason',
+        'deal__stage__success_stage', 'deal__stage__conditional_success_stage',
+    ),
+    'crm.Deal': (
+        'department_id', 'owner_id', 'co_owner_id', 'creation_date',
+        'relevant', 'active', 'closing_date', 'win_closing_date',
+        'request__receipt_date', 'closing_reason__success_reason',
+    ),
+    'crm.Payment': (
+        'deal__department_id', 'deal__owner_id', 'deal__co_owner_id',
+        'status', 'payment_date', 'amount', 'currency_id',
+    ),
+}
+# the objects whose facts depend on the objects of a model:
+# (model label, {lookup: attribute of the changed object})
+DEPENDENTS = {
+    'crm.Request': (
+        ('crm.Request', {'pk': 'pk'}),
+        ('crm.Deal', {'request': 'pk'}),
+    ),
+    'crm.Deal': (
+        ('crm.Deal', {'pk': 'pk'}),
+        ('crm.Request', {'deal': 'pk'}),
+        ('crm.Payment', {'deal': 'pk'}),
+    ),
+    'crm.Payment': (
+        ('crm.Payment', {'pk': 'pk'}),
+    ),
+    'crm.Lead': (
+        ('crm.Request', {'lead': 'pk'}),
+    ),
+    'crm.Stage': (
+        ('crm.Request', {'deal__stage': 'pk'}),
+    ),
+    'crm.ClosingReason': (
+        ('crm.Request', {'deal__closing_reason': 'pk'}),
+        ('crm.Deal', {'closing_reason': 'pk'}),
+    ),
+    'crm.Rate': (
+        ('crm.Payment', {'currency': 'currency_id', 'payment_date': 'payment_date'}),
+    ),
+}
+
+
+def get_month(value) -> Optional[date]:
+    """
+    The first day of the month of the date or datetime.
+    Datetimes are bucketed in TIME_ZONE, not in the active (user's) zone,
+    so the month does not depend on who saved the object.
+    """
+    if not value:
+        return None
+    if hasattr(value, 'tzinfo'):
+        value = localtime(value, get_default_timezone()).date()
+    return value.replace(day=1)
+
+
+def get_values(model, queryset: QuerySet) -> Iterator[dict]:
+    """Yields the values of the objects from which their facts are computed."""
+    label = model._meta.label
+    if label == 'crm.Payment':
+        rate = model._meta.apps.get_model('crm', 'Rate')._default_manager.filter(
+            currency=OuterRef('currency'),
+            payment_date=OuterRef('payment_date')
+        ).order_by('id')
+        queryset = queryset.annotate(
+            rate_to_state_currency=Subquery(
+                rate.values('rate_to_state_currency')[:1]),
+            rate_to_marketing_currency=Subquery(
+                rate.values('rate_to_marketing_currency')[:1]),
+        )
+        fields = (*FACT_FIELDS[label],
+                  'rate_to_state_currency', 'rate_to_marketing_currency')
+    else:
+        fields = FACT_FIELDS[label]
+    return queryset.values('pk', *fields).order_by('pk').iterator()
+
+
+def get_facts(label: str, values: dict) -> list:
+    """
+    Returns the facts of an object as
+    ((department_id, owner_id, co_owner_id, month, metric, key), count, amount).
+    """
+    facts = []
+    if label == 'crm.Payment':
+        if values['status'] != Payment.RECEIVED:
+            return facts
+        dims = (values['deal__department_id'], values['deal__owner_id'],
+                values['deal__co_owner_id'], get_month(values['payment_date']))
+        amount = values['amount']
+        if values['rate_to_state_currency'] is None:
+            # converted at the current rate of the currency
+            facts.append(((*dims, MonthlyRollup.INCOME, values['currency_id']), 1, amount))
+        else:
+            for metric, rate_field_name in (
+                    (MonthlyRollup.INCOME_STATE, 'rate_to_state_currency'),
+                    (MonthlyRollup.INCOME_MARKETING, 'rate_to_marketing_currency'),
+            ):
+                value = (amount * values[rate_field_name]).quantize(QUANTUM)
+                facts.append(((*dims, metric, 0), 1, value))
+        return facts
+
+    dims = (values['department_id'], values['owner_id'], values['co_owner_id'])
+    if label == 'crm.Request':
+        facts.append((
+            (*dims, get_month(values['creation_date']),
+             MonthlyRollup.LEAD_SOURCE_REQUESTS, values['lead_source_id'] or 0),
+            1, 0
+        ))
+        if values['receipt_date'] and not values['duplicate'] \
+                and not values['lead__disqualified']:
+            month = get_month(values['receipt_date'])
+            key = int(values['subsequent'])
+            facts.append(((*dims, month, MonthlyRollup.REQUESTS, key), 1, 0))
+            if values['deal__relevant']:
+                facts.append(((*dims, month, MonthlyRollup.RELEVANT_REQUESTS, key), 1, 0))
+            if values['deal__closing_reason__success_reason'] \
+                    or values['deal__stage__success_stage'] \
+                    or values['deal__stage__conditional_success_stage']:
+                facts.append(((*dims, month, MonthlyRollup.WON_REQUESTS, key), 1, 0))
+    elif label == 'crm.Deal':
+        if values['request__receipt_date']:
+            facts.append((
+                (*dims, get_month(values['request__receipt_date']),
+                 MonthlyRollup.DEALS, int(values['relevant'])),
+                1, 0
+            ))
+        if values['closing_reason__success_reason'] and not values['active'] \
+                and values['closing_date']:
+            # the amount is the number of seconds it took to win the deal
+            month = get_month(values['closing_date'])
+            if values['win_closing_date']:
+                seconds = values['win_closing_date'] - values['creation_date']
+                facts.append((
+                    (*dims, month, MonthlyRollup.WON_DEALS, 1),
+                    1, Decimal(seconds.total_seconds()).quantize(QUANTUM)
+                ))
+            else:
+                facts.append(((*dims, month, MonthlyRollup.WON_DEALS, 0), 1, 0))
+    return facts
+
+
+def index_objects(model, ids: Iterable) -> int:
+    """
+    Updates the facts of the objects and adds their changes to the rollups.
+    The facts of deleted objects are deleted.
+    The objects and their facts are locked until the transaction ends,
+    so concurrent updates of the same objects do not count the changes twice.
+    """
+    ids = sorted(ids)
+    label = model._meta.label
+    content_type = ContentType.objects.get_for_model(model)
+    with transaction.atomic():
+        objects = model._default_manager.filter(pk__in=ids)
+        list(objects.select_for_update().order_by('pk').values_list('pk', flat=True))
+        facts = RollupFact.objects.select_for_update().filter(
+            content_type=content_type, object_id__in=ids
+        ).order_by('pk')
+        old_facts = {
+            (f['object_id'], *(f[d] for d in DIMENSIONS)): (f['count'], f['amount'], f['id'])
+            for f in facts.values('id', 'object_id', 'count', 'amount', *DIMENSIONS)
+        }
+        new_facts = {}
+        for values in get_values(model, objects):
+            for dims, count, amount in get_facts(label, values):
+                new_facts[(values['pk'], *dims)] = (count, Decimal(amount))
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        removed = []
+        for key, (count, amount, pk) in old_facts.items():
+            if new_facts.get(key) != (count, amount):
+                removed.append(pk)
+                deltas[key[1:]][0] -= count
+                deltas[key[1:]][1] -= amount
+        added = []
+        for key, (count, amount) in new_facts.items():
+            if old_facts.get(key, ())[:2] != (count, amount):
+                added.append(RollupFact(
+                    content_type=content_type, object_id=key[0],
+                    **dict(zip(DIMENSIONS, key[1:])), count=count, amount=amount
+                ))
+                deltas[key[1:]][0] += count
+                deltas[key[1:]][1] += amount
+        if removed:
+            RollupFact.objects.filter(pk__in=removed).delete()
+        if added:
+            RollupFact.objects.bulk_create(added)
+        add_to_rollups(deltas)
+    return len(added)
+
+
+def index_queryset(queryset: QuerySet) -> int:
+    ids = queryset.values_list('pk', flat=True).order_by('pk').iterator()
+    number = 0
+    while batch := list(islice(ids, BATCH_SIZE)):
+        number += index_objects(queryset.model, batch)
+    return number
+
+
+def add_to_rollups(deltas: dict) -> None:
+    for dims, (count, amount) in deltas.items():
+        if not count and not amount:
+            continue
+        params = dict(zip(DIMENSIONS, dims))
+        pk = MonthlyRollup.objects.filter(**params).values_list(
+            'pk', flat=True).first()
+        if pk:
+            MonthlyRollup.objects.filter(pk=pk).update(
+                count=F('count') + count, amount=F('amount') + amount
+            )
+        else:
+            MonthlyRollup.objects.create(**params, count=count, amount=amount)
+
+
+def get_dependents(model, instance) -> list:
+    """Returns (model, ids) of the objects whose facts depend on the object."""
+    dependents = []
+    for label, lookups in DEPENDENTS.get(model._meta.label, ()):
+        dependent_model = apps.get_model(label)
+        params = {k: getattr(instance, v) for k, v in lookups.items()}
+        if params == {'pk': instance.pk}:
+            ids = [instance.pk]
+        else:
+            ids = list(dependent_model._default_manager.filter(
+                **params).values_list('pk', flat=True))
+        if ids:
+            dependents.append((dependent_model, ids))
+    return dependents
+
+
+def update_rollups(dependents: list) -> None:
+    """Updates the facts of the dependents of a saved or deleted object."""
+    for model, ids in dependents:
+        for i in range(0, len(ids), BATCH_SIZE):
+            index_objects(model, ids[i:i + BATCH_SIZE])
+
+
+def iter_facts(model) -> Iterator[tuple]:
+    """Yields (object id, dimensions, count, amount) of the facts of all the objects."""
+    label = model._meta.label
+    for values in get_values(model, model._default_manager.all()):
+        for dims, count, amount in get_facts(label, values):
+            yield values['pk'], dims, count, amount
+
+
+def compute_rollups() -> dict:
+    """Computes the rollups from all the objects: {dimensions: [count, amount]}."""
+    rollups = defaultdict(lambda: [0, Decimal(0)])
+    for label in FACT_FIELDS:
+        for _pk, dims, count, amount in iter_facts(apps.get_model(label)):
+            rollups[dims][0] += count
+            rollups[dims][1] += amount
+    return rollups
+
+
+def get_stored_rollups() -> dict:
+    values = MonthlyRollup.objects.values(*DIMENSIONS).annotate(
+        total_count=Sum('count'), total_amount=Sum('amount')
+    ).order_by()
+    return {
+        tuple(v[d] for d in DIMENSIONS): [v['total_count'], v['total_amount']]
+        for v in values
+    }
+
+
+def compare_rollups() -> list:
+    """Returns (dimensions, stored, computed) of the rollups that differ."""
+    stored = get_stored_rollups()
+    computed = compute_rollups()
+    differences = []
+    for dims in sorted(stored.keys() | computed.keys(), key=str):
+        a = stored.get(dims, [0, 0])
+        b = computed.get(dims, [0, 0])
+        if a[0] != b[0] or Decimal(a[1]).quantize(QUANTUM) != Decimal(b[1]).quantize(QUANTUM):
+            differences.append((dims, a, b))
+    return differences
+
+
+def rebuild_rollups() -> int:
+    """Rebuilds the facts and the rollups of all the objects."""
+    rollups = defaultdict(lambda: [0, Decimal(0)])
+    number = 0
+    with transaction.atomic():
+        RollupFact.objects.all().delete()
+        MonthlyRollup.objects.all().delete()
+        for label in FACT_FIELDS:
+            model = apps.get_model(label)
+            content_type = ContentType.objects.get_for_model(model)
+            facts = iter_facts(model)
+            while batch := list(islice(facts, BATCH_SIZE)):
+                RollupFact.objects.bulk_create([
+                    RollupFact(
+                        content_type=content_type, object_id=pk,
+                        **dict(zip(DIMENSIONS, dims)), count=count, amount=amount
+                    )
+                    for pk, dims, count, amount in batch
+                ])
+                for _pk, dims, count, amount in batch:
+                    rollups[dims][0] += count
+                    rollups[dims][1] += amount
+                number += len(batch)
+        MonthlyRollup.objects.bulk_create(
+            (
+                MonthlyRollup(**dict(zip(DIMENSIONS, dims)), count=count, amount=amount)
+                for dims, (count, amount) in rollups.items()
+            ),
+            batch_size=BATCH_SIZE
+        )
+    return number
+
+
+def get_months(today: date, number: int = 12) -> list:
+    """Returns the first days of the months ending with the current one."""
+    first = today.replace(day=1)
+    return [first + relativedelta(months=i - number + 1) for i in range(number)]
+
+
+class RollupTotals:
+    """The counts and amounts of rollups by metric, key and month."""
+
+    def __init__(self, rollups: Optional[QuerySet] = None,
+                 first_month: Optional[date] = None):
+        self.totals = {}
+        if rollups is not None:
+            for v in get_total_values(rollups, first_month):
+                self.add(v)
+
+    @classmethod
+    def by_department(cls, rollups: QuerySet,
+                      first_month: Optional[date] = None) -> dict:
+        """Returns the totals of the departments read with one query."""
+        totals = defaultdict(cls)
+        for v in get_total_values(rollups, first_month, 'department_id'):
+            totals[v['department_id']].add(v)
+        return dict(totals)
+
+    def add(self, value: dict) -> None:
+        key = (value['metric'], value['key'], value['month'])
+        self.totals[key] = (value['total_count'], value['total_amount'])
+
+    def items(self, metric: str, keys=None, months=None) -> Iterator[tuple]:
+        for (m, key, month), value in self.totals.items():
+            if m == metric and (keys is None or key in keys) \
+                    and (months is None or month in months):
+                yield key, month, value
+
+    def count(self, metric: str, keys=None, months=None) -> int:
+        return sum(v[0] for _k, _m, v in self.items(metric, keys, months))
+
+    def amount(self, metric: str, keys=None, months=None) -> Decimal:
+        return sum(
+            (v[1] for _k, _m, v in self.items(metric, keys, months)), Decimal(0)
+        )
+
+    def get_series(self, metric: str, months: list, keys=None) -> list:
+        """Returns the chart items of the counts of the months."""
+        counts = dict.fromkeys(months, 0)
+        for _key, month, value in self.items(metric, keys, months):
+            counts[month] += value[0]
+        return [{'period': m, 'total': c} for m, c in counts.items()]
+
+    def get_income(self, rate_field_name: str, rates: Optional[dict] = None) -> dict:
+        """
+        Returns the income by month in the currency of the rate field.
+        Payments without a rate of their date are converted at the current rate
+        (read from the database unless the rates by currency id are given).
+        """
+        metric = {
+            'rate_to_state_currency': MonthlyRollup.INCOME_STATE,
+            'rate_to_marketing_currency': MonthlyRollup.INCOME_MARKETING,
+        }[rate_field_name]
+        income = defaultdict(Decimal)
+        for _key, month, value in self.items(metric):
+            income[month] += value[1]
+        currency_ids = {k for k, _m, _v in self.items(MonthlyRollup.INCOME)}
+        if currency_ids and rates is None:
+            rates = dict(Currency.objects.filter(
+                id__in=currency_ids).values_list('id', rate_field_name))
+        for key, month, value in self.items(MonthlyRollup.INCOME):
+            income[month] += value[1] * rates.get(key, 0)
+        return dict(income)
+
+
+def get_total_values(rollups: QuerySet, first_month: Optional[date] = None,
+                     *fields) -> QuerySet:
+    """Returns the sums of the rollups by metric, key, month and the fields."""
+    if first_month:
+        rollups = rollups.filter(month__gte=first_month)
+    return rollups.values(*fields, 'metric', 'key', 'month').annotate(
+        total_count=Sum('count'), total_amount=Sum('amount')
+    ).order_by()
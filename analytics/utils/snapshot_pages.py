@@ -0,0 +1,218 @@
+import re
+from datetime import date
+from decimal import Decimal
+from decimal import InvalidOperation
+from html.parser import HTMLParser
+from typing import Iterator
+from typing import Optional
+from dateutil.relativedelta import relativedelta
+
+from analytics.utils.income_snapshots import EXPECTED_STATUSES
+from analytics.utils.income_snapshots import VERSION
+from common.utils.helpers import LEADERS
+
+# The income snapshots saved before they stored data contain the rendered
+# income summary page. The data of such a page is read from its markup:
+# the summary, the tables of received and expected payments and the charts.
+# The income of the months is read from the bars of the charts of both
+# periods, so it is rounded to whole units of the currency.
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr',
+}
+DEAL_URL_RE = re.compile(r'/deal/(\d+)/change/')
+CURRENCY_RE = re.compile(r'\((\w+)\)\s*$')
+
+
+class Element:
+
+    def __init__(self, tag: str, attrs: dict, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children = []
+
+    def iter(self, tag: Optional[str] = None) -> Iterator['Element']:
+        """Yields the descendant elements (of the tag) in document order."""
+        for child in self.children:
+            if isinstance(child, Element):
+                if tag is None or child.tag == tag:
+                    yield child
+                yield from child.iter(tag)
+
+    def find(self, tag: str) -> Optional['Element']:
+        return next(self.iter(tag), None)
+
+    def has_class(self, name: str) -> bool:
+        return name in (self.attrs.get('class') or '').split()
+
+    @property
+    def text(self) -> str:
+        parts = []
+        for child in self.children:
+            parts.append(child.text if isinstance(child, Element) else child)
+        return ' '.join(' '.join(parts).split())
+
+
+class TreeBuilder(HTMLParser):
+    """Builds a tree of the elements of a page tolerating unclosed tags."""
+
+    def __init__(self):
+        super().__init__()
+        self.root = self.current = Element('', {})
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, dict(attrs), self.current)
+        self.current.children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self.current = element
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Element(tag, dict(attrs), self.current))
+
+    def handle_endtag(self, tag):
+        element = self.current
+        while element is not self.root and element.tag != tag:
+            element = element.parent
+        if element is not self.root:
+            self.current = element.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_page(webpage: str, today: date) -> Optional[dict]:
+    """
+    Returns the data of the income summary page (see income_snapshots.py)
+    saved on the date or None if the page can not be read.
+    """
+    builder = TreeBuilder()
+    builder.feed(webpage)
+    builder.close()
+    root = builder.root
+    try:
+        won_deals = get_won_deals(root)
+        tables = [
+            div.find('table') for div in root.iter('div')
+            if div.has_class('tableFixHeadFoot')
+        ]
+        charts = get_charts(root)
+        if won_deals is None or len(tables) != 4 or len(charts) != 3:
+            return None
+        currency_code = CURRENCY_RE.search(charts[1][0]).group(1)
+        first_month = today.replace(day=1) + relativedelta(months=-23)
+        totals = charts[1][1] + charts[0][1]
+        if len(totals) != 24:
+            return None
+        return {
+            'version': VERSION,
+            'today': today,
+            'currency_code': currency_code,
+            'income': [
+                (first_month + relativedelta(months=i), total)
+                for i, total in enumerate(totals)
+            ],
+            'won_deals': won_deals,
+            'received': [
+                get_received_row(cells, today) for cells in get_rows(tables[0])
+            ],
+            'expected': {
+                status: [get_expected_row(cells) for cells in get_rows(table)]
+                for status, table in zip(EXPECTED_STATUSES, tables[1:])
+            },
+        }
+    except (AttributeError, IndexError, InvalidOperation, ValueError):
+        return None
+
+
+def get_won_deals(root: Element) -> Optional[int]:
+    """The first line of the summary is the number of won deals."""
+    for p in root.iter('p'):
+        name, sep, value = p.text.rpartition(' = ')
+        if sep:
+            return int(value)
+    return None
+
+
+def get_charts(root: Element) -> list:
+    """Returns the titles and the totals of the bars of the charts."""
+    charts = []
+    for div in root.iter('div'):
+        if not div.has_class('bar-chart'):
+            continue
+        title = div.parent
+        while title is not None and title.tag != 'p':
+            title = get_previous(title)
+        totals = [
+            Decimal(re.sub(r'[^\d-]', '', tooltip.text) or 0)
+            for bar in div.iter('div') if bar.has_class('bar')
+            for tooltip in bar.iter('div') if tooltip.has_class('bar-tooltip')
+        ]
+        charts.append((title.text if title else '', totals))
+    return charts
+
+
+def get_previous(element: Element) -> Optional[Element]:
+    siblings = [e for e in element.parent.children if isinstance(e, Element)]
+    index = siblings.index(element)
+    return siblings[index - 1] if index else None
+
+
+def get_rows(table: Element) -> list:
+    return [list(tr.iter('td')) for tr in table.find('tbody').iter('tr')]
+
+
+def get_deal_row(cells: list, owner: Element) -> dict:
+    link = cells[0].find('a')
+    return {
+        'deal_id': int(DEAL_URL_RE.search(link.attrs['href']).group(1)),
+        'name': link.text,
+        'products': cells[1].text,
+        'owner': owner.text,
+    }
+
+
+def get_sum(cell: Element) -> list:
+    """Returns [value, whether through representation] of the amount cell."""
+    if cell.text == LEADERS:
+        return [None, False]
+    return [Decimal(cell.text.split()[0]), cell.find('span') is not None]
+
+
+def get_received_row(cells: list, today: date) -> dict:
+    value, through_representation = get_sum(cells[2])
+    order_number = cells[4].text
+    return {
+        **get_deal_row(cells, cells[5]),
+        'value': value,
+        'through_representation': through_representation,
+        'payment_date': get_payment_date(cells[3].text, today),
+        'order_number': '' if order_number == LEADERS else order_number,
+    }
+
+
+def get_expected_row(cells: list) -> dict:
+    orders = cells[5].text
+    return {
+        **get_deal_row(cells, cells[6]),
+        'sums': [get_sum(cell) for cell in cells[2:5]],
+        'orders': [] if orders == LEADERS else orders.split(', '),
+    }
+
+
+def get_payment_date(text: str, today: date) -> date:
+    """
+    Returns the date of the current month rendered in the local format.
+    The numbers of the year and month are dropped, the day remains.
+    """
+    numbers = [int(n) for n in re.findall(r'\d+', text)]
+    for year in (today.year, today.year % 100):
+        if year in numbers:
+            numbers.remove(year)
+            break
+    if len(numbers) > 1 and today.month in numbers:
+        numbers.remove(today.month)
+    if len(numbers) != 1:
+        raise ValueError(f'Unknown date: {text}')
+    return today.replace(day=numbers[0])
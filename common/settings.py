@@ -1,3 +1,22 @@
 
 # TODO: The "REMAINDER_CHECK_INTERVAL" setting is deprecated and will be removed in the future.
 REMAINDER_CHECK_INTERVAL = 60 * 5
+
+# Seconds the user's roles, department and profile data used on every
+# request are cached. Changes of the user's groups and profile reset it
+# in the default cache. Unless CACHES sets a shared backend (Redis,
+# Memcached), the default cache is LocMemCache, local to each process,
+# so the other processes (gunicorn workers) see a removed group or role
+# only after this TTL. Keep it a few seconds then; with a shared cache
+# it can be raised (e.g. 60 * 10).
+USER_PRINCIPAL_CACHE_TTL = 5
+# Seconds the admin site counters (outbox, requests, tasks, memos) and help
+# urls are cached. They are reset when the counted objects are changed.
+SITE_CACHE_TTL = 60
+# Seconds the changelist filter decisions and row fragments are cached
+# in the process memory. Changes made in other processes are seen after it.
+LOCAL_CACHE_TTL = 60 * 5
+
+# Number of objects fetched from the database at a time when exporting
+# them to a file. Many-to-many values are prefetched for each chunk.
+EXPORT_CHUNK_SIZE = 2000
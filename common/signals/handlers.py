@@ -1,9 +1,37 @@
 from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_save
 from django.dispatch import receiver
 
+from analytics.utils.rollups import get_dependents
+from analytics.utils.rollups import update_rollups
+from common.models import Department
 from common.models import UserProfile
 from common.utils.helpers import USER_MODEL
+from common.utils.site_cache import invalidate
+from common.utils.user_principal import invalidate_principal
+from crm.models import ClosingReason
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Country
+from crm.models import CrmEmail
+from crm.models import Deal
+from crm.models import Lead
+from crm.models import Payment
+from crm.models import Rate
+from crm.models import Request
+from crm.models import Stage
+from crm.utils.matching import update_match_keys
+from crm.utils.phone_numbers import update_phone_numbers
+from crm.utils.search import remember_indexed_values
+from crm.utils.search import update_index
+from help.models import Page
+from help.models import Paragraph
+from tasks.models import Memo
+from tasks.models import Task
 
 
 @receiver(post_save, sender=USER_MODEL)
@@ -12,3 +40,150 @@ def user_creation_handler(sender, instance, created, **kwargs):
         co_workers = Group.objects.get(name='co-workers')
         instance.groups.add(co_workers)
         UserProfile.objects.create(user=instance)
+
+
+@receiver(m2m_changed, sender=USER_MODEL.groups.through)
+def user_groups_handler(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_principal(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        invalidate_principal(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_group_users(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_handler(sender, instance, **kwargs):
+    invalidate_principal(instance.user_id)
+
+
+@receiver(post_save, sender=Department)
+@receiver(pre_delete, sender=Department)
+@receiver(pre_delete, sender=Group)
+def group_handler(sender, instance, **kwargs):
+    invalidate_group_users(instance)
+
+
+def invalidate_group_users(group: Group) -> None:
+    invalidate_principal(*group.user_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=CrmEmail)
+@receiver(post_delete, sender=CrmEmail)
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Memo)
+@receiver(post_delete, sender=Memo)
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Paragraph)
+@receiver(post_delete, sender=Paragraph)
+def site_cache_handler(sender, **kwargs):
+    """Reset the cached admin site counters and help urls."""
+    invalidate(sender._meta.label_lower)
+
+
+@receiver(m2m_changed, sender=Task.responsible.through)
+@receiver(m2m_changed, sender=Paragraph.groups.through)
+def site_cache_m2m_handler(sender, action, **kwargs):
+    if action.startswith('post_'):
+        # the model with the ManyToManyField
+        invalidate(sender._meta.auto_created._meta.label_lower)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+@receiver(post_save, sender=CrmEmail)
+@receiver(post_delete, sender=CrmEmail)
+@receiver(post_save, sender=Deal)
+@receiver(post_delete, sender=Deal)
+@receiver(post_save, sender=Lead)
+@receiver(post_delete, sender=Lead)
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def search_index_handler(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    """Update the search documents of the object and related objects."""
+    if not raw:
+        update_index(sender, instance, update_fields,
+                     deleted=kwargs['signal'] is post_delete)
+
+
+@receiver(pre_save, sender=Company)
+@receiver(pre_save, sender=Contact)
+@receiver(pre_save, sender=Country)
+@receiver(pre_save, sender=CrmEmail)
+@receiver(pre_save, sender=Deal)
+@receiver(pre_save, sender=Lead)
+@receiver(pre_save, sender=Request)
+def search_values_handler(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    """Keep the saved values of the indexed fields of the object."""
+    if not raw:
+        remember_indexed_values(sender, instance, update_fields)
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+@receiver(post_save, sender=Lead)
+@receiver(post_delete, sender=Lead)
+def phone_numbers_handler(sender, instance, **kwargs):
+    """
+    Update the normalized phone numbers of the contact or lead.
+    They depend only on the object itself, so loaded fixtures are indexed too.
+    """
+    update_phone_numbers(sender, instance)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+@receiver(post_save, sender=Lead)
+@receiver(post_delete, sender=Lead)
+def match_keys_handler(sender, instance, **kwargs):
+    """Update the keys by which requests are matched to the object."""
+    update_match_keys(sender, instance)
+
+
+@receiver(post_save, sender=ClosingReason)
+@receiver(post_save, sender=Deal)
+@receiver(post_save, sender=Lead)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Rate)
+@receiver(post_save, sender=Request)
+@receiver(post_save, sender=Stage)
+def rollups_handler(sender, instance, **kwargs):
+    """Update the analytics rollups of the object and the objects depending on it."""
+    update_rollups(get_dependents(sender, instance))
+
+
+@receiver(pre_delete, sender=ClosingReason)
+@receiver(pre_delete, sender=Deal)
+@receiver(pre_delete, sender=Lead)
+@receiver(pre_delete, sender=Payment)
+@receiver(pre_delete, sender=Rate)
+@receiver(pre_delete, sender=Request)
+@receiver(pre_delete, sender=Stage)
+def rollups_pre_delete_handler(sender, instance, **kwargs):
+    """Find the dependents before the relations to the object are cleared."""
+    instance._rollup_dependents = get_dependents(sender, instance)  # NOQA
+
+
+@receiver(post_delete, sender=ClosingReason)
+@receiver(post_delete, sender=Deal)
+@receiver(post_delete, sender=Lead)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Rate)
+@receiver(post_delete, sender=Request)
+@receiver(post_delete, sender=Stage)
+def rollups_delete_handler(sender, instance, **kwargs):
+    update_rollups(getattr(instance, '_rollup_dependents', ()))
@@ -86,6 +86,7 @@ class BaseModelAdmin(admin.ModelAdmin):
                 request,
                 _("Filters may affect search results.")
             )
+            return self.search(request, queryset, search_term)
         return super().get_search_results(request, queryset, search_term)
 
     def save_model(self, request, obj, form, change):
@@ -108,7 +109,11 @@ class BaseModelAdmin(admin.ModelAdmin):
 
     @admin.display(description='')
     def attachment(self, obj):
-        if obj.files.exists():
+        # 'has_files' is annotation of changelists
+        has_files = getattr(obj, 'has_files', None)
+        if has_files is None:
+            has_files = obj.files.exists()
+        if has_files:
             return safe_attach_file_icon
         return ''
 
@@ -250,3 +255,7 @@ class BaseModelAdmin(admin.ModelAdmin):
                     obj.department_id = get_department_id(obj.owner)
                 else:
                     obj.department_id = request.user.department_id  # NOQA
+
+    def search(self, request: WSGIRequest, queryset, search_term: str) -> tuple:
+        """Searches the objects by search_fields."""
+        return super().get_search_results(request, queryset, search_term)
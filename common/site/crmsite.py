@@ -14,9 +14,12 @@ from django.utils.safestring import mark_safe
 from common.models import Reminder, UserProfile
 from common.utils.hide_main_tasks import hide_main_tasks
 from common.utils.helpers import LEADERS
+from common.utils.site_cache import get_cached
+from common.utils.user_principal import get_principal
 from crm.models import CrmEmail
 from crm.models import Request
 from help.models import Page
+from help.models import Paragraph
 from tasks.models import Memo
 from tasks.models import Task
 
@@ -167,12 +170,16 @@ def get_counters(request, app_label, models):
 
 
 def get_outbox_email_count(request, models):
-    outbox_count = CrmEmail.objects.filter(
-        owner=request.user,
-        sent=False, 
-        incoming=False, 
-        trash=False
-    ).count()
+    outbox_count = get_cached(
+        (CrmEmail._meta.label_lower,),
+        f'outbox_{request.user.id}',
+        CrmEmail.objects.filter(
+            owner=request.user,
+            sent=False,
+            incoming=False,
+            trash=False
+        ).count
+    )
     if outbox_count:
         model_name = CrmEmail._meta.verbose_name_plural
         post = next((m for m in models if m['name'] == model_name), None)
@@ -184,10 +191,14 @@ def get_outbox_email_count(request, models):
 
 
 def get_memo_count(request, models):
-    memo_count = Memo.objects.filter(
-        stage=Memo.PENDING,
-        to=request.user,
-    ).count()
+    memo_count = get_cached(
+        (Memo._meta.label_lower,),
+        f'memos_{request.user.id}',
+        Memo.objects.filter(
+            stage=Memo.PENDING,
+            to=request.user,
+        ).count
+    )
     if memo_count:
         model_name = Memo._meta.verbose_name_plural
         memo = next((
@@ -205,22 +216,30 @@ def get_request_count(request, models):
     today = localtime(now()).replace(hour=0, minute=0, second=0, microsecond=0)
     qs = Request.objects.filter(pending=True)
     q_params = Q()
+    role = ''
     if any((
         request.user.is_operator,
         request.user.is_superoperator,
         request.user.is_superuser,
         request.user.is_chief,
     )):
+        role = 'operator'
         q_params = Q(owner__groups__name__in=('superoperators', 'operators'))
         q_params |= Q(owner__isnull=True)
         if request.user.department_id:
             qs = qs.filter(department_id=request.user.department_id)
     elif request.user.is_manager:
+        role = 'manager'
         q_params = Q(owner=request.user) | Q(co_owner=request.user)
 
-    counts = qs.filter(q_params).aggregate(
-        regular=Count('pk', filter=Q(creation_date__gte=today)),
-        urgent=Count('pk', filter=Q(creation_date__lt=today))
+    counts = get_cached(
+        (Request._meta.label_lower,),
+        f'requests_{request.user.id}_{role}_'
+        f'{request.user.department_id}_{today.date()}',
+        lambda: qs.filter(q_params).aggregate(
+            regular=Count('pk', filter=Q(creation_date__gte=today)),
+            urgent=Count('pk', filter=Q(creation_date__lt=today))
+        )
     )
     if counts['urgent'] or counts['regular']:
         set_counters(Request, models, counts)
@@ -233,9 +252,13 @@ def get_task_count(request, models):
         responsible=request.user,
     )
     qs = hide_main_tasks(request, qs)
-    counts = qs.aggregate(
-        regular=Count('pk', filter=Q(next_step_date__isnull=True) | Q(next_step_date__gte=today)),
-        urgent=Count('pk', filter=Q(next_step_date__isnull=False) & Q(next_step_date__lt=today))
+    counts = get_cached(
+        (Task._meta.label_lower,),
+        f'tasks_{request.user.id}_{today.date()}',
+        lambda: qs.aggregate(
+            regular=Count('pk', filter=Q(next_step_date__isnull=True) | Q(next_step_date__gte=today)),
+            urgent=Count('pk', filter=Q(next_step_date__isnull=False) & Q(next_step_date__lt=today))
+        )
     )
     if counts['urgent'] or counts['regular']:
         set_counters(Task, models, counts)
@@ -286,7 +309,7 @@ def get_help_url(request) -> str:
     """
     Return the URL of the help page for the current language or English.
     """
-    help_url = app_label = model = page = ''  # index/home page
+    app_label = model = page = ''  # index/home page
     index_url = reverse('site:index')
     path = request.path_info.replace(index_url, '').split('?')
     if path[0]:
@@ -302,6 +325,20 @@ def get_help_url(request) -> str:
                         page = 'i'
             except IndexError:
                 pass  # page of app
+    # the paragraphs shown depend on the user groups
+    groups = ''
+    if request.user.is_authenticated:
+        groups = ','.join(sorted(get_principal(request.user).group_names))
+    return get_cached(
+        (Page._meta.label_lower, Paragraph._meta.label_lower),
+        f'help_{get_language()}_{app_label}_{model}_{page}'
+        f'_{request.user.is_superuser}_{groups}',
+        lambda: find_help_url(request, app_label, model, page)
+    )
+
+
+def find_help_url(request, app_label: str, model: str, page: str) -> str:
+    help_url = ''
     pages = Page.objects.filter(
         app_label=app_label,
         model=model,
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+from typing import Hashable
+from typing import Iterable
+from django.conf import settings
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+# In-process caches for values computed by the admin site on every page:
+# filter decisions and html fragments of changelist rows.
+# A cache keeps at most maxsize values (least recently used are dropped)
+# for LOCAL_CACHE_TTL seconds, and is cleared
+# when an object of the models it depends on is saved or deleted
+# (or a many-to-many relation is changed if the model is its "through" model).
+# Other processes see such a change after the TTL.
+
+
+class LocalCache:
+
+    def __init__(self, name: str, maxsize: int = 1000,
+                 models: Iterable = ()):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        for model in models:
+            for signal in (post_save, post_delete, m2m_changed):
+                signal.connect(
+                    self.clear_handler, sender=model, weak=False,
+                    dispatch_uid=f'local_cache_{name}_{model.__name__}'
+                )
+
+    def get(self, key: Hashable, func: Callable):
+        """
+        Return the value cached under the key
+        or compute it with func() and cache it.
+        """
+        ttl = settings.LOCAL_CACHE_TTL
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item and item[1] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+        value = func()
+        if ttl:
+            with self._lock:
+                self._data[key] = (value, now + ttl)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def clear_handler(self, sender, **kwargs):
+        self.clear()
+
+    def stats(self) -> dict:
+        return {
+            'name': self.name,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,46 @@
+import hashlib
+from typing import Callable
+from typing import Iterable
+from django.conf import settings
+from django.core.cache import cache
+
+# Values computed for the admin site pages (counters, help urls) are cached
+# per group of models. Saving or deleting an object of the group changes
+# the group generation, which is part of the value keys,
+# so the cached values of the group become unreachable at once.
+# SITE_CACHE_TTL limits the lifetime of the values that
+# are changed without signals (queryset.update(), date change).
+
+GENERATION_KEY = 'site_cache_generation_{}'
+VALUE_KEY = 'site_cache_{}_{}_{}'
+
+
+def get_cached(groups: Iterable[str], key: str, func: Callable):
+    """
+    Return the value cached under the key
+    or compute it with func() and cache it.
+    """
+    groups = tuple(groups)
+    generations = cache.get_many(
+        [GENERATION_KEY.format(group) for group in groups]
+    )
+    generation = '.'.join(
+        str(generations.get(GENERATION_KEY.format(group), 0))
+        for group in groups
+    )
+    # keys may contain characters not allowed by memcached
+    key = hashlib.md5(key.encode()).hexdigest()
+    value_key = VALUE_KEY.format('.'.join(groups), generation, key)
+    value = cache.get(value_key)
+    if value is None:
+        value = func()
+        cache.set(value_key, value, settings.SITE_CACHE_TTL)
+    return value
+
+
+def invalidate(group: str) -> None:
+    key = GENERATION_KEY.format(group)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
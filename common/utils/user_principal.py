@@ -0,0 +1,56 @@
+from typing import NamedTuple
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+
+from common.models import UserProfile
+
+CACHE_KEY = 'user_principal_{}'
+# user attribute: group name
+ROLES = {
+    'is_superoperator': 'superoperators',
+    'is_operator': 'operators',
+    'is_chief': 'chiefs',
+    'is_manager': 'managers',
+    'is_accountant': 'accountants',
+    'is_task_operator': 'task_operators',
+    'is_department_head': 'department heads',
+}
+
+
+class UserPrincipal(NamedTuple):
+    """The user data needed on every request."""
+    group_names: frozenset
+    department_ids: tuple       # ordered by id
+    utc_timezone: str
+    activate_timezone: bool
+    language_code: Optional[str]     # None if the user has no profile
+    has_messages: bool
+
+
+def get_principal(user) -> UserPrincipal:
+    key = CACHE_KEY.format(user.id)
+    principal = cache.get(key)
+    if principal is None:
+        principal = load_principal(user)
+        cache.set(key, principal, settings.USER_PRINCIPAL_CACHE_TTL)
+    return principal
+
+
+def load_principal(user) -> UserPrincipal:
+    groups = user.groups.order_by('id').values_list('name', 'department')
+    profile = UserProfile.objects.filter(user_id=user.id).values(
+        'utc_timezone', 'activate_timezone', 'language_code', 'messages'
+    ).first() or {}
+    return UserPrincipal(
+        group_names=frozenset(name for name, _d in groups),
+        department_ids=tuple(d for _n, d in groups if d),
+        utc_timezone=profile.get('utc_timezone', ''),
+        activate_timezone=profile.get('activate_timezone', False),
+        language_code=profile.get('language_code'),
+        has_messages=bool(profile.get('messages')),
+    )
+
+
+def invalidate_principal(*user_ids) -> None:
+    cache.delete_many([CACHE_KEY.format(user_id) for user_id in user_ids])
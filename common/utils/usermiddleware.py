@@ -8,6 +8,10 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import get_language
 
 from common.models import UserProfile
+from common.utils.user_principal import get_principal
+from common.utils.user_principal import invalidate_principal
+from common.utils.user_principal import ROLES
+from common.utils.user_principal import UserPrincipal
 
 
 class UserMiddleware:
@@ -16,20 +20,20 @@ class UserMiddleware:
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            profile = getattr(request.user, 'profile', None)
-            groups = request.user.groups.all()      
-            set_user_timezone(profile)
-            set_user_groups(request, groups)
-            set_user_department(request, groups)
+            principal = get_principal(request.user)
+            set_user_timezone(principal)
+            set_user_groups(request, principal)
+            set_user_department(request, principal)
             iem = apps.get_app_config('crm')
             iem.import_emails(request.user)
-            activate_stored_messages_to_user(request, profile)
-            check_user_language(profile)
+            activate_stored_messages_to_user(request, principal)
+            check_user_language(request.user, principal)
         return self.get_response(request)
 
 
-def activate_stored_messages_to_user(request: WSGIRequest, profile: UserProfile) -> None:
-    if profile.messages:
+def activate_stored_messages_to_user(request: WSGIRequest, principal: UserPrincipal) -> None:
+    if principal.has_messages:
+        profile = UserProfile.objects.get(user_id=request.user.id)
         while profile.messages:
             msg = mark_safe(profile.messages.pop(0))    # NOQA
             level = profile.messages.pop(0)             # NOQA
@@ -37,14 +41,16 @@ def activate_stored_messages_to_user(request: WSGIRequest, profile: UserProfile)
         profile.save(update_fields=['messages'])
 
 
-def check_user_language(profile: UserProfile) -> None:
+def check_user_language(user, principal: UserPrincipal) -> None:
     cur_language = get_language()
-    if cur_language != profile.language_code:
-        profile.language_code = cur_language
-        profile.save(update_fields=['language_code'])
+    if principal.language_code not in (None, cur_language):
+        UserProfile.objects.filter(user_id=user.id).update(
+            language_code=cur_language
+        )
+        invalidate_principal(user.id)
 
 
-def set_user_department(request: WSGIRequest, groups) -> None:
+def set_user_department(request: WSGIRequest, principal: UserPrincipal) -> None:
     if request.headers.get('x-requested-with') != 'XMLHttpRequest':
         if any((
             request.user.is_superuser,
@@ -64,36 +70,26 @@ def set_user_department(request: WSGIRequest, groups) -> None:
                 request.user.department_id = None
                 request.session['department_id'] = None
         else:
-            department = groups.filter(
-                department__isnull=False
-            ).first()
-            request.user.department_id = department.id if department else None
+            department_ids = principal.department_ids
+            request.user.department_id = department_ids[0] if department_ids else None
             request.user.is_chief = False
 
 
-def set_user_groups(request: WSGIRequest, groups) -> None:
-    group_names = groups.values_list('name', flat=True)
-    request.user.is_superoperator = 'superoperators' in group_names
-    request.user.is_operator = 'operators' in group_names
-    request.user.is_chief = 'chiefs' in group_names
-    request.user.is_manager = 'managers' in group_names
-    request.user.is_accountant = 'accountants' in group_names
-    request.user.is_task_operator = 'task_operators' in group_names
-    request.user.is_department_head = 'department heads' in group_names
+def set_user_groups(request: WSGIRequest, principal: UserPrincipal) -> None:
+    for attr, group_name in ROLES.items():
+        setattr(request.user, attr, group_name in principal.group_names)
 
     if request.user.is_operator:
-        departments = groups.filter(department__isnull=False).count()
-        if departments > 1:
+        if len(principal.department_ids) > 1:
             request.user.is_superoperator = True
             request.user.is_operator = False
     
 
-def set_user_timezone(profile: UserProfile) -> None:
-    utc_timezone = getattr(profile, 'utc_timezone', None)  
-    if settings.USE_TZ and utc_timezone:
-        if profile.activate_timezone:
+def set_user_timezone(principal: UserPrincipal) -> None:
+    if settings.USE_TZ and principal.utc_timezone:
+        if principal.activate_timezone:
             timezone.activate(
-                zoneinfo.ZoneInfo(profile.utc_timezone)
+                zoneinfo.ZoneInfo(principal.utc_timezone)
             )
         else:
             timezone.deactivate()
@@ -1,8 +1,13 @@
-import pandas as pd
+import csv
+from decimal import Decimal
 from pathlib import Path
+from tempfile import TemporaryFile
+from typing import BinaryIO
+from typing import Iterator
 from typing import Union
-from django.http import HttpResponse
-from django.http import HttpResponseNotFound
+import xlsxwriter
+from django.http import FileResponse
+from django.http import StreamingHttpResponse
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.handlers.wsgi import WSGIRequest
@@ -18,17 +23,40 @@ from crm.models import Deal
 from crm.models import Lead
 from tasks.models import Task
 
+# Objects are exported row by row in one pass over the queryset:
+# related objects of the columns are selected with the rows,
+# many-to-many values are prefetched for every EXPORT_CHUNK_SIZE rows.
+# CSV rows are streamed to the client as they are written.
+# An xlsx workbook is written by xlsxwriter in constant memory mode
+# to a temporary file which is then streamed.
 
-def get_file_path(username: str, queryset: QuerySet = None, model=None) -> Path:
+CSV = 'csv'
+XLSX = 'xlsx'
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    XLSX: 'application/vnd.ms-excel',
+}
+
+
+class Echo:
+    """A file-like object of csv.writer returning the written lines."""
+
+    @staticmethod
+    def write(value):
+        return value
+
+
+def get_file_path(username: str, queryset: QuerySet = None, model=None,
+                  extension: str = XLSX) -> Path:
     today = get_today()
     file_path = settings.MEDIA_ROOT / 'exported'
-    if queryset:
-        file_name = f"{queryset.model.__name__}_db_{username}_{today}.xlsx"
+    if queryset is not None:
+        file_name = f"{queryset.model.__name__}_db_{username}_{today}.{extension}"
     else:
         if not model:
             raise Exception("either queryset or model must be specified")
-        file_name = f"{model.__name__}_db_{username}_{today}.xlsx"
-    
+        file_name = f"{model.__name__}_db_{username}_{today}.{extension}"
+
     return file_path / escape_uri_path(file_name)
 
 
@@ -42,7 +70,7 @@ def get_columns_data() -> dict:
     }
 
 
-def export_objects_view(request: WSGIRequest) -> Union[HttpResponse, HttpResponseNotFound]:
+def export_objects_view(request: WSGIRequest) -> StreamingHttpResponse:
     content_type_id = request.GET.get("content_type")
     content_type = ContentType.objects.get(id=content_type_id)
     queryset = content_type.model_class().objects.filter(
@@ -52,101 +80,95 @@ def export_objects_view(request: WSGIRequest) -> Union[HttpResponse, HttpRespons
 
 
 def export_selected_objects(request: WSGIRequest,
-                            queryset: QuerySet) -> Union[HttpResponse, HttpResponseNotFound]:
+                            queryset: QuerySet) -> StreamingHttpResponse:
+    """
+    Export the objects to a CSV file if the "format" parameter
+    of the request is "csv", to an xlsx file otherwise.
+    """
     content_type = ContentType.objects.get_for_model(queryset.model)
-
-    file_path = get_file_path(request.user.username, queryset)
-    columns_data = get_columns_data()
-    datadict = get_datadict(
-        request,
-        columns_data[content_type.id],
-        queryset=queryset
-    )
-    save_to_excel(datadict, file_path)
-    return get_export_response(file_path)
-
-
-def save_to_excel(datadict: dict, file_path: Path) -> None:
-    df = pd.DataFrame(datadict)
-    df = df.replace('nan', '')
-    df = df.replace('None', '')
-    writer = pd.ExcelWriter(file_path, engine='xlsxwriter')
-    df.to_excel(writer, 'Sheet1', index=False, na_rep=' ')
-    writer.close()
-
-
-def get_export_response(file_path: Path) -> Union[HttpResponse, HttpResponseNotFound]:
-    if file_path.exists():
-        with open(file_path, 'rb') as fh:
-            response = HttpResponse(fh.read(), content_type="application/vnd.ms-excel")
-            response['Content-Disposition'] = 'inline; filename=' + file_path.name
-            return response
-
-    return HttpResponseNotFound()
-
-
-def get_datadict(request: WSGIRequest, columns,
-                 obj=None, queryset: QuerySet = None) -> dict:
-    datadict = dict()
-    model = _get_model(obj, queryset)
-    for attr in columns:
-        objects = _get_object_iterator(request, obj, queryset)
-    
-        value_list = []
-        for o in objects:
-            if attr == 'industry':
-                name_list = []
-                for ind in o.industry.all():
-                    name_list.append(ind.name)
-                value = ",".join(name_list)
-            else:
-                if '__' in attr:
-                    attrs = attr.split('__')
-                    rel_o = getattr(o, attrs[0])
-                    if rel_o:
-                        value = getattr(rel_o, attrs[1])
-                    else:
-                        value =''
-                else:
-                    value = getattr(o, attr)
-
-            if attr in ('birth_date', 'was_in_touch', 'lead_time'):
-                value = str(value)
-            elif attr == 'creation_date':
-                if model == Task:
-                    value = date_format(
-                        o.creation_date.date(),
-                        format="SHORT_DATE_FORMAT",
-                        use_l10n=True
-                    )
-                else:
-                    value = str(o.creation_date.date()) if value else ''
-
-            value_list.append(value)
-        
-        if model == Task:
-            attr = get_verbose_name(model, attr)
-        datadict[attr] = value_list
-    return datadict
-
-
-def _get_object_iterator(request: WSGIRequest, obj,
-                         queryset: QuerySet) -> QuerySet:
-    if obj:
-        if request.user.is_superuser:
-            objects = obj.objects.all().iterator()
-        else:
-            objects = obj.objects.filter(owner=request.user).iterator()
-    elif queryset:
-        objects = queryset.iterator()
+    columns = get_columns_data()[content_type.id]
+    extension = CSV if request.GET.get('format') == CSV else XLSX
+    file_name = get_file_path(
+        request.user.username, queryset, extension=extension
+    ).name
+    rows = iter_rows(columns, queryset)
+    if extension == CSV:
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in rows),
+            content_type=CONTENT_TYPES[CSV]
+        )
     else:
-        raise RuntimeError('Error: either object or queryset does not received')
-    return objects
-
+        response = FileResponse(
+            write_xlsx(rows), content_type=CONTENT_TYPES[XLSX]
+        )
+    response['Content-Disposition'] = 'inline; filename=' + file_name
+    return response
+
+
+def write_xlsx(rows: Iterator[list]) -> BinaryIO:
+    """Write the rows to an xlsx workbook in a temporary file."""
+    f = TemporaryFile()
+    workbook = xlsxwriter.Workbook(f, {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    worksheet = workbook.add_worksheet('Sheet1')
+    for i, row in enumerate(rows):
+        worksheet.write_row(i, 0, row)
+    workbook.close()
+    f.seek(0)
+    return f
+
+
+def iter_rows(columns, queryset: QuerySet) -> Iterator[list]:
+    """Yield the header and the cell values of the objects row by row."""
+    model = queryset.model
+    attrs = [c[0] if isinstance(c, (list, tuple)) else c for c in columns]
+    if model == Task:
+        yield [get_verbose_name(model, attr) for attr in attrs]
+    else:
+        yield [c[1] if isinstance(c, (list, tuple)) else c for c in columns]
+
+    related, many_to_many = [], []
+    for attr in attrs:
+        name = attr.split('__')[0]
+        field = next((f for f in model._meta.get_fields() if f.name == name), None)
+        if field is None or not field.is_relation:
+            continue
+        if field.many_to_many:
+            many_to_many.append(name)
+        elif field.many_to_one or field.one_to_one:
+            related.append(name)
+    if related:
+        queryset = queryset.select_related(*dict.fromkeys(related))
+    if many_to_many:
+        queryset = queryset.prefetch_related(*dict.fromkeys(many_to_many))
+    for obj in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield [get_value(obj, attr, model) for attr in attrs]
+
+
+def get_value(obj, attr: str, model) -> Union[str, int, float, Decimal, bool]:
+    if attr == 'industry':
+        return ",".join(ind.name for ind in obj.industry.all())
+    if '__' in attr:
+        attrs = attr.split('__')
+        rel_o = getattr(obj, attrs[0])
+        value = getattr(rel_o, attrs[1]) if rel_o else ''
+    else:
+        value = getattr(obj, attr)
 
-def _get_model(obj, queryset: QuerySet):
-    if obj and obj.__class__ == Task:
-        model = obj.__class__
-    elif queryset:
-        model = queryset.model
-    return model    # NOQA
+    if attr == 'creation_date':
+        if not value:
+            return ''
+        if model == Task:
+            return date_format(
+                value.date(), format="SHORT_DATE_FORMAT", use_l10n=True
+            )
+        return str(value.date())
+    if value is None:
+        return ''
+    if isinstance(value, (str, int, float, Decimal)):
+        return value
+    return str(value)
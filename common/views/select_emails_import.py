@@ -21,6 +21,7 @@ from crm.models import Request
 from crm.utils.helpers import get_crmimap
 from crm.utils.import_emails import get_email_headers_page
 from crm.utils.import_emails import parse_message_bytes
+from crm.utils.mime_stream import spool_message
 from crm.site.crmadminsite import crm_site
 from massmail.models import EmailAccount
 
@@ -175,7 +176,9 @@ def _get_emails_by_uid(request: WSGIRequest, ea: EmailAccount, t: str, uids: lis
                         b_msg = parse_message_bytes(uid, data)
                     if b_msg:
                         crm_conf = apps.get_app_config('crm')
-                        crm_conf.eml_queue.put((b_msg, ea, t, uid, ticket, request))
+                        crm_conf.eml_queue.put(
+                            (spool_message(b_msg), ea, t, uid, ticket, request)
+                        )
                 if result != 'OK' or not data[0] or err:
                     mail_admins(
                         f"The result is {result} at get_emails_by_uid",
@@ -12,16 +12,22 @@ class CrmConfig(AppConfig):
     def ready(self):
         from crm.utils.create_email_request import CreateEmailInquiry
         from crm.utils.import_emails import ImportEmails
+        from crm.utils.import_queue import AccountQueue
         from crm.utils.manage_imaps import CrmImapManager
         from crm.utils.restore_imap_emails import RestoreImapEmails
 
-        ea_queue = Queue()
+        ea_queue = AccountQueue()
         self.inq_eml_queue = Queue(2)
         self.eml_queue = Queue(4)                           # NOQA
         self.mci = CrmImapManager(ea_queue)                 # NOQA
         self.mci.start()
         self.im = ImportEmails(ea_queue, self.eml_queue)    # NOQA
         self.im.start()
+        self.idle = None
+        if settings.IMAP_IDLE and not settings.TESTING:
+            from crm.utils.imap_idle import ImapIdleManager
+            self.idle = ImapIdleManager(ea_queue)
+            self.idle.start()
         rim = RestoreImapEmails(self.eml_queue, self.inq_eml_queue)
         rim.start()
         cei = CreateEmailInquiry(self.inq_eml_queue)
@@ -1,5 +1,9 @@
+import time
 from abc import ABC, abstractmethod
 from datetime import date
+from datetime import timedelta
+from typing import Iterable
+from typing import Optional
 from typing import Tuple
 from django.core.mail import mail_admins
 
@@ -37,19 +41,47 @@ class BaseBackend(ABC):
     def get_rate_to_state_currency(self, currency: str = 'USD'):
         pass
 
+    @classmethod
+    def get_range_rates(cls, currency: str, marketing_currency: str,
+                        start: date, end: date,
+                        dates: Optional[Iterable[date]] = None,
+                        delay: float = 0) -> Tuple[dict, str]:
+        """
+        Returns the rates of the currency on the dates of the range
+        ({date: (rate_to_state_currency, rate_to_marketing_currency)}, error).
+        dates - the dates of the range that are needed (all by default).
+        delay - seconds between the requests.
+        The rates are requested for each date. Backends of APIs
+        returning the rates of a period override this method.
+        """
+        if dates is None:
+            dates = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        rates = {}
+        for i, rate_date in enumerate(dates):
+            if i and delay:
+                time.sleep(delay)
+            be = cls(currency, marketing_currency, rate_date)
+            values = be.calculate_rates()
+            if be.error:
+                return rates, be.error
+            rates[rate_date] = values
+        return rates, ''
+
+    def calculate_rates(self) -> Tuple[float, float]:
+        """Returns the rates to the state and marketing currencies."""
+        if self.error:
+            return 1, 1
+        if self.currency == self.state_currency:
+            return 1, 1 / self.marketing_currency_rate
+        if self.currency == self.marketing_currency:
+            return self.marketing_currency_rate, 1
+        rate_to_state_currency = self.get_rate_to_state_currency(self.currency)
+        return rate_to_state_currency, rate_to_state_currency / self.marketing_currency_rate
+
     def get_rates(self) -> Tuple[float, float, str]:
+        rate_to_state_currency, rate_to_marketing_currency_rate = self.calculate_rates()
         if not self.error:
-            if self.currency == self.state_currency:
-                rate_to_state_currency = 1
-                rate_to_marketing_currency_rate = 1 / self.marketing_currency_rate
-            elif self.currency == self.marketing_currency:
-                rate_to_state_currency = self.marketing_currency_rate
-                rate_to_marketing_currency_rate = 1
-            else:
-                rate_to_state_currency = self.get_rate_to_state_currency(self.currency)
-                rate_to_marketing_currency_rate = rate_to_state_currency / self.marketing_currency_rate
-            if not self.error:
-                return rate_to_state_currency, rate_to_marketing_currency_rate, self.error
+            return rate_to_state_currency, rate_to_marketing_currency_rate, self.error
 
         mail_admins(
             "Error getting currency rates",
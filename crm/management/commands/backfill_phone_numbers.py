@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from crm.models.phone_number import PHONE_FIELDS
+from crm.utils.phone_numbers import rebuild_phone_numbers
+
+
+class Command(BaseCommand):
+    help = "Rebuild the normalized phone numbers of contacts and leads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*', metavar='app_label.ModelName',
+            help=f"Models to rebuild (default: {', '.join(PHONE_FIELDS)})"
+        )
+
+    def handle(self, *args, **options):
+        for label in options['models'] or PHONE_FIELDS:
+            if label not in PHONE_FIELDS:
+                raise CommandError(f"{label} has no indexed phone numbers")
+            number = rebuild_phone_numbers(apps.get_model(label))
+            self.stdout.write(f"{label}: {number} phone numbers")
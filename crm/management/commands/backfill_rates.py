@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from crm.models import Currency
+from crm.utils.rate_backfill import backfill_rates
+
+
+class Command(BaseCommand):
+    help = "Load the official currency rates of the dates of received payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--range-days', type=int, default=settings.RATE_BACKFILL_RANGE_DAYS,
+            help="Maximum number of days requested from the backend at once"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.LOAD_RATE_BACKEND:
+            raise CommandError("LOAD_RATE_BACKEND is not set in settings")
+        marketing_currency = Currency.objects.filter(
+            is_marketing_currency=True
+        ).first()
+        if not marketing_currency:
+            raise CommandError("Please specify the marketing currency")
+        number, errors = backfill_rates(
+            marketing_currency,
+            import_string(settings.LOAD_RATE_BACKEND),
+            timezone.localdate(),
+            range_days=options['range_days']
+        )
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(f"{number} rates saved")
@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from crm.models.match_key import MATCHED_MODELS
+from crm.utils.matching import rebuild_match_keys
+
+
+class Command(BaseCommand):
+    help = "Rebuild the keys by which requests are matched to contacts, leads and companies"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*', metavar='app_label.ModelName',
+            help=f"Models to rebuild (default: {', '.join(MATCHED_MODELS)})"
+        )
+
+    def handle(self, *args, **options):
+        for label in options['models'] or MATCHED_MODELS:
+            if label not in MATCHED_MODELS:
+                raise CommandError(f"{label} is not matched to requests")
+            number = rebuild_match_keys(apps.get_model(label))
+            self.stdout.write(f"{label}: {number} keys")
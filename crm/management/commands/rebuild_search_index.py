@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from crm.models.search_document import INDEXED_MODELS
+from crm.utils.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the documents of the changelist full-text search"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*', metavar='app_label.ModelName',
+            help=f"Models to rebuild (default: {', '.join(INDEXED_MODELS)})"
+        )
+
+    def handle(self, *args, **options):
+        for label in options['models'] or INDEXED_MODELS:
+            if label not in INDEXED_MODELS:
+                raise CommandError(f"{label} is not indexed")
+            number = rebuild_index(apps.get_model(label))
+            self.stdout.write(f"{label}: {number} documents")
@@ -0,0 +1,29 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from crm.models import Request
+from crm.utils.matching import match_requests
+
+
+class Command(BaseCommand):
+    help = "Find the contacts, leads and companies of the requests that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=date.fromisoformat, metavar='YYYY-MM-DD',
+            help="Only the requests created since the date"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Count the requests that would be linked without saving them"
+        )
+
+    def handle(self, *args, **options):
+        requests = Request.objects.filter(
+            Q(contact__isnull=True, lead__isnull=True) | Q(company__isnull=True)
+        )
+        if options['since']:
+            requests = requests.filter(creation_date__date__gte=options['since'])
+        number = match_requests(requests, save=not options['dry_run'])
+        self.stdout.write(f"{number} requests linked")
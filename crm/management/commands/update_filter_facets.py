@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from crm.models import FilterFacet
+from crm.models.filter_facet import FACET_MODELS
+
+
+class Command(BaseCommand):
+    help = "Rebuild the facets of the changelist country and city filters"
+
+    def handle(self, *args, **options):
+        for label in FACET_MODELS:
+            model = apps.get_model(label)
+            content_type = ContentType.objects.get_for_model(model)
+            rows = model.objects.values(
+                'department_id', 'country_id', 'city_id'
+            ).annotate(number=Count('id')).order_by()
+            with transaction.atomic():
+                FilterFacet.objects.filter(content_type=content_type).delete()
+                facets = FilterFacet.objects.bulk_create(
+                    (FilterFacet(content_type=content_type, **row)
+                     for row in rows.iterator()),
+                    batch_size=1000
+                )
+            self.stdout.write(f"{label}: {len(facets)} facets")
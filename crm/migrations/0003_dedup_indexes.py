@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crmemail',
+            index=models.Index(fields=['message_id'], name='crmemail_message_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crmemail',
+            index=models.Index(fields=['uid', 'creation_date'], name='crmemail_uid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crmemail',
+            index=models.Index(fields=['email_host_user', 'incoming', 'creation_date'], name='crmemail_host_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='crmemail',
+            index=models.Index(fields=['ticket'], name='crmemail_ticket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['ticket'], name='request_ticket_idx'),
+        ),
+    ]
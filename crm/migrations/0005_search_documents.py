@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:20
+
+import django.db.models.deletion
+from django.db import DatabaseError
+from django.db import migrations, models
+from django.db import transaction
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE crm_searchdocument_fts USING fts5("
+    "text, content='crm_searchdocument', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER crm_searchdocument_ai AFTER INSERT ON crm_searchdocument BEGIN "
+    "INSERT INTO crm_searchdocument_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER crm_searchdocument_ad AFTER DELETE ON crm_searchdocument BEGIN "
+    "INSERT INTO crm_searchdocument_fts(crm_searchdocument_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER crm_searchdocument_au AFTER UPDATE ON crm_searchdocument BEGIN "
+    "INSERT INTO crm_searchdocument_fts(crm_searchdocument_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO crm_searchdocument_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+FULL_TEXT_INDEX = {
+    'mysql': (
+        ["ALTER TABLE crm_searchdocument ADD FULLTEXT INDEX "
+         "searchdocument_text_ft (text) WITH PARSER ngram"],
+        ["ALTER TABLE crm_searchdocument DROP INDEX searchdocument_text_ft"],
+    ),
+    'postgresql': (
+        ["CREATE INDEX searchdocument_text_gin ON crm_searchdocument "
+         "USING GIN (to_tsvector('simple', text))"],
+        ["DROP INDEX IF EXISTS searchdocument_text_gin"],
+    ),
+    'sqlite': (
+        SQLITE_FTS,
+        ["DROP TABLE IF EXISTS crm_searchdocument_fts"],
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql, _reverse = FULL_TEXT_INDEX.get(schema_editor.connection.vendor, ([], []))
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for statement in sql:
+                schema_editor.execute(statement)
+    except DatabaseError:
+        # e.g. SQLite without FTS5 - the search falls back to LIKE
+        pass
+
+
+def drop_index(apps, schema_editor):
+    _sql, sql = FULL_TEXT_INDEX.get(schema_editor.connection.vendor, ([], []))
+    for statement in sql:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('crm', '0004_filter_facets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('text', models.TextField(default='')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Search document',
+                'verbose_name_plural': 'Search documents',
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_phone_numbers(apps, schema_editor):
+    content_type_model = apps.get_model('contenttypes', 'ContentType')
+    phone_number_model = apps.get_model('crm', 'PhoneNumber')
+    for model_name in ('contact', 'lead'):
+        model = apps.get_model('crm', model_name)
+        content_type, _ = content_type_model.objects.get_or_create(
+            app_label='crm', model=model_name
+        )
+        numbers = set()
+        rows = model.objects.values_list('pk', 'phone', 'other_phone', 'mobile')
+        for pk, *phones in rows.iterator():
+            for phone in phones:
+                digits = ''.join(c for c in reversed(phone or '') if c.isdigit())
+                if digits:
+                    numbers.add((pk, digits))
+        phone_number_model.objects.bulk_create(
+            [
+                phone_number_model(
+                    content_type=content_type, object_id=pk, reversed_digits=digits
+                )
+                for pk, digits in numbers
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('crm', '0005_search_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneNumber',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('reversed_digits', models.CharField(db_index=True, max_length=100)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Phone number',
+                'verbose_name_plural': 'Phone numbers',
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'reversed_digits'), name='unique_phone_number')],
+            },
+        ),
+        migrations.RunPython(fill_phone_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_match_keys(apps, schema_editor):
+    from crm.utils.matching import get_keys
+    from crm.utils.matching import KEY_FIELDS
+
+    content_type_model = apps.get_model('contenttypes', 'ContentType')
+    match_key_model = apps.get_model('crm', 'MatchKey')
+    for label, fields in KEY_FIELDS.items():
+        model = apps.get_model(label)
+        content_type, _ = content_type_model.objects.get_or_create(
+            app_label='crm', model=model._meta.model_name
+        )
+        keys = set()
+        for values in model.objects.values('pk', *fields).iterator():
+            keys.update((values['pk'], *key) for key in get_keys(label, values))
+        match_key_model.objects.bulk_create(
+            [
+                match_key_model(
+                    content_type=content_type, object_id=pk, kind=kind, value=value
+                )
+                for pk, kind, value in keys
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('crm', '0006_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('email', 'Email'), ('domain', 'Domain'), ('name', 'Company name'), ('person', 'Full name')], max_length=10)),
+                ('value', models.CharField(max_length=200)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Match key',
+                'verbose_name_plural': 'Match keys',
+                'indexes': [models.Index(fields=['kind', 'value', 'content_type'], name='match_key_value_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'kind', 'value'), name='unique_match_key')],
+            },
+        ),
+        migrations.RunPython(fill_match_keys, migrations.RunPython.noop),
+    ]
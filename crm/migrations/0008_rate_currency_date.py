@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0007_match_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rate',
+            index=models.Index(fields=['currency', 'payment_date'], name='rate_currency_date_idx'),
+        ),
+    ]
@@ -17,3 +17,7 @@ from crm.models.tag import Tag
 from crm.models.product import Product
 from crm.models.output import Output
 from crm.models.output import Shipment
+from crm.models.filter_facet import FilterFacet
+from crm.models.search_document import SearchDocument
+from crm.models.phone_number import PhoneNumber
+from crm.models.match_key import MatchKey
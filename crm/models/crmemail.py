@@ -10,6 +10,16 @@ class CrmEmail(BaseEml):
     class Meta:
         verbose_name = _("Email")
         verbose_name_plural = _("Emails in CRM")
+        indexes = [
+            # Duplicate checks of imported emails
+            models.Index(fields=['message_id'], name='crmemail_message_id_idx'),
+            models.Index(fields=['uid', 'creation_date'], name='crmemail_uid_date_idx'),
+            models.Index(
+                fields=['email_host_user', 'incoming', 'creation_date'],
+                name='crmemail_host_user_date_idx'
+            ),
+            models.Index(fields=['ticket'], name='crmemail_ticket_idx'),
+        ]
 
     to = models.TextField(
         null=True, blank=False,
@@ -0,0 +1,52 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from crm.models.country import City
+from crm.models.country import Country
+
+# models whose changelist country and city filters can use the facets
+FACET_MODELS = ('crm.Company', 'crm.Contact', 'crm.Deal', 'crm.Lead', 'crm.Request')
+
+
+class FilterFacet(models.Model):
+    """
+    The number of objects of a model per department, country and city.
+    The table is rebuilt by the "update_filter_facets" command.
+    """
+    class Meta:
+        verbose_name = _("Filter facet")
+        verbose_name_plural = _("Filter facets")
+        indexes = [
+            models.Index(
+                fields=['content_type', 'department'],
+                name='filter_facet_department_idx'
+            ),
+        ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+    )
+    department = models.ForeignKey(
+        'auth.Group',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    country = models.ForeignKey(
+        Country,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    city = models.ForeignKey(
+        City,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    number = models.PositiveIntegerField(default=0)
@@ -0,0 +1,47 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+# models whose objects are matched to incoming requests
+MATCHED_MODELS = ('crm.Company', 'crm.Contact', 'crm.Lead')
+
+
+class MatchKey(models.Model):
+    """
+    A normalized value of an object by which requests are matched
+    to contacts, leads and companies (see crm.utils.matching).
+    """
+    EMAIL = 'email'
+    DOMAIN = 'domain'
+    NAME = 'name'
+    PERSON = 'person'
+    KINDS = (
+        (EMAIL, _("Email")),
+        (DOMAIN, _("Domain")),
+        (NAME, _("Company name")),
+        (PERSON, _("Full name")),
+    )
+
+    class Meta:
+        verbose_name = _("Match key")
+        verbose_name_plural = _("Match keys")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'kind', 'value'],
+                name='unique_match_key'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['kind', 'value', 'content_type'],
+                name='match_key_value_idx'
+            ),
+        ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+    )
+    object_id = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    value = models.CharField(max_length=200)
@@ -176,6 +176,11 @@ class Rate(models.Model):
     class Meta:
         verbose_name = _("Currency rate")
         verbose_name_plural = _("Currency rates")
+        indexes = [
+            models.Index(
+                fields=['currency', 'payment_date'], name='rate_currency_date_idx'
+            ),
+        ]
 
     APPROXIMATE = 'A'
     OFFICIAL = 'O'
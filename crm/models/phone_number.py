@@ -0,0 +1,33 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+# models whose phone numbers are indexed and their phone fields
+PHONE_FIELDS = {
+    'crm.Contact': ('phone', 'other_phone', 'mobile'),
+    'crm.Lead': ('phone', 'other_phone', 'mobile'),
+}
+
+
+class PhoneNumber(models.Model):
+    """
+    The digits of a phone number of a contact or lead.
+    They are stored reversed so that numbers ending with
+    the given digits are found with an index range scan.
+    """
+    class Meta:
+        verbose_name = _("Phone number")
+        verbose_name_plural = _("Phone numbers")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'reversed_digits'],
+                name='unique_phone_number'
+            ),
+        ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+    )
+    object_id = models.PositiveIntegerField()
+    reversed_digits = models.CharField(max_length=100, db_index=True)
@@ -0,0 +1,33 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+# models whose changelists can be searched with the full-text index
+INDEXED_MODELS = (
+    'crm.Company', 'crm.Contact', 'crm.CrmEmail',
+    'crm.Deal', 'crm.Lead', 'crm.Request'
+)
+
+
+class SearchDocument(models.Model):
+    """
+    The text of the search fields of an object.
+    The full-text index of the database is built on it
+    (see crm.utils.search).
+    """
+    class Meta:
+        verbose_name = _("Search document")
+        verbose_name_plural = _("Search documents")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id'],
+                name='unique_search_document'
+            ),
+        ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+    )
+    object_id = models.PositiveIntegerField()
+    text = models.TextField(default='')
@@ -141,6 +141,62 @@ EMAIL_HOST_PASSWORD = 'your_email_password'
 IMAP_CONNECTION_IDLE = 300
 IMAP_NOOP_PERIOD = 300
 REUSE_IMAP_CONNECTION = False
+IMAP_DEBUG_LEVEL = 0
+# Seconds to wait for a CrmIMAP connection used by another thread
+IMAP_LEASE_TIMEOUT = 60
+# Also lock the connection of an account between processes (gunicorn workers)
+# for the duration of each lease. The lockfiles are stored in MEDIA_ROOT/locks.
+IMAP_PROCESS_LOCK = False
+# Number of messages requested by one UID FETCH command during import
+IMAP_FETCH_BATCH_SIZE = 20
+# Maximum number of messages imported from one box per import cycle
+IMAP_IMPORT_LIMIT = 50
+# Per account overrides, for example:
+# {'crm@example.com': {'batch_size': 50, 'limit': 1000}}
+IMAP_IMPORT_ACCOUNTS = {}
+# Number of threads importing emails from different accounts concurrently
+IMAP_IMPORT_WORKERS = 4
+# Maximum number of accounts imported concurrently from one IMAP host
+IMAP_HOST_CONNECTIONS = 2
+# Wait for new emails in INBOX with IMAP IDLE (one asyncio connection
+# per account). Servers without IDLE are polled with NOOP. The Sent box
+# is still imported every IMAP_NOOP_PERIOD seconds.
+IMAP_IDLE = False
+IMAP_IDLE_TIMEOUT = 25 * 60     # re-issue IDLE before servers drop it (29 min)
+IMAP_IDLE_CONNECT_TIMEOUT = 30
+IMAP_IDLE_RETRY = 10            # seconds before reconnecting, doubled on errors
+# Messages and attachments larger than this (in bytes) are kept in temporary
+# files instead of memory while they are imported.
+IMAP_MESSAGE_MEMORY_LIMIT = 5 * 1024 * 1024
+# Size of the chunks in which messages are parsed and attachments decoded
+IMAP_PARSE_CHUNK_SIZE = 64 * 1024
+# Imported emails are written to the database in batches of up to
+# IMAP_WRITE_BATCH_SIZE emails collected within IMAP_WRITE_BATCH_DELAY seconds.
+IMAP_WRITE_BATCH_SIZE = 50
+IMAP_WRITE_BATCH_DELAY = 0.2
+# Email import of the user's accounts is triggered by their requests
+# not more often than once in this number of seconds
+IMAP_USER_IMPORT_INTERVAL = 60
+
+# Build the changelist country and city filters from the FilterFacet table
+# instead of the objects. Run "python manage.py update_filter_facets"
+# periodically (e.g. by cron) to keep the table up to date.
+FILTER_FACETS = False
+
+# Search the changelists of companies, contacts, deals, emails, leads and
+# requests with the full-text index of the database instead of LIKE scans
+# of every search field. 'auto' selects the backend for the database vendor
+# (MySQL FULLTEXT ngram, PostgreSQL tsvector, SQLite FTS5), or specify
+# the dotted path of a crm.utils.search.BaseBackend subclass.
+# Run "python manage.py rebuild_search_index" after enabling it.
+SEARCH_BACKEND = ''
+
+# The official rates of the dates of received payments are requested from
+# LOAD_RATE_BACKEND for ranges of up to RATE_BACKFILL_RANGE_DAYS days.
+# The responses are cached in MEDIA_ROOT/rates. Run
+# "python manage.py backfill_rates" to load the rates of all the payments.
+RATE_BACKFILL_RANGE_DAYS = 31
+RATE_BACKFILL_DELAY = 0.5       # seconds between the requests to the backend
 
 # Recaptcha
 GOOGLE_RECAPTCHA_SITE_KEY = ''
@@ -53,6 +53,7 @@ class CompanyAdmin(CrmModelAdmin):
         'id',
         'registration_number'
     ]
+    list_select_related = ('owner', 'type')
     list_filter = [
         HasContactsFilter,
         ByOwnerFilter,
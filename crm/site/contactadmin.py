@@ -32,6 +32,7 @@ class ContactAdmin(CrmModelAdmin):
         'created',
         'person',
     ]
+    list_select_related = ('owner', 'company')
     list_filter = (
         ByOwnerFilter,
         ('company__industry', ScrollRelatedOnlyFieldListFilter),
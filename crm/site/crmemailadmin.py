@@ -6,6 +6,7 @@ from django.db.models import OuterRef, Subquery
 from django.http import HttpResponseRedirect
 from django.template.defaultfilters import linebreaks
 from django.urls import reverse
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _
 from django.utils.safestring import mark_safe
 
@@ -349,40 +350,23 @@ class CrmEmailAdmin(CrmModelAdmin):
 
     @admin.display(description=_('Box'))
     def box(self, obj):
-        parameter_name = MailboxFilter.parameter_name
-        if obj.sent and not obj.trash:
-            value = getattr(_thread_local, "mailbox=sent", None)
-            if not value:
-                url = self.get_url_for_callable(
-                    parameter_name, 'sent')
-                value = mark_safe(f'<a title="{_("sent")}" href="{url}">{sentbox_icon}</a>')
-                setattr(_thread_local, "mailbox=sent", value)                
-            
-        elif obj.incoming and not obj.trash:
-            value = getattr(_thread_local, "mailbox=inbox", None)
-            if not value:
-                url = self.get_url_for_callable(
-                    parameter_name, 'inbox')
-                value = mark_safe(f'<a title="{_("inbox")}" href="{url}">{inbox_icon}</a>')
-                setattr(_thread_local, "mailbox=inbox", value)           
-
-        elif not any((obj.incoming, obj.sent, obj.trash)):
-            value = getattr(_thread_local, "mailbox=outbox", None)
-            if not value:
-                url = self.get_url_for_callable(
-                    parameter_name, 'outbox')
-                value = mark_safe(f'<a title="{_("outbox")}" href="{url}">{outbox_icon}</a>')
-                setattr(_thread_local, "mailbox=outbox", value)
-                
-        elif obj.trash:
-            value = getattr(_thread_local, "mailbox=trash", None)
-            if not value:
-                url = self.get_url_for_callable(
-                    parameter_name, 'trash')
-                value = mark_safe(f'<a title="{_("trash")}" href="{url}">{trashbox_icon}</a>')
-                setattr(_thread_local, "mailbox=trash", value)
-                
-        return value    # NOQA
+        if obj.trash:
+            box, title, icon = 'trash', _("trash"), trashbox_icon
+        elif obj.sent:
+            box, title, icon = 'sent', _("sent"), sentbox_icon
+        elif obj.incoming:
+            box, title, icon = 'inbox', _("inbox"), inbox_icon
+        else:
+            box, title, icon = 'outbox', _("outbox"), outbox_icon
+
+        def get_link():
+            url = self.get_url_for_callable(
+                MailboxFilter.parameter_name, box)
+            return mark_safe(f'<a title="{title}" href="{url}">{icon}</a>')
+
+        return self.get_fragment(
+            ('mailbox', box, translation.get_language()), get_link
+        )
 
     @admin.display(description=_('Content'))
     def readonly_content(self, obj):
@@ -1,5 +1,6 @@
 import re
 import threading
+from typing import Optional
 from typing import Union
 from datetime import datetime as dt
 from django.conf import settings
@@ -22,14 +23,17 @@ from django.urls import reverse
 from common.models import Department
 from common.models import TheFile
 from common.site.basemodeladmin import BaseModelAdmin
+from common.utils.local_cache import LocalCache
 from common.utils.helpers import FRIDAY_SATURDAY_SUNDAY_MSG
 from common.utils.helpers import get_active_users
 from common.utils.helpers import get_department_id
 from common.utils.helpers import get_manager_departments
 from common.utils.helpers import LEADERS
 from common.utils.helpers import popup_window
+from crm.models import City
 from crm.models import Company
 from crm.models import ClientType
+from crm.models import Country
 from crm.models import Contact
 from crm.models import Deal
 from crm.models import Lead
@@ -40,7 +44,10 @@ from crm.models import Product
 from crm.models import Stage
 from crm.models import ClosingReason
 from crm.models import CrmEmail
+from crm.models import FilterFacet
+from crm.models.filter_facet import FACET_MODELS
 from crm.models.request import Request
+from crm.models.search_document import INDEXED_MODELS
 from crm.utils.admfilters import ScrollRelatedOnlyFieldListFilter
 from crm.utils.admfilters import TagFilter
 from crm.utils.clarify_permission import clarify_permission
@@ -48,11 +55,20 @@ from crm.utils.helpers import html2txt
 from crm.utils.admfilters import ByCityFilter
 from crm.utils.admfilters import ByDepartmentFilter
 from crm.utils.make_massmail_form import get_massmail_form
+from crm.utils.search import get_search_backend
 from massmail.admin_actions import BAD_RESULT_MSG
 from massmail.admin_actions import have_massmail_accounts
 from massmail.models import MailingOut
 
 _thread_local = threading.local()
+# keys: (model label, queryset scope)
+country_filter_cache = LocalCache(
+    'country_filter', models=(Company, Contact, Deal, Lead, Request)
+)
+# keys: (changelist full path, ...) because the links keep its filters
+fragment_cache = LocalCache(
+    'changelist_fragments', maxsize=5000, models=(City, Country)
+)
 _fields = {
     'type': {'model': ClientType},
     'lead_source': {'model': LeadSource, 'order_by_field': '-name'},
@@ -90,6 +106,7 @@ class CrmModelAdmin(BaseModelAdmin):
 
         _thread_local.query_dict = request.GET
         _thread_local.query_path = request.path
+        _thread_local.full_path = request.get_full_path()
         return super().changelist_view(
             request, extra_context=extra_context,
         )
@@ -210,15 +227,7 @@ class CrmModelAdmin(BaseModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        if request.user.department_id:
-            return qs.filter(department_id=request.user.department_id)
-        elif request.user.is_superoperator:
-            return qs.filter(
-                department__in=request.user.groups.filter(
-                    department__isnull=False
-                )
-            )
-        return qs
+        return self.filter_by_department(request, qs)
 
     def get_readonly_fields(self, request, obj=None):
         readonly_fields = super().get_readonly_fields(request, obj)
@@ -329,13 +338,13 @@ class CrmModelAdmin(BaseModelAdmin):
                 if recipients_number:
                     mailing_out = MailingOut(
                         name=settings.NO_NAME_STR,
-                        recipient_ids=",".join([str(x) for x in selected_ids]),
                         recipients_number=recipients_number,
                         content_type=content_type,
                         owner=request.user,
                         department_id=request.user.department_id
                     )
                     mailing_out.save()
+                    mailing_out.add_recipients(selected_ids)
                     messages.info(request, _(FRIDAY_SATURDAY_SUNDAY_MSG)
                     )
                     return HttpResponseRedirect(reverse(
@@ -400,14 +409,12 @@ class CrmModelAdmin(BaseModelAdmin):
         if not obj.city:
             return LEADERS
 
-        url_name = f"{obj.__class__.__name__}-{obj.city.name}"
-        value = getattr(_thread_local, url_name, None)
-        if not value:
+        def get_link():
             url = self.get_url_for_callable(
                 'city__id__exact', obj.city.id)
-            value = mark_safe(f'<a href="{url}">{obj.city.name}</a>')
-            setattr(_thread_local, url_name, value)
-        return value
+            return mark_safe(f'<a href="{url}">{obj.city.name}</a>')
+
+        return self.get_fragment(('city', obj.city.id), get_link)
 
     @admin.display(description=mark_safe(
         f'<i class="material-icons" style="color: var(--body-quiet-color)">place</i>'),
@@ -417,14 +424,12 @@ class CrmModelAdmin(BaseModelAdmin):
         if not obj.country:
             return LEADERS
 
-        url_name = f"{obj.__class__.__name__}-{obj.country.url_name}"
-        value = getattr(_thread_local, url_name, None)
-        if not value:
+        def get_link():
             url = self.get_url_for_callable(
                 'country__id__exact', obj.country.id)
-            value = mark_safe(f'<a href="{url}">{obj.country.name}</a>')
-            setattr(_thread_local, url_name, value)
-        return value
+            return mark_safe(f'<a href="{url}">{obj.country.name}</a>')
+
+        return self.get_fragment(('country', obj.country.id), get_link)
 
     @admin.display(description=mark_safe(
         '<i class="material-icons" style="color: var(--body-quiet-color)">contact_mail</i>'
@@ -519,19 +524,20 @@ class CrmModelAdmin(BaseModelAdmin):
         return url
 
     def get_country_filter_needed(self, request: WSGIRequest) -> bool:
-        attr = f"num_countries_dep_id{request.user.department_id}"  # NOQA
-        country_filter_needed = getattr(_thread_local, attr, None)
-        if country_filter_needed is None:
+        def get_value():
             qs = self.get_queryset(request)     # NOQA
             num_countries = qs.exclude(
                 country__isnull=True
-            ).values('country').distinct().count()
-            if num_countries <= 1:
-                country_filter_needed = False
-            else:
-                country_filter_needed = True
-            setattr(_thread_local, attr, country_filter_needed)
-        return country_filter_needed
+            ).values('country').distinct()[:2].count()
+            return num_countries > 1
+
+        key = (self.model._meta.label, self.get_queryset_scope(request))
+        return country_filter_cache.get(key, get_value)
+
+    @staticmethod
+    def get_fragment(key: tuple, func) -> str:
+        """Returns html fragment of changelist row cached for the page."""
+        return fragment_cache.get((_thread_local.full_path, *key), func)
 
     @staticmethod
     def get_latest_emails(field: str, object_id: int) -> QuerySet:
@@ -551,6 +557,57 @@ class CrmModelAdmin(BaseModelAdmin):
                 e.content = html2txt(e.content)
         return emails
 
+    def get_facets(self, request: WSGIRequest) -> Optional[QuerySet]:
+        """
+        Returns the facets of the objects available in get_queryset()
+        or None if they are not used.
+        """
+        if not settings.FILTER_FACETS \
+                or self.model._meta.label not in FACET_MODELS \
+                or type(self).get_queryset is not CrmModelAdmin.get_queryset:
+            return None
+        facets = FilterFacet.objects.filter(
+            content_type=ContentType.objects.get_for_model(self.model)
+        )
+        if request.user.department_id:
+            return facets.filter(department_id=request.user.department_id)
+        elif request.user.is_superoperator:
+            return facets.filter(
+                department__in=request.user.groups.filter(
+                    department__isnull=False
+                )
+            )
+        return facets
+
+    @staticmethod
+    def filter_by_department(request: WSGIRequest, queryset: QuerySet) -> QuerySet:
+        """Returns the objects of the departments available to the user."""
+        if request.user.department_id:
+            return queryset.filter(department_id=request.user.department_id)
+        elif request.user.is_superoperator:
+            return queryset.filter(
+                department__in=request.user.groups.filter(
+                    department__isnull=False
+                )
+            )
+        return queryset
+
+    def get_queryset_scope(self, request: WSGIRequest):
+        """Returns a key of the objects available in get_queryset()."""
+        if type(self).get_queryset is not CrmModelAdmin.get_queryset:
+            return f'user_{request.user.id}'
+        if request.user.department_id:
+            return request.user.department_id
+        if request.user.is_superoperator:
+            return f'user_{request.user.id}'
+        return None
+
+    def search(self, request, queryset, search_term):
+        backend = get_search_backend()
+        if backend and self.model._meta.label in INDEXED_MODELS:
+            return backend.search(queryset, search_term), False
+        return super().search(request, queryset, search_term)
+
     @staticmethod
     def get_url_for_callable(parameter: str, value) -> str:
         query_dict = _thread_local.query_dict.copy()
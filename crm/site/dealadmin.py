@@ -1,4 +1,3 @@
-import threading
 from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.contenttypes.models import ContentType
@@ -14,6 +13,7 @@ from django.urls import reverse
 from chat.models import ChatMessage
 from common.admin import FileInline
 from common.models import Department
+from common.models import TheFile
 from common.utils.helpers import (
     add_chat_context, set_toggle_tooltip, get_now, LEADERS,
     get_today, popup_window
@@ -24,6 +24,7 @@ from crm.models import (
     ClosingReason, CrmEmail, Deal, Output, Payment, Stage
 )
 from crm.site.crmmodeladmin import CrmModelAdmin
+from crm.site.crmmodeladmin import fragment_cache
 from crm.site.outputinline import OutputInline
 from crm.site.paymentadmin import set_currency_initial
 from crm.site.paymentinline import PaymentInline
@@ -33,6 +34,7 @@ from crm.utils.admfilters import (
     ScrollRelatedOnlyFieldListFilter
 )
 from crm.utils.clarify_permission import clarify_permission
+from crm.utils.helpers import count_related
 from crm.utils.helpers import get_counterparty_header
 from tasks.models import Memo
 
@@ -86,8 +88,6 @@ textarea_tag = '<textarea name="description" cols="80" rows="5" class="vLargeTex
 subject_icon = '<i title="{}" class="material-icons" style="color: var(--body-quiet-color)">subject</i>'
 relevant_deal_str = _('Relevant deal')
 
-_thread_local = threading.local()
-
 
 class DealAdmin(CrmModelAdmin):
     actions = ['export_selected']
@@ -108,6 +108,9 @@ class DealAdmin(CrmModelAdmin):
         ('company__industry', ScrollRelatedOnlyFieldListFilter),
     )
     list_per_page = 50
+    list_select_related = (
+        'owner', 'co_owner', 'stage', 'company__country', 'lead__country'
+    )
     raw_id_fields = (
         'lead',
         'contact',
@@ -190,7 +193,6 @@ class DealAdmin(CrmModelAdmin):
         title = gettext(self.model._meta.get_field("name").help_text._args[0])
         func.short_description = mark_safe(subject_icon.format(title))
 
-        _thread_local.department_id = {}
         return super().changelist_view(request, extra_context)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
@@ -208,8 +210,16 @@ class DealAdmin(CrmModelAdmin):
             trash=False
         ).order_by('-creation_date')
 
+        newest_inquiry = newest_email.filter(inquiry=True)
+
+        content_type = ContentType.objects.get_for_model(Deal)
+        files = TheFile.objects.filter(
+            content_type=content_type,
+            object_id=OuterRef('pk')
+        )
+
         unread_chat = ChatMessage.objects.filter(
-            content_type=ContentType.objects.get_for_model(Deal),
+            content_type=content_type,
             object_id=OuterRef('pk'),
             recipients=request.user
         ).values('id')
@@ -227,6 +237,14 @@ class DealAdmin(CrmModelAdmin):
             'is_unread_chat': Exists(unread_chat),
             'is_received_payment': Exists(received_payments),
             'is_no_product': ~Exists(product_exists),
+            'inquiry_date': Subquery(newest_inquiry.values('creation_date')[:1]),
+            'inquiry_subsequent': Subquery(
+                newest_inquiry.values('request__subsequent')[:1]
+            ),
+            'has_files': Exists(files),
+            'company_deals': count_related(Deal, 'company'),
+            'lead_deals': count_related(Deal, 'lead'),
+            'works_globally': F('department__department__works_globally'),
         }
 
         if settings.SHIPMENT_DATE_CHECK:
@@ -507,21 +525,19 @@ class DealAdmin(CrmModelAdmin):
         if not counterparty:
             return LEADERS
 
-        if hasattr(_thread_local, 'deal_changelist_url'):
-            url = _thread_local.deal_changelist_url
-        else:
-            url = reverse("site:crm_deal_changelist")
-            _thread_local.deal_changelist_url = url
+        url = fragment_cache.get(
+            'deal_changelist_url', lambda: reverse("site:crm_deal_changelist")
+        )
 
         url += f"?{counterparty._meta.model_name}={counterparty.id}&active=all"
         name = counterparty.full_name
 
-        if obj.department:
-            if obj.department_id in _thread_local.department_id:
-                works_globally = _thread_local.department_id[obj.department_id]
+        if obj.department_id:
+            # 'works_globally' is annotation of the changelist
+            if hasattr(obj, 'works_globally'):
+                works_globally = obj.works_globally
             else:
                 works_globally = Department.objects.get(id=obj.department_id).works_globally
-                _thread_local.department_id[obj.department_id] = works_globally
 
             if works_globally and hasattr(counterparty, 'country'):
                 name += f", {counterparty.country}"
@@ -556,10 +572,15 @@ class DealAdmin(CrmModelAdmin):
     @staticmethod
     @admin.display(description='')
     def deal_counter(obj):
-        if obj.company:
-            counter = Deal.objects.filter(company=obj.company).count()
-        elif obj.lead:
-            counter = Deal.objects.filter(lead=obj.lead).count()
+        # 'company_deals' and 'lead_deals' are annotations of the changelist
+        if obj.company_id:
+            counter = getattr(obj, 'company_deals', None)
+            if counter is None:
+                counter = Deal.objects.filter(company_id=obj.company_id).count()
+        elif obj.lead_id:
+            counter = getattr(obj, 'lead_deals', None)
+            if counter is None:
+                counter = Deal.objects.filter(lead_id=obj.lead_id).count()
         else:
             return ''
 
@@ -594,18 +615,10 @@ class DealAdmin(CrmModelAdmin):
 
         # Unanswered inquiry icon
         if getattr(instance, 'is_unanswered_inquiry', False):
-            inquiry = CrmEmail.objects.filter(
-                deal=instance,
-                inquiry=True,
-                trash=False
-            ).order_by('-creation_date').annotate(
-                subsequent=F('request__subsequent')
-            ).values('creation_date', 'subsequent').first()
-
-            if not inquiry['subsequent']:
-                days = (timezone.now() - inquiry['creation_date']).days
+            if not instance.inquiry_subsequent:
+                days = (timezone.now() - instance.inquiry_date).days
                 title = _('I have been waiting for an answer to my request for %d days') % days
-
+                icon = ''
                 if days == 2:
                     icon = f'<i class="material-icons" title="{title}" style="font-size:small;color: var(--body-quiet-color)">sentiment_neutral</i>'
                 elif days in (3, 4):
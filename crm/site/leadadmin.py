@@ -48,6 +48,7 @@ class LeadAdmin(CrmModelAdmin):
         'created'
     ]
     list_display_links = ('the_full_name',)
+    list_select_related = ('owner',)
     list_filter = (
         IsDisqualifiedFilter,
         ByOwnerFilter,
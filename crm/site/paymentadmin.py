@@ -1,7 +1,7 @@
 from decimal import Decimal
 from django.conf import settings
 from django.contrib import admin
-from django.db.models import Case, CharField, DecimalField, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models import Case, DecimalField, Sum, When
 from django.utils.formats import date_format
 from django.utils.translation import gettext_lazy as _
 from django.utils.safestring import mark_safe
@@ -9,9 +9,13 @@ from django.core.exceptions import ObjectDoesNotExist
 
 from common.models import Department
 from common.utils.helpers import get_today
-from crm.models import Currency, Output, Rate
+from crm.models import Currency, Rate
 from crm.utils.admfilters import PaymentByDepartmentFilter, ScrollRelatedOnlyFieldListFilter, CrmDateFieldListFilter
+from crm.utils.currency_rates import get_amount_expression
+from crm.utils.currency_rates import get_rate_type_expression
 from crm.utils.helpers import get_counterparty_header
+from crm.utils.helpers import get_deal_products
+from crm.utils.helpers import get_outputs_prefetch
 
 OFFICIAL_RATE = next((x[1] for x in Rate.RATE_TYPE if x[0] == Rate.OFFICIAL))
 APPROXIMATE_RATE = next((x[1] for x in Rate.RATE_TYPE if x[0] == Rate.APPROXIMATE))
@@ -28,6 +32,10 @@ class PaymentAdmin(admin.ModelAdmin):
         'products',
         'person'
     )
+    list_select_related = (
+        'currency', 'deal__owner', 'deal__co_owner', 'deal__lead__country',
+        'deal__contact__company', 'deal__contact__country',
+    )
     list_filter = (
         ('deal__owner', ScrollRelatedOnlyFieldListFilter),
         'status',
@@ -58,36 +66,10 @@ class PaymentAdmin(admin.ModelAdmin):
         except (AttributeError, KeyError):
             return response
 
-        rate = Rate.objects.filter(
-            currency=OuterRef('currency'),
-            payment_date=OuterRef('payment_date')
-        )
-
         total_data = queryset.annotate(
-            state_value=Case(
-                When(
-                    Exists(rate),
-                    then=F('amount') * Subquery(rate.values('rate_to_state_currency')[:1])
-                ),
-                default=F('amount') * F('currency__rate_to_state_currency'),
-                output_field=DecimalField(),
-            ),
-            marketing_value=Case(
-                When(
-                    Exists(rate),
-                    then=F('amount') * Subquery(rate.values('rate_to_marketing_currency')[:1])
-                ),
-                default=F('amount') * F('currency__rate_to_marketing_currency'),
-                output_field=DecimalField(),
-            ),
-            rate_type=Case(
-                When(
-                    Exists(rate),
-                    then=Subquery(rate.values('rate_type')[:1]),
-                ),
-                default=Value(Rate.APPROXIMATE),
-                output_field=CharField(),
-            ),
+            state_value=get_amount_expression('rate_to_state_currency'),
+            marketing_value=get_amount_expression('rate_to_marketing_currency'),
+            rate_type=get_rate_type_expression(),
         ).aggregate(
             state_amount=Sum('state_value'),
             marketing_amount=Sum('marketing_value'),
@@ -128,6 +110,13 @@ class PaymentAdmin(admin.ModelAdmin):
 
         return response
 
+    def get_changelist_instance(self, request):
+        cl = super().get_changelist_instance(request)
+        cl.result_list = cl.result_list.prefetch_related(
+            get_outputs_prefetch('deal__output_set')
+        )
+        return cl
+
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'currency':
             set_currency_initial(request, kwargs)
@@ -214,11 +203,7 @@ class PaymentAdmin(admin.ModelAdmin):
 
     @staticmethod
     def products(obj):
-        products = ', '.join([
-            f'{otp.product} - {otp.quantity}{otp.pcs}'
-            for otp in Output.objects.filter(deal=obj.deal)
-        ])
-        return products if products else '-'
+        return get_deal_products(obj.deal) or '-'
 
     @admin.display(
         description=mark_safe(
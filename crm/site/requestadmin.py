@@ -1,4 +1,3 @@
-import threading
 from django.contrib import admin
 from django.contrib import messages
 from django.contrib.auth import get_user_model
@@ -30,9 +29,11 @@ from crm.models import Request
 from crm.models import Stage
 from crm.settings import FIRST_STEP
 from crm.site.crmmodeladmin import CrmModelAdmin
+from crm.site.crmmodeladmin import fragment_cache
 from crm.utils.check_city import check_city
 from crm.utils.admfilters import ByOwnerFilter
 from crm.utils.admfilters import ScrollRelatedOnlyFieldListFilter
+from crm.utils.helpers import count_related
 from crm.utils.helpers import get_counterparty_header
 
 ATTR_LIST = (
@@ -93,8 +94,6 @@ today_safe_icon = mark_safe(
     '<i class="material-icons" style="color: var(--body-quiet-color)">today</i>'
 )
 
-_thread_local = threading.local()
-
 
 class RequestAdmin(CrmModelAdmin):
     fieldsets = [
@@ -140,6 +139,7 @@ class RequestAdmin(CrmModelAdmin):
         'subsequent'
     ]
     list_per_page = 30
+    list_select_related = ('owner', 'co_owner', 'company', 'lead')
     raw_id_fields = ('lead', 'contact', 'company', 'deal')
     readonly_fields = (
         'subsequent', 'ticket',
@@ -196,6 +196,14 @@ class RequestAdmin(CrmModelAdmin):
                 form.country_must_be_specified = True
         return form
 
+    def get_changelist_instance(self, request):
+        cl = super().get_changelist_instance(request)
+        cl.result_list = cl.result_list.annotate(
+            company_requests=count_related(Request, 'company'),
+            lead_requests=count_related(Request, 'lead'),
+        )
+        return cl
+
     def get_changeform_initial_data(self, request):
         initial = super().get_changeform_initial_data(request)
         request_id = request.GET.get('copy_request')
@@ -370,20 +378,24 @@ class RequestAdmin(CrmModelAdmin):
     @admin.display(description='')
     def request_counter(obj):
         counter = counterparty = None
+        # 'company_requests' and 'lead_requests' are annotations of the changelist
         if obj.company:
             counterparty = obj.company
-            counter = Request.objects.filter(company=obj.company).count()
+            counter = getattr(obj, 'company_requests', None)
+            if counter is None:
+                counter = Request.objects.filter(company=obj.company).count()
         elif obj.lead:
             counterparty = obj.lead
-            counter = Request.objects.filter(lead=obj.lead).count()
+            counter = getattr(obj, 'lead_requests', None)
+            if counter is None:
+                counter = Request.objects.filter(lead=obj.lead).count()
         if counter:
             obj_plural_name = obj._meta.verbose_name_plural     # NOQA
             if counter > 1:
-                if hasattr(_thread_local, 'request_changelist_url'):
-                    url = _thread_local.request_changelist_url
-                else:
-                    url = reverse("site:crm_request_changelist")
-                    _thread_local.request_changelist_url = url
+                url = fragment_cache.get(
+                    'request_changelist_url',
+                    lambda: reverse("site:crm_request_changelist")
+                )
                 url += f"?{counterparty._meta.model_name}={counterparty.id}"  # NOQA
                 link = f'<a href="{url}" title="{obj_plural_name}">({counter})</a>'
                 return mark_safe(link)
@@ -19,6 +19,7 @@ from crm.utils.admfilters import ByDepartmentFilter
 from crm.utils.admfilters import CrmDateFieldListFilter
 from crm.utils.admfilters import ScrollRelatedOnlyFieldListFilter
 from crm.utils.helpers import get_counterparty_header
+from crm.utils.helpers import get_first_payment
 from crm.utils.helpers import NO_DEAL_AMOUNT_STR
 from crm.utils.helpers import get_owner_header
 from common.utils.helpers import save_message
@@ -62,6 +63,10 @@ class ShipmentAdmin(admin.ModelAdmin):
             )
         }),
     )
+    list_select_related = (
+        'product', 'deal__owner', 'deal__country', 'deal__lead__country',
+        'deal__contact__company', 'deal__contact__country',
+    )
     ordering = ['-shipping_date']
     readonly_fields = (
         'product',
@@ -115,6 +120,8 @@ class ShipmentAdmin(admin.ModelAdmin):
                 next_payment.values('currency__name')[:1]),
             next_payment_date=Subquery(
                 next_payment.values('payment_date')[:1]),
+            first_contract_number=get_first_payment('contract_number'),
+            first_order_number=get_first_payment('order_number'),
         )
         return cl
 
@@ -250,8 +257,11 @@ class ShipmentAdmin(admin.ModelAdmin):
 
     @admin.display(description=_("contract number"))
     def contract_number(self, obj):
-        payment = Payment.objects.filter(deal__id=obj.deal_id).first()
-        return payment.contract_number if payment else LEADERS
+        if hasattr(obj, 'first_contract_number'):
+            value = obj.first_contract_number
+        else:
+            value = get_first_payment_value(obj, 'contract_number')
+        return LEADERS if value is None else value
 
     @admin.display(description=get_counterparty_header())
     def counterparty(self, obj):
@@ -298,8 +308,11 @@ class ShipmentAdmin(admin.ModelAdmin):
     @staticmethod
     @admin.display(description=ORDER_NUMBER_STR)
     def order_number(obj):
-        payment = Payment.objects.filter(deal__id=obj.deal_id).first()
-        return getattr(payment, "order_number", None) or LEADERS
+        if hasattr(obj, 'first_order_number'):
+            value = obj.first_order_number
+        else:
+            value = get_first_payment_value(obj, 'order_number')
+        return value or LEADERS
 
     @staticmethod
     @admin.display(description=get_owner_header())
@@ -342,3 +355,10 @@ class ShipmentAdmin(admin.ModelAdmin):
     @admin.display(description=PCS)
     def quantity_abbreviation(obj):
         return obj.quantity
+
+
+def get_first_payment_value(obj, field: str):
+    """The field of the first payment of the deal (the change form)."""
+    return Payment.objects.filter(
+        deal__id=obj.deal_id
+    ).order_by('pk').values_list(field, flat=True).first()
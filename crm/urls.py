@@ -15,6 +15,7 @@ from crm.views.reply_email import reply_email
 from crm.views.got_massmails import got_company_massmails
 from crm.views.got_massmails import got_contacts_massmails
 from crm.views.got_massmails import got_leads_massmails
+from crm.views.import_metrics import import_metrics
 from crm.views.view_original_email import view_original_email
 from crm.views.change_owner_companies import change_owner_companies
 
@@ -103,4 +104,9 @@ urlpatterns = [
         staff_member_required(download_original_email),
         name='download_original_email'
     ),
+    path(
+        'import-metrics/',
+        staff_member_required(import_metrics),
+        name='import_metrics'
+    ),
 ]
\ No newline at end of file
@@ -1,11 +1,10 @@
+import threading
+from typing import Optional
 from dateutil.relativedelta import relativedelta
 from django.contrib import admin
 from django.contrib.admin import SimpleListFilter
 from django.contrib.admin.filters import DateFieldListFilter
-from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import CharField
-from django.db.models import Exists
-from django.db.models import OuterRef
 from django.db.models import Q
 from django.db.models import Value as V  # NOQA
 from django.db.models.functions import Cast
@@ -18,15 +17,71 @@ from common.models import Department
 from common.utils.helpers import get_department_id
 from common.utils.helpers import USER_MODEL
 from common.utils.helpers import LEADERS
+from common.utils.local_cache import LocalCache
 from crm.models import Contact
 from crm.models import Product
 from crm.models import Tag
 from crm.models import Output
 from crm.models.country import City
+from crm.models.country import Country
 
 # Lookup parameters must be removed from the querystring when
 # the corresponding filter is executed!
 
+_lookup_caches = {}
+_lookup_caches_lock = threading.Lock()
+
+
+def get_lookup_cache(model) -> LocalCache:
+    """
+    Returns the cache of the filter lookups of the model changelist.
+    It is cleared when the model objects, their tags or
+    the cities, countries or departments are changed.
+    """
+    with _lookup_caches_lock:
+        cache = _lookup_caches.get(model)
+        if cache is None:
+            models = [model, City, Country, Department, Tag]
+            if hasattr(model, 'tags'):
+                models.append(model.tags.through)
+            cache = _lookup_caches[model] = LocalCache(
+                f'filter_lookups_{model._meta.label_lower}', models=models
+            )
+    return cache
+
+
+def get_scope(request, model_admin):
+    """Returns a key of the objects available in model_admin.get_queryset()."""
+    if hasattr(model_admin, 'get_queryset_scope'):
+        return model_admin.get_queryset_scope(request)
+    return f'user_{request.user.id}'
+
+
+def get_lookup_queryset(request, model_admin) -> QuerySet:
+    """
+    Returns the precomputed facets of the objects if they are used
+    or the objects themselves. Both have department, country and city fields.
+    """
+    if hasattr(model_admin, 'get_facets'):
+        facets = model_admin.get_facets(request)
+        if facets is not None:
+            return facets
+    return model_admin.get_queryset(request)
+
+
+def get_default_country(department_id) -> tuple:
+    """Returns (id, name) of the default country of the department."""
+    def get_value():
+        return Department.objects.filter(id=department_id).values_list(
+            'default_country_id', 'default_country__name'
+        ).first() or (None, None)
+
+    if not department_id:
+        return None, None
+    return get_lookup_cache(Department).get(
+        ('default_country', department_id), get_value
+    )
+
 
 class ByCityFilter(SimpleListFilter):
     template = "crm/filter_scroll.html"
@@ -35,24 +90,18 @@ class ByCityFilter(SimpleListFilter):
 
     def lookups(self, request, model_admin):
         result = []
-        qs = model_admin.get_queryset(request)
         country_id = request.GET.get("country__id__exact")
-        if country_id:
-            qs = qs.filter(country_id=country_id)
-        is_null = qs.filter(city_id=None).exists()
-        if is_null:
-            qs = qs.exclude(city_id=None)
-
-        cities = qs.values_list(
-            'city_id', 'city__name'
-        ).order_by('city__name').distinct()
+        is_null, cities = get_lookup_cache(model_admin.model).get(
+            ('city', get_scope(request, model_admin), country_id),
+            lambda: self.get_cities(request, model_admin, country_id)
+        )
         city_id = request.GET.get(self.parameter_name)
 
         if city_id and city_id != 'IsNull':
-            try:
-                city = cities.get(city_id=city_id)
-                cities = cities.exclude(city_id=city_id)
-            except ObjectDoesNotExist:
+            city = next((c for c in cities if str(c[0]) == city_id), None)
+            if city:
+                cities = [c for c in cities if c is not city]
+            else:
                 city = City.objects.filter(
                     id=city_id
                 ).values_list('id', 'name').first()
@@ -61,12 +110,26 @@ class ByCityFilter(SimpleListFilter):
         elif city_id == 'IsNull':
             result.append(('IsNull', LEADERS))
 
-        result.extend([*cities])
+        result.extend(cities)
         if is_null:
             result.append(('IsNull', LEADERS))
 
         return result
 
+    @staticmethod
+    def get_cities(request, model_admin, country_id) -> tuple:
+        qs = get_lookup_queryset(request, model_admin)
+        if country_id:
+            qs = qs.filter(country_id=country_id)
+        is_null = qs.filter(city_id=None).exists()
+        if is_null:
+            qs = qs.exclude(city_id=None)
+
+        cities = qs.values_list(
+            'city_id', 'city__name'
+        ).order_by('city__name').distinct()
+        return is_null, [*cities]
+
     def queryset(self, request, queryset):
         if not self.value():
             return queryset
@@ -115,48 +178,55 @@ class ByCountryFilter(ChoicesSimpleListFilter):
 
     def lookups(self, request, model_admin):
         result = [('all', _('All'))]
-        department_id = request.user.department_id
-        default_country = None
-        if department_id:
-            default_country = Department.objects.get(
-                id=department_id).default_country
-        qs = model_admin.get_queryset(request)
+        _id, default_country = get_default_country(request.user.department_id)
+        is_null, countries = get_lookup_cache(model_admin.model).get(
+            ('country', get_scope(request, model_admin)),
+            lambda: self.get_countries(request, model_admin)
+        )
         country_id = request.GET.get(self.parameter_name)
-        is_null = qs.filter(country_id=None).exists()
-        if is_null:
-            qs = qs.exclude(country_id=None)
-
-        countries = qs.distinct().annotate(
-            str_id=Cast('country_id', output_field=CharField())
-        ).values_list(
-            'str_id', 'country__name'
-        ).order_by('country__name')
 
         if country_id not in (None, 'all', 'IsNull'):
-            country = countries.get(country_id=country_id)
-            countries = countries.exclude(country_id=country_id)
+            country = next((c for c in countries if c[0] == country_id), None)
+            if country:
+                countries = [c for c in countries if c is not country]
+            else:
+                country = Country.objects.filter(id=country_id).annotate(
+                    str_id=Cast('id', output_field=CharField())
+                ).values_list('str_id', 'name').first()
             result.append(country)
 
         elif country_id is None:
             if default_country:
-                result.append((None, default_country.name))
+                result.append((None, default_country))
             else:
                 result = [(None, _('All'))]
 
-        result.extend([*countries])
+        result.extend(countries)
         if is_null or country_id == 'IsNull':
             result.append(('IsNull', LEADERS))
 
         return result
 
+    @staticmethod
+    def get_countries(request, model_admin) -> tuple:
+        qs = get_lookup_queryset(request, model_admin)
+        is_null = qs.filter(country_id=None).exists()
+        if is_null:
+            qs = qs.exclude(country_id=None)
+
+        countries = qs.distinct().annotate(
+            str_id=Cast('country_id', output_field=CharField())
+        ).values_list(
+            'str_id', 'country__name'
+        ).order_by('country__name')
+        return is_null, [*countries]
+
     def queryset(self, request, queryset):
         value = self.value()
-        department_id = request.user.department_id
-        default_country_id = None
         if not value:
-            if department_id:
-                default_country_id = Department.objects.get(
-                    id=department_id).default_country_id
+            default_country_id, _name = get_default_country(
+                request.user.department_id
+            )
             if default_country_id:
                 return queryset.filter(country_id=default_country_id)
             return queryset
@@ -233,26 +303,38 @@ class TagFilter(SimpleListFilter):
     parameter_name = 'tags__id'
 
     def lookups(self, request, model_admin):
+        username = request.GET.get('owner')
+        own = not any((request.user.is_superuser, request.user.is_chief, username))
+        lookups = get_lookup_cache(model_admin.model).get(
+            (
+                'tag', get_scope(request, model_admin),
+                request.user.department_id, username,
+                request.user.id if own else None
+            ),
+            lambda: self.get_tags(request, model_admin, username, own)
+        )
+        if len(lookups) > 9:
+            self.template = "crm/filter_scroll.html"
+        return lookups
+
+    @staticmethod
+    def get_tags(request, model_admin, username, own) -> list:
         qs = model_admin.get_queryset(request)
         department_id = request.user.department_id
         if department_id:
             qs = qs.filter(department_id=department_id)
-        username = request.GET.get('owner')
         if username and username != 'all':
             if username == 'IsNull':
                 qs = qs.filter(owner__isnull=True)
             else:
                 qs = qs.filter(owner__username=username)
-        if not any((request.user.is_superuser, request.user.is_chief, username)):
+        if own:
             qs = qs.filter(owner=request.user)
         tag_ids = qs.values_list('tags__id', flat=True).distinct()
         objects = Tag.objects.filter(
             id__in=tag_ids
         ).values_list('id', 'name').order_by('name')
-        lookups = [*objects]
-        if len(lookups) > 9:
-            self.template = "crm/filter_scroll.html"        
-        return lookups
+        return [*objects]
 
     def queryset(self, request, queryset):
         value = self.value()
@@ -344,48 +426,75 @@ class ByOwnerFilter(ChoicesSimpleListFilter):
     parameter_name = 'owner'
 
     def lookups(self, request, model_admin):
-        qs = model_admin.get_queryset(request)
         lookups = [(None, _('All'))]
         deal_id = request.GET.get('deal__id__exact')
-        if deal_id:
-            qs = qs.filter(deal_id=int(deal_id))
         request_id = request.GET.get('request__id__exact')
-        if request_id:
-            qs = qs.filter(request_id=int(request_id))
-        if not any((
+        others = not any((
                 request.user.is_superuser,
                 request.user.is_superoperator,
                 request.user.is_chief,
                 request.user.is_task_operator,
                 request.user.is_accountant
-        )) and not any((deal_id, request_id)):
-            q_params = Q(owner=request.user)
-            if hasattr(qs.model, 'co_owner'):
-                q_params |= Q(co_owner=request.user)
-            qs = qs.exclude(q_params)
+        )) and not any((deal_id, request_id))
+        if others:
             lookups = [('all', _('All')), (None, request.user.username)]
 
-        lookups.extend(self.get_owner_lookups(qs))
-        if qs.filter(owner=None).exists():
+        owner_lookups, is_null = get_lookup_cache(model_admin.model).get(
+            (
+                'owner', get_scope(request, model_admin), deal_id, request_id,
+                request.user.id if others else None
+            ),
+            lambda: self.get_owners(
+                request, model_admin, deal_id, request_id, others)
+        )
+        lookups.extend(owner_lookups)
+        if is_null:
             lookups.append(('IsNull', LEADERS))
         if len(lookups) > 9:
             self.template = "crm/filter_scroll.html"
         return lookups
 
+    def get_owners(self, request, model_admin, deal_id,
+                   request_id, others) -> tuple:
+        """
+        Returns the owner lookups and whether there are objects without owner.
+        If "others" is True, the objects of the user are excluded.
+        """
+        qs = model_admin.get_queryset(request)
+        if deal_id:
+            qs = qs.filter(deal_id=int(deal_id))
+        if request_id:
+            qs = qs.filter(request_id=int(request_id))
+        if others:
+            q_params = Q(owner=request.user)
+            if hasattr(qs.model, 'co_owner'):
+                q_params |= Q(co_owner=request.user)
+            qs = qs.exclude(q_params)
+        return self.get_owner_lookups(qs), qs.filter(owner=None).exists()
+
     @staticmethod
     def get_owner_lookups(queryset: QuerySet) -> list:
-        q_params = Q(owner=OuterRef('pk'))
+        q_params = Q(id__in=queryset.values('owner_id'))
         if hasattr(queryset.model, 'co_owner'):
-            q_params |= Q(co_owner=OuterRef('pk'))
-        filtered_qs = queryset.filter(q_params)
-        owners = USER_MODEL.objects.annotate(
-            user=Exists(filtered_qs)
-        ).filter(user=True).values_list(
+            q_params |= Q(id__in=queryset.values('co_owner_id'))
+        owners = USER_MODEL.objects.filter(q_params).values_list(
             'username', flat=True).order_by('username')
 
         return [(x, x) for x in owners]
 
     def queryset(self, request, queryset):
+        owner = self.get_owner(request)
+        if owner == 'IsNull':
+            return queryset.filter(owner=None)
+        if owner:
+            return self.get_owner_queryset(queryset, owner)
+        return queryset
+
+    def get_owner(self, request) -> Optional[str]:
+        """
+        Returns the username of the owner or co-owner the objects are filtered by,
+        'IsNull' for the objects without owner or None if they are not filtered.
+        """
         if not any((
                 request.user.is_superuser,
                 request.user.is_superoperator,
@@ -397,14 +506,14 @@ class ByOwnerFilter(ChoicesSimpleListFilter):
                     request.GET.get('deal__id__exact'),
                     request.GET.get('request__id__exact')
             )):
-                return self.get_owner_queryset(queryset, request.user.username)
+                return request.user.username
 
         if self.value() in (x[1] for x in self.lookup_choices):
-            return self.get_owner_queryset(queryset, self.value())
+            return self.value()
 
         if self.value() == 'IsNull':
-            return queryset.filter(owner=None)
-        return queryset
+            return 'IsNull'
+        return None
 
     @staticmethod
     def get_owner_queryset(queryset, username):
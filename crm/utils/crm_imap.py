@@ -1,34 +1,28 @@
 
 import imaplib
 import os
-import sys
 import threading
 from datetime import datetime as dt
-from time import sleep
+from time import monotonic
 from typing import Optional
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.mail import mail_admins
 
+from crm.utils.imap_lease import lease_metrics
+from crm.utils.imap_lease import ProcessLock
 from massmail.models import EmailAccount
 
 
-if sys.platform != "win32":
-    import fcntl
-
-path = settings.MEDIA_ROOT / 'locks'
-sleep_time_sec = 0.03
-release_limit = int(60 / sleep_time_sec)    # 60 sec
-sleep_time_sec2 = 0.01
-lockfile_limit = int(20 / sleep_time_sec2)    # 20 sec
-
-
 class CrmIMAP:
 
     def __init__(self, email_host_user: str):
         # quick initialization
         self.email_host_user = email_host_user
-        self.locked = True
+        self.cond = threading.Condition()
+        self.process_lock = None
+        self.locked = True   # the creator holds the first lease
+        self._start_lease(0)
 
     def check_box_status(self, box: str, upd_fields: list) -> tuple:
         """Return (changed, uid_validity)"""
@@ -107,30 +101,30 @@ class CrmIMAP:
         return True
 
     def lock(self) -> None:
-        """Lock this instance for other customers."""
-        if self.locked:
-            counter = release_limit
-            while self.locked:
-                sleep(sleep_time_sec)
-                counter -= 1
-                if not counter:
-                    n = release_limit * sleep_time_sec
-                    msg = f"The CrmIMAP.{self} was not released within {n} seconds"
-                    site = Site.objects.get_current()
-                    mail_admins(
-                        msg,
-                        f'''{msg}\n
-                        \nSite {site.domain}
-                        \nEmail account:_____{self.ea}
-                        \ncreate_time:_______{self.create_time}
-                        \nLast_Noop_time:___{self.noop_time}
-                        \nLast_request_time:_{self.last_request_time}
-                        \nException time:____{dt.now()}
-                        \nLog: \n{self._parse_log()}
-                        ''',
-                    )
-                    raise RuntimeError(msg)
-        self.locked = True
+        """Lease this instance. Wait until the current holder releases it."""
+        start = monotonic()
+        with self.cond:
+            contended = self.locked
+            acquired = self.cond.wait_for(
+                lambda: not self.locked, settings.IMAP_LEASE_TIMEOUT)
+            if acquired:
+                self.locked = True
+        if not acquired:
+            lease_metrics.timed_out(self.email_host_user)
+            self._mail_lease_timeout(
+                f"The {self} was not released within "
+                f"{settings.IMAP_LEASE_TIMEOUT} seconds"
+            )
+        self._start_lease(monotonic() - start if contended else 0)
+
+    def try_lock(self) -> bool:
+        """Lease this instance if it is free. Return True on success."""
+        with self.cond:
+            if self.locked:
+                return False
+            self.locked = True
+        self._start_lease(0)
+        return True
 
     def mark_emails_as_read(self, uids_str) -> None:
         result = self.select_box('INBOX')
@@ -157,8 +151,14 @@ class CrmIMAP:
 
     def release(self) -> None:
         """Unlock this instance for other customers."""
+        if self.process_lock:
+            self.process_lock.release()
+            self.process_lock = None
+        lease_metrics.released(self.email_host_user)
         if settings.REUSE_IMAP_CONNECTION:
-            self.locked = False
+            with self.cond:
+                self.locked = False
+                self.cond.notify()
         else:
             self.close_and_logout()
 
@@ -195,33 +195,13 @@ class CrmIMAP:
             f'Exception at IMAP.uid FETCH {uid}'
         )
 
-    def _close_lockfile(self) -> None:
-        try:
-            if sys.platform == 'win32':
-                os.close(self.fd)
-                os.unlink(self.lockfile)
-            else:
-                fcntl.lockf(self.fp, fcntl.LOCK_UN)
-                if os.path.isfile(self.lockfile):
-                    os.unlink(self.lockfile)
-        except Exception as err:     # FileNotFoundError
-            msg = f"The lockfile of {self} was deleted already?"
-            site = Site.objects.get_current()
-            mail_admins(
-                msg,
-                f'''{msg}\n
-                \nException: {err} 
-                \nSite {site.domain}
-                \nThread: {threading.current_thread()}
-                \nProcess: {os.getpid()}\n                
-                \nEmail account:_____{self.ea}
-                \ncreate_time:_______{self.create_time}
-                \nLast_Noop_time:___{self.noop_time}
-                \nLast_request_time:_{self.last_request_time}
-                \nException time:____{dt.now()}
-                \nLog: \n{self._parse_log()}
-                ''',
-            )
+    def uid_fetch_batch(self, uids: list,
+                        param: str = '(RFC822)') -> tuple:
+        """
+        Fetch several messages with a single UID FETCH command.
+        Return (result, data, error)
+        """
+        return self.uid_fetch(get_uid_set(uids), param)
 
     def _complete_init(self, boxes: dict, ea: EmailAccount):
         now = dt.now()
@@ -231,7 +211,6 @@ class CrmIMAP:
         self.ea = ea
         self.error = None
         self.ea = ea
-        self.lockfile = path / f"{self.ea.imap_host}.lock"
         self.selected_box = None
         self.noop_time = None
         self.create_time = now
@@ -240,8 +219,6 @@ class CrmIMAP:
     def _execute(self, command,
                  params: Optional[tuple], msg: str) -> tuple:
         """Return (result, data, error)"""
-        if settings.REUSE_IMAP_CONNECTION:
-            self._open_lockfile()
         result = data = None
         try:
             if params:
@@ -256,8 +233,6 @@ class CrmIMAP:
             self.error = err
             self._mail_admins(command, params, msg, result, data)
 
-        if settings.REUSE_IMAP_CONNECTION:
-            self._close_lockfile()
         return result, data, self.error
 
     def _expunge(self) -> tuple:
@@ -352,52 +327,21 @@ class CrmIMAP:
             fail_silently=True,
         )
 
-    def _open_lockfile(self) -> None:
-        counter = lockfile_limit
-        while counter:
-            if sys.platform == 'win32':
-                try:
-                    if os.path.exists(self.lockfile):
-                        os.unlink(self.lockfile)
-                    self.fd = os.open(
-                        self.lockfile, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-                except OSError as err:
-                    _, e, _ = sys.exc_info()
-                    if e.errno == 13:
-                        pass
-                    print(err)
-                    raise
-                else:
-                    return
-
-            else:  # non Win32
-                self.fp = open(self.lockfile, 'w')
-                self.fp.flush()
-                try:
-                    fcntl.lockf(self.fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
-                except IOError:
-                    pass
-                else:
-                    return
-
-            sleep(sleep_time_sec2)
-            counter -= 1
-
-        n = lockfile_limit * sleep_time_sec2
-        msg = f"The lockfile of {self} was not released within {n} seconds"
+    def _mail_lease_timeout(self, msg: str) -> None:
         site = Site.objects.get_current()
         mail_admins(
             msg,
             f'''{msg}\n
-            \nThe connection will be restored automatically.\n
-            \nSite {site.domain}\n
-            Email account:_____{self.ea}\n
-            \ncreate_time:_______{self.create_time}\n
-            Last_Noop_time:___{self.noop_time}\n
-            Last_request_time:_{self.last_request_time}\n
-            Exception time:____{dt.now()}\n
-            \nLog: \n{self._parse_log()}
+            \nSite {site.domain}
+            \nEmail account:_____{getattr(self, 'ea', None)}
+            \nHolder:____________{lease_metrics.as_dict().get(self.email_host_user)}
+            \ncreate_time:_______{getattr(self, 'create_time', None)}
+            \nLast_Noop_time:___{getattr(self, 'noop_time', None)}
+            \nLast_request_time:_{getattr(self, 'last_request_time', None)}
+            \nException time:____{dt.now()}
+            \nLog: \n{self._parse_log() if getattr(self, 'connection', None) else ''}
             ''',
+            fail_silently=True,
         )
         raise RuntimeError(msg)
 
@@ -415,6 +359,21 @@ class CrmIMAP:
             return log
         return "IMAP_DEBUG_LEVEL = 0"
 
+    def _start_lease(self, wait: float) -> None:
+        if settings.IMAP_PROCESS_LOCK:
+            self.process_lock = ProcessLock(self.email_host_user)
+            if not self.process_lock.acquire(settings.IMAP_LEASE_TIMEOUT):
+                self.process_lock = None
+                with self.cond:
+                    self.locked = False
+                    self.cond.notify()
+                lease_metrics.timed_out(self.email_host_user)
+                self._mail_lease_timeout(
+                    f"The process lock of {self} was not released within "
+                    f"{settings.IMAP_LEASE_TIMEOUT} seconds"
+                )
+        lease_metrics.acquired(self.email_host_user, wait)
+
     def _uid_copy(self, uids_str, box) -> tuple:
         """Return (result, data, error)"""
         box = self.boxes[box]
@@ -452,3 +411,17 @@ def _get_box_initial_data() -> dict:
         'Spam': {'name': 'Spam', 'name on server': b'Spam'},
         'Trash': {'name': 'Trash', 'name on server': b'Trash'}
     }
+
+
+def get_uid_set(uids: list) -> str:
+    """Compress uids into an IMAP sequence set: [1, 2, 3, 7] -> '1:3,7'"""
+    nums = sorted({int(uid) for uid in uids})
+    ranges = []
+    start = end = nums[0]
+    for n in nums[1:]:
+        if n != end + 1:
+            ranges.append(f"{start}:{end}" if start != end else f"{start}")
+            start = n
+        end = n
+    ranges.append(f"{start}:{end}" if start != end else f"{start}")
+    return ','.join(ranges)
@@ -0,0 +1,145 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from typing import Sequence
+import numpy as np
+import pandas as pd
+from django.db.models import CharField
+from django.db.models import DecimalField
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Value
+from django.db.models.expressions import Expression
+from django.db.models.functions import Coalesce
+
+from common.utils.local_cache import LocalCache
+from crm.models import Currency
+from crm.models import Rate
+
+# Payment amounts are converted to the state or marketing currency
+# at the rate of their currency on the payment date (Rate) or,
+# if there is no such rate, at the current rate of the currency.
+# If there are several rates of a date, the first one is used.
+#
+# RateTable loads the rates into a pandas index keyed by
+# (currency, date) and converts arrays of amounts at once.
+# The tables are kept in the process memory and are cleared
+# when a rate or currency is saved or deleted (see LocalCache).
+# get_amount_expression() is the database variant: one lookup of
+# the rate on the (currency, payment_date) index per row,
+# with the current rate of the currency as the default.
+
+RATE_FIELDS = ('rate_to_state_currency', 'rate_to_marketing_currency')
+# precision of the converted amounts (and of the analytics rollups)
+QUANTUM = Decimal('0.0001')
+# keys of (currency, date) are currency_id * DAYS + days since 1970-01-01
+DAYS = 1 << 20
+_rate_tables = LocalCache('rate_tables', maxsize=16, models=(Currency, Rate))
+
+
+class RateTable:
+    """The rates of the currencies on the dates of the window."""
+
+    def __init__(self, start: Optional[date] = None, end: Optional[date] = None):
+        rates = Rate.objects.order_by('pk')
+        if start:
+            rates = rates.filter(payment_date__gte=start)
+        if end:
+            rates = rates.filter(payment_date__lte=end)
+        frame = pd.DataFrame.from_records(
+            list(rates.values_list('currency_id', 'payment_date', *RATE_FIELDS)),
+            columns=('currency_id', 'payment_date', *RATE_FIELDS)
+        )
+        frame.index = pd.Index(
+            get_keys(frame['currency_id'], frame['payment_date'])
+        )
+        frame = frame[~frame.index.duplicated()]
+        self.index = frame.index
+        self.rates = {f: frame[f].to_numpy(float) for f in RATE_FIELDS}
+        self.currencies = pd.DataFrame.from_records(
+            list(Currency.objects.values_list('id', *RATE_FIELDS)),
+            columns=('id', *RATE_FIELDS), index='id'
+        ).astype(float)
+
+    def get_rates(self, currency_ids: Sequence, dates: Sequence,
+                  rate_field_name: str) -> np.ndarray:
+        """Returns the rates of the currencies on the dates."""
+        positions = self.index.get_indexer(get_keys(currency_ids, dates))
+        current = self.get_current_rates(currency_ids, rate_field_name)
+        # the position -1 (no rate) takes the appended item
+        rates = np.append(self.rates[rate_field_name], 0)[positions]
+        return np.where(positions >= 0, rates, current)
+
+    def get_current_rates(self, currency_ids: Sequence,
+                          rate_field_name: str) -> np.ndarray:
+        return self.currencies[rate_field_name].reindex(
+            get_currency_ids(currency_ids)
+        ).to_numpy(float, na_value=0)
+
+    def convert(self, currency_ids: Sequence, dates: Sequence,
+                amounts: Sequence, rate_field_name: str) -> np.ndarray:
+        """Returns the amounts converted at the rates of the dates."""
+        return np.asarray(amounts, dtype=float) * self.get_rates(
+            currency_ids, dates, rate_field_name
+        )
+
+
+def get_rate_table(start: Optional[date] = None,
+                   end: Optional[date] = None) -> RateTable:
+    """Returns the rate table of the window."""
+    return _rate_tables.get((start, end), lambda: RateTable(start, end))
+
+
+def clear_rate_tables() -> None:
+    """Clears the rate tables after bulk queries, which send no signals."""
+    _rate_tables.clear()
+
+
+def to_decimals(values: np.ndarray) -> list:
+    """
+    Returns the converted amounts as decimals rounded to QUANTUM
+    (the float products of amounts with cents have representation errors).
+    """
+    return [Decimal(repr(v)).quantize(QUANTUM) for v in values.tolist()]
+
+
+def get_keys(currency_ids: Sequence, dates: Sequence) -> np.ndarray:
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return get_currency_ids(currency_ids) * DAYS + days
+
+
+def get_currency_ids(currency_ids: Sequence) -> np.ndarray:
+    """
+    Returns the ids as an array. Payments without a currency get the id 0,
+    which has no rates, so their amounts are converted to 0.
+    """
+    return np.array([i or 0 for i in currency_ids], dtype=np.int64)
+
+
+def get_rate_subquery(field: str, currency='currency',
+                      payment_date='payment_date') -> Subquery:
+    """The field of the first rate of the currency on the payment date."""
+    return Subquery(Rate.objects.filter(
+        currency=OuterRef(currency),
+        payment_date=OuterRef(payment_date)
+    ).order_by('pk').values(field)[:1])
+
+
+def get_amount_expression(rate_field_name: str, payment_date='payment_date',
+                          amount='amount', currency='currency') -> Expression:
+    """The amount converted at the rate of the payment date."""
+    return Coalesce(
+        F(amount) * get_rate_subquery(rate_field_name, currency, payment_date),
+        F(amount) * F(f'{currency}__{rate_field_name}'),
+        output_field=DecimalField()
+    )
+
+
+def get_rate_type_expression(payment_date='payment_date',
+                             currency='currency') -> Expression:
+    return Coalesce(
+        get_rate_subquery('rate_type', currency, payment_date),
+        Value(Rate.APPROXIMATE),
+        output_field=CharField()
+    )
@@ -9,10 +9,15 @@ from email.utils import parseaddr
 from typing import Optional
 from django import forms
 from django.apps import apps
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.handlers.wsgi import WSGIRequest
 from django.db.models import CharField
+from django.db.models import Count
 from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Prefetch
+from django.db.models import Subquery
 from django.db.models import Value
 from django.utils import timezone
 from django.utils.html import strip_tags
@@ -66,11 +71,33 @@ def get_counterparty_header() -> SafeString:
     return counterparty_safe_icon
 
 
+def count_related(model, field: str) -> Subquery:
+    """
+    Subquery counting the model objects with the same value
+    of the field as the outer object, e.g. deals of the deal company.
+    """
+    return Subquery(
+        model.objects.filter(
+            **{field: OuterRef(field)}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    )
+
+
 def get_crmimap(ea: EmailAccount, box: Optional[str] = None) -> Optional[CrmIMAP]:
     app_config = apps.get_app_config('crm')
     return app_config.mci.get_crmimap(ea, box)    
     
 
+def get_deal_products(deal) -> str:
+    """
+    The products of the deal with their quantities.
+    The outputs of the deal are prefetched with get_outputs_prefetch().
+    """
+    return ', '.join(str(otp) for otp in deal.output_set.all())
+
+
 def get_email_date(msg: Message) -> datetime:
     if msg['Date']:
         eml_date = parsedate_to_datetime(msg['Date'])
@@ -102,6 +129,24 @@ def get_products_header() -> SafeString:
     )
 
 
+def get_first_payment(field: str, deal: str = 'deal') -> Subquery:
+    """The field of the first payment of the deal of the outer object."""
+    payment_model = apps.get_model('crm', 'Payment')
+    return Subquery(
+        payment_model.objects.filter(
+            deal=OuterRef(deal)
+        ).order_by('pk').values(field)[:1]
+    )
+
+
+def get_outputs_prefetch(lookup: str = 'output_set') -> Prefetch:
+    """Prefetch of the outputs of deals with their products."""
+    output_model = apps.get_model('crm', 'Output')
+    return Prefetch(
+        lookup, queryset=output_model.objects.select_related('product')
+    )
+
+
 def get_owner(request: WSGIRequest, username: str):
     if username:
         try:
@@ -123,6 +168,15 @@ def get_owner_header() -> SafeString:
     )
 
 
+def get_import_limits(ea: EmailAccount) -> tuple:
+    """Return (batch_size, limit) of the email import for the account."""
+    limits = settings.IMAP_IMPORT_ACCOUNTS.get(ea.email_host_user, {})
+    return (
+        limits.get('batch_size', settings.IMAP_FETCH_BATCH_SIZE),
+        limits.get('limit', settings.IMAP_IMPORT_LIMIT)
+    )
+
+
 def get_uid_data(ea: EmailAccount) -> dict:
     return {
         'incoming': {
@@ -0,0 +1,277 @@
+import asyncio
+import re
+import ssl
+import threading
+from datetime import datetime as dt
+from functools import partial
+from random import random
+from typing import Callable
+from typing import Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from massmail.models import EmailAccount
+
+exists_re = re.compile(rb'^\* (\d+) EXISTS', re.I)
+literal_re = re.compile(rb'\{(\d+)\}\r\n$')
+
+
+class ImapError(Exception):
+    pass
+
+
+class AsyncImapClient:
+    """
+    Minimal asyncio IMAP4rev1 client.
+    It knows only the commands needed to wait for new messages.
+    """
+
+    def __init__(self, host: str, port: int = 993, use_ssl: bool = True):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.capabilities = set()
+        self.exists = None
+        self.idling = False
+        self.reader = self.writer = None
+        self.tag_num = 0
+
+    async def connect(self) -> None:
+        ssl_context = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context),
+            settings.IMAP_IDLE_CONNECT_TIMEOUT
+        )
+        greeting = await self._read_line()
+        if not greeting.startswith(b'* OK'):
+            raise ImapError(greeting)
+        await self.command('CAPABILITY')
+
+    async def close(self) -> None:
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+            self.writer = None
+
+    async def command(self, name: str, *args: str) -> list:
+        """Run command and return untagged responses."""
+        tag = self._new_tag()
+        line = ' '.join((tag, name) + args)
+        self.writer.write(line.encode() + b'\r\n')
+        await self.writer.drain()
+        return await self._read_response(tag)
+
+    async def idle(self, timeout: float) -> bool:
+        """
+        Wait for new messages in the selected box.
+        Return True if the server reported them within timeout.
+        """
+        tag = self._new_tag()
+        self.writer.write(tag.encode() + b' IDLE\r\n')
+        self.idling = True
+        await self.writer.drain()
+        line = await self._read_line()
+        if not line.startswith(b'+'):
+            self.idling = False
+            raise ImapError(line)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        new_mail = False
+        while not new_mail:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                line = await asyncio.wait_for(self._read_line(), remaining)
+            except asyncio.TimeoutError:
+                break
+            new_mail = self._check_exists(line)
+        self.writer.write(b'DONE\r\n')
+        self.idling = False
+        await self.writer.drain()
+        for line in await self._read_response(tag):
+            new_mail = self._check_exists(line) or new_mail
+        return new_mail
+
+    async def login(self, user: str, password: str) -> None:
+        await self.command('LOGIN', _quote(user), _quote(password))
+
+    async def logout(self) -> None:
+        if self.idling:
+            self.writer.write(b'DONE\r\n')
+            self.idling = False
+        try:
+            await asyncio.wait_for(self.command('LOGOUT'), 5)
+        except (OSError, ImapError, asyncio.TimeoutError):
+            pass
+
+    async def noop(self) -> bool:
+        """Return True if the server reported new messages."""
+        new_mail = False
+        for line in await self.command('NOOP'):
+            new_mail = self._check_exists(line) or new_mail
+        return new_mail
+
+    async def select(self, box: str = 'INBOX') -> None:
+        self.exists = None
+        for line in await self.command('SELECT', box):
+            self._check_exists(line)
+
+    def _check_exists(self, line: bytes) -> bool:
+        match = exists_re.match(line)
+        if not match:
+            return False
+        exists, self.exists = self.exists, int(match.group(1))
+        return exists is not None and self.exists > exists
+
+    def _new_tag(self) -> str:
+        self.tag_num += 1
+        return f"A{self.tag_num:04d}"
+
+    async def _read_line(self) -> bytes:
+        line = await self.reader.readline()
+        if not line:
+            raise ImapError(f"Connection to {self.host} closed")
+        match = literal_re.search(line)
+        if match:
+            line += await self.reader.readexactly(int(match.group(1)))
+            line += await self._read_line()
+        return line
+
+    async def _read_response(self, tag: str) -> list:
+        untagged = []
+        tag = tag.encode()
+        while True:
+            line = await self._read_line()
+            if line.startswith(tag + b' '):
+                if line.split()[1].upper() != b'OK':
+                    raise ImapError(line)
+                return untagged
+            if line.upper().startswith(b'* CAPABILITY'):
+                self.capabilities = set(line.upper().split()[2:])
+            untagged.append(line)
+
+
+class ImapIdleManager(threading.Thread):
+    """
+    Serves all email accounts with import enabled in one asyncio event loop.
+    Each account gets one connection waiting in IDLE for new messages in
+    INBOX. The account is queued for import as soon as the server
+    reports new messages. Servers without IDLE are polled with NOOP
+    every IMAP_NOOP_PERIOD seconds.
+    The Sent box is not watched, so all the accounts are also queued
+    every IMAP_NOOP_PERIOD seconds (the import skips unchanged boxes).
+    """
+
+    def __init__(self, ea_queue, port: int = 993, use_ssl: bool = True):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.ea_queue = ea_queue
+        self.port = port
+        self.use_ssl = use_ssl
+        self.loop = None
+        self.state = {}     # email_host_user: dict
+        self.watchers = {}  # ea.pk: (task, credentials)
+
+    def run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self._main())
+
+    def get_state(self) -> dict:
+        return {k: dict(v) for k, v in self.state.items()}
+
+    def stop(self) -> None:
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._cancel_all)
+
+    async def watch(self, ea: EmailAccount,
+                    notify: Optional[Callable] = None) -> None:
+        """Keep a connection to the account and notify about new messages."""
+        notify = notify or partial(self.ea_queue.put, pushed=True)
+        state = self.state.setdefault(ea.email_host_user, {
+            'mode': None, 'pushes': 0, 'errors': 0, 'error': ''
+        })
+        retry = settings.IMAP_IDLE_RETRY
+        while True:
+            client = AsyncImapClient(ea.imap_host, self.port, self.use_ssl)
+            try:
+                await client.connect()
+                await client.login(
+                    ea.email_host_user,
+                    ea.email_app_password or ea.email_host_password
+                )
+                await client.select('INBOX')
+                retry = settings.IMAP_IDLE_RETRY
+                if b'IDLE' in client.capabilities:
+                    state['mode'] = 'idle'
+                    while True:
+                        if await client.idle(settings.IMAP_IDLE_TIMEOUT):
+                            state['pushes'] += 1
+                            state['last_push'] = dt.now().isoformat()
+                            notify(ea)
+                else:
+                    state['mode'] = 'poll'
+                    while True:
+                        await asyncio.sleep(settings.IMAP_NOOP_PERIOD)
+                        if await client.noop():
+                            notify(ea)
+            except (OSError, ImapError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError) as err:
+                state['errors'] += 1
+                state['error'] = str(err)
+                state['mode'] = None
+            finally:
+                if client.writer:
+                    await client.logout()
+                await client.close()
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, settings.IMAP_NOOP_PERIOD)
+
+    def _cancel_all(self) -> None:
+        for task in asyncio.all_tasks(self.loop):
+            task.cancel()
+
+    async def _main(self) -> None:
+        await asyncio.sleep(random() * 10)
+        try:
+            while True:
+                eas = await sync_to_async(_get_accounts, thread_sensitive=False)()
+                self._update_watchers(eas)
+                for ea in eas:
+                    self.ea_queue.put(ea)
+                await asyncio.sleep(settings.IMAP_NOOP_PERIOD)
+        except asyncio.CancelledError:
+            pass
+
+    def _update_watchers(self, eas: list) -> None:
+        """Start watching new accounts, restart changed ones, drop removed ones."""
+        actual = {}
+        for ea in eas:
+            credentials = (ea.imap_host, ea.email_host_user,
+                           ea.email_app_password, ea.email_host_password)
+            actual[ea.pk] = credentials
+            watcher = self.watchers.get(ea.pk)
+            if watcher and watcher[1] == credentials:
+                continue
+            if watcher:
+                watcher[0].cancel()
+            task = self.loop.create_task(self.watch(ea))
+            self.watchers[ea.pk] = (task, credentials)
+        for pk in set(self.watchers) - set(actual):
+            self.watchers.pop(pk)[0].cancel()
+
+
+def _get_accounts() -> list:
+    close_old_connections()
+    eas = list(EmailAccount.objects.filter(do_import=True).exclude(imap_host=''))
+    close_old_connections()
+    return eas
+
+
+def _quote(value: str) -> str:
+    value = value.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{value}"'
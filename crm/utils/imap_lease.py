@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+from pathlib import Path
+from time import monotonic
+from time import sleep
+from django.conf import settings
+from django.utils import timezone
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+class LeaseMetrics:
+    """Contention metrics of CrmIMAP leases per email account."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def acquired(self, email_host_user: str, wait: float) -> None:
+        with self.lock:
+            item = self._get_item(email_host_user)
+            item['leases'] += 1
+            if wait:
+                item['contended'] += 1
+            item['total_wait'] += wait
+            item['max_wait'] = max(item['max_wait'], wait)
+            item['holder'] = threading.current_thread().name
+            item['since'] = timezone.now().isoformat()
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {k: dict(v) for k, v in self.data.items()}
+
+    def released(self, email_host_user: str) -> None:
+        with self.lock:
+            item = self._get_item(email_host_user)
+            item['holder'] = item['since'] = None
+
+    def timed_out(self, email_host_user: str) -> None:
+        with self.lock:
+            self._get_item(email_host_user)['timeouts'] += 1
+
+    def _get_item(self, email_host_user: str) -> dict:
+        return self.data.setdefault(email_host_user, {
+            'leases': 0, 'contended': 0, 'timeouts': 0,
+            'total_wait': 0, 'max_wait': 0,
+            'holder': None, 'since': None,
+        })
+
+
+class ProcessLock:
+    """
+    Exclusive lock shared by processes (gunicorn workers) of the server.
+    Taken once per CrmIMAP lease if IMAP_PROCESS_LOCK is True.
+    """
+
+    def __init__(self, name: str):
+        self.path = Path(settings.MEDIA_ROOT) / 'locks' / f"{name}.lock"
+        self.fd = None
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Wait for the lock with growing intervals.
+        Returns False if it was not acquired within timeout.
+        """
+        self.path.parent.mkdir(mode=0o775, parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        deadline = monotonic() + timeout
+        interval = 0.01
+        while True:
+            try:
+                if sys.platform == "win32":
+                    msvcrt.locking(self.fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                if monotonic() + interval > deadline:
+                    os.close(self.fd)
+                    self.fd = None
+                    return False
+            sleep(interval)
+            interval = min(interval * 2, 0.5)
+
+    def release(self) -> None:
+        if self.fd is None:
+            return
+        try:
+            if sys.platform == "win32":
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+
+lease_metrics = LeaseMetrics()
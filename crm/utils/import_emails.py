@@ -1,9 +1,10 @@
 import email
+import re
 import time
 import threading
 from datetime import timedelta
 from email.parser import BytesHeaderParser
-from pathlib import Path
+from time import monotonic
 from typing import Optional
 from django.apps import apps
 from django.conf import settings
@@ -22,124 +23,148 @@ from crm.utils.crm_imap import CrmIMAP
 from crm.utils.helpers import ensure_decoding
 from crm.utils.helpers import get_crmimap
 from crm.utils.helpers import get_email_date
+from crm.utils.helpers import get_import_limits
 from crm.utils.helpers import get_uid_data
+from crm.utils.import_queue import AccountQueue
+from crm.utils.import_queue import ImportMetrics
+from crm.utils.mime_stream import spool_message
 from massmail.models import EmailAccount
 
 app_config = apps.get_app_config('crm')
 control_period = timedelta(seconds=120)
+uid_re = re.compile(rb'UID (\d+)')
 
 
-class ImportEmails(threading.Thread):
+class ImportEmails:
+    """
+    Pool of ImportWorker threads.
+    Different email accounts are imported concurrently.
+    """
 
-    def __init__(self, ea_queue, eml_queue): 
-        threading.Thread.__init__(self)
-        self.daemon = True
-        self.close = False
+    def __init__(self, ea_queue: AccountQueue, eml_queue):
         self.crmimap_storage = app_config.mci.crmimap_storage
         self.ea_queue = ea_queue
         self.eml_queue = eml_queue
+        self.metrics = ImportMetrics()
+        self.user_imports = {}      # user id: time of the last send
+        self.lock = threading.Lock()
+        self.workers = [
+            ImportWorker(self) for _ in range(settings.IMAP_IMPORT_WORKERS)
+        ]
 
     def send(self, user):
+        now = monotonic()
+        with self.lock:
+            last = self.user_imports.get(user.id)
+            if last is not None and now - last < settings.IMAP_USER_IMPORT_INTERVAL:
+                return
+            self.user_imports[user.id] = now
         eas = EmailAccount.objects.filter(
             do_import=True, owner=user,
         )
         for ea in eas:
             if not settings.REUSE_IMAP_CONNECTION or \
                     ea.email_host_user not in self.crmimap_storage:
-                if ea not in list(self.ea_queue.queue):
-                    self.ea_queue.put(ea)
+                self.ea_queue.put(ea)
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+
+class ImportWorker(threading.Thread):
+
+    def __init__(self, pool: ImportEmails):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.pool = pool
 
     def run(self):
-        if not settings.TESTING:
-            path = Path(settings.MEDIA_ROOT / 'locks')
-            try:
-                path.mkdir(mode=0o775)
-            except FileExistsError:
-                for child in path.glob('*'):
-                    child.unlink()
-        crmimap = ea = None
         while True:
+            ea, wait, pushed = self.pool.ea_queue.get()
+            start = monotonic()
             try:
-                if crmimap:
-                    crmimap.release()
-                    crmimap = None
-                ea = self.ea_queue.get()
                 if not settings.TESTING:
                     # To prevent hit the db until the apps.ready() is completed.
                     time.sleep(1)
-                    ea.refresh_from_db(fields=['last_import_dt'])
-                    now = timezone.now()
-                    if ea.last_import_dt > now - control_period:
-                        continue
-
-                    ea.last_import_dt = now
-                    ea.save(update_fields=['last_import_dt'])
-                    crmimap = get_crmimap(ea)
-                    if not crmimap or crmimap.error:
-                        continue
-
-                    upd_fields = []
-                    uid_data = get_uid_data(ea)
-
-                    for t in ('incoming', 'sent'):
-                        box = 'Sent' if t == 'sent' else 'INBOX'
-                        result = crmimap.select_box(box)
-                        if result != 'OK':
-                            continue
-
-                        changed, uid_validity = crmimap.check_box_status(box, upd_fields)
-                        if not changed:
-                            continue
-                        if not uid_validity:
-                            set_new_start_uid(crmimap, t)
-
-                        result, data, e = crmimap.search(uid_data[t]['search_params'])
-                        if result != 'OK':
-                            continue
-
-                        # result <class 'list'>: [b'[CANNOT] Unsupported search criterion:
-                        # SENTSINCE 08-MAY-2020 FLAGGED']
-                        uids = data[0].split()
-                        if not uids:
-                            continue
-
-                        for i, uid in enumerate(uids):
-                            result, data, e = crmimap.uid_fetch(uid)
-                            if result != 'OK' or not data[0]:
-                                continue
-
-                            b_msg = parse_message_bytes(uid, data)
-                            if not b_msg:
-                                result, data, err = crmimap.uid_fetch(uid)
-                                if result != 'OK' or not data[0]:
-                                    continue
-                                b_msg = parse_message_bytes(uid, data)
-                                if not b_msg:
-                                    continue
-
-                            if not uid_validity:
-                                email_message = email.message_from_bytes(
-                                    b_msg, policy=email.policy.default)
-                                if CrmEmail.objects.filter(
-                                    message_id=email_message['Message-ID'],
-                                    creation_date=get_email_date(email_message)
-                                ).exists():
-                                    continue
-
-                            self.eml_queue.put((b_msg, ea, t, uid, '', None))
-                            if i == 50:
-                                break
-
-                    ea.last_import_dt = timezone.now()
-                    upd_fields.append('last_import_dt')
-                    ea.save(update_fields=upd_fields)
-
+                    self.import_emails(ea, force=pushed)
             except Exception as e:
                 mail_admins(
                     'ImportEmails Exception',
                     f'\nEmail account: {ea}\nException: {e}',
                     fail_silently=True,
                 )
+            finally:
+                self.pool.ea_queue.task_done(ea)
+                self.pool.metrics.add(ea, wait, monotonic() - start)
+
+    def import_emails(self, ea: EmailAccount, force: bool = False) -> None:
+        """
+        Import the emails of the account unless it was imported less than
+        control_period ago. New emails pushed by the server (force)
+        are imported at once.
+        """
+        ea.refresh_from_db(fields=['last_import_dt'])
+        now = timezone.now()
+        if not force and ea.last_import_dt > now - control_period:
+            return
+
+        ea.last_import_dt = now
+        ea.save(update_fields=['last_import_dt'])
+        crmimap = get_crmimap(ea)
+        if not crmimap:
+            return
+        try:
+            if not crmimap.error:
+                self.import_boxes(crmimap, ea)
+        finally:
+            crmimap.release()
+
+    def import_boxes(self, crmimap: CrmIMAP, ea: EmailAccount) -> None:
+        upd_fields = []
+        uid_data = get_uid_data(ea)
+
+        for t in ('incoming', 'sent'):
+            box = 'Sent' if t == 'sent' else 'INBOX'
+            result = crmimap.select_box(box)
+            if result != 'OK':
+                continue
+
+            changed, uid_validity = crmimap.check_box_status(box, upd_fields)
+            if not changed:
+                continue
+            if not uid_validity:
+                set_new_start_uid(crmimap, t)
+
+            result, data, e = crmimap.search(uid_data[t]['search_params'])
+            if result != 'OK':
+                continue
+
+            # result <class 'list'>: [b'[CANNOT] Unsupported search criterion:
+            # SENTSINCE 08-MAY-2020 FLAGGED']
+            uids = data[0].split()
+            if not uids:
+                continue
+
+            batch_size, limit = get_import_limits(ea)
+            uids = uids[:limit]
+            for i in range(0, len(uids), batch_size):
+                chunk = uids[i:i + batch_size]
+                messages = fetch_messages(crmimap, chunk)
+                if not uid_validity:
+                    messages = exclude_existing(messages)
+                for uid in chunk:
+                    b_msg = messages.pop(uid, None)
+                    if not b_msg:
+                        continue
+                    self.pool.eml_queue.put(
+                        (spool_message(b_msg), ea, t, uid, '', None)
+                    )
+
+        ea.last_import_dt = timezone.now()
+        upd_fields.append('last_import_dt')
+        ea.save(update_fields=upd_fields)
+
 
 
 def get_email_headers_page(ea: EmailAccount, page_num) -> tuple:
@@ -197,21 +222,22 @@ def get_email_headers_page(ea: EmailAccount, page_num) -> tuple:
                         subject_str = mark_safe(
                             f'<a href="#" onClick="{onclick}">{subject}</a>'
                         )
-                        is_exists = CrmEmail.objects.filter(
-                            incoming=True,
-                            creation_date=date,
-                            email_host_user=ea.email_host_user
-                        ).exists()
                         emails.append({
                             'subject': subject_str,
                             'from': ensure_decoding(msg['From']),
                             'to': ensure_decoding(msg['To']),
                             'date': date,
                             'uid': int(uid),
-                            'is_exists': is_exists,
                             'unseen': uid in unseen_list
                         })
-                    emails.sort(key=lambda x: x['uid'], reverse=True)
+                emails.sort(key=lambda x: x['uid'], reverse=True)
+                existing = set(CrmEmail.objects.filter(
+                    incoming=True,
+                    creation_date__in=[e['date'] for e in emails],
+                    email_host_user=ea.email_host_user
+                ).values_list('creation_date', flat=True))
+                for e in emails:
+                    e['is_exists'] = e['date'] in existing
             else:
                 crmimap.release()
     else:
@@ -248,19 +274,64 @@ def set_new_start_uid(crmimap: CrmIMAP, t: str) -> None:
     setattr(crmimap.ea, f"start_{t}_uid", int(start_uid))
 
 
+def exclude_existing(messages: dict) -> dict:
+    """
+    Exclude messages already saved in CRM (by Message-ID and date)
+    with a single query.
+    """
+    parser = BytesHeaderParser(policy=email.policy.default)
+    keys = {}
+    for uid, b_msg in messages.items():
+        msg = parser.parsebytes(b_msg)
+        keys[uid] = (str(msg['Message-ID'] or ''), get_email_date(msg))
+    existing = set(CrmEmail.objects.filter(
+        message_id__in={k[0] for k in keys.values() if k[0]}
+    ).values_list('message_id', 'creation_date'))
+    return {
+        uid: b_msg for uid, b_msg in messages.items()
+        if keys[uid] not in existing
+    }
+
+
+def fetch_messages(crmimap: CrmIMAP, uids: list) -> dict:
+    """
+    Fetch messages with a single UID FETCH command.
+    Messages missing in the response are fetched again one by one.
+    Returns {uid: message bytes}.
+    """
+    messages = {}
+    result, data, _ = crmimap.uid_fetch_batch(uids)
+    if result == 'OK' and data:
+        messages = parse_fetch_response(data)
+    for uid in uids:
+        if uid in messages or crmimap.error:
+            continue
+        result, data, _ = crmimap.uid_fetch(uid)
+        if result != 'OK' or not data[0]:
+            continue
+        b_msg = parse_message_bytes(uid, data)
+        if b_msg:
+            messages[uid] = b_msg
+    return messages
+
+
+def parse_fetch_response(data: list) -> dict:
+    """
+    Parse a (multi-message) UID FETCH response in one pass.
+    Returns {uid: message bytes}.
+    """
+    messages = {}
+    for i, item in enumerate(data):
+        if type(item) is not tuple or type(item[1]) is not bytes:
+            continue
+        match = uid_re.search(item[0])
+        if not match and i + 1 < len(data) and type(data[i + 1]) is bytes:
+            # The UID can follow the message literal: b' UID 123)'
+            match = uid_re.search(data[i + 1])
+        if match:
+            messages[match.group(1)] = item[1]
+    return messages
+
+
 def parse_message_bytes(uid: bytes, data: list) -> Optional[bytes]:
-    tmpl = f"UID {uid.decode()} RFC822".encode('utf8')
-    b_msg = next((
-        x[1] for x in data if type(x) is tuple and tmpl in x[0]
-    ), None)
-    if type(b_msg) is int:  # FIXME: fix and remove
-        mail_admins(
-            f"The data[0][1] is int at _parse_message_bytes(",
-            f'''
-            \nData: {data}
-            \nb_msg: {b_msg}
-            ''',
-            fail_silently=True,
-        )
-        b_msg = None
-    return b_msg
+    return parse_fetch_response(data).get(uid)
@@ -0,0 +1,103 @@
+import threading
+from collections import deque
+from time import monotonic
+from django.conf import settings
+from django.utils import timezone
+
+from massmail.models import EmailAccount
+
+
+class AccountQueue:
+    """
+    FIFO queue of email accounts waiting for import.
+    An account is queued once and is handed out to one worker at a time.
+    The number of accounts imported concurrently from one IMAP host
+    is limited by IMAP_HOST_CONNECTIONS.
+    Accounts with new emails pushed by the server (IMAP IDLE) are
+    handed out with the pushed flag set.
+    """
+
+    def __init__(self):
+        self.accounts = deque()     # (ea, put time)
+        self.queued = set()         # ea.pk
+        self.active = set()         # ea.pk
+        self.pushed = set()         # ea.pk
+        self.hosts = {}             # imap_host: number of active imports
+        self.cond = threading.Condition()
+
+    def get(self) -> tuple:
+        """
+        Block until an account can be imported.
+        Return (ea, queue wait, pushed).
+        """
+        with self.cond:
+            item = self._pop_next()
+            while not item:
+                self.cond.wait()
+                item = self._pop_next()
+        ea, put_time, pushed = item
+        return ea, monotonic() - put_time, pushed
+
+    def put(self, ea: EmailAccount, pushed: bool = False) -> bool:
+        """Queue the account if it is not queued yet."""
+        with self.cond:
+            if pushed:
+                self.pushed.add(ea.pk)
+            if ea.pk in self.queued:
+                return False
+            self.queued.add(ea.pk)
+            self.accounts.append((ea, monotonic()))
+            self.cond.notify_all()
+        return True
+
+    def qsize(self) -> int:
+        return len(self.accounts)
+
+    def task_done(self, ea: EmailAccount) -> None:
+        with self.cond:
+            self.active.discard(ea.pk)
+            self.hosts[ea.imap_host] -= 1
+            self.cond.notify_all()
+
+    def _pop_next(self):
+        for item in self.accounts:
+            ea = item[0]
+            if ea.pk in self.active:
+                continue
+            if self.hosts.get(ea.imap_host, 0) >= settings.IMAP_HOST_CONNECTIONS:
+                continue
+            self.accounts.remove(item)
+            self.queued.discard(ea.pk)
+            pushed = ea.pk in self.pushed
+            self.pushed.discard(ea.pk)
+            self.active.add(ea.pk)
+            self.hosts[ea.imap_host] = self.hosts.get(ea.imap_host, 0) + 1
+            return (*item, pushed)
+
+
+class ImportMetrics:
+    """Queue wait and import duration (in seconds) per email account."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def add(self, ea: EmailAccount, wait: float, duration: float) -> None:
+        with self.lock:
+            item = self.data.setdefault(ea.email_host_user, {
+                'imports': 0,
+                'queue_wait': 0, 'max_queue_wait': 0, 'total_queue_wait': 0,
+                'duration': 0, 'max_duration': 0, 'total_duration': 0,
+            })
+            item['imports'] += 1
+            item['queue_wait'] = wait
+            item['max_queue_wait'] = max(item['max_queue_wait'], wait)
+            item['total_queue_wait'] += wait
+            item['duration'] = duration
+            item['max_duration'] = max(item['max_duration'], duration)
+            item['total_duration'] += duration
+            item['last_import'] = timezone.now().isoformat()
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {k: dict(v) for k, v in self.data.items()}
@@ -42,8 +42,11 @@ class CrmImapManager(threading.Thread):
                 self._keep_in_touch()
     
     def _create_crmimap(self, ea: EmailAccount) -> Optional[CrmIMAP]:
-        crmimap = CrmIMAP(ea.email_host_user)
-        if ea.email_host_user not in self.crmimap_storage:
+        crmimap = self.crmimap_storage.get(ea.email_host_user)
+        if crmimap:
+            crmimap.lock()
+        else:
+            crmimap = CrmIMAP(ea.email_host_user)
             if settings.REUSE_IMAP_CONNECTION:
                 self.crmimap_storage[ea.email_host_user] = crmimap
             boxes = self.boxes_storage.get(ea.email_host_user)
@@ -51,14 +54,13 @@ class CrmImapManager(threading.Thread):
             if not crmimap.error:
                 if not boxes:
                     self.boxes_storage[ea.email_host_user] = crmimap.boxes
-        else:
-            crmimap = self.crmimap_storage.get(ea.email_host_user)
         crmimap.last_request_time = dt.now()
         return crmimap
 
     def _del_crmimap(self, crmimap: CrmIMAP) -> None:
         del self.crmimap_storage[crmimap.email_host_user]
         crmimap.close_and_logout()
+        crmimap.release()
 
     def _get_crmimap(self, ea: EmailAccount) -> Optional[CrmIMAP]:
         crmimap = None
@@ -88,9 +90,8 @@ class CrmImapManager(threading.Thread):
         while True:
             key_list = list(self.crmimap_storage.keys())
             for key in key_list:
-                value = getattr(self.crmimap_storage.get(key, None), 'locked')
-                if value is False:
-                    self.crmimap_storage[key].locked = True
+                crmimap = self.crmimap_storage.get(key)
+                if crmimap and crmimap.try_lock():
                     self._serve_crmimap(key)
 
             sleep(IMAP_NOOP_PERIOD)
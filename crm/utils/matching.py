@@ -0,0 +1,367 @@
+from collections import defaultdict
+from email.utils import getaddresses
+from email.utils import parseaddr
+from itertools import islice
+from typing import Iterable
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import CharField
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models.query import QuerySet
+
+from crm.models import MatchKey
+from crm.models import PhoneNumber
+from crm.models.match_key import MATCHED_MODELS
+from crm.utils.phone_numbers import get_reversed_digits
+from crm.utils.phone_numbers import MIN_DIGITS
+from settings.models import PublicEmailDomain
+
+# Incoming requests are matched to contacts, leads and companies
+# by normalized keys of these objects kept in the MatchKey table
+# (emails, email and website domains, company names, full names)
+# and by their phone numbers kept in the PhoneNumber table.
+# The keys of all the requests are looked up with one indexed query,
+# the candidates are loaded with one query per model and ranked
+# by the weights of the keys they share with the request.
+# The keys are updated when the objects are saved
+# and rebuilt by the "rebuild_match_keys" command.
+
+BATCH_SIZE = 1000
+PHONE = 'phone'
+# the weights of the keys shared with the request
+CONTACT_WEIGHTS = {MatchKey.EMAIL: 8, PHONE: 4, MatchKey.PERSON: 2}
+COMPANY_WEIGHTS = {MatchKey.EMAIL: 8, PHONE: 4, MatchKey.NAME: 4, MatchKey.DOMAIN: 2}
+KEY_FIELDS = {
+    'crm.Company': ('full_name', 'alternative_names', 'email', 'website'),
+    'crm.Contact': ('first_name', 'last_name', 'email', 'secondary_email'),
+    'crm.Lead': ('first_name', 'last_name', 'email', 'secondary_email'),
+}
+
+
+def normalize_email(email: str) -> str:
+    return parseaddr(email or '')[1].strip().lower()
+
+
+def normalize_name(name: str) -> str:
+    """Leaves only the letters of the name, e.g. "Test - Company LLC." -> "testcompanyllc"."""
+    return ''.join(c for c in (name or '').casefold() if c.isalpha())[:200]
+
+
+def normalize_person(first_name: str, last_name: str) -> str:
+    first_name, last_name = (first_name or '').strip(), (last_name or '').strip()
+    if not first_name or not last_name:
+        return ''
+    return f"{first_name} {last_name}".lower()[:200]
+
+
+def get_host(website: str) -> str:
+    host = (website or '').strip().lower().split('//')[-1]
+    host = host.split('/')[0].split(':')[0]
+    return host.removeprefix('www.')
+
+
+def get_domain(email: str) -> str:
+    return email.rpartition('@')[2] if '@' in email else ''
+
+
+def get_keys(label: str, values: dict) -> set:
+    """Returns the (kind, value) keys of an object by its field values."""
+    keys = set()
+    if label == 'crm.Company':
+        names = [values['full_name'], *values['alternative_names'].split(',')]
+        keys.update((MatchKey.NAME, n) for n in map(normalize_name, names))
+        emails = [e for _, e in getaddresses([values['email']])]
+        keys.update((MatchKey.DOMAIN, get_domain(e.lower())) for e in emails)
+        keys.add((MatchKey.DOMAIN, get_host(values['website'])))
+    else:
+        for field in ('email', 'secondary_email'):
+            emails = [e for _, e in getaddresses([values[field] or ''])]
+            keys.update((MatchKey.EMAIL, normalize_email(e)) for e in emails)
+        keys.add((
+            MatchKey.PERSON,
+            normalize_person(values['first_name'], values['last_name'])
+        ))
+    return {(kind, value) for kind, value in keys if value}
+
+
+def index_objects(model, ids: Iterable) -> int:
+    """
+    Updates the match keys of the objects.
+    The keys of deleted objects are deleted.
+    """
+    ids = list(ids)
+    label = model._meta.label
+    content_type = ContentType.objects.get_for_model(model)
+    new = set()
+    for values in model._default_manager.filter(pk__in=ids).values('pk', *KEY_FIELDS[label]):
+        new.update((values['pk'], *key) for key in get_keys(label, values))
+    keys = MatchKey.objects.filter(content_type=content_type, object_id__in=ids)
+    old = {(k.object_id, k.kind, k.value): k.pk for k in keys}
+    with transaction.atomic():
+        MatchKey.objects.filter(
+            pk__in=[pk for key, pk in old.items() if key not in new]
+        ).delete()
+        MatchKey.objects.bulk_create([
+            MatchKey(content_type=content_type, object_id=pk, kind=kind, value=value)
+            for pk, kind, value in new if (pk, kind, value) not in old
+        ])
+    return len(new)
+
+
+def index_queryset(queryset: QuerySet) -> int:
+    ids = queryset.values_list('pk', flat=True).order_by('pk').iterator()
+    number = 0
+    while batch := list(islice(ids, BATCH_SIZE)):
+        number += index_objects(queryset.model, batch)
+    return number
+
+
+def update_match_keys(model, instance) -> None:
+    """Updates the match keys of the saved or deleted object."""
+    if model._meta.label in MATCHED_MODELS:
+        index_objects(model, [instance.pk])
+
+
+def rebuild_match_keys(model) -> int:
+    """Rebuilds the match keys of all the model objects."""
+    MatchKey.objects.filter(
+        content_type=ContentType.objects.get_for_model(model)
+    ).delete()
+    return index_queryset(model._default_manager.all())
+
+
+class RequestMatcher:
+    """
+    Finds the contacts, leads and companies of the requests.
+    All the requests share the queries, so a batch of requests
+    is matched with the same number of queries as one request.
+    """
+
+    def __init__(self, requests: Iterable):
+        self.requests = list(requests)
+        self.positions = {id(r): i for i, r in enumerate(self.requests)}
+        self.contact_model = apps.get_model('crm', 'Contact')
+        self.lead_model = apps.get_model('crm', 'Lead')
+        self.company_model = apps.get_model('crm', 'Company')
+        # request index -> {(model, pk): kinds of the shared keys}
+        self.shared = defaultdict(lambda: defaultdict(set))
+        self.objects = {}
+        self._loaded = False
+
+    def set_contact_or_lead(self, request) -> bool:
+        """
+        Sets the best-ranked contact or lead (and the company of the contact)
+        of the request. Returns True if it is found.
+        """
+        candidate = self.get_contact_or_lead(request)
+        if candidate is None:
+            return False
+        if candidate.__class__ is self.contact_model:
+            if request.company:
+                if request.company == candidate.company:
+                    request.contact = candidate
+            else:
+                request.contact = candidate
+                request.company = candidate.company
+        else:
+            request.lead = candidate
+        request.verification_required = True
+        return True
+
+    def set_company(self, request) -> None:
+        """Sets the best-ranked company of the request."""
+        company = self.get_company(request)
+        if company is not None:
+            request.company = company
+            request.verification_required = True
+
+    def get_contact_or_lead(self, request):
+        """
+        Returns the contact or lead with the same first name that shares
+        the email, phone number or full name with the request.
+        Sharing only the full name requires the same company (if the request
+        has a company name).
+        Contacts win the ties with leads, older objects win the ties
+        with newer ones.
+        """
+        first_name = request.first_name.strip().lower()
+        company_name = normalize_name(request.company_name)
+        ranked = []
+        for (model, pk), kinds in self.get_shared(request).items():
+            if model not in (self.contact_model, self.lead_model):
+                continue
+            obj = self.objects.get((model, pk))
+            if obj is None or obj.first_name.strip().lower() != first_name:
+                continue
+            score = sum(CONTACT_WEIGHTS.get(kind, 0) for kind in kinds)
+            if not score:
+                continue
+            if company_name:
+                if model is self.contact_model:
+                    name = normalize_name(obj.company.full_name)
+                else:
+                    name = normalize_name(obj.company_name)
+                if name == company_name:
+                    score += 2
+                elif company_name in name:
+                    score += 1
+                elif kinds & CONTACT_WEIGHTS.keys() == {MatchKey.PERSON}:
+                    # a namesake from another company
+                    continue
+            ranked.append((-score, model is not self.contact_model, pk, obj))
+        return min(ranked, key=lambda r: r[:3])[3] if ranked else None
+
+    def get_company(self, request):
+        """
+        Returns the company of the contacts sharing the email or phone number
+        with the request, or the company sharing the name or domain with it.
+        The country of the request breaks the ties.
+        """
+        scores = defaultdict(set)
+        for (model, pk), kinds in self.get_shared(request).items():
+            if model is self.contact_model:
+                obj = self.objects.get((model, pk))
+                if obj is not None:
+                    scores[obj.company_id].update(kinds & {MatchKey.EMAIL, PHONE})
+            elif model is self.company_model:
+                scores[pk].update(kinds)
+        ranked = []
+        for pk, kinds in scores.items():
+            company = self.objects.get((self.company_model, pk))
+            score = sum(COMPANY_WEIGHTS.get(kind, 0) for kind in kinds)
+            if company is None or not score:
+                continue
+            score += 1 if request.country_id and company.country_id == request.country_id else 0
+            ranked.append((-score, pk, company))
+        return min(ranked, key=lambda r: r[:2])[2] if ranked else None
+
+    def get_shared(self, request) -> dict:
+        self.load()
+        return self.shared[self.positions[id(request)]]
+
+    def get_request_keys(self, request) -> set:
+        """Returns the (kind, value) keys of the request."""
+        email = normalize_email(request.email)
+        keys = {
+            (MatchKey.EMAIL, email),
+            (MatchKey.PERSON, normalize_person(request.first_name, request.last_name)),
+            (MatchKey.NAME, normalize_name(request.company_name)),
+            (MatchKey.DOMAIN, get_domain(email)),
+            (MatchKey.DOMAIN, get_host(request.website)),
+        }
+        return {(kind, value) for kind, value in keys if value}
+
+    def load(self) -> None:
+        """Looks up the keys of all the requests and loads the candidates."""
+        if self._loaded:
+            return
+        self._loaded = True
+        index = defaultdict(list)
+        phones = defaultdict(list)
+        for i, request in enumerate(self.requests):
+            for key in self.get_request_keys(request):
+                index[key].append(i)
+            digits = get_reversed_digits(request.phone)
+            if len(digits) >= MIN_DIGITS:
+                phones[digits].append(i)
+        domains = [value for kind, value in index if kind == MatchKey.DOMAIN]
+        if domains:
+            public = PublicEmailDomain.objects.filter(domain__in=domains)
+            for domain in public.values_list('domain', flat=True):
+                index.pop((MatchKey.DOMAIN, domain.lower()), None)
+
+        querysets = []
+        if index:
+            q_params = Q()
+            for kind in (MatchKey.EMAIL, MatchKey.PERSON, MatchKey.NAME, MatchKey.DOMAIN):
+                values = [value for k, value in index if k == kind]
+                if values:
+                    q_params |= Q(kind=kind, value__in=values)
+            querysets.append(MatchKey.objects.filter(q_params).values_list(
+                'content_type_id', 'object_id', 'kind', 'value'
+            ))
+        if phones:
+            q_params = Q()
+            for digits in phones:
+                q_params |= Q(reversed_digits__startswith=digits)
+            querysets.append(PhoneNumber.objects.filter(q_params).values_list(
+                'content_type_id', 'object_id',
+                Value(PHONE, output_field=CharField()), 'reversed_digits'
+            ))
+        if not querysets:
+            return
+        rows = querysets[0].union(*querysets[1:], all=True)
+
+        models = {
+            ContentType.objects.get_for_model(model).id: model
+            for model in (self.contact_model, self.lead_model, self.company_model)
+        }
+        ids = defaultdict(set)
+        for content_type_id, object_id, kind, value in rows:
+            model = models.get(content_type_id)
+            if model is None:
+                continue
+            if kind == PHONE:
+                matched = [
+                    i for n in range(MIN_DIGITS, len(value) + 1)
+                    for i in phones.get(value[:n], ())
+                ]
+            else:
+                matched = index.get((kind, value), ())
+            for i in matched:
+                self.shared[i][(model, object_id)].add(kind)
+                ids[model].add(object_id)
+        self._load_objects(ids)
+
+    def _load_objects(self, ids: dict) -> None:
+        contacts = self.contact_model.objects.filter(
+            pk__in=ids[self.contact_model]
+        ).select_related('company') if ids[self.contact_model] else ()
+        leads = self.lead_model.objects.filter(
+            pk__in=ids[self.lead_model]
+        ) if ids[self.lead_model] else ()
+        for obj in (*contacts, *leads):
+            self.objects[(obj.__class__, obj.pk)] = obj
+            if obj.__class__ is self.contact_model:
+                self.objects[(self.company_model, obj.company_id)] = obj.company
+        company_ids = ids[self.company_model].difference(
+            pk for model, pk in self.objects if model is self.company_model
+        )
+        if company_ids:
+            for company in self.company_model.objects.filter(pk__in=company_ids):
+                self.objects[(self.company_model, company.pk)] = company
+
+
+def match_requests(queryset: QuerySet, save: bool = True) -> int:
+    """
+    Matches the requests that have no contact, lead or company
+    in batches and saves the found links. Returns the number of
+    the requests with new links.
+    """
+    fields = ('contact', 'lead', 'company', 'verification_required')
+    ids = queryset.values_list('pk', flat=True).order_by('pk').iterator()
+    model = queryset.model
+    number = 0
+    while batch := list(islice(ids, BATCH_SIZE)):
+        requests = list(model._default_manager.filter(pk__in=batch).select_related(
+            'company', 'contact__company'
+        ))
+        matcher = RequestMatcher(requests)
+        changed = []
+        for request in requests:
+            before = tuple(getattr(request, f'{f}_id') for f in fields[:3])
+            if not any((request.contact, request.lead)):
+                matcher.set_contact_or_lead(request)
+            if request.contact:
+                request.company = request.contact.company
+            if not request.company:
+                matcher.set_company(request)
+            if tuple(getattr(request, f'{f}_id') for f in fields[:3]) != before:
+                changed.append(request)
+        if save and changed:
+            model._default_manager.bulk_update(changed, fields)
+        number += len(changed)
+    return number
+
@@ -0,0 +1,114 @@
+import binascii
+import email
+import quopri
+from email.message import Message
+from email.parser import BytesFeedParser
+from tempfile import SpooledTemporaryFile
+from tempfile import TemporaryFile
+from typing import BinaryIO
+from typing import Iterator
+from typing import Union
+from django.conf import settings
+
+# Import of large emails without holding several copies of them in memory.
+# The raw message is kept in a temporary file while it waits in the
+# eml_queue, it is parsed chunk by chunk and attachments are decoded
+# chunk by chunk into temporary files which are written to the storage.
+
+
+def spool_message(b_msg: bytes) -> Union[bytes, BinaryIO]:
+    """
+    Move a message larger than IMAP_MESSAGE_MEMORY_LIMIT to a temporary file.
+    Smaller messages are returned as is.
+    """
+    if len(b_msg) <= settings.IMAP_MESSAGE_MEMORY_LIMIT:
+        return b_msg
+    f = TemporaryFile()
+    f.write(b_msg)
+    f.seek(0)
+    return f
+
+
+def parse_message(source: Union[bytes, BinaryIO]) -> email.message.EmailMessage:
+    """
+    Parse message bytes or a (spooled) message file with BytesFeedParser
+    feeding it by IMAP_PARSE_CHUNK_SIZE bytes. The file is closed.
+    """
+    parser = BytesFeedParser(policy=email.policy.default)
+    chunk_size = settings.IMAP_PARSE_CHUNK_SIZE
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for i in range(0, len(view), chunk_size):
+            parser.feed(bytes(view[i:i + chunk_size]))
+    elif hasattr(source, 'read'):
+        with source:
+            source.seek(0)
+            while chunk := source.read(chunk_size):
+                parser.feed(chunk)
+    else:
+        raise TypeError(
+            f"Expected message bytes or file, got {type(source).__name__}"
+        )
+    return parser.close()
+
+
+def spool_payload(part: Message) -> SpooledTemporaryFile:
+    """
+    Decode the payload of a message part into a temporary file chunk by chunk.
+    Payloads up to IMAP_MESSAGE_MEMORY_LIMIT stay in memory, larger ones
+    are rolled over to disk. The payload of the part is released.
+    """
+    f = SpooledTemporaryFile(max_size=settings.IMAP_MESSAGE_MEMORY_LIMIT)
+    cte = str(part.get('content-transfer-encoding', '')).strip().lower()
+    try:
+        if cte in ('base64', 'quoted-printable', '7bit', '8bit', 'binary', ''):
+            for chunk in _decode_payload(part.get_payload(), cte):
+                f.write(chunk)
+        else:
+            # x-uuencode and unknown encodings are rare and decoded by email
+            f.write(part.get_payload(decode=True) or b'')
+    except (binascii.Error, ValueError):
+        # Defective payload. Let the email package decode it as it can.
+        f.seek(0)
+        f.truncate()
+        f.write(part.get_payload(decode=True) or b'')
+    part.set_payload('')
+    f.seek(0)
+    return f
+
+
+def _decode_payload(payload: str, cte: str) -> Iterator[bytes]:
+    size = settings.IMAP_PARSE_CHUNK_SIZE
+    if cte == 'base64':
+        rest = ''
+        for block in _iter_lines(payload, size):
+            data = rest + ''.join(block.split())
+            end = len(data) - len(data) % 4
+            rest = data[end:]
+            yield binascii.a2b_base64(data[:end])
+        if rest:
+            yield binascii.a2b_base64(rest)
+    elif cte == 'quoted-printable':
+        for block in _iter_lines(payload, size):
+            yield quopri.decodestring(_to_bytes(block))
+    else:
+        for block in _iter_lines(payload, size):
+            yield _to_bytes(block)
+
+
+def _iter_lines(payload: str, size: int) -> Iterator[str]:
+    """Yield blocks of whole lines of about size characters."""
+    start, length = 0, len(payload)
+    while start < length:
+        end = payload.find('\n', start + size)
+        end = length if end == -1 else end + 1
+        yield payload[start:end]
+        start = end
+
+
+def _to_bytes(block: str) -> bytes:
+    # The same way as email.message.Message.get_payload(decode=True) does.
+    try:
+        return block.encode('ascii', 'surrogateescape')
+    except UnicodeError:
+        return block.encode('raw-unicode-escape')
@@ -0,0 +1,95 @@
+from itertools import islice
+from typing import Iterable
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+from crm.models import PhoneNumber
+from crm.models.phone_number import PHONE_FIELDS
+
+# Phone numbers are looked up in the PhoneNumber table by their digits
+# instead of scanning the phone fields of every contact and lead with a regex.
+# The digits are stored reversed, so a number is found by its ending
+# with an index range scan, e.g. "555-12-34" finds "+1 (800) 555 1234".
+# The rows are updated when contacts and leads are saved,
+# and rebuilt by the "backfill_phone_numbers" command.
+
+BATCH_SIZE = 1000
+# numbers with fewer digits are not looked up
+MIN_DIGITS = 5
+
+
+def get_reversed_digits(phone: str) -> str:
+    return ''.join(c for c in reversed(phone or '') if c.isdigit())
+
+
+def get_phone_q_params(model, phone: str, exact: bool = False) -> Q:
+    """
+    Returns Q params of the model objects having a phone number
+    that ends with (or is equal to, if exact) the digits of the phone.
+    The Q is empty if the phone has too few digits.
+    """
+    digits = get_reversed_digits(phone)
+    if len(digits) < MIN_DIGITS:
+        return Q()
+    lookup = 'reversed_digits' if exact else 'reversed_digits__startswith'
+    numbers = PhoneNumber.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        **{lookup: digits}
+    )
+    return Q(pk__in=numbers.values('object_id'))
+
+
+def index_objects(model, ids: Iterable) -> int:
+    """
+    Updates the phone numbers of the objects.
+    The numbers of deleted objects are deleted.
+    """
+    ids = list(ids)
+    content_type = ContentType.objects.get_for_model(model)
+    new = set()
+    rows = model._default_manager.filter(pk__in=ids).values_list(
+        'pk', *PHONE_FIELDS[model._meta.label]
+    )
+    for pk, *phones in rows:
+        new.update(
+            (pk, digits) for digits in map(get_reversed_digits, phones) if digits
+        )
+    numbers = PhoneNumber.objects.filter(
+        content_type=content_type, object_id__in=ids
+    )
+    old = {(n.object_id, n.reversed_digits): n.pk for n in numbers}
+    with transaction.atomic():
+        PhoneNumber.objects.filter(
+            pk__in=[pk for key, pk in old.items() if key not in new]
+        ).delete()
+        PhoneNumber.objects.bulk_create([
+            PhoneNumber(
+                content_type=content_type, object_id=pk, reversed_digits=digits
+            )
+            for pk, digits in new if (pk, digits) not in old
+        ])
+    return len(new)
+
+
+def index_queryset(queryset: QuerySet) -> int:
+    ids = queryset.values_list('pk', flat=True).order_by('pk').iterator()
+    number = 0
+    while batch := list(islice(ids, BATCH_SIZE)):
+        number += index_objects(queryset.model, batch)
+    return number
+
+
+def update_phone_numbers(model, instance) -> None:
+    """Updates the phone numbers of the saved or deleted object."""
+    if model._meta.label in PHONE_FIELDS:
+        index_objects(model, [instance.pk])
+
+
+def rebuild_phone_numbers(model) -> int:
+    """Rebuilds the phone numbers of all the model objects."""
+    PhoneNumber.objects.filter(
+        content_type=ContentType.objects.get_for_model(model)
+    ).delete()
+    return index_queryset(model._default_manager.all())
@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Optional
+from typing import Tuple
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists
+from django.db.models import OuterRef
+
+from analytics.utils.rollups import index_queryset
+from crm.models import Currency
+from crm.models import Payment
+from crm.models import Rate
+from crm.utils.currency_rates import clear_rate_tables
+
+# The official rates of the dates of received payments are backfilled
+# in batches. The missing (currency, date) pairs are selected with one query
+# and the dates of each currency are grouped into ranges of up to
+# RATE_BACKFILL_RANGE_DAYS days requested from the backend at once
+# (see BaseBackend.get_range_rates).
+# The rates of each range are saved with bulk queries (the rollups of
+# the payments of its dates are updated explicitly), and the responses
+# are cached in MEDIA_ROOT/rates, so an interrupted or failed backfill
+# resumes with the missing dates without requesting the cached ones again.
+# An error of a range does not stop the backfill of the other ranges.
+
+RATE_FIELDS = ('rate_to_state_currency', 'rate_to_marketing_currency')
+
+
+class RateCache:
+    """The rates received from the backend, one file per currency."""
+
+    def __init__(self, backend, marketing_currency: str):
+        self.path = Path(settings.MEDIA_ROOT) / 'rates' / backend.__name__
+        self.marketing_currency = marketing_currency
+        self._data = {}
+
+    def get(self, currency: str) -> dict:
+        """Returns the cached rates of the currency {date: (rate, rate)}."""
+        if currency not in self._data:
+            try:
+                with open(self.get_file(currency)) as f:
+                    self._data[currency] = {
+                        date.fromisoformat(day): tuple(values)
+                        for day, values in json.load(f).items()
+                    }
+            except (OSError, ValueError):
+                self._data[currency] = {}
+        return self._data[currency]
+
+    def update(self, currency: str, rates: dict) -> None:
+        data = self.get(currency)
+        data.update(rates)
+        self.path.mkdir(mode=0o775, parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({day.isoformat(): values for day, values in data.items()},
+                      f, cls=DjangoJSONEncoder)
+        os.replace(name, self.get_file(currency))
+
+    def get_file(self, currency: str) -> Path:
+        return self.path / f"{currency}-{self.marketing_currency}.json"
+
+
+def get_missing_rates(today: date) -> dict:
+    """
+    Returns the dates of the received payments (before today)
+    without an official rate by currency {currency_id: [date, ...]}.
+    """
+    rates = Rate.objects.filter(
+        currency=OuterRef('currency'),
+        payment_date=OuterRef('payment_date'),
+        rate_type=Rate.OFFICIAL
+    )
+    pairs = Payment.objects.filter(
+        ~Exists(rates),
+        payment_date__lt=today,
+        status=Payment.RECEIVED,
+    ).values_list('currency_id', 'payment_date').distinct().order_by(
+        'currency_id', 'payment_date'
+    )
+    missing = defaultdict(list)
+    for currency_id, payment_date in pairs:
+        missing[currency_id].append(payment_date)
+    return missing
+
+
+def get_ranges(dates: list, days: int) -> list:
+    """
+    Splits the sorted dates into ranges of up to the number of days
+    [(start, end, dates of the range)].
+    """
+    ranges = []
+    for day in dates:
+        if ranges and (day - ranges[-1][0]).days < days:
+            ranges[-1][1] = day
+            ranges[-1][2].append(day)
+        else:
+            ranges.append([day, day, [day]])
+    return [tuple(r) for r in ranges]
+
+
+def save_rates(currency: Currency, rates: dict) -> None:
+    """
+    Saves the official rates of the currency {date: (rate, rate)}
+    and updates the analytics rollups of the payments of the dates
+    (bulk queries do not send the signals that update them).
+    """
+    with transaction.atomic():
+        existing = list(Rate.objects.filter(
+            currency=currency, payment_date__in=rates
+        ))
+        for r in existing:
+            (r.rate_to_state_currency,
+             r.rate_to_marketing_currency) = rates[r.payment_date]
+            r.rate_type = Rate.OFFICIAL
+        Rate.objects.bulk_update(existing, (*RATE_FIELDS, 'rate_type'))
+        saved = {r.payment_date for r in existing}
+        Rate.objects.bulk_create(
+            Rate(
+                currency=currency,
+                payment_date=day,
+                rate_to_state_currency=values[0],
+                rate_to_marketing_currency=values[1],
+                rate_type=Rate.OFFICIAL,
+            )
+            for day, values in rates.items() if day not in saved
+        )
+        index_queryset(Payment.objects.filter(
+            currency=currency, payment_date__in=rates
+        ))
+
+
+def backfill_rates(marketing_currency: Currency, backend, today: date,
+                   range_days: Optional[int] = None,
+                   delay: Optional[float] = None) -> Tuple[int, list]:
+    """
+    Saves the official rates of the received payments that have none.
+    Returns the number of the saved dates and the errors of the backend.
+    """
+    if range_days is None:
+        range_days = settings.RATE_BACKFILL_RANGE_DAYS
+    if delay is None:
+        delay = settings.RATE_BACKFILL_DELAY
+    cache = RateCache(backend, marketing_currency.name)
+    currencies = Currency.objects.in_bulk()
+    number = 0
+    errors = []
+    requested = False
+    for currency_id, dates in get_missing_rates(today).items():
+        currency = currencies[currency_id]
+        cached = cache.get(currency.name)
+        for start, end, range_dates in get_ranges(dates, range_days):
+            rates = {day: cached[day] for day in range_dates if day in cached}
+            if len(rates) < len(range_dates):
+                if requested and delay:
+                    time.sleep(delay)
+                requested = True
+                received, error = backend.get_range_rates(
+                    currency.name, marketing_currency.name, start, end,
+                    [day for day in range_dates if day not in cached], delay
+                )
+                if received:
+                    cache.update(currency.name, received)
+                if error:
+                    errors.append(f"{currency.name} {start} - {end}: {error}")
+                rates.update(
+                    (day, received[day]) for day in range_dates if day in received
+                )
+            if rates:
+                save_rates(currency, rates)
+                number += len(rates)
+    if number:
+        clear_rate_tables()
+    return number, errors
+
@@ -5,14 +5,11 @@ from tendo.singleton import SingleInstance
 from django.conf import settings
 from django.core.mail import mail_admins
 from django.db import connection
-from django.db.models import Exists
-from django.db.models import OuterRef
 from django.utils import timezone
 from django.utils.module_loading import import_string
 
 from crm.models import Currency
-from crm.models import Payment
-from crm.models import Rate
+from crm.utils.rate_backfill import backfill_rates
 
 
 BACKEND = ""
@@ -83,43 +80,11 @@ def get_rates(marketing_currency: Currency, backend=BACKEND) -> None:
             currency.save()
         time.sleep(0.5)
 
-    rates = Rate.objects.filter(
-        currency=OuterRef('currency'),
-        payment_date=OuterRef('payment_date'),
-        rate_type=Rate.OFFICIAL
-    )
-    while True:
-        payment = Payment.objects.filter(
-            payment_date__lt=now.date(),
-            status=Payment.RECEIVED
-        ).annotate(
-            rate=Exists(rates)
-        ).filter(rate=False).first()
-        if not payment:
-            break
-        currency = payment.currency
-        payment_date = payment.payment_date
-        be = backend(
-            currency.name,
-            marketing_currency.name,
-            payment_date
+    # official rates of the received payments
+    _number, errors = backfill_rates(marketing_currency, backend, now.date())
+    if errors:
+        mail_admins(
+            "Error getting currency rates",
+            "\n".join(errors),
+            fail_silently=True,
         )
-        rate_to_state_currency, rate_to_marketing_currency, error = be.get_rates()
-        if error:
-            break
-        try:
-            r = Rate.objects.get(
-                currency=currency,
-                payment_date=payment_date,
-            )
-        except Rate.DoesNotExist:
-            r = Rate(
-                currency=currency,
-                payment_date=payment_date,
-            )
-        r.rate_to_state_currency = rate_to_state_currency
-        r.rate_to_marketing_currency = rate_to_marketing_currency
-        r.rate_type = Rate.OFFICIAL
-        r.save()
-
-        time.sleep(0.5)
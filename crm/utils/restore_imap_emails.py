@@ -1,6 +1,9 @@
-import io
 import email
 import threading
+from queue import Empty
+from time import monotonic
+from typing import NamedTuple
+from typing import Optional
 from email.utils import parseaddr
 from django.db.models import F
 from django.db.models import TextField
@@ -22,6 +25,7 @@ from common.templatetags.util import replace_lang
 from common.utils.helpers import get_formatted_short_date
 from common.utils.helpers import get_trans_for_user
 from common.utils.helpers import save_message
+from common.utils.site_cache import invalidate
 from common.models import TheFile
 from crm.models import CrmEmail
 from crm.models import Deal
@@ -32,6 +36,10 @@ from crm.utils.helpers import delete3enters
 from crm.utils.helpers import html2txt
 from crm.utils.helpers import get_email_date
 from crm.utils.helpers import get_uid_data
+from crm.utils.mime_stream import parse_message
+from crm.utils.mime_stream import spool_payload
+from crm.utils.search import get_search_backend
+from crm.utils.search import index_objects
 from crm.utils.ticketproc import get_ticket
 from crm.utils.send_email import EMAIL_SENT_TO_str
 from massmail.models import EmailAccount
@@ -40,144 +48,308 @@ EXCEPT_SUBJECT = 'RestoreImapEmails Exception'
 received_email_from_str = _('Received an email from "%s"')
 
 
+class PendingEmail(NamedTuple):
+    """An imported email waiting to be written with its batch."""
+    crm_eml: Optional[CrmEmail]     # None if only start_uid is advanced
+    ea: EmailAccount
+    t: str
+    uid_data: dict
+    uid: str
+    attachments: list = []          # [(filename, file)]
+    frm: str = ''
+
+
 class RestoreImapEmails(threading.Thread):
+    """
+    Saves emails from the eml_queue in the database.
+    Emails are written in batches of up to IMAP_WRITE_BATCH_SIZE emails
+    collected within IMAP_WRITE_BATCH_DELAY seconds. If a batch fails,
+    its emails are saved one by one.
+    """
 
     def __init__(self, eml_queue, inq_eml_queue):
         threading.Thread.__init__(self)
         self.daemon = True
         self.eml_queue = eml_queue
         self.inq_eml_queue = inq_eml_queue
+        self.batch = []
 
     def run(self):
+        deadline = 0
         while True:
-            raw_content = ea = t = uid = ''
             try:
-                item, ea, t, uid, ticket, request = self.eml_queue.get()
-                email_message = email.message_from_bytes(
-                    item, policy=email.policy.default)
-                uid_data = get_uid_data(ea)
-                if received_from_crm(email_message):
-                    if request:
-                        messages.error(
-                            request,
-                            "ERROR: Trying to import an email sent from CRM!"
-                        )
-                        request = None
-                    else:
-                        if int(uid) > getattr(ea, uid_data[t]['start_uid']):
-                            update_ea(ea, uid_data, t, uid)
-                    connection.close()
-                    self.eml_queue.task_done()
-                    continue
-
-                subj = ensure_decoding(email_message['Subject'])
-                richest = email_message.get_body(   # NOQA
-                    preferencelist=('plain', 'html', 'related'))
-                if richest is None:
-                    if email_message.is_multipart():
-                        raw_content, is_html, e = '', False, ''
-                    else:
-                        raise RuntimeError("Unknown content")
-                else:
-                    raw_content, is_html, e = get_raw_content(
-                        richest, ea, t, uid, subj)
-                if e:
-                    self.eml_queue.task_done()
-                    continue
-                if t != 'inquiry':
-                    ticket = ticket or get_ticket((subj, raw_content))
-                    if not ticket:
-                        update_ea(ea, uid_data, t, uid)
-                        connection.close()
-                        self.eml_queue.task_done()
-                        continue
-                    crm_eml = CrmEmail(
-                        ticket=ticket,
-                        incoming=uid_data[t]['incoming'],
-                        sent=uid_data[t]['sent']
+                timeout = max(deadline - monotonic(), 0) if self.batch else None
+                item = self.eml_queue.get(timeout=timeout)
+            except Empty:
+                self.flush()
+                connection.close()
+                continue
+            pending = self.prepare(item)
+            del item    # the raw message is not needed anymore
+            if pending:
+                if not self.batch:
+                    deadline = monotonic() + settings.IMAP_WRITE_BATCH_DELAY
+                self.batch.append(pending)
+            if len(self.batch) >= settings.IMAP_WRITE_BATCH_SIZE or \
+                    self.batch and monotonic() >= deadline:
+                self.flush()
+            if not self.batch:
+                connection.close()
+
+    def prepare(self, item: tuple) -> Optional[PendingEmail]:
+        """
+        Parse the email and make the CrmEmail object.
+        Returns None if the email is done with.
+        """
+        raw_content = ea = t = uid = ''
+        try:
+            b_msg, ea, t, uid, ticket, request = item
+            email_message = parse_message(b_msg)
+            del b_msg
+            uid_data = get_uid_data(ea)
+            if received_from_crm(email_message):
+                if request:
+                    messages.error(
+                        request,
+                        "ERROR: Trying to import an email sent from CRM!"
                     )
-                    update_with_deal_and_request(crm_eml, ticket)
-                else:
-                    crm_eml = CrmEmail(inquiry=True, incoming=True)
-
-                crm_eml.creation_date = get_email_date(email_message)
-                crm_eml.content = html2txt(
-                    raw_content) if is_html else delete3enters(raw_content)
-                crm_eml.to = email_message['To']
-                crm_eml.cc = email_message['CC']
-                crm_eml.bcc = email_message['BCC']
-                crm_eml.subject = truncatechars(subj, 220)   # 250 - 30
-                crm_eml.from_field = parseaddr(email_message['From'])[1]
-                crm_eml.uid = int(uid)
-                crm_eml.imap_host = ea.imap_host
-                crm_eml.email_host_user = ea.email_host_user
-                crm_eml.owner = ea.owner
-                crm_eml.department = ea.department
-                crm_eml.is_html = False
-                if email_message['Message-ID'] is not None:
-                    crm_eml.message_id = email_message['Message-ID']
-                if eml_already_exists(email_message, uid):
-                    continue
-                try:
-                    self.crm_eml_save(crm_eml, t, uid_data, uid, ea, email_message)
-                    self.eml_queue.task_done()
-                except IntegrityError as e:
-                    raise e
-                except Exception as e:
-                    if f'{e}'.count('Incorrect string value:'):
-                        if f'{e}'.count('content'):
-                            crm_eml.content = '--- ERROR importing content of the email ---'
-                        elif f'{e}'.count('subject'):
-                            crm_eml.subject = '--- ERROR importing content of the email ---'
-                        self.crm_eml_save(crm_eml, t, uid_data, uid, ea, email_message)
-                    raise e
+                elif int(uid) > getattr(ea, uid_data[t]['start_uid']):
+                    return PendingEmail(None, ea, t, uid_data, uid)
+                self.eml_queue.task_done()
+                return None
 
-            except Exception as e:
-                mail_admins(
-                    EXCEPT_SUBJECT,
-                    f"""
-                    \nEmail account: {ea}
-                    \nEmail account: {ea.owner}
-                    \nException: {e}
-                    \nType: {t}
-                    \nUID: {uid}
-                    \nraw_content: {raw_content}
-                    """,
-                    fail_silently=True,
+            subj = ensure_decoding(email_message['Subject'])
+            richest = email_message.get_body(   # NOQA
+                preferencelist=('plain', 'html', 'related'))
+            if richest is None:
+                if email_message.is_multipart():
+                    raw_content, is_html, e = '', False, ''
+                else:
+                    raise RuntimeError("Unknown content")
+            else:
+                raw_content, is_html, e = get_raw_content(
+                    richest, ea, t, uid, subj)
+            if e:
+                self.eml_queue.task_done()
+                return None
+            if t != 'inquiry':
+                ticket = ticket or get_ticket((subj, raw_content))
+                if not ticket:
+                    return PendingEmail(None, ea, t, uid_data, uid)
+                crm_eml = CrmEmail(
+                    ticket=ticket,
+                    incoming=uid_data[t]['incoming'],
+                    sent=uid_data[t]['sent']
                 )
+                update_with_deal_and_request(crm_eml, ticket)
+            else:
+                crm_eml = CrmEmail(inquiry=True, incoming=True)
+
+            crm_eml.creation_date = get_email_date(email_message)
+            crm_eml.content = html2txt(
+                raw_content) if is_html else delete3enters(raw_content)
+            crm_eml.to = email_message['To']
+            crm_eml.cc = email_message['CC']
+            crm_eml.bcc = email_message['BCC']
+            crm_eml.subject = truncatechars(subj, 220)   # 250 - 30
+            crm_eml.from_field = parseaddr(email_message['From'])[1]
+            crm_eml.uid = int(uid)
+            crm_eml.imap_host = ea.imap_host
+            crm_eml.email_host_user = ea.email_host_user
+            crm_eml.owner = ea.owner
+            crm_eml.department = ea.department
+            crm_eml.is_html = False
+            if email_message['Message-ID'] is not None:
+                crm_eml.message_id = email_message['Message-ID']
+            if crm_eml.contact_id and not crm_eml.company_id:
+                crm_eml.company_id = crm_eml.contact.company_id
+            if eml_already_exists(email_message, uid) or \
+                    self.in_batch(crm_eml):
                 self.eml_queue.task_done()
+                return None
+            return PendingEmail(
+                crm_eml, ea, t, uid_data, uid,
+                get_attachments(email_message), email_message['From']
+            )
 
-            connection.close()
+        except Exception as e:
+            self.report(e, ea, t, uid, raw_content)
+            self.eml_queue.task_done()
+
+    def flush(self) -> None:
+        """Save the collected emails."""
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        try:
+            try:
+                notices = self.save_batch(batch)
+            except Exception:   # NOQA
+                # Keep the per email failure semantics
+                for pending in batch:
+                    self.save_one(pending)
+            else:
+                for pending in batch:
+                    if pending.crm_eml:
+                        self.after_save(pending, notices.get(id(pending.crm_eml)))
+        finally:
+            for pending in batch:
+                for attachment in pending.attachments:
+                    attachment[1].close()
+                self.eml_queue.task_done()
+
+    def save_batch(self, batch: list) -> dict:
+        """
+        Save the batch in one transaction.
+        Returns notices for the deal workflow {id(crm_eml): str}.
+        """
+        emails = [p.crm_eml for p in batch if p.crm_eml]
+        stored = []
+        try:
+            with transaction.atomic():
+                if connection.features.can_return_rows_from_bulk_insert:
+                    CrmEmail.objects.bulk_create(emails)
+                else:
+                    for crm_eml in emails:
+                        crm_eml.save()
+                # the counterparty name is looked up by the saved email
+                notices = {
+                    id(p.crm_eml): get_workflow_notice(p.crm_eml, p.t)
+                    for p in batch if p.crm_eml and p.crm_eml.ticket
+                }
+                files = []
+                for pending in batch:
+                    for filename, f in pending.attachments:
+                        the_file = TheFile(content_object=pending.crm_eml)
+                        the_file.file = store_file(the_file, filename, f)
+                        stored.append(the_file.file)
+                        files.append(the_file)
+                TheFile.objects.bulk_create(files)
+                # Advance start uid once per email account and box
+                last_uids = {}
+                for pending in batch:
+                    if pending.t != 'inquiry':
+                        last_uids[(pending.ea.pk, pending.t)] = pending
+                for p in last_uids.values():
+                    update_ea(p.ea, p.uid_data, p.t, p.uid)
+                # Merge the workflow prepends per deal
+                workflows = {}
+                for crm_eml in emails:
+                    if id(crm_eml) in notices:
+                        workflows[crm_eml.ticket] = \
+                            notices[id(crm_eml)][0] + workflows.get(crm_eml.ticket, '')
+                for ticket, msg_str in workflows.items():
+                    update_deal_workflow(ticket, msg_str)
+        except Exception:
+            for crm_eml in emails:
+                crm_eml.pk = None
+                crm_eml._state.adding = True    # NOQA
+            for file in stored:
+                file.storage.delete(file.name)
+            raise
+        if connection.features.can_return_rows_from_bulk_insert:
+            index_emails(emails)
+        return notices
 
-    def crm_eml_save(self, crm_eml: CrmEmail, t: str, uid_data: dict, uid: str,
-                     ea: EmailAccount, email_message: email.message.Message) -> None:
+    def save_one(self, pending: PendingEmail) -> None:
+        crm_eml, ea, t, uid_data, uid = pending[:5]
+        try:
+            if not crm_eml:
+                update_ea(ea, uid_data, t, uid)
+                return
+            try:
+                self.crm_eml_save(pending)
+            except IntegrityError as e:
+                raise e
+            except Exception as e:
+                if f'{e}'.count('Incorrect string value:'):
+                    if f'{e}'.count('content'):
+                        crm_eml.content = '--- ERROR importing content of the email ---'
+                    elif f'{e}'.count('subject'):
+                        crm_eml.subject = '--- ERROR importing content of the email ---'
+                    self.crm_eml_save(pending)
+                raise e
+        except Exception as e:
+            self.report(e, ea, t, uid, crm_eml.content if crm_eml else '')
+
+    def crm_eml_save(self, pending: PendingEmail) -> None:
+        crm_eml, ea, t, uid_data, uid, attachments = pending[:6]
         with transaction.atomic():
             crm_eml.save()
             if t != 'inquiry':
                 update_ea(ea, uid_data, t, uid)
-        attach_files(email_message, crm_eml)
-        if t == 'inquiry':
-            self.inq_eml_queue.put((crm_eml, email_message['From'], ea))
+        for filename, f in attachments:
+            the_file = TheFile(content_object=crm_eml)
+            the_file.save()
+            attached_file = getattr(the_file, 'file')
+            attached_file.save(filename, File(f))
+        notice = None
         if crm_eml.ticket:
-            f_date = get_formatted_short_date()
-            if t in ('incoming', 'inquiry'):
-                from_name = get_counterparty_name(crm_eml)
-                msg = get_trans_for_user(
-                    received_email_from_str, crm_eml.owner)
-                formated_msg = msg % from_name
-                if t == 'incoming':
-                    _notify_user(crm_eml, formated_msg)
-
-            elif t == 'sent':
-                to_name = get_counterparty_name(crm_eml)
-                msg = get_trans_for_user(
-                    EMAIL_SENT_TO_str, crm_eml.owner)
-                formated_msg = msg % to_name
-
-            msg_str = f"{f_date} - {formated_msg}\n"
-            Deal.objects.filter(ticket=crm_eml.ticket).update(
-                workflow=Concat(Value(msg_str), F('workflow'),  output_field=TextField())
-            )
+            notice = get_workflow_notice(crm_eml, t)
+            update_deal_workflow(crm_eml.ticket, notice[0])
+        self.after_save(pending, notice)
+
+    def after_save(self, pending: PendingEmail, notice: Optional[tuple]) -> None:
+        try:
+            if pending.t == 'inquiry':
+                self.inq_eml_queue.put((pending.crm_eml, pending.frm, pending.ea))
+            if notice and pending.t == 'incoming':
+                _notify_user(pending.crm_eml, notice[1])
+        except Exception as e:
+            self.report(e, pending.ea, pending.t, pending.uid,
+                        pending.crm_eml.content)
+
+    def in_batch(self, crm_eml: CrmEmail) -> bool:
+        if not crm_eml.message_id:
+            return False
+        return any(
+            p.crm_eml and p.crm_eml.message_id == crm_eml.message_id
+            for p in self.batch
+        )
+
+    @staticmethod
+    def report(e: Exception, ea, t: str, uid, raw_content: str) -> None:
+        mail_admins(
+            EXCEPT_SUBJECT,
+            f"""
+            \nEmail account: {ea}
+            \nEmail account: {getattr(ea, 'owner', '')}
+            \nException: {e}
+            \nType: {t}
+            \nUID: {uid}
+            \nraw_content: {raw_content}
+            """,
+            fail_silently=True,
+        )
+
+
+def get_workflow_notice(crm_eml: CrmEmail, t: str) -> tuple:
+    """Returns the deal workflow entry and the message for the owner."""
+    f_date = get_formatted_short_date()
+    if t in ('incoming', 'inquiry'):
+        from_name = get_counterparty_name(crm_eml)
+        msg = get_trans_for_user(
+            received_email_from_str, crm_eml.owner)
+        formated_msg = msg % from_name
+    else:
+        to_name = get_counterparty_name(crm_eml)
+        msg = get_trans_for_user(
+            EMAIL_SENT_TO_str, crm_eml.owner)
+        formated_msg = msg % to_name
+    return f"{f_date} - {formated_msg}\n", formated_msg
+
+
+def update_deal_workflow(ticket: str, msg_str: str) -> None:
+    Deal.objects.filter(ticket=ticket).update(
+        workflow=Concat(Value(msg_str), F('workflow'),  output_field=TextField())
+    )
+
+
+def store_file(the_file: TheFile, filename: str, f) -> str:
+    """Write the file to the storage without saving the_file."""
+    field = the_file.file.field
+    name = field.generate_filename(the_file, filename)
+    return field.storage.save(name, File(f), max_length=field.max_length)
 
 
 def _notify_user(crm_eml: CrmEmail, msg: str) -> None:
@@ -250,7 +422,12 @@ def get_raw_content(richest, ea: EmailAccount, t: str, uid: str, subj: str):
     return raw_content, is_html, err
 
 
-def attach_files(email_message: email.message.Message, crm_eml: CrmEmail) -> None:
+def get_attachments(email_message: email.message.Message) -> list:
+    """
+    Returns [(filename, file)] of the attachments.
+    Their payloads are spooled to temporary files and released.
+    """
+    attachments = []
     if email_message.is_multipart():
         for part in email_message.walk():
             if part.get_content_maintype() == 'multipart':
@@ -260,13 +437,8 @@ def attach_files(email_message: email.message.Message, crm_eml: CrmEmail) -> Non
             filename = part.get_filename()
             if filename and part.get_content_disposition() == 'attachment':
                 filename = ensure_decoding(filename)
-                f = io.BytesIO(part.get_payload(decode=True))
-                memory_file = File(f)
-                the_file = TheFile(content_object=crm_eml)
-                the_file.save()
-                attached_file = getattr(the_file, 'file')
-                attached_file.save(filename, memory_file)
-                f.close()
+                attachments.append((filename, spool_payload(part)))
+    return attachments
 
 
 def eml_already_exists(email_message, uid) -> bool:
@@ -308,3 +480,13 @@ def update_with_deal_and_request(crm_eml: CrmEmail, ticket: str) -> None:
             crm_eml.company = request.company
         except Request.DoesNotExist:
             return
+
+
+def index_emails(emails: list) -> None:
+    """
+    Update the search documents and the site cache of the emails
+    saved with bulk_create, which sends no post_save signals.
+    """
+    if get_search_backend() is not None:
+        index_objects(CrmEmail, [e.pk for e in emails])
+    invalidate('crm.crmemail')
@@ -0,0 +1,282 @@
+import re
+from functools import lru_cache
+from functools import partial
+from itertools import islice
+from typing import Iterable
+from typing import Optional
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db import transaction
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.db.models.query import QuerySet
+from django.utils.module_loading import import_string
+from django.utils.text import smart_split
+from django.utils.text import unescape_string_literal
+
+from crm.models import SearchDocument
+from crm.models.search_document import INDEXED_MODELS
+
+# The changelist search of the indexed models looks for the search terms
+# in one SearchDocument per object instead of scanning every field
+# of "search_fields" with LIKE '%term%'. The documents are updated
+# when the objects (or the related objects whose fields they contain)
+# are saved, and rebuilt by the "rebuild_search_index" command.
+# Saves that change none of the indexed fields do not update the documents.
+# The documents of the related objects are updated after the transaction
+# is committed.
+# The full-text index is created by the migration for the database vendor.
+
+VENDOR_BACKENDS = {
+    'mysql': 'crm.utils.search.MySQLBackend',
+    'postgresql': 'crm.utils.search.PostgreSQLBackend',
+    'sqlite': 'crm.utils.search.SQLiteBackend',
+}
+BATCH_SIZE = 1000
+_backends = {}
+
+
+class BaseBackend:
+    """Finds the documents with LIKE scans of the text (no full-text index)."""
+    # shorter terms are looked for with LIKE
+    min_term_length = 1
+
+    def search(self, queryset: QuerySet, search_term: str) -> QuerySet:
+        """Returns the objects whose documents contain all the search terms."""
+        terms = get_terms(search_term)
+        if not terms:
+            return queryset
+        documents = SearchDocument.objects.filter(
+            content_type=ContentType.objects.get_for_model(queryset.model)
+        )
+        indexed_terms = [t for t in terms if len(t) >= self.min_term_length]
+        if indexed_terms:
+            documents = self.match(documents, indexed_terms)
+        for term in terms:
+            if len(term) < self.min_term_length:
+                documents = documents.filter(text__icontains=term)
+        return queryset.filter(pk__in=documents.values('object_id'))
+
+    def match(self, documents: QuerySet, terms: list) -> QuerySet:
+        for term in terms:
+            documents = documents.filter(text__icontains=term)
+        return documents
+
+
+class MySQLBackend(BaseBackend):
+    """FULLTEXT index with the ngram parser. Phrases match substrings."""
+    min_term_length = 2     # ngram_token_size
+
+    def match(self, documents, terms):
+        query = ' '.join(f'+"{t.replace(chr(34), " ")}"' for t in terms)
+        return documents.filter(RawSQL(
+            "MATCH (text) AGAINST (%s IN BOOLEAN MODE)",
+            (query,), output_field=BooleanField()
+        ))
+
+
+class PostgreSQLBackend(BaseBackend):
+    """GIN index of tsvector. Terms match the beginnings of words."""
+
+    def match(self, documents, terms):
+        words = [w for t in terms for w in smart_words(t)]
+        if not words:
+            return super().match(documents, terms)
+        query = ' & '.join(f"{w}:*" for w in words)
+        return documents.filter(RawSQL(
+            "to_tsvector('simple', text) @@ to_tsquery('simple', %s)",
+            (query,), output_field=BooleanField()
+        ))
+
+
+class SQLiteBackend(BaseBackend):
+    """FTS5 table with the trigram tokenizer. Terms match substrings."""
+    min_term_length = 3
+
+    def match(self, documents, terms):
+        if 'crm_searchdocument_fts' not in get_table_names():
+            return super().match(documents, terms)
+        query = ' AND '.join(f'"{t.replace(chr(34), chr(34) * 2)}"' for t in terms)
+        return documents.filter(RawSQL(
+            "id IN (SELECT rowid FROM crm_searchdocument_fts "
+            "WHERE crm_searchdocument_fts MATCH %s)",
+            (query,), output_field=BooleanField()
+        ))
+
+
+def get_search_backend() -> Optional[BaseBackend]:
+    """Returns the backend set by SEARCH_BACKEND or None if it is not used."""
+    path = settings.SEARCH_BACKEND
+    if not path:
+        return None
+    if path == 'auto':
+        path = VENDOR_BACKENDS.get(
+            connection.vendor, 'crm.utils.search.BaseBackend'
+        )
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends[path] = import_string(path)()
+    return backend
+
+
+def get_terms(search_term: str) -> list:
+    """Splits the search term like the admin site does."""
+    terms = []
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit and bit not in terms:
+            terms.append(bit)
+    return terms
+
+
+def smart_words(term: str) -> list:
+    return re.findall(r'\w+', term)
+
+
+@lru_cache(maxsize=None)
+def get_table_names() -> tuple:
+    return tuple(connection.introspection.table_names())
+
+
+@lru_cache(maxsize=None)
+def get_search_fields(model) -> tuple:
+    """Returns the search fields of the model changelist."""
+    from crm.site.crmadminsite import crm_site
+    model_admin = crm_site._registry[model]     # NOQA
+    return tuple(f.lstrip('^=@') for f in model_admin.search_fields)
+
+
+@lru_cache(maxsize=None)
+def get_dependents(model) -> tuple:
+    """
+    Returns (indexed model, lookup) pairs of the documents
+    that contain fields of the model objects.
+    """
+    dependents = []
+    for label in INDEXED_MODELS:
+        indexed_model = apps.get_model(label)
+        lookups = set()
+        for field in get_search_fields(indexed_model):
+            parts = field.split('__')[:-1]
+            related_model = indexed_model
+            for i, part in enumerate(parts):
+                related_model = related_model._meta.get_field(part).related_model
+                if related_model is model:
+                    lookups.add('__'.join(parts[:i + 1]))
+        dependents.extend((indexed_model, lookup) for lookup in sorted(lookups))
+    return tuple(dependents)
+
+
+@lru_cache(maxsize=None)
+def get_indexed_fields(model) -> tuple:
+    """
+    Returns the fields of the model whose values are contained in
+    the documents of its objects or of the objects depending on them.
+    """
+    names = set()
+    if model._meta.label in INDEXED_MODELS:
+        names.update(f.split('__')[0] for f in get_search_fields(model))
+    for label in INDEXED_MODELS:
+        indexed_model = apps.get_model(label)
+        for field in get_search_fields(indexed_model):
+            parts = field.split('__')
+            related_model = indexed_model
+            for i, part in enumerate(parts[:-1]):
+                related_model = related_model._meta.get_field(part).related_model
+                if related_model is model:
+                    names.add(parts[i + 1])
+    return tuple(model._meta.get_field(name) for name in sorted(names))
+
+
+def get_indexed_values(model, instance) -> tuple:
+    return tuple(getattr(instance, f.attname) for f in get_indexed_fields(model))
+
+
+def remember_indexed_values(model, instance, update_fields=None) -> None:
+    """Keeps the saved values of the indexed fields of the object to be saved."""
+    instance._indexed_values = None
+    if get_search_backend() is None or instance._state.adding \
+            or update_fields is not None:
+        return
+    instance._indexed_values = model._default_manager.filter(
+        pk=instance.pk
+    ).values_list(*(f.attname for f in get_indexed_fields(model))).first()
+
+
+def is_changed(model, instance, update_fields=None) -> bool:
+    """Whether the save of the object changed any of its indexed fields."""
+    if update_fields is not None:
+        return any(
+            f.name in update_fields or f.attname in update_fields
+            for f in get_indexed_fields(model)
+        )
+    saved = getattr(instance, '_indexed_values', None)
+    return saved is None or saved != get_indexed_values(model, instance)
+
+
+def index_objects(model, ids: Iterable) -> int:
+    """
+    Updates the documents of the objects.
+    The documents of deleted objects are deleted.
+    """
+    ids = list(ids)
+    texts = {}
+    rows = model._default_manager.filter(pk__in=ids).values_list(
+        'pk', *get_search_fields(model)
+    )
+    for pk, *values in rows:
+        parts = texts.setdefault(pk, [])
+        parts.extend(str(v) for v in values if v not in (None, ''))
+    content_type = ContentType.objects.get_for_model(model)
+    with transaction.atomic():
+        SearchDocument.objects.filter(
+            content_type=content_type, object_id__in=ids
+        ).delete()
+        SearchDocument.objects.bulk_create([
+            SearchDocument(
+                content_type=content_type, object_id=pk,
+                text='\n'.join(dict.fromkeys(parts))
+            )
+            for pk, parts in texts.items()
+        ])
+    return len(texts)
+
+
+def index_queryset(queryset: QuerySet) -> int:
+    ids = queryset.values_list('pk', flat=True).order_by('pk').iterator()
+    number = 0
+    while batch := list(islice(ids, BATCH_SIZE)):
+        number += index_objects(queryset.model, batch)
+    return number
+
+
+def update_index(model, instance, update_fields=None, deleted=False) -> None:
+    """
+    Updates the documents that contain fields of the saved or deleted object.
+    The documents of the related objects are updated on commit.
+    """
+    if get_search_backend() is None:
+        return
+    if not deleted and not is_changed(model, instance, update_fields):
+        return
+    if model._meta.label in INDEXED_MODELS:
+        index_objects(model, [instance.pk])
+    if get_dependents(model):
+        transaction.on_commit(partial(index_dependents, model, instance.pk))
+
+
+def index_dependents(model, pk) -> None:
+    """Updates the documents of the objects depending on the object."""
+    for indexed_model, lookup in get_dependents(model):
+        index_queryset(indexed_model._default_manager.filter(**{lookup: pk}))
+
+
+def rebuild_index(model) -> int:
+    """Rebuilds the documents of all the model objects."""
+    SearchDocument.objects.filter(
+        content_type=ContentType.objects.get_for_model(model)
+    ).delete()
+    return index_queryset(model._default_manager.all())
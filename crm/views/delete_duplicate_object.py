@@ -1,4 +1,3 @@
-import re
 from django import forms
 from django.contrib.admin.widgets import ForeignKeyRawIdWidget
 from django.contrib.contenttypes.models import ContentType
@@ -19,7 +18,7 @@ from crm.models import Request
 from crm.models import CrmEmail
 from crm.models.country import City
 from crm.site.crmadminsite import crm_site
-from massmail.models import MailingOut
+from massmail.models import MailingRecipient
 from massmail.models import MassContact
 
 
@@ -93,16 +92,15 @@ class DeleteDuplicateObject(View):
             objects = model.objects.filter(**kwarg1)
             objects.update(**kwarg2)
 
-        # re_str string must be acceptable for MySQL and PostgreSQL
-        re_str = fr"^{self.duplicate_id},|,{self.duplicate_id},|,{self.duplicate_id}$"
-        mailing_outs = MailingOut.objects.filter(recipient_ids__regex=re_str)
-        for mo in mailing_outs:
-            ids = mo.recipient_ids
-            ids = re.sub(fr"^{self.duplicate_id},", f"{self.original_id},", ids)
-            ids = re.sub(fr",{self.duplicate_id},", f",{self.original_id},", ids)
-            ids = re.sub(fr",{self.duplicate_id}$", f",{self.original_id}", ids)
-            mo.recipient_ids = ids
-            mo.save()
+        recipients = MailingRecipient.objects.filter(
+            mailing_out__content_type=self.content_type,
+            object_id=self.duplicate_id
+        )
+        # the original is already among the recipients of these mailings
+        recipients.filter(
+            mailing_out__mailing_recipients__object_id=self.original_id
+        ).delete()
+        recipients.update(object_id=self.original_id)
 
         TheFile.objects.filter(
             content_type=self.content_type,
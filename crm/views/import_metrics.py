@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import JsonResponse
+
+from crm.utils.imap_lease import lease_metrics
+
+
+def import_metrics(request: WSGIRequest) -> JsonResponse:
+    """
+    Returns queue wait and duration (in seconds) of email imports
+    per email account in the current process,
+    the state of IDLE connections and CrmIMAP lease contention.
+    """
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    app_config = apps.get_app_config('crm')
+    return JsonResponse({
+        'workers': len(app_config.im.workers),
+        'queued': app_config.im.ea_queue.qsize(),
+        'accounts': app_config.im.metrics.as_dict(),
+        'idle': app_config.idle.get_state() if app_config.idle else None,
+        'leases': lease_metrics.as_dict(),
+    })
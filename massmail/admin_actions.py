@@ -13,6 +13,7 @@ from django.utils.translation import gettext_lazy as _
 from common.utils.helpers import FRIDAY_SATURDAY_SUNDAY_MSG
 from massmail.models import EmailAccount
 from massmail.models import MailingOut
+from massmail.models import MailingRecipient
 from massmail.models import MassContact
 
 MULTIPLE_OWNERS_MSG = _("Please select recipients only with the same owner.")
@@ -47,9 +48,9 @@ def make_mailing_out(modeladmin, request, queryset):
         owner=request.user,
         modified_by=request.user,
         department_id=request.user.department_id,
-        recipient_ids=",".join([str(obj.id) for obj in queryset]),
         recipients_number=queryset.count()
     )
+    mailing_out.add_recipients(queryset.values_list('id', flat=True))
     messages.info(request, _(FRIDAY_SATURDAY_SUNDAY_MSG))
     return HttpResponseRedirect(
         reverse(
@@ -65,19 +66,24 @@ def merge_mailing_outs(modeladmin, request, queryset):
             multiple_content_types(request, queryset),
             multiple_messages(request, queryset))):
         return HttpResponseRedirect(request.path)
-    recipient_ids, successful_ids, failed_ids = [], [], []
     report, recipients_number = '', 0
     for mo in queryset:
-        r_ids = mo.get_recipient_ids()
-        recipient_ids.extend(r_ids)
-        s_ids = mo.get_successful_ids()
-        successful_ids.extend(s_ids)
-        f_ids = mo.get_failed_ids()
-        failed_ids.extend(f_ids)
         recipients_number += mo.recipients_number
         if mo.report:
             report += f"\n\n<+>\n\n{mo.report}\n\n"
-    recipient_ids = list(set(recipient_ids))
+    # a recipient still pending in any of the mailings stays pending
+    priority = {
+        MailingRecipient.SUCCESSFUL: 0,
+        MailingRecipient.FAILED: 1,
+        MailingRecipient.PENDING: 2,
+    }
+    statuses = {}
+    recipients = MailingRecipient.objects.filter(
+        mailing_out__in=queryset
+    ).values_list('object_id', 'status')
+    for object_id, status in recipients.iterator():
+        if priority[status] >= priority[statuses.get(object_id, status)]:
+            statuses[object_id] = status
     m_o = queryset.first()
     united = _("united")
     name = m_o.name + f' ({united})'
@@ -87,12 +93,14 @@ def merge_mailing_outs(modeladmin, request, queryset):
         name = truncatechars(m_o.name, 100 - delta) + f' ({_("united")})'
     m_o.id = None
     m_o.name = name
-    m_o.recipient_ids = ",".join([str(x) for x in recipient_ids])
-    m_o.successful_ids = ",".join([str(x) for x in successful_ids])
-    m_o.failed_ids = ",".join([str(x) for x in failed_ids])
     m_o.recipients_number = recipients_number
     m_o.report = report
     m_o.save()
+    for status in priority:
+        m_o.add_recipients(
+            [r_id for r_id, s in statuses.items() if s == status],
+            status
+        )
     messages.success(
         request,
         f' {queryset.count()} mailing outs have been merged.'
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+# status: the source field, a recipient listed in several fields
+# gets the status of the first one
+FIELDS = (
+    ('P', 'recipient_ids'),
+    ('F', 'failed_ids'),
+    ('S', 'successful_ids'),
+)
+
+
+def get_ids(field: str) -> list:
+    return [int(r_id) for r_id in field.split(',') if r_id.strip()]
+
+
+def convert_ids(apps, schema_editor):
+    MailingOut = apps.get_model('massmail', 'MailingOut')
+    MailingRecipient = apps.get_model('massmail', 'MailingRecipient')
+    mailing_outs = MailingOut.objects.only(
+        'id', *(field for _status, field in FIELDS)
+    )
+    for mo in mailing_outs.iterator():
+        statuses = {}
+        for status, field in FIELDS:
+            for r_id in get_ids(getattr(mo, field)):
+                statuses.setdefault(r_id, status)
+        MailingRecipient.objects.bulk_create(
+            [
+                MailingRecipient(mailing_out_id=mo.id, object_id=r_id, status=status)
+                for r_id, status in statuses.items()
+            ],
+            batch_size=BATCH_SIZE
+        )
+
+
+def restore_ids(apps, schema_editor):
+    MailingOut = apps.get_model('massmail', 'MailingOut')
+    MailingRecipient = apps.get_model('massmail', 'MailingRecipient')
+    for mo in MailingOut.objects.only('id').iterator():
+        ids = {status: [] for status, _field in FIELDS}
+        recipients = MailingRecipient.objects.filter(
+            mailing_out_id=mo.id
+        ).order_by('id').values_list('object_id', 'status')
+        for r_id, status in recipients.iterator():
+            ids[status].append(str(r_id))
+        MailingOut.objects.filter(id=mo.id).update(**{
+            field: ','.join(ids[status]) for status, field in FIELDS
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('massmail', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingRecipient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(db_index=True)),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('S', 'Successful'), ('F', 'Failed')], default='P', max_length=1, verbose_name='Status')),
+                ('mailing_out', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mailing_recipients', to='massmail.mailingout')),
+            ],
+            options={
+                'verbose_name': 'Mailing recipient',
+                'verbose_name_plural': 'Mailing recipients',
+                'indexes': [models.Index(fields=['mailing_out', 'status'], name='mailing_recipient_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('mailing_out', 'object_id'), name='unique_mailing_recipient')],
+            },
+        ),
+        migrations.RunPython(convert_ids, restore_ids),
+        # allows to restore the field
+        migrations.AlterField(
+            model_name='mailingout',
+            name='recipient_ids',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RemoveField(
+            model_name='mailingout',
+            name='failed_ids',
+        ),
+        migrations.RemoveField(
+            model_name='mailingout',
+            name='recipient_ids',
+        ),
+        migrations.RemoveField(
+            model_name='mailingout',
+            name='successful_ids',
+        ),
+    ]
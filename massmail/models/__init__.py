@@ -1,6 +1,7 @@
 from .signature import Signature
 from .email_message import EmlMessage
 from .mailing_out import MailingOut
+from .mailing_recipient import MailingRecipient
 from .email_account import EmailAccount
 from .mass_contact import MassContact
 from .eml_accounts_queue import EmlAccountsQueue
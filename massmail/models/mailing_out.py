@@ -4,6 +4,7 @@ from django.utils.translation import gettext_lazy as _
 
 from common.models import Base1
 from massmail.models import EmlMessage
+from massmail.models.mailing_recipient import MailingRecipient
 
 
 class MailingOut(Base1):
@@ -44,9 +45,6 @@ class MailingOut(Base1):
         verbose_name=_("Recipients"),
         help_text=_("Number of recipients")
     )
-    recipient_ids = models.TextField()
-    successful_ids = models.TextField(blank=True, default='')
-    failed_ids = models.TextField(blank=True, default='')
 
     content_type = models.ForeignKey(
         ContentType, blank=True, null=True,
@@ -65,46 +63,66 @@ class MailingOut(Base1):
     today_count = models.PositiveIntegerField(default=0, blank=True)
     sending_date = models.DateField(blank=True, null=True)
 
+    def add_recipients(self, recipient_ids, status: str = MailingRecipient.PENDING):
+        """Add recipients. Those already added are ignored."""
+        MailingRecipient.objects.bulk_create(
+            [
+                MailingRecipient(
+                    mailing_out=self, object_id=r_id, status=status
+                ) for r_id in recipient_ids
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
     def get_successful_ids(self):
-        return self.get_ids(self.successful_ids)
+        return self.get_ids(MailingRecipient.SUCCESSFUL)
 
     def get_failed_ids(self):
-        return self.get_ids(self.failed_ids)
+        return self.get_ids(MailingRecipient.FAILED)
 
     def get_recipient_ids(self):
-        return self.get_ids(self.recipient_ids)
+        return self.get_ids(MailingRecipient.PENDING)
+
+    def get_ids(self, status: str) -> list:
+        return list(
+            self.mailing_recipients.filter(
+                status=status
+            ).order_by('id').values_list('object_id', flat=True)
+        )
+
+    def has_ids(self, status: str) -> bool:
+        return self.mailing_recipients.filter(status=status).exists()
+
+    def has_recipients(self) -> bool:
+        return self.has_ids(MailingRecipient.PENDING)
 
-    @staticmethod
-    def get_ids(field):
-        if field:
-            return [int(r_id) for r_id in field.split(',')]
-        return []
+    def has_successful(self) -> bool:
+        return self.has_ids(MailingRecipient.SUCCESSFUL)
+
+    def has_failed(self) -> bool:
+        return self.has_ids(MailingRecipient.FAILED)
 
     def remove_recipient_ids(self, recipient_id):
-        recipient_ids = self.get_recipient_ids()
-        recipient_ids.remove(recipient_id)
-        self.recipient_ids = ",".join(map(str, recipient_ids))
+        self.mailing_recipients.filter(object_id=recipient_id).delete()
+
+    def set_recipients_status(self, recipient_ids, status: str) -> int:
+        """Batch update of the recipients status."""
+        return self.mailing_recipients.filter(
+            object_id__in=recipient_ids
+        ).update(status=status)
 
     def move_to_successful_ids(self, recipient_id):
-        self.remove_recipient_ids(recipient_id)
-        successful_ids = self.get_successful_ids()
-        successful_ids.append(recipient_id)
-        self.successful_ids = ",".join(map(str, successful_ids))
-        self.save()
+        self.set_recipients_status([recipient_id], MailingRecipient.SUCCESSFUL)
 
     def move_to_failed_ids(self, recipient_id):
-        self.remove_recipient_ids(recipient_id)
-        failed_ids = self.get_failed_ids()
-        failed_ids.append(recipient_id)
-        self.failed_ids = ",".join(map(str, failed_ids))
+        self.set_recipients_status([recipient_id], MailingRecipient.FAILED)
         self.save()
 
     def move_to_recipient_ids(self):
-        recipient_ids = self.get_recipient_ids()
-        failed_ids = self.get_failed_ids()
-        recipient_ids.extend(failed_ids)
-        self.recipient_ids = ",".join(map(str, recipient_ids))
-        self.failed_ids = ''
+        self.mailing_recipients.filter(
+            status=MailingRecipient.FAILED
+        ).update(status=MailingRecipient.PENDING)
         self.save()
 
     def __str__(self):
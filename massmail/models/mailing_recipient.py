@@ -0,0 +1,45 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class MailingRecipient(models.Model):
+    """The sending state of one recipient of a mailing out."""
+
+    class Meta:
+        verbose_name = _('Mailing recipient')
+        verbose_name_plural = _('Mailing recipients')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mailing_out', 'object_id'],
+                name='unique_mailing_recipient'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['mailing_out', 'status'],
+                name='mailing_recipient_status_idx'
+            ),
+        ]
+
+    PENDING = 'P'
+    SUCCESSFUL = 'S'
+    FAILED = 'F'
+
+    STATUS_CHOICES = (
+        (PENDING, _('Pending')),
+        (SUCCESSFUL, _('Successful')),
+        (FAILED, _('Failed')),
+    )
+    mailing_out = models.ForeignKey(
+        'MailingOut', on_delete=models.CASCADE,
+        related_name='mailing_recipients'
+    )
+    # id of the recipient (mailing_out.content_type object)
+    object_id = models.PositiveIntegerField(db_index=True)
+    status = models.CharField(
+        max_length=1, choices=STATUS_CHOICES, default=PENDING,
+        verbose_name=_("Status"),
+    )
+
+    def __str__(self):
+        return f"{self.object_id} ({self.status})"
@@ -0,0 +1,7 @@
+
+# Massmail sending keeps one SMTP connection per email account open
+# during a sending cycle. The connection is renewed after
+# MASSMAIL_MESSAGES_PER_CONNECTION messages.
+MASSMAIL_MESSAGES_PER_CONNECTION = 100
+# Attempts to reconnect and resend a message if the server has disconnected
+MASSMAIL_RECONNECT_ATTEMPTS = 1
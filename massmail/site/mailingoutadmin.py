@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.conf import settings
 from django.contrib import messages
+from django.db.models import Count
+from django.db.models import Q
 from django.template.defaultfilters import linebreaksbr
 from django.urls import reverse
 from django.utils import timezone
@@ -14,6 +16,7 @@ from crm.site.crmmodeladmin import CrmModelAdmin
 from crm.utils.admfilters import ByOwnerFilter
 from massmail.admin_actions import merge_mailing_outs
 from massmail.models import EmailAccount
+from massmail.models import MailingRecipient
 from massmail.utils.adminfilters import StatusMailingFilter
 from massmail.utils.helpers import get_rendered_msg
 from settings.models import MassmailSettings
@@ -48,9 +51,7 @@ class MailingOutAdmin(CrmModelAdmin):
     )
     list_filter = (StatusMailingFilter, ByOwnerFilter)
     save_on_top = True
-    exclude = (
-        'recipient_ids', 'successful_ids', 'failed_ids', 'department',
-    )
+    exclude = ('department',)
     readonly_fields = (
         'recipients_number', 'owner', 'modified_by',
         'content_type', 'sent_today', 'display_preview',
@@ -63,6 +64,15 @@ class MailingOutAdmin(CrmModelAdmin):
 
     # -- ModelAdmin methods -- #
 
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.annotate(
+            pending_number=Count(
+                'mailing_recipients',
+                filter=Q(mailing_recipients__status=MailingRecipient.PENDING)
+            )
+        )
+
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
         now = timezone.localtime(timezone.now())
@@ -166,7 +176,7 @@ class MailingOutAdmin(CrmModelAdmin):
     def exclude_recipients(self, obj):
         from django.urls import reverse
         url = '#'
-        if obj.recipient_ids:
+        if obj.has_recipients():
             url = reverse(
                 'exclude_recipients', args=(obj.id,)
             )
@@ -210,8 +220,7 @@ class MailingOutAdmin(CrmModelAdmin):
     @staticmethod
     @admin.display(description=progress_safe_str)
     def progress(instance):
-        rt_ids = instance.get_recipient_ids()
-        tn = len(rt_ids)
+        tn = instance.pending_number
         rn = instance.recipients_number
         if rn == 0:
             return '0 %'
@@ -1,3 +1,5 @@
+import threading
+from collections import OrderedDict
 from typing import Union
 from django.conf import settings
 from django.core.handlers.wsgi import WSGIRequest
@@ -17,6 +19,11 @@ from massmail.models.email_account import EmailAccount
 
 prev_corr_blockquote = '<blockquote style="padding-left:1ex; border-left:#ccc 1px' \
                 ' solid; margin:0px 0px 0px 0.8ex">{}</blockquote>'
+TEMPLATE_CACHE_SIZE = 256
+# Compiled templates of messages
+# {(model label, pk): (version, subject template, body template)}
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
 
 
 def email_creator(eml_message: Union[CrmEmail, EmlMessage],
@@ -27,21 +34,14 @@ def email_creator(eml_message: Union[CrmEmail, EmlMessage],
                   ) -> Union[EmailMultiAlternatives, EmailMessage]:
     extra_context = extra_context or {}
     extra_context = Context(extra_context)
-    tmpl = Template(eml_message.subject)
-    subject = tmpl.render(extra_context)
-    signature = eml_message.signature.content if eml_message.signature else ''
-    tmpl = Template(
-        "{% load mailbuilder %}"
-        + linebreaks(eml_message.content)
-        + "<p> </p>"
-        + signature
-        + "<p> </p>" + "<p> </p>"
-        + "<p>-----------------</p>"
-        + prev_corr_blockquote.format(linebreaks(eml_message.prev_corr))
-    )
+    subject_tmpl, tmpl, text_tmpl = get_templates(eml_message)
+    subject = subject_tmpl.render(extra_context)
+    with extra_context.push():
+        # Embedded images are attached by the html template only
+        body = text_tmpl.render(extra_context)
     # extra_context.bind_template(tmpl)    # it doesn't work
     html_content = tmpl.render(extra_context)
-    data = _get_data(html_content, to, email_account, subject)
+    data = _get_data(html_content, to, email_account, subject, body)
     if cc:
         data['cc'] = cc
     if bcc:
@@ -77,8 +77,52 @@ def create_test_email(request: WSGIRequest, message_id: int,
              inline_images, extra_context, eml_message)
 
 
-def _get_data(html_content, to, email_account, subject) -> dict:
-    body = strip_tags(html_content)
+def get_templates(eml_message: Union[CrmEmail, EmlMessage]) -> tuple:
+    """
+    Returns compiled subject, html body and text body templates of the message.
+    They are cached by the message id and update date
+    (and the signature id and update date).
+    """
+    if eml_message.pk is None:
+        return _compile_templates(eml_message)
+    key = (eml_message._meta.label, eml_message.pk)
+    signature = eml_message.signature
+    version = (
+        eml_message.update_date,
+        signature.pk if signature else None,
+        signature.update_date if signature else None
+    )
+    with _templates_lock:
+        item = _templates.get(key)
+        if item and item[0] == version:
+            _templates.move_to_end(key)
+            return item[1:]
+    templates = _compile_templates(eml_message)
+    with _templates_lock:
+        _templates[key] = (version, *templates)
+        _templates.move_to_end(key)
+        while len(_templates) > TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return templates
+
+
+def _compile_templates(eml_message: Union[CrmEmail, EmlMessage]) -> tuple:
+    signature = eml_message.signature.content if eml_message.signature else ''
+    source = (
+        "{% load mailbuilder %}"
+        + linebreaks(eml_message.content)
+        + "<p> </p>"
+        + signature
+        + "<p> </p>" + "<p> </p>"
+        + "<p>-----------------</p>"
+        + prev_corr_blockquote.format(linebreaks(eml_message.prev_corr))
+    )
+    return Template(eml_message.subject), Template(source), Template(strip_tags(source))
+
+
+def _get_data(html_content, to, email_account, subject, body=None) -> dict:
+    if body is None:
+        body = strip_tags(html_content)
     return {
         'to': to,
         'from_email': email_account.from_email,
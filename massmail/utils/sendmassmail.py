@@ -36,9 +36,26 @@ from massmail.models import EmlAccountsQueue
 from massmail.models import MailingOut
 from massmail.models import MassContact
 from massmail.utils.email_creators import email_creator
+from massmail.utils.smtp_pool import SmtpPool
 from settings.models import MassmailSettings
 
 USER_MODEL = get_user_model()
+# Recipient fields for the message context. The first one is the address.
+RECIPIENT_FIELDS = {
+    Contact: [
+        'email', 'first_name', 'first_middle_name',
+        'last_name', 'full_name',
+        'title', 'company'
+    ],
+    Company: [
+        'email', 'full_name'
+    ],
+    Lead: [
+        'email', 'first_name', 'first_middle_name',
+        'last_name', 'full_name',
+        'title', 'company_name'
+    ]
+}
 
 class SendMassmail(threading.Thread, SingleInstance):
 
@@ -49,6 +66,7 @@ class SendMassmail(threading.Thread, SingleInstance):
             SingleInstance.__init__(self, flavor_id='Massmail_test')
         else:
             SingleInstance.__init__(self, flavor_id='Massmail')
+        self.smtp_pool = SmtpPool()
 
     def run(self):
         while not apps.ready:
@@ -72,11 +90,17 @@ class SendMassmail(threading.Thread, SingleInstance):
                     connection.close()
                     time.sleep(s + random.randint(120, 300))
 
-            send_massmail(massmail_settings)
+            send_massmail(massmail_settings, self.smtp_pool)
             time.sleep(30)
 
 
-def send_massmail(massmail_settings: MassmailSettings) -> None:
+def send_massmail(massmail_settings: MassmailSettings,
+                  smtp_pool: Optional[SmtpPool] = None) -> None:
+    """
+    Send a message of each active mailing from each email account.
+    SMTP connections are kept open until the end of the cycle.
+    """
+    smtp_pool = smtp_pool or SmtpPool()
     try:
         mailing_outs = MailingOut.objects.filter(
             status__in=['A', 'E']
@@ -124,9 +148,10 @@ def send_massmail(massmail_settings: MassmailSettings) -> None:
                         force_multipart=True, inline_images=True
                     )
                     if settings.MAILING or not settings.MAILING and settings.TESTING:
-                        msg.send(fail_silently=False)
+                        smtp_pool.send(ea, msg)
                     mailing_out.move_to_successful_ids(mc.object_id)
                 except (SMTPAuthenticationError, SMTPSenderRefused) as e:
+                    smtp_pool.close(ea)
                     off = True
                     report(ea, mailing_out, mc, now, e, off)
                     continue
@@ -155,6 +180,8 @@ def send_massmail(massmail_settings: MassmailSettings) -> None:
             \nException:____{err}
             ''',
         )
+    finally:
+        smtp_pool.close_all()
 
 
 def check_owners(mailing_outs) -> list:
@@ -291,30 +318,14 @@ def report(
 
 
 def get_extra_context(mc: MassContact) -> dict:
-    data = {
-        ContentType.objects.get_for_model(Contact): [
-            'email', 'first_name', 'first_middle_name',
-            'last_name', 'full_name',
-            'title', 'company'
-        ],
-        ContentType.objects.get_for_model(Company): [
-            'email', 'full_name'
-        ],
-        ContentType.objects.get_for_model(Lead): [
-            'email', 'first_name', 'first_middle_name',
-            'last_name', 'full_name',
-            'title', 'company_name'
-        ]
-    }
+    model = ContentType.objects.get_for_id(mc.content_type_id).model_class()
     url = reverse(
             'unsubscribe', args=[mc.uuid]
     )
     extra_context = {
-        'unsubscribe_url': Site.objects.get(
-            pk=settings.SITE_ID
-        ).domain + url
+        'unsubscribe_url': Site.objects.get_current().domain + url
     }
-    fields = data[mc.content_type].copy()
+    fields = RECIPIENT_FIELDS[model].copy()
     field = fields.pop(0)
     extra_context['to'] = getattr(mc.content_object, field)
     for field in fields:
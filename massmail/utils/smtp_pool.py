@@ -0,0 +1,97 @@
+import threading
+from smtplib import SMTPException
+from smtplib import SMTPServerDisconnected
+from time import perf_counter
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from massmail.models import EmailAccount
+from massmail.utils.email_creators import email_connection
+
+
+class SmtpPool:
+    """
+    Keeps one open SMTP connection per email account during a sending cycle.
+    The connection is renewed after MASSMAIL_MESSAGES_PER_CONNECTION messages
+    and when the server disconnects.
+    Handshake (connect, TLS, login) and send times are recorded in seconds.
+    """
+
+    def __init__(self):
+        self.connections = {}   # ea.pk: [connection, number of sent messages]
+        self.stats = {}         # email_host_user: dict
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close_all()
+
+    def close(self, ea: EmailAccount) -> None:
+        item = self.connections.pop(ea.pk, None)
+        if item:
+            _close(item[0])
+
+    def close_all(self) -> None:
+        for item in self.connections.values():
+            _close(item[0])
+        self.connections.clear()
+
+    def get_connection(self, ea: EmailAccount):
+        """Return an open connection of the email account."""
+        item = self.connections.get(ea.pk)
+        if item and item[1] >= settings.MASSMAIL_MESSAGES_PER_CONNECTION:
+            self.close(ea)
+            item = None
+        if not item:
+            connection = email_connection(ea)
+            start = perf_counter()
+            connection.open()
+            self._add_stat(ea, 'handshakes', 'handshake_time', start)
+            item = self.connections[ea.pk] = [connection, 0]
+        return item[0]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {k: dict(v) for k, v in self.stats.items()}
+
+    def send(self, ea: EmailAccount, msg: EmailMessage) -> None:
+        """
+        Send the message through the connection of the email account.
+        Reconnect and resend if the server has disconnected.
+        """
+        attempts = settings.MASSMAIL_RECONNECT_ATTEMPTS
+        while True:
+            msg.connection = self.get_connection(ea)
+            start = perf_counter()
+            try:
+                msg.send(fail_silently=False)
+            except SMTPServerDisconnected:
+                self.close(ea)
+                if attempts <= 0:
+                    raise
+                attempts -= 1
+                self._add_stat(ea, 'reconnects')
+                continue
+            self._add_stat(ea, 'messages', 'send_time', start)
+            self.connections[ea.pk][1] += 1
+            return
+
+    def _add_stat(self, ea: EmailAccount, counter: str,
+                  timer: str = '', start: float = 0) -> None:
+        with self.lock:
+            item = self.stats.setdefault(ea.email_host_user, {
+                'handshakes': 0, 'handshake_time': 0,
+                'messages': 0, 'send_time': 0, 'reconnects': 0,
+            })
+            item[counter] += 1
+            if timer:
+                item[timer] += perf_counter() - start
+
+
+def _close(connection) -> None:
+    try:
+        connection.close()
+    except (SMTPException, OSError):
+        pass
@@ -0,0 +1,197 @@
+from decimal import Decimal
+from io import StringIO
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import Group
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from analytics.models import IncomeStatSnapshot
+from analytics.utils.helpers import get_months_items
+from analytics.utils.helpers import get_rolling_totals
+from analytics.utils.income_snapshots import dump_data
+from analytics.utils.income_snapshots import load_data
+from analytics.utils.income_snapshots import save_income_snapshots
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Output
+from crm.models import Payment
+from crm.models import Product
+from crm.models import Stage
+from tests.base_test_classes import BaseTestCase
+from tests.utils.helpers import get_country_instance
+
+# manage.py test tests.analytics.test_income_stat --noinput
+
+
+class TestIncomeStat(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        cls.country = get_country_instance()
+        cls.stage = Stage.objects.filter(department_id=cls.department_id).first()
+        cls.currency = Currency.objects.first()
+        cls.product = Product.objects.create(name='Product')
+        cls.counter = 0
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.url = reverse('site:analytics_incomestat_changelist')
+        self.client.force_login(self.owner)
+
+    def test_rolling_totals(self):
+        month = get_today().replace(day=1)
+        monthly = {month + relativedelta(months=-i): Decimal(i + 1) for i in range(24)}
+        items = get_months_items(monthly, month + relativedelta(months=-12))
+        self.assertEqual(len(items), 12)
+        self.assertEqual(items[-1]['period'], month)
+        totals = get_rolling_totals(monthly, items)
+        self.assertEqual(totals[-1]['total'], sum(range(1, 13)))
+        self.assertEqual(totals[0]['total'], sum(range(12, 24)))
+
+    def test_changelist_queries(self):
+        self.create_deals(2)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200, response.reason_phrase)
+        self.assertNotContains(response, 'name="snapshot"')
+
+        self.create_deals(3)
+        with self.assertNumQueries(len(ctx.captured_queries)):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200, response.reason_phrase)
+
+    def test_save_snapshot(self):
+        self.create_deals(1)
+        next_url = f'http://testserver{self.url}?owner=all'
+        response = self.client.post(
+            reverse('site:save_snapshot'),
+            {'username': 'all', 'next': next_url}
+        )
+        self.assertRedirects(response, next_url, fetch_redirect_response=False)
+        snapshot = IncomeStatSnapshot.objects.get()
+        self.assertEqual(snapshot.webpage, '')
+        data = load_data(snapshot.data)
+        self.assertEqual(len(data['income']), 24)
+        self.assertEqual(
+            [
+                (row['name'], row['products'])
+                for row in data['expected'][Payment.GUARANTEED]
+            ],
+            [(f'Company {self.counter}, {self.country}',
+              f'Product - {self.counter}pcs')]
+        )
+        response = self.client.get(
+            reverse('site:snapshot_view', args=(snapshot.id,))
+        )
+        self.assertEqual(response.status_code, 200, response.reason_phrase)
+        self.assertContains(response, f'Company {self.counter}')
+
+    def test_save_snapshot_of_invalid_page(self):
+        # the changelist redirects to "?e=1" for unknown filters
+        next_url = f'http://testserver{self.url}?owner=all&unknown=1'
+        response = self.client.post(
+            reverse('site:save_snapshot'),
+            {'username': 'all', 'next': next_url}
+        )
+        self.assertRedirects(response, next_url, fetch_redirect_response=False)
+        self.assertFalse(IncomeStatSnapshot.objects.exists())
+        messages = [m.level_tag for m in get_messages(response.wsgi_request)]
+        self.assertEqual(messages, ['error'])
+
+    def test_save_income_snapshots(self):
+        self.create_deals(2)
+        response = self.client.get(self.url + '?owner=all')
+        page_data = response.context_data['income_data']
+        departments = Group.objects.filter(id=self.department_id)
+        with CaptureQueriesContext(connection) as ctx:
+            snapshot, = save_income_snapshots(departments)
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+        data = load_data(snapshot.data)
+        self.assertEqual(data, load_data(dump_data(page_data)))
+        self.assertLess(len(snapshot.data), 2000)
+
+    def test_convert_snapshots(self):
+        self.create_deals(2)
+        deal = Deal.objects.get(name=f'Deal {self.counter}')
+        Payment.objects.create(
+            deal=deal, status=Payment.RECEIVED, amount=7, currency=self.currency,
+            payment_date=get_today(), through_representation=True,
+            order_number='order'
+        )
+        response = self.client.get(self.url + '?owner=all')
+        data = load_data(dump_data(response.context_data['income_data']))
+        snapshot = IncomeStatSnapshot.objects.create(
+            department_id=self.department_id,
+            webpage=response.content.decode()
+        )
+        url = reverse('site:snapshot_view', args=(snapshot.id,))
+        response = self.client.get(url)
+        self.assertContains(response, '#changelist-filter{display:none;}')
+        call_command('convert_income_snapshots', stdout=StringIO())
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.webpage, '')
+        converted = load_data(snapshot.data)
+        # the income of the charts is rounded
+        data['income'] = {m: round(v) for m, v in data['income'].items()}
+        for row in data['received']:
+            row['value'] = round(row['value'], 2)
+        for rows in data['expected'].values():
+            for row in rows:
+                row['sums'] = [
+                    [None if v is None else round(v, 2), rep]
+                    for v, rep in row['sums']
+                ]
+        self.assertEqual(converted, data)
+        response = self.client.get(url)
+        self.assertContains(response, f'Company {self.counter}')
+
+    def create_deals(self, number: int) -> None:
+        # no payments are received in the current month
+        # so the table of received payments is empty
+        today = get_today()
+        for _i in range(number):
+            type(self).counter += 1
+            n = self.counter
+            company = Company.objects.create(
+                full_name=f'Company {n}', email=f'office{n}@example.com',
+                country=self.country, owner=self.owner,
+                department_id=self.department_id
+            )
+            contact = Contact.objects.create(
+                first_name=f'Contact {n}', email=f'contact{n}@example.com',
+                company=company, owner=self.owner,
+                department_id=self.department_id
+            )
+            deal = Deal.objects.create(
+                name=f'Deal {n}', ticket=f'ticket{n}', next_step='Next step',
+                next_step_date=today, stage=self.stage,
+                owner=self.owner, contact=contact, company=company,
+                department_id=self.department_id,
+                amount=100, currency=self.currency
+            )
+            Output.objects.create(
+                deal=deal, product=self.product, quantity=n,
+                amount=100, currency=self.currency
+            )
+            for months, status in (
+                (-1, Payment.RECEIVED), (-5, Payment.RECEIVED),
+                (-15, Payment.RECEIVED), (1, Payment.GUARANTEED),
+                (0, Payment.HIGH_PROBABILITY), (2, Payment.LOW_PROBABILITY),
+            ):
+                Payment.objects.create(
+                    deal=deal, status=status, amount=10, currency=self.currency,
+                    payment_date=today + relativedelta(months=months),
+                    order_number=f'order{n}'
+                )
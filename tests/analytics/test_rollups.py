@@ -0,0 +1,181 @@
+from datetime import date
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import MonthlyRollup
+from analytics.utils.rollups import compare_rollups
+from analytics.utils.rollups import get_month
+from analytics.utils.rollups import index_objects
+from analytics.utils.rollups import rebuild_rollups
+from analytics.utils.rollups import RollupTotals
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_now
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import ClosingReason
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import LeadSource
+from crm.models import Payment
+from crm.models import Request
+from crm.models import Stage
+from tests.base_test_classes import BaseTestCase
+from tests.utils.helpers import get_country_instance
+
+# manage.py test tests.analytics.test_rollups --noinput
+
+
+class TestRollups(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        cls.stage = Stage.objects.filter(department_id=cls.department_id).first()
+        cls.currency = Currency.objects.first()
+        cls.lead_source = LeadSource.objects.filter(
+            department_id=cls.department_id).first()
+        cls.company = Company.objects.create(
+            full_name='Company 1', email='office1@example.com',
+            country=get_country_instance(), owner=cls.owner,
+            department_id=cls.department_id
+        )
+        cls.contact = Contact.objects.create(
+            first_name='Contact 1', email='contact1@example.com',
+            company=cls.company, owner=cls.owner,
+            department_id=cls.department_id
+        )
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.today = get_today()
+        self.month = self.today.replace(day=1)
+        self.client.force_login(self.owner)
+
+    def test_updates(self):
+        request = Request.objects.create(
+            request_for='Request 1', email='contact1@example.com',
+            receipt_date=self.today, lead_source=self.lead_source,
+            contact=self.contact, company=self.company,
+            owner=self.owner, department_id=self.department_id
+        )
+        deal = Deal.objects.create(
+            name='Deal 1', ticket='ticket1', next_step='Next step',
+            next_step_date=self.today, stage=self.stage, owner=self.owner,
+            contact=self.contact, company=self.company, request=request,
+            department_id=self.department_id, amount=100, currency=self.currency
+        )
+        request.deal = deal
+        request.save()
+        self.assertEqual(self.count(MonthlyRollup.REQUESTS), 1)
+        self.assertEqual(self.count(MonthlyRollup.DEALS, key=1), 1)
+        self.assertEqual(self.count(
+            MonthlyRollup.LEAD_SOURCE_REQUESTS, key=self.lead_source.id), 1)
+
+        # the request facts depend on the deal
+        deal.closing_reason = ClosingReason.objects.filter(
+            success_reason=True, department_id=self.department_id
+        ).first()
+        deal.active = False
+        deal.closing_date = self.today
+        deal.win_closing_date = get_now()
+        deal.relevant = False
+        deal.save()
+        self.assertEqual(self.count(MonthlyRollup.WON_REQUESTS), 1)
+        self.assertEqual(self.count(MonthlyRollup.WON_DEALS, key=1), 1)
+        self.assertEqual(self.count(MonthlyRollup.DEALS, key=1), 0)
+        self.assertEqual(self.count(MonthlyRollup.DEALS, key=0), 1)
+
+        payment = Payment.objects.create(
+            deal=deal, amount=10, currency=self.currency,
+            payment_date=self.today, status=Payment.RECEIVED
+        )
+        income = RollupTotals(MonthlyRollup.objects.all()).get_income(
+            'rate_to_state_currency')
+        self.assertEqual(
+            income[self.month], 10 * self.currency.rate_to_state_currency)
+        self.assertEqual(compare_rollups(), [])
+
+        payment.delete()
+        deal.delete()       # the request is deleted with the deal
+        self.assertEqual(compare_rollups(), [])
+        self.assertFalse(
+            MonthlyRollup.objects.exclude(count=0).exists())
+
+    def test_facts_read_in_transaction(self):
+        request = Request.objects.create(
+            request_for='Request 4', email='contact1@example.com',
+            receipt_date=self.today, contact=self.contact,
+            owner=self.owner, department_id=self.department_id
+        )
+        savepoints = []
+
+        def wrapper(execute, sql, params, many, context):
+            if sql.startswith('SELECT') and '"analytics_rollupfact"' in sql:
+                savepoints.append(len(connection.savepoint_ids))
+            return execute(sql, params, many, context)
+
+        depth = len(connection.savepoint_ids)
+        with connection.execute_wrapper(wrapper):
+            Request.objects.filter(pk=request.pk).update(receipt_date=None)
+            index_objects(Request, [request.pk])
+        # the facts are read and replaced in one transaction
+        self.assertEqual(savepoints, [depth + 1])
+        self.assertEqual(self.count(MonthlyRollup.REQUESTS), 0)
+        self.assertEqual(compare_rollups(), [])
+
+    @override_settings(TIME_ZONE='UTC')
+    def test_month_in_default_timezone(self):
+        value = datetime(2026, 1, 31, 23, 30, tzinfo=dt_timezone.utc)
+        # the zone of the user activated by UserMiddleware
+        with timezone.override('Asia/Tokyo'):
+            self.assertEqual(get_month(value), date(2026, 1, 1))
+        self.assertEqual(get_month(value), date(2026, 1, 1))
+
+    def test_check_command(self):
+        Request.objects.create(
+            request_for='Request 2', email='contact1@example.com',
+            receipt_date=self.today, contact=self.contact,
+            owner=self.owner, department_id=self.department_id
+        )
+        call_command('check_rollups', stdout=StringIO())
+        MonthlyRollup.objects.filter(
+            metric=MonthlyRollup.REQUESTS).update(count=5)
+        with self.assertRaises(CommandError):
+            call_command('check_rollups', stdout=StringIO())
+        call_command('check_rollups', '--fix', stdout=StringIO())
+        self.assertEqual(compare_rollups(), [])
+        self.assertEqual(self.count(MonthlyRollup.REQUESTS), 1)
+
+    def test_dashboards(self):
+        Request.objects.create(
+            request_for='Request 3', email='contact1@example.com',
+            receipt_date=self.today, contact=self.contact,
+            owner=self.owner, department_id=self.department_id
+        )
+        rebuild_rollups()
+        for name in ('requeststat', 'conversionstat', 'dealstat',
+                     'leadsourcestat', 'incomestat'):
+            url = reverse(f'site:analytics_{name}_changelist')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, name)
+        url = reverse('site:analytics_requeststat_changelist')
+        response = self.client.get(url)
+        summary = response.context_data['summary']
+        self.assertEqual(list(summary.values())[0], 1)
+
+    def count(self, metric: str, key=None) -> int:
+        rollups = MonthlyRollup.objects.filter(metric=metric, month=self.month)
+        if key is not None:
+            rollups = rollups.filter(key=key)
+        return sum(rollups.values_list('count', flat=True))
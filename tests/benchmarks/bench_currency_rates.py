@@ -0,0 +1,119 @@
+import os
+from datetime import timedelta
+from decimal import Decimal
+from time import perf_counter
+from django.db import connection
+from django.db.models import Case
+from django.db.models import DecimalField
+from django.db.models import Exists
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models import When
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Payment
+from crm.models import Rate
+from crm.models import Stage
+from crm.utils.currency_rates import get_amount_expression
+from crm.utils.currency_rates import RateTable
+from tests.base_test_classes import BaseTestCase
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_currency_rates
+# BENCH_RATE_PAYMENTS=500000 manage.py test tests.benchmarks.bench_currency_rates
+
+PAYMENTS = int(os.getenv('BENCH_RATE_PAYMENTS', 100_000))
+DAYS = 1000
+FIELD = 'rate_to_state_currency'
+
+
+class BenchCurrencyRates(BaseTestCase):
+    """Time of the total of payments converted at the rates of their dates."""
+
+    def test_total_amount(self):
+        owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        department_id = get_department_id(owner)
+        stage = Stage.objects.filter(department_id=department_id).first()
+        currencies = list(Currency.objects.all()[:3])
+        today = get_today()
+        deal = Deal.objects.create(
+            name='Deal', ticket='ticket', next_step='Next step',
+            next_step_date=today, stage=stage, owner=owner,
+            department_id=department_id, amount=100, currency=currencies[0]
+        )
+        # the rates of every other day
+        Rate.objects.bulk_create(
+            (
+                Rate(
+                    currency=c, payment_date=today - timedelta(days=d),
+                    rate_to_state_currency=Decimal(1 + d % 7) / 4,
+                    rate_to_marketing_currency=Decimal(1 + d % 5) / 8,
+                )
+                for c in currencies for d in range(0, DAYS, 2)
+            ),
+            batch_size=5000
+        )
+        Payment.objects.bulk_create(
+            (
+                Payment(
+                    deal=deal, currency=currencies[i % len(currencies)],
+                    amount=Decimal(i % 1000) + Decimal('0.25'),
+                    payment_date=today - timedelta(days=i % DAYS)
+                )
+                for i in range(PAYMENTS)
+            ),
+            batch_size=5000
+        )
+        payments = Payment.objects.all()
+
+        rate = Rate.objects.filter(
+            currency=OuterRef('currency'),
+            payment_date=OuterRef('payment_date')
+        )
+        correlated = payments.annotate(value=Case(
+            When(Exists(rate), then=F('amount') * Subquery(rate.values(FIELD)[:1])),
+            default=F('amount') * F(f'currency__{FIELD}'),
+            output_field=DecimalField()
+        ))
+        index = Rate._meta.indexes[0]
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            cursor.execute(editor.sql_delete_index % {
+                'table': editor.quote_name(Rate._meta.db_table),
+                'name': editor.quote_name(index.name),
+            })
+        start = perf_counter()
+        total = correlated.aggregate(total=Sum('value'))['total']
+        print(f"\n{PAYMENTS} payments: Exists + Subquery without "
+              f"the (currency, payment_date) index {perf_counter() - start:.2f} s")
+        with connection.cursor() as cursor:
+            cursor.execute(str(index.create_sql(Rate, editor)))
+        start = perf_counter()
+        correlated = correlated.aggregate(total=Sum('value'))['total']
+        print(f"Exists + Subquery {perf_counter() - start:.2f} s")
+        self.assertEqual(total, correlated)
+
+        start = perf_counter()
+        database = payments.aggregate(
+            total=Sum(get_amount_expression(FIELD)))['total']
+        print(f"one indexed subquery: {perf_counter() - start:.2f} s")
+
+        start = perf_counter()
+        currency_ids, dates, amounts = zip(*payments.values_list(
+            'currency_id', 'payment_date', 'amount').iterator(chunk_size=10000))
+        fetched = perf_counter() - start
+        table = RateTable()
+        loaded = perf_counter() - start - fetched
+        in_memory = table.convert(currency_ids, dates, amounts, FIELD).sum()
+        print(f"rate table: {perf_counter() - start:.2f} s (fetching the "
+              f"payments {fetched:.2f} s, loading the rates {loaded:.2f} s)")
+
+        self.assertAlmostEqual(float(correlated), float(database), places=2)
+        self.assertAlmostEqual(float(correlated), in_memory, places=2)
@@ -0,0 +1,84 @@
+import os
+from datetime import timedelta
+from random import randrange
+from time import perf_counter
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from crm.models import CrmEmail
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_dedup_lookups
+# BENCH_ROWS=1000000 BENCH_LOOKUPS=2000 manage.py test tests.benchmarks.bench_dedup_lookups
+
+ROWS = int(os.getenv('BENCH_ROWS', 100_000))
+LOOKUPS = int(os.getenv('BENCH_LOOKUPS', 500))
+CHUNK = 5000
+
+
+class BenchDedupLookups(TransactionTestCase):
+
+    def setUp(self):
+        start = timezone.now() - timedelta(days=365)
+        for i in range(0, ROWS, CHUNK):
+            CrmEmail.objects.bulk_create([
+                CrmEmail(
+                    message_id=f"<{n}@example.com>",
+                    creation_date=start + timedelta(minutes=n),
+                    email_host_user=f"user{n % 20}@example.com",
+                    incoming=True,
+                    uid=n,
+                    ticket=f"{n:016d}",
+                ) for n in range(i, min(i + CHUNK, ROWS))
+            ])
+        self.start = start
+
+    def test_dedup_lookups(self):
+        samples = [randrange(ROWS) for _ in range(LOOKUPS)]
+        indexed = self._run_lookups(samples)
+        with connection.schema_editor() as editor:
+            for index in CrmEmail._meta.indexes:
+                editor.remove_index(CrmEmail, index)
+        try:
+            plain = self._run_lookups(samples)
+        finally:
+            with connection.schema_editor() as editor:
+                for index in CrmEmail._meta.indexes:
+                    editor.add_index(CrmEmail, index)
+
+        print(f"\n{ROWS} emails, {LOOKUPS} lookups per query ({connection.vendor}):")
+        for name, t in indexed.items():
+            print(
+                f"  {name:<20} indexed: {t * 1000 / LOOKUPS:8.3f} ms"
+                f"  no index: {plain[name] * 1000 / LOOKUPS:8.3f} ms"
+                f"  x{plain[name] / t:.1f}"
+            )
+
+    def _run_lookups(self, samples: list) -> dict:
+        queries = {
+            'message_id': lambda n: CrmEmail.objects.filter(
+                message_id=f"<{n}@example.com>",
+                creation_date=self.start + timedelta(minutes=n)
+            ).exists(),
+            'host_user_date': lambda n: CrmEmail.objects.filter(
+                incoming=True,
+                creation_date=self.start + timedelta(minutes=n),
+                email_host_user=f"user{n % 20}@example.com"
+            ).exists(),
+            'uid_date': lambda n: CrmEmail.objects.filter(
+                uid=n,
+                creation_date=self.start + timedelta(minutes=n)
+            ).exists(),
+            'ticket': lambda n: CrmEmail.objects.filter(
+                ticket=f"{n:016d}"
+            ).exists(),
+        }
+        timings = {}
+        for name, query in queries.items():
+            start = perf_counter()
+            for n in samples:
+                self.assertTrue(query(n))
+            timings[name] = perf_counter() - start
+        return timings
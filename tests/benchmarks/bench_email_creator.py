@@ -0,0 +1,69 @@
+import os
+from time import perf_counter
+from django.test import TestCase
+
+from massmail.models import EmailAccount
+from massmail.models import EmlMessage
+from massmail.models import Signature
+from massmail.utils import email_creators
+from massmail.utils.email_creators import email_creator
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_email_creator
+# BENCH_MESSAGES=50000 manage.py test tests.benchmarks.bench_email_creator
+
+MESSAGES = int(os.getenv('BENCH_MESSAGES', 10_000))
+
+
+class BenchEmailCreator(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ea = EmailAccount.objects.create(
+            name='Email Account',
+            email_host='smtp.example.com',
+            email_host_user='andrew@example.com',
+            from_email='andrew@example.com',
+        )
+        signature = Signature.objects.create(
+            name="Signature",
+            content="<p>Best regards,<br>Andrew<br>Example Ltd.</p>" * 3,
+        )
+        cls.eml = EmlMessage.objects.create(
+            subject="{{ first_name }}, news of {{ company_name }}",
+            content="Dear {{ full_name }},\n\n" + "Lorem ipsum dolor sit amet.\n" * 40
+                    + "\n<a href='{{ unsubscribe_url }}'>Unsubscribe</a>",
+            signature=signature,
+            prev_corr="Previous message\n" * 10,
+        )
+
+    def test_render_messages(self):
+        contexts = [{
+            'first_name': f'Name{i}', 'full_name': f'Name{i} Surname{i}',
+            'company_name': f'Company {i}',
+            'unsubscribe_url': f'example.com/unsubscribe/{i}/',
+        } for i in range(MESSAGES)]
+
+        start = perf_counter()
+        for extra_context in contexts:
+            email_creators._templates.clear()     # NOQA
+            email_creator(
+                self.eml, self.ea, ['you@example.com'],
+                extra_context=extra_context, force_multipart=True
+            )
+        compiled = perf_counter() - start
+
+        start = perf_counter()
+        for extra_context in contexts:
+            email_creator(
+                self.eml, self.ea, ['you@example.com'],
+                extra_context=extra_context, force_multipart=True
+            )
+        cached = perf_counter() - start
+
+        print(
+            f"\n{MESSAGES} personalised messages:"
+            f"\n  compiled per message: {MESSAGES / compiled:8.0f} msg/s"
+            f"\n  cached templates:     {MESSAGES / cached:8.0f} msg/s"
+        )
@@ -0,0 +1,103 @@
+import io
+import os
+import tracemalloc
+from time import perf_counter
+import pandas as pd
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import Group
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test import override_settings
+
+from common.views.export_objects import export_selected_objects
+from crm.models import Company
+from crm.models import Country
+from crm.models import Industry
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_export_objects
+# BENCH_EXPORT_ROWS=200000 manage.py test tests.benchmarks.bench_export_objects
+
+ROWS = int(os.getenv('BENCH_EXPORT_ROWS', 20_000))
+COLUMNS = [
+    'full_name', 'industry', 'phone', 'email', 'website',
+    'country__name', 'city_name', 'creation_date',
+]
+
+
+@override_settings(COMPANY_COLUMNS=COLUMNS)
+class BenchExportObjects(TestCase):
+    """Time and peak traced memory of the export of companies."""
+
+    def test_export(self):
+        country = Country.objects.create(name='Testland', url_name='testland')
+        companies = Company.objects.bulk_create(
+            (
+                Company(
+                    full_name=f'Company {i}', email=f'office@company{i}.example.com',
+                    website=f'www.company{i}.example.com', phone=f'+1 800 {i:07}',
+                    city_name='Springfield', country=country if i % 2 else None,
+                )
+                for i in range(ROWS)
+            ),
+            batch_size=5000
+        )
+        department = Group.objects.create(name='bench')
+        industries = [
+            Industry.objects.create(name=f'Industry {i}', department=department)
+            for i in range(3)
+        ]
+        through = Company.industry.through
+        through.objects.bulk_create(
+            (through(company_id=c.id, industry_id=industries[c.id % 3].id)
+             for c in companies),
+            batch_size=5000
+        )
+        print(f"\n{ROWS} companies, {len(COLUMNS)} columns:")
+        for name, func in (
+            ('pandas, per column', self.export_by_columns),
+            ('streaming CSV', lambda: self.export('csv')),
+            ('streaming xlsx', lambda: self.export('xlsx')),
+        ):
+            tracemalloc.start()
+            start = perf_counter()
+            size = func()
+            seconds = perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+            print(
+                f"  {name:<20} {seconds:6.1f} s, peak {peak:7.1f} MB,"
+                f" file {size / 2 ** 20:6.1f} MB"
+            )
+
+    @staticmethod
+    def export(extension: str) -> int:
+        request = RequestFactory().get('/', {'format': extension})
+        request.user = AnonymousUser()
+        response = export_selected_objects(request, Company.objects.all())
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    @staticmethod
+    def export_by_columns() -> int:
+        """The former export: a query per column, a DataFrame, a file."""
+        datadict = {}
+        for attr in COLUMNS:
+            values = []
+            for o in Company.objects.all().iterator():
+                if attr == 'industry':
+                    value = ",".join(ind.name for ind in o.industry.all())
+                elif '__' in attr:
+                    rel_o = getattr(o, attr.split('__')[0])
+                    value = getattr(rel_o, attr.split('__')[1]) if rel_o else ''
+                elif attr == 'creation_date':
+                    value = str(o.creation_date.date())
+                else:
+                    value = getattr(o, attr)
+                values.append(value)
+            datadict[attr] = values
+        f = io.BytesIO()
+        writer = pd.ExcelWriter(f, engine='xlsxwriter')
+        pd.DataFrame(datadict).to_excel(writer, sheet_name='Sheet1', index=False)
+        writer.close()
+        return len(f.getvalue())
@@ -0,0 +1,63 @@
+import os
+from time import perf_counter
+from django.test import SimpleTestCase
+
+from crm.utils.import_emails import fetch_messages
+from crm.utils.import_emails import parse_message_bytes
+from massmail.models import EmailAccount
+from tests.utils.fake_imap import connect_crmimap
+from tests.utils.fake_imap import FakeImapServer
+from tests.utils.fake_imap import get_messages
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_imap_fetch
+# BENCH_MESSAGES=2000 BENCH_LATENCY=0.005 manage.py test tests.benchmarks.bench_imap_fetch
+
+MESSAGES = int(os.getenv('BENCH_MESSAGES', 500))
+LATENCY = float(os.getenv('BENCH_LATENCY', 0.002))     # seconds per command
+BATCH_SIZE = int(os.getenv('BENCH_BATCH_SIZE', 20))
+
+
+class BenchImapFetch(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeImapServer(get_messages(MESSAGES, 2000), LATENCY)
+        cls.server.start()
+        cls.ea = EmailAccount(
+            email_host_user='andrew@example.com',
+            imap_host='127.0.0.1'
+        )
+        cls.uids = [str(uid).encode() for uid in cls.server.uids()]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def test_fetch_throughput(self):
+        crmimap = connect_crmimap(self.server, self.ea)
+        start = perf_counter()
+        fetched = 0
+        for uid in self.uids:
+            result, data, _ = crmimap.uid_fetch(uid)
+            if result == 'OK' and parse_message_bytes(uid, data):
+                fetched += 1
+        per_uid = perf_counter() - start
+        self.assertEqual(fetched, MESSAGES)
+
+        start = perf_counter()
+        fetched = 0
+        for i in range(0, len(self.uids), BATCH_SIZE):
+            fetched += len(fetch_messages(crmimap, self.uids[i:i + BATCH_SIZE]))
+        batched = perf_counter() - start
+        crmimap.close_and_logout()
+        self.assertEqual(fetched, MESSAGES)
+
+        print(
+            f"\n{MESSAGES} messages, {LATENCY * 1000:.1f} ms per command:"
+            f"\n  UID FETCH per message: {MESSAGES / per_uid:8.0f} msg/s"
+            f"\n  UID FETCH batch of {BATCH_SIZE}: {MESSAGES / batched:8.0f} msg/s"
+        )
@@ -0,0 +1,96 @@
+import os
+from time import perf_counter
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from analytics.utils.rollups import rebuild_rollups
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Payment
+from crm.models import Stage
+from tests.base_test_classes import BaseTestCase
+from tests.utils.helpers import get_country_instance
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_income_stat
+# BENCH_INCOME_DEALS=20000 manage.py test tests.benchmarks.bench_income_stat
+
+DEALS = int(os.getenv('BENCH_INCOME_DEALS', 2000))
+STATUSES = (
+    Payment.RECEIVED, Payment.RECEIVED, Payment.RECEIVED,
+    Payment.GUARANTEED, Payment.HIGH_PROBABILITY, Payment.LOW_PROBABILITY,
+)
+
+
+class BenchIncomeStat(BaseTestCase):
+    """Time and number of queries of the Income Summary page."""
+
+    def test_changelist(self):
+        owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        department_id = get_department_id(owner)
+        stage = Stage.objects.filter(department_id=department_id).first()
+        currency = Currency.objects.first()
+        today = get_today()
+        company = Company.objects.create(
+            full_name='Company', email='office@example.com',
+            country=get_country_instance(), owner=owner,
+            department_id=department_id
+        )
+        contact = Contact.objects.create(
+            first_name='Contact', email='contact@example.com',
+            company=company, owner=owner, department_id=department_id
+        )
+        deals = Deal.objects.bulk_create(
+            (
+                Deal(
+                    name=f'Deal {i}', ticket=f'ticket{i}', next_step='Next step',
+                    next_step_date=today, stage=stage, owner=owner,
+                    contact=contact, company=company,
+                    department_id=department_id,
+                    amount=100, currency=currency
+                )
+                for i in range(DEALS)
+            ),
+            batch_size=5000
+        )
+        # the received payments are spread over two years,
+        # the expected payments over the next three months
+        Payment.objects.bulk_create(
+            (
+                Payment(
+                    deal=deal, status=status, amount=10, currency=currency,
+                    payment_date=today + relativedelta(
+                        months=(deal.id * 7 + i) % 24 - 23 if i < 3 else i - 3
+                    )
+                )
+                for deal in deals
+                for i, status in enumerate(STATUSES)
+            ),
+            batch_size=5000
+        )
+        # bulk_create() does not send the signals that update the rollups
+        rebuild_rollups()
+        url = reverse('site:analytics_incomestat_changelist')
+        self.client.force_login(owner)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            start = perf_counter()
+            response = self.client.get(url)
+            elapsed = perf_counter() - start
+        self.assertEqual(response.status_code, 200)
+        per_row = sum(
+            'FROM "crm_output"' in q['sql'] for q in ctx.captured_queries
+        )
+        print(
+            f"\n{DEALS} deals, {DEALS * len(STATUSES)} payments: "
+            f"{elapsed:.2f} s, {len(ctx.captured_queries)} queries "
+            f"({per_row} of them query the products of a row)"
+        )
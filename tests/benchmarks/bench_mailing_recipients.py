@@ -0,0 +1,50 @@
+import os
+from time import perf_counter
+from django.test import TestCase
+
+from massmail.models import MailingOut
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_mailing_recipients
+# BENCH_RECIPIENTS=200000 manage.py test tests.benchmarks.bench_mailing_recipients
+
+RECIPIENTS = int(os.getenv('BENCH_RECIPIENTS', 50_000))
+# Number of sent messages measured
+TRANSITIONS = int(os.getenv('BENCH_TRANSITIONS', 500))
+
+
+class BenchMailingRecipients(TestCase):
+
+    def test_move_to_successful(self):
+        mo = MailingOut.objects.create(name='Test MO', recipients_number=RECIPIENTS)
+        recipient_ids = range(1, RECIPIENTS + 1)
+
+        start = perf_counter()
+        mo.add_recipients(recipient_ids)
+        created = perf_counter() - start
+
+        # The former comma-joined fields: parse, remove, join per message
+        ids_field, successful_field = ",".join(map(str, recipient_ids)), ''
+        start = perf_counter()
+        for r_id in recipient_ids[:TRANSITIONS]:
+            ids = [int(x) for x in ids_field.split(',')]
+            ids.remove(r_id)
+            ids_field = ",".join(map(str, ids))
+            successful = [int(x) for x in successful_field.split(',') if x]
+            successful.append(r_id)
+            successful_field = ",".join(map(str, successful))
+        strings = perf_counter() - start
+
+        start = perf_counter()
+        for r_id in recipient_ids[:TRANSITIONS]:
+            mo.move_to_successful_ids(r_id)
+        table = perf_counter() - start
+        self.assertEqual(len(mo.get_successful_ids()), TRANSITIONS)
+
+        print(
+            f"\n{RECIPIENTS} recipients, {TRANSITIONS} sent messages:"
+            f"\n  recipients created in {created:.2f} s"
+            f"\n  comma-joined fields (CPU only): {TRANSITIONS / strings:8.0f} msg/s"
+            f"\n  recipient table:                {TRANSITIONS / table:8.0f} msg/s"
+        )
@@ -0,0 +1,102 @@
+import email
+import io
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import tracemalloc
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase
+
+from crm.utils.mime_stream import parse_message
+from crm.utils.mime_stream import spool_payload
+from tests.utils.helpers import get_email_message
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_mime_memory
+# BENCH_ATTACHMENTS=3 BENCH_ATTACHMENT_MB=30 manage.py test tests.benchmarks.bench_mime_memory
+
+ATTACHMENTS = int(os.getenv('BENCH_ATTACHMENTS', 3))
+ATTACHMENT_MB = int(os.getenv('BENCH_ATTACHMENT_MB', 30))
+
+
+class BenchMimeMemory(SimpleTestCase):
+    """
+    Peak memory used to import one message with large attachments.
+    Each import path runs in a forked process to get its own peak RSS.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp()
+        msg, _, _ = get_email_message()
+        for i in range(ATTACHMENTS):
+            msg.add_attachment(
+                os.urandom(ATTACHMENT_MB * 1024 * 1024),
+                maintype='application', subtype='octet-stream',
+                filename=f'file{i}.bin'
+            )
+        cls.eml_path = os.path.join(cls.tmp_dir, 'message.eml')
+        with open(cls.eml_path, 'wb') as f:
+            f.write(msg.as_bytes())
+        cls.storage = FileSystemStorage(os.path.join(cls.tmp_dir, 'media'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+        super().tearDownClass()
+
+    def test_peak_memory(self):
+        size = os.path.getsize(self.eml_path) / 2 ** 20
+        print(f"\nMessage of {size:.0f} MB, {ATTACHMENTS} attachments:")
+        for name, func in (('message_from_bytes', self.import_in_memory),
+                           ('streaming', self.import_streaming)):
+            rss, traced = run_in_process(func)
+            print(
+                f"  {name:<20} peak RSS +{rss:6.0f} MB"
+                f"  peak Python allocations {traced:6.0f} MB"
+            )
+
+    def import_in_memory(self):
+        # The queued raw message
+        with open(self.eml_path, 'rb') as f:
+            item = f.read()
+        email_message = email.message_from_bytes(
+            item, policy=email.policy.default)
+        for part in email_message.iter_attachments():
+            f = io.BytesIO(part.get_payload(decode=True))
+            self.storage.save(part.get_filename(), File(f))
+            f.close()
+
+    def import_streaming(self):
+        # The queued raw message is spooled to disk
+        email_message = parse_message(open(self.eml_path, 'rb'))
+        for part in email_message.iter_attachments():
+            with spool_payload(part) as f:
+                self.storage.save(part.get_filename(), File(f))
+
+
+def run_in_process(func) -> tuple:
+    ctx = multiprocessing.get_context('fork')
+    reader, writer = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_measure, args=(func, writer))
+    process.start()
+    result = reader.recv()
+    process.join()
+    return result
+
+
+def _measure(func, writer) -> None:
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    func()
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+    # ru_maxrss is in kilobytes on Linux
+    writer.send((rss / 1024, traced / 2 ** 20))
+    writer.close()
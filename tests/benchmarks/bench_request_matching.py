@@ -0,0 +1,111 @@
+import os
+import random
+from time import perf_counter
+from django.db.models import Q
+from django.test import TestCase
+
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Request
+from crm.utils.matching import RequestMatcher
+from crm.utils.matching import rebuild_match_keys
+from crm.utils.phone_numbers import rebuild_phone_numbers
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_request_matching
+# BENCH_MATCH_ROWS=1000000 manage.py test tests.benchmarks.bench_request_matching
+
+ROWS = int(os.getenv('BENCH_MATCH_ROWS', 50_000))
+REQUESTS = int(os.getenv('BENCH_MATCH_REQUESTS', 200))
+WORDS = (
+    'acme', 'global', 'rocket', 'supply', 'north', 'trading', 'systems',
+    'logistics', 'green', 'energy', 'digital', 'metal', 'works', 'studio',
+)
+NAMES = ('Tom', 'Ann', 'Bruno', 'Kate', 'Michael', 'Olga', 'Ivan', 'Maria')
+
+
+class BenchRequestMatching(TestCase):
+
+    def test_matching(self):
+        rnd = random.Random(1)
+        companies = Company.objects.bulk_create(
+            (
+                Company(
+                    full_name=f"{' '.join(rnd.sample(WORDS, 2))} company{i}",
+                    email=f"office@company{i}.example.com",
+                )
+                for i in range(ROWS // 10)
+            ),
+            batch_size=5000
+        )
+        Contact.objects.bulk_create(
+            (
+                Contact(
+                    first_name=rnd.choice(NAMES), last_name=f'Smith{i}',
+                    email=f'person{i}@company{i // 10}.example.com',
+                    phone=f'+1 (800) {i:07}', company=companies[i // 10],
+                )
+                for i in range(ROWS)
+            ),
+            batch_size=5000
+        )
+        start = perf_counter()
+        rebuild_match_keys(Company)
+        rebuild_match_keys(Contact)
+        rebuild_phone_numbers(Contact)
+        indexed = perf_counter() - start
+
+        requests = []
+        for _i in range(REQUESTS):
+            contact = Contact.objects.get(last_name=f'Smith{rnd.randrange(ROWS)}')
+            requests.append(Request(
+                request_for='Inquiry', first_name=contact.first_name,
+                email=rnd.choice((contact.email, f'new@{contact.email.split("@")[1]}')),
+                phone=rnd.choice((contact.phone, '')), company_name='',
+            ))
+        print(f"\n{ROWS} contacts, {REQUESTS} requests, keys built in {indexed:.1f} s")
+
+        start = perf_counter()
+        legacy = [self.scan(r) for r in requests]
+        scan = perf_counter() - start
+
+        start = perf_counter()
+        found = []
+        for request in requests:
+            matcher = RequestMatcher([request])
+            found.append(matcher.get_contact_or_lead(request))
+            matcher.get_company(request)
+        single = perf_counter() - start
+
+        start = perf_counter()
+        matcher = RequestMatcher(requests)
+        for request in requests:
+            matcher.get_contact_or_lead(request)
+            matcher.get_company(request)
+        batch = perf_counter() - start
+
+        self.assertEqual(
+            [c.pk if c else None for c in found],
+            [c.pk if c else None for c in legacy]
+        )
+        for name, seconds in (
+            ('LIKE and REGEXP scans', scan),
+            ('indexed, one by one', single),
+            ('indexed, batch', batch),
+        ):
+            print(f"  {name:22} {seconds / REQUESTS * 1000:8.2f} ms per request")
+
+    @staticmethod
+    def scan(request):
+        """The email and phone steps of the former matching by field scans."""
+        q_params = Q()
+        if request.email:
+            q_params |= Q(email__icontains=request.email)
+            q_params |= Q(secondary_email__icontains=request.email)
+        digits = [c for c in request.phone if c.isdigit()]
+        if len(digits) > 4:
+            phone_re = ''.join(f'[^0-9]*[{c}]{{1}}' for c in digits)
+            q_params |= Q(phone__iregex=phone_re) | Q(mobile__iregex=phone_re)
+        contacts = Contact.objects.filter(q_params, first_name__iexact=request.first_name)
+        return contacts.order_by('pk').first()
@@ -0,0 +1,78 @@
+import os
+from datetime import timedelta
+from time import perf_counter
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from analytics.utils.rollups import compare_rollups
+from analytics.utils.rollups import rebuild_rollups
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Request
+from crm.models import Stage
+from tests.base_test_classes import BaseTestCase
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_rollups
+# BENCH_ROLLUP_REQUESTS=100000 manage.py test tests.benchmarks.bench_rollups
+
+REQUESTS = int(os.getenv('BENCH_ROLLUP_REQUESTS', 10_000))
+DASHBOARDS = ('requeststat', 'conversionstat', 'dealstat', 'leadsourcestat')
+
+
+class BenchRollups(BaseTestCase):
+    """Time and number of queries of the dashboards read from the rollups."""
+
+    def test_dashboards(self):
+        owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        department_id = get_department_id(owner)
+        stage = Stage.objects.filter(department_id=department_id).first()
+        currency = Currency.objects.first()
+        today = get_today()
+        requests = Request.objects.bulk_create(
+            (
+                Request(
+                    request_for=f'Request {i}', email=f'contact{i}@example.com',
+                    receipt_date=today - timedelta(days=i % 400),
+                    subsequent=not i % 3, owner=owner,
+                    department_id=department_id
+                )
+                for i in range(REQUESTS)
+            ),
+            batch_size=5000
+        )
+        Deal.objects.bulk_create(
+            (
+                Deal(
+                    name=f'Deal {r.id}', ticket=f'ticket{r.id}',
+                    next_step='Next step', next_step_date=today, stage=stage,
+                    owner=owner, request=r, relevant=bool(r.id % 2),
+                    department_id=department_id, amount=100, currency=currency
+                )
+                for r in requests[::2]
+            ),
+            batch_size=5000
+        )
+        start = perf_counter()
+        number = rebuild_rollups()
+        print(f"\n{REQUESTS} requests: {number} facts rebuilt in "
+              f"{perf_counter() - start:.2f} s")
+        start = perf_counter()
+        self.assertEqual(compare_rollups(), [])
+        print(f"consistency check: {perf_counter() - start:.2f} s")
+
+        self.client.force_login(owner)
+        for name in DASHBOARDS:
+            url = reverse(f'site:analytics_{name}_changelist')
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as ctx:
+                start = perf_counter()
+                response = self.client.get(url)
+                elapsed = perf_counter() - start
+            self.assertEqual(response.status_code, 200)
+            print(f"{name}: {elapsed:.3f} s, {len(ctx.captured_queries)} queries")
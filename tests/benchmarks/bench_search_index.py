@@ -0,0 +1,76 @@
+import os
+import random
+from time import perf_counter
+from django.contrib import admin
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test import override_settings
+
+from crm.models import Company
+from crm.site.crmadminsite import crm_site
+from crm.utils.search import get_search_backend
+from crm.utils.search import rebuild_index
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_search_index
+# BENCH_SEARCH_ROWS=1000000 manage.py test tests.benchmarks.bench_search_index
+
+ROWS = int(os.getenv('BENCH_SEARCH_ROWS', 50_000))
+REPEAT = int(os.getenv('BENCH_SEARCH_REPEAT', 5))
+WORDS = (
+    'acme', 'global', 'rocket', 'supply', 'north', 'trading', 'systems',
+    'logistics', 'green', 'energy', 'digital', 'metal', 'works', 'studio',
+    'partners', 'foods', 'textile', 'motors', 'pharma', 'capital',
+)
+SEARCH_TERMS = ('rocket', 'north logistics', 'zeta', 'company77 ')
+
+
+@override_settings(SEARCH_BACKEND='auto')
+class BenchSearchIndex(TestCase):
+
+    def test_search(self):
+        rnd = random.Random(1)
+        Company.objects.bulk_create(
+            (
+                Company(
+                    full_name=f"{' '.join(rnd.sample(WORDS, 3))} company{i}",
+                    email=f"office{i}@{rnd.choice(WORDS)}.example.com",
+                    website=f"www.{rnd.choice(WORDS)}{i}.example.com",
+                    address=f"{i} {rnd.choice(WORDS)} street",
+                    description=' '.join(rnd.choices(WORDS, k=12)),
+                )
+                for i in range(ROWS)
+            ),
+            batch_size=5000
+        )
+        start = perf_counter()
+        rebuild_index(Company)
+        indexed = perf_counter() - start
+
+        model_admin = crm_site._registry[Company]     # NOQA
+        request = RequestFactory().get('/')
+        queryset = Company.objects.all()
+        backend = get_search_backend()
+        print(
+            f"\n{ROWS} companies, {backend.__class__.__name__},"
+            f" index built in {indexed:.1f} s"
+        )
+        for term in SEARCH_TERMS:
+            start = perf_counter()
+            for _i in range(REPEAT):
+                like_qs, _d = admin.ModelAdmin.get_search_results(
+                    model_admin, request, queryset, term)
+                like_number = like_qs.count()
+            like = (perf_counter() - start) / REPEAT
+
+            start = perf_counter()
+            for _i in range(REPEAT):
+                index_number = backend.search(queryset, term).count()
+            index = (perf_counter() - start) / REPEAT
+
+            self.assertEqual(index_number, like_number)
+            print(
+                f"  {term!r:20} {like_number:7} found:"
+                f" LIKE {like * 1000:8.1f} ms, index {index * 1000:8.1f} ms"
+            )
@@ -0,0 +1,75 @@
+import os
+from time import perf_counter
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from massmail.models import EmailAccount
+from massmail.utils.email_creators import email_connection
+from massmail.utils.smtp_pool import SmtpPool
+from tests.utils.fake_smtp import FakeSmtpServer
+
+# Benchmarks are not collected by the default test discovery (test*.py).
+# Run explicitly:
+# manage.py test tests.benchmarks.bench_smtp_send
+# BENCH_MESSAGES=1000 BENCH_HANDSHAKE_LATENCY=0.05 manage.py test tests.benchmarks.bench_smtp_send
+
+MESSAGES = int(os.getenv('BENCH_MESSAGES', 200))
+LATENCY = float(os.getenv('BENCH_LATENCY', 0.001))     # seconds per command
+# Extra seconds for the greeting, EHLO and AUTH (TLS and login on real servers)
+HANDSHAKE_LATENCY = float(os.getenv('BENCH_HANDSHAKE_LATENCY', 0.02))
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+    MASSMAIL_MESSAGES_PER_CONNECTION=100
+)
+class BenchSmtpSend(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeSmtpServer(LATENCY, HANDSHAKE_LATENCY)
+        cls.server.start()
+        cls.ea = EmailAccount(
+            pk=1, email_host='127.0.0.1', email_port=cls.server.port,
+            email_host_user='andrew@example.com',
+            email_host_password='password',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def test_send_throughput(self):
+        start = perf_counter()
+        for _ in range(MESSAGES):
+            msg = get_message()
+            msg.connection = email_connection(self.ea)
+            msg.send(fail_silently=False)
+        per_message = perf_counter() - start
+
+        start = perf_counter()
+        with SmtpPool() as pool:
+            for _ in range(MESSAGES):
+                pool.send(self.ea, get_message())
+        pooled = perf_counter() - start
+        self.assertEqual(self.server.messages, MESSAGES * 2)
+
+        stats = pool.get_stats()[self.ea.email_host_user]
+        print(
+            f"\n{MESSAGES} messages, {LATENCY * 1000:.1f} ms per command, "
+            f"{HANDSHAKE_LATENCY * 1000:.0f} ms handshake steps:"
+            f"\n  connection per message: {MESSAGES / per_message:8.0f} msg/s"
+            f"\n  pooled connection:      {MESSAGES / pooled:8.0f} msg/s"
+            f"\n  pooled handshakes: {stats['handshakes']}"
+            f" in {stats['handshake_time']:.2f} s,"
+            f" sending: {stats['send_time']:.2f} s"
+        )
+
+
+def get_message() -> EmailMessage:
+    return EmailMessage(
+        'Subject', 'Body', 'andrew@example.com', ['you@example.com']
+    )
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+from django.test import TestCase
+from django.test import override_settings
+
+from common.utils.local_cache import LocalCache
+from crm.models import Country
+
+# manage.py test tests.common.utils.test_local_cache --noinput
+
+
+@override_settings(LOCAL_CACHE_TTL=60)
+class TestLocalCache(TestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_hits_and_misses(self):
+        cache = LocalCache('test_hits')
+        self.assertEqual(cache.get('a', lambda: 1), 1)
+        self.assertEqual(cache.get('a', lambda: 2), 1)
+        self.assertEqual(cache.get('b', lambda: 3), 3)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 2))
+
+    def test_maxsize(self):
+        cache = LocalCache('test_maxsize', maxsize=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 1)   # 'b' is the least recently used now
+        cache.get('c', lambda: 3)
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.get('a', lambda: 0), 1)
+        self.assertEqual(cache.get('b', lambda: 0), 0)
+
+    def test_ttl(self):
+        cache = LocalCache('test_ttl')
+        with patch('common.utils.local_cache.time.monotonic', return_value=100):
+            cache.get('a', lambda: 1)
+        with patch('common.utils.local_cache.time.monotonic', return_value=159):
+            self.assertEqual(cache.get('a', lambda: 2), 1)
+        with patch('common.utils.local_cache.time.monotonic', return_value=161):
+            self.assertEqual(cache.get('a', lambda: 2), 2)
+
+    @override_settings(LOCAL_CACHE_TTL=0)
+    def test_disabled(self):
+        cache = LocalCache('test_disabled')
+        cache.get('a', lambda: 1)
+        self.assertEqual(cache.get('a', lambda: 2), 2)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_signal_invalidation(self):
+        cache = LocalCache('test_signals', models=(Country,))
+        cache.get('a', lambda: 1)
+        country = Country.objects.create(name='Testland', url_name='testland')
+        self.assertEqual(cache.get('a', lambda: 2), 2)
+        country.delete()
+        self.assertEqual(cache.get('a', lambda: 3), 3)
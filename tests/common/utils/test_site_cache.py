@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import override_settings
+from django.urls import reverse
+
+from common.utils.helpers import USER_MODEL
+from common.utils.usermiddleware import UserMiddleware
+from crm.site.crmadminsite import crm_site
+from tasks.models import Memo
+from tests.base_test_classes import BaseTestCase
+
+# manage.py test tests.common.utils.test_site_cache --noinput
+
+
+@override_settings(
+    SITE_CACHE_TTL=60,
+    USER_PRINCIPAL_CACHE_TTL=600,
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage'
+)
+class TestSiteCache(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_each_context_queries(self):
+        crm_site.each_context(self.get_request())
+        request = self.get_request()
+        with self.assertNumQueries(0):
+            crm_site.each_context(request)
+
+    def test_counter_invalidation(self):
+        crm_site.each_context(self.get_request())
+        Memo.objects.create(name='Memo', to=self.user, owner=self.user)
+        context = crm_site.each_context(self.get_request())
+        tasks = next(
+            app for app in context['available_apps']
+            if app['app_label'] == 'tasks'
+        )
+        memos = next(
+            m for m in tasks['models']
+            if m['object_name'] == 'Memo'
+        )
+        self.assertIn('(<span', memos['name'])
+
+    def get_request(self):
+        request = RequestFactory().get(reverse('site:index'))
+        request.user = self.user
+        request.session = {}
+        UserMiddleware(lambda r: HttpResponse())(request)
+        return request
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import Group
+from django.contrib.messages.storage import default_storage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import translation
+
+from common.models import Department
+from common.utils.helpers import save_message
+from common.utils.helpers import USER_MODEL
+from common.utils.user_principal import get_principal
+from common.utils.usermiddleware import UserMiddleware
+
+# manage.py test tests.common.utils.test_user_principal --noinput
+
+
+@override_settings(
+    USER_PRINCIPAL_CACHE_TTL=600,
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage'
+)
+class TestUserPrincipal(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.create(name='co-workers')
+        cls.managers = Group.objects.create(name='managers')
+        cls.department = Department.objects.create(name='Global sales')
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        cache.clear()
+        self.user = USER_MODEL.objects.create_user('john', 'john@example.com')
+        self.user.groups.add(self.managers, self.department)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_warm_cache_queries(self):
+        middleware = UserMiddleware(lambda r: HttpResponse())
+        with translation.override(self.user.profile.language_code):
+            middleware(self.get_request())
+            request = self.get_request()
+            with self.assertNumQueries(0):
+                middleware(request)
+        self.assertTrue(request.user.is_manager)
+        self.assertFalse(request.user.is_chief)
+        self.assertEqual(request.user.department_id, self.department.id)
+
+    def test_invalidation(self):
+        principal = get_principal(self.user)
+        self.assertEqual(principal.group_names, {'co-workers', 'managers', 'Global sales'})
+        self.assertEqual(principal.department_ids, (self.department.id,))
+
+        self.user.groups.remove(self.managers)
+        self.assertNotIn('managers', get_principal(self.user).group_names)
+        self.managers.user_set.add(self.user)
+        self.assertIn('managers', get_principal(self.user).group_names)
+
+        profile = self.user.profile
+        profile.utc_timezone = 'Etc/GMT-3'
+        profile.activate_timezone = True
+        profile.save()
+        principal = get_principal(self.user)
+        self.assertEqual(principal.utc_timezone, 'Etc/GMT-3')
+        self.assertFalse(principal.has_messages)
+
+        save_message(self.user, 'Message')
+        self.assertTrue(get_principal(self.user).has_messages)
+
+    def test_language_update(self):
+        middleware = UserMiddleware(lambda r: HttpResponse())
+        with translation.override('uk'):
+            middleware(self.get_request())
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.language_code, 'uk')
+        self.assertEqual(get_principal(self.user).language_code, 'uk')
+
+    def get_request(self):
+        request = RequestFactory().get('/')
+        request.user = USER_MODEL.objects.get(id=self.user.id)
+        request.session = {}
+        request._messages = default_storage(request)
+        return request
@@ -0,0 +1,75 @@
+import csv
+from io import BytesIO
+from io import StringIO
+from django.contrib.contenttypes.models import ContentType
+from django.test import override_settings
+from django.urls import reverse
+from openpyxl import load_workbook
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import USER_MODEL
+from crm.models import Company
+from crm.models import Industry
+from tests.base_test_classes import BaseTestCase
+from tests.utils.helpers import get_country_instance
+
+# manage.py test tests.common.views.test_export_objects --noinput
+
+COLUMNS = ['full_name', 'industry', 'country__name', 'country', 'creation_date', 'was_in_touch']
+
+
+@override_settings(COMPANY_COLUMNS=COLUMNS, EXPORT_CHUNK_SIZE=2)
+class TestExportObjects(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        cls.country = get_country_instance()
+        cls.industries = list(Industry.objects.all()[:2])
+        for i in range(5):
+            company = Company.objects.create(
+                full_name=f'Company {i}', email=f'office{i}@example.com',
+                country=cls.country if i % 2 else None, owner=cls.owner,
+                department_id=cls.department_id
+            )
+            company.industry.set(cls.industries[:i % 3])
+        cls.url = reverse('export_objects') + \
+            f"?content_type={ContentType.objects.get_for_model(Company).id}"
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.client.force_login(self.owner)
+
+    def test_csv(self):
+        response = self.client.get(self.url + '&format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], COLUMNS)
+        self.assertEqual(len(rows), 6)
+        by_name = {row[0]: row for row in rows[1:]}
+        self.assertEqual(
+            by_name['Company 2'][1],
+            ','.join(i.name for i in self.industries[:2])
+        )
+        self.assertEqual(by_name['Company 1'][2:4], [self.country.name, str(self.country)])
+        self.assertEqual(by_name['Company 2'][2:4], ['', ''])
+        self.assertEqual(by_name['Company 0'][5], '')
+
+    def test_xlsx(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        rows = [[c or '' for c in row] for row in workbook.active.iter_rows(values_only=True)]
+        self.assertEqual(rows[0], COLUMNS)
+        self.assertEqual(sorted(row[0] for row in rows[1:]), [f'Company {i}' for i in range(5)])
+
+    def test_number_of_queries(self):
+        # the session, user, profile, groups and content type,
+        # the rows and the industries of each chunk of 2 rows
+        with self.assertNumQueries(9):
+            response = self.client.get(self.url + '&format=csv', follow=True)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(content.count(b'\n'), 6)
@@ -0,0 +1,143 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_now
+from common.utils.helpers import USER_MODEL
+from crm.models import City
+from crm.models import Company
+from crm.models import Contact
+from crm.models import CrmEmail
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Lead
+from crm.models import Output
+from crm.models import Payment
+from crm.models import Product
+from crm.models import Request
+from crm.models import Stage
+from tests.base_test_classes import BaseTestCase
+from tests.crm.test_request_methods import get_country_instance
+
+# manage.py test tests.crm.test_changelist_queries --noinput
+
+
+class TestChangelistQueries(BaseTestCase):
+    """The number of queries of a changelist does not depend on the number of rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.admin = USER_MODEL.objects.get(username="Adam.Admin")
+        cls.department_id = get_department_id(cls.owner)
+        cls.country = get_country_instance()
+        cls.stage = Stage.objects.filter(department_id=cls.department_id).first()
+        cls.currency = Currency.objects.first()
+        cls.product = Product.objects.create(name='Product')
+        cls.counter = 0
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.create_rows(2)
+
+    def test_deal_changelist(self):
+        self.check_changelist('deal', '?active=all')
+
+    def test_request_changelist(self):
+        self.check_changelist('request')
+
+    def test_lead_changelist(self):
+        self.check_changelist('lead')
+
+    def test_company_changelist(self):
+        self.check_changelist('company')
+
+    def test_contact_changelist(self):
+        self.check_changelist('contact')
+
+    def test_payment_changelist(self):
+        self.check_changelist('payment')
+
+    def test_shipment_changelist(self):
+        self.check_changelist('shipment')
+
+    @override_settings(LOCAL_CACHE_TTL=60)
+    def test_city_links_keep_filters(self):
+        city = City.objects.create(name='Springfield', country=self.country)
+        Contact.objects.filter(owner=self.owner).update(city=city)
+        self.client.force_login(self.owner)
+        url = reverse('site:crm_contact_changelist')
+        for query in ('?q=Contact', '?q=Contact+1'):
+            response = self.client.get(url + query)
+            self.assertContains(
+                response, f'href="{url}{query}&city__id__exact={city.id}"'
+            )
+
+    def check_changelist(self, model_name: str, params: str = '') -> None:
+        url = reverse(f'site:crm_{model_name}_changelist') + params
+        for user in (self.owner, self.admin):
+            self.client.force_login(user)
+            self.client.get(url)    # fill the caches of the first request
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.reason_phrase)
+            rows = len(response.context['cl'].result_list)
+            self.assertTrue(rows)
+
+            self.create_rows(3)
+            with self.assertNumQueries(len(ctx.captured_queries)):
+                response = self.client.get(url)
+            self.assertGreater(len(response.context['cl'].result_list), rows)
+
+    def create_rows(self, number: int) -> None:
+        for _i in range(number):
+            TestChangelistQueries.counter += 1
+            n = self.counter
+            company = Company.objects.create(
+                full_name=f'Company {n}', email=f'office{n}@example.com',
+                country=self.country, owner=self.owner,
+                department_id=self.department_id
+            )
+            contact = Contact.objects.create(
+                first_name=f'Contact {n}', email=f'contact{n}@example.com',
+                company=company, owner=self.owner,
+                department_id=self.department_id
+            )
+            Lead.objects.create(
+                first_name=f'Lead {n}', email=f'lead{n}@example.com',
+                country=self.country, owner=self.owner,
+                department_id=self.department_id
+            )
+            request = Request.objects.create(
+                request_for=f'Request {n}', contact=contact, company=company,
+                country=self.country, owner=self.owner, co_owner=self.admin,
+                department_id=self.department_id
+            )
+            deal = Deal.objects.create(
+                name=f'Deal {n}', ticket=f'ticket{n}', next_step='Next step',
+                next_step_date=get_now().date(), stage=self.stage,
+                owner=self.owner, co_owner=self.admin,
+                contact=contact, company=company, request=request,
+                department_id=self.department_id,
+                amount=100, currency=self.currency
+            )
+            CrmEmail.objects.create(
+                to='sale@example.com', subject='Inquiry', content='',
+                incoming=True, inquiry=True, request=request,
+                owner=self.owner, deal=deal, department_id=self.department_id,
+                creation_date=get_now() - timedelta(days=n % 8)
+            )
+            Payment.objects.create(
+                deal=deal, status=Payment.RECEIVED,
+                amount=10, currency=self.currency,
+                contract_number=f'contract{n}', order_number=f'order{n}'
+            )
+            Output.objects.create(
+                deal=deal, product=self.product, quantity=n,
+                amount=10, currency=self.currency,
+                shipping_date=get_now().date()
+            )
@@ -0,0 +1,109 @@
+from io import StringIO
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import override_settings
+from django.urls import reverse
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import USER_MODEL
+from common.utils.usermiddleware import UserMiddleware
+from crm.models import City
+from crm.models import Company
+from crm.models import Country
+from crm.models import FilterFacet
+from crm.models import Tag
+from crm.site.crmadminsite import crm_site
+from crm.utils.admfilters import ByCityFilter
+from crm.utils.admfilters import ByCountryFilter
+from crm.utils.admfilters import ByOwnerFilter
+from crm.utils.admfilters import TagFilter
+from crm.utils.admfilters import _lookup_caches
+from tests.base_test_classes import BaseTestCase
+
+# manage.py test tests.crm.test_filter_lookups --noinput
+
+FILTERS = (ByCityFilter, ByCountryFilter, ByOwnerFilter, TagFilter)
+
+
+@override_settings(
+    LOCAL_CACHE_TTL=60,
+    USER_PRINCIPAL_CACHE_TTL=0,
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage'
+)
+class TestFilterLookups(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        cls.country = Country.objects.create(name='Testland', url_name='testland')
+        cls.city = City.objects.create(name='Springfield', country=cls.country)
+        cls.tag = Tag.objects.create(name='vip', department_id=cls.department_id)
+        company = Company.objects.create(
+            full_name='Company 1', email='office1@example.com',
+            country=cls.country, city=cls.city, owner=cls.owner,
+            department_id=cls.department_id
+        )
+        company.tags.add(cls.tag)
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.model_admin = crm_site._registry[Company]     # NOQA
+        self.clear_caches()
+
+    def tearDown(self):
+        self.clear_caches()
+
+    def test_cached_lookups(self):
+        lookups = self.get_lookups()
+        self.assertIn((self.city.id, self.city.name), lookups[ByCityFilter])
+        self.assertIn((str(self.country.id), self.country.name), lookups[ByCountryFilter])
+        self.assertIn((self.tag.id, self.tag.name), lookups[TagFilter])
+        request = self.get_request()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_lookups(request), lookups)
+
+    def test_invalidation(self):
+        self.get_lookups()
+        city = City.objects.create(name='Shelbyville', country=self.country)
+        Company.objects.create(
+            full_name='Company 2', email='office2@example.com',
+            country=self.country, city=city, owner=self.owner,
+            department_id=self.department_id
+        )
+        self.assertIn((city.id, city.name), self.get_lookups()[ByCityFilter])
+
+        tag = Tag.objects.create(name='partner', department_id=self.department_id)
+        Company.objects.get(full_name='Company 2').tags.add(tag)
+        self.assertIn((tag.id, tag.name), self.get_lookups()[TagFilter])
+
+    @override_settings(LOCAL_CACHE_TTL=0)
+    def test_facets(self):
+        objects_lookups = self.get_lookups()
+        call_command('update_filter_facets', stdout=StringIO())
+        self.assertTrue(FilterFacet.objects.filter(city=self.city).exists())
+        with override_settings(FILTER_FACETS=True):
+            facets_lookups = self.get_lookups()
+        self.assertEqual(facets_lookups, objects_lookups)
+
+    def get_lookups(self, request=None) -> dict:
+        request = request or self.get_request()
+        return {
+            f: f(request, request.GET.copy(), Company, self.model_admin).lookup_choices
+            for f in FILTERS
+        }
+
+    def get_request(self):
+        url = reverse('site:crm_company_changelist')
+        request = RequestFactory().get(url, {'country__id__exact': self.country.id})
+        request.user = self.owner
+        request.session = {}
+        UserMiddleware(lambda r: HttpResponse())(request)
+        return request
+
+    @staticmethod
+    def clear_caches():
+        for cache in _lookup_caches.values():
+            cache.clear()
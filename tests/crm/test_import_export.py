@@ -110,6 +110,9 @@ class TestImportExport(TransactionTestCase):
             f"?content_type={content_type_id}"
         response = self.client.get(export_url, follow=True)
         self.assertEqual(response.status_code, 200, response.reason_phrase)
+        file_path = get_file_path(self.owner.username, model=sender)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(b''.join(response.streaming_content))
         obj1.delete()
         obj2.delete()
 
@@ -119,7 +122,6 @@ class TestImportExport(TransactionTestCase):
                 if description == instance.description:
                     contact_queue.put(instance)
 
-        file_path = get_file_path(self.owner.username, model=sender)
         response = self.client.get(import_url, follow=True)
         self.assertEqual(response.status_code, 200, response.reason_phrase)
         self.assertEqual(response.redirect_chain, [])
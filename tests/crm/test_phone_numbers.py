@@ -0,0 +1,80 @@
+from io import StringIO
+from django.core.management import call_command
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import USER_MODEL
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Lead
+from crm.models import PhoneNumber
+from crm.utils.phone_numbers import get_phone_q_params
+from tests.base_test_classes import BaseTestCase
+from voip.views.voipwebhook import find_objects_by_phone
+
+# manage.py test tests.crm.test_phone_numbers --noinput
+
+
+class TestPhoneNumbers(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        company = Company.objects.create(
+            full_name='Company 1', email='office@example.com',
+            owner=cls.owner, department_id=cls.department_id
+        )
+        cls.contact = Contact.objects.create(
+            first_name='John', email='john@example.com', company=company,
+            phone='+1 (800) 555-12-34', mobile='8 050 111 2233',
+            owner=cls.owner, department_id=cls.department_id
+        )
+        cls.lead = Lead.objects.create(
+            first_name='Jane', email='jane@example.com',
+            phone='+44 20 7946 0018', owner=cls.owner,
+            department_id=cls.department_id
+        )
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_suffix_and_exact_match(self):
+        for phone in ('18005551234', '555 1234', '(050) 111-22-33'):
+            self.assertEqual(self.find(Contact, phone), [self.contact], phone)
+        self.assertEqual(self.find(Contact, '+1-800-555-1234', exact=True), [self.contact])
+        self.assertEqual(self.find(Contact, '555 1234', exact=True), [])
+        self.assertEqual(self.find(Contact, '5551299'), [])
+        self.assertEqual(self.find(Lead, '555 1234'), [])
+        self.assertFalse(get_phone_q_params(Contact, '1234'))
+
+    def test_update_on_save_and_delete(self):
+        self.contact.phone = '+1 (800) 555-99-99'
+        self.contact.save()
+        self.assertEqual(self.find(Contact, '5559999'), [self.contact])
+        self.assertEqual(self.find(Contact, '5551234'), [])
+        self.assertEqual(self.find(Contact, '0501112233'), [self.contact])
+        self.contact.delete()
+        self.assertFalse(PhoneNumber.objects.filter(
+            content_type__model='contact', object_id=self.contact.id
+        ).exists())
+
+    def test_backfill(self):
+        Lead.objects.filter(id=self.lead.id).update(phone='+44 20 7946 0099')
+        self.assertEqual(self.find(Lead, '7946 0099'), [])
+        out = StringIO()
+        call_command('backfill_phone_numbers', 'crm.Lead', stdout=out)
+        self.assertIn('crm.Lead: 1 phone numbers', out.getvalue())
+        self.assertEqual(self.find(Lead, '7946 0099'), [self.lead])
+
+    def test_find_objects_by_phone(self):
+        contact, lead, _deal, error = find_objects_by_phone('8005551234')
+        self.assertEqual((contact, lead, error), (self.contact, None, ''))
+        contact, lead, _deal, error = find_objects_by_phone('20 7946 0018')
+        self.assertEqual((contact, lead, error), (None, self.lead, ''))
+        contact, lead, _deal, error = find_objects_by_phone('0018')
+        self.assertEqual((contact, lead), (None, None))
+
+    @staticmethod
+    def find(model, phone: str, exact: bool = False) -> list:
+        return list(model.objects.filter(get_phone_q_params(model, phone, exact)))
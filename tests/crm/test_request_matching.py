@@ -0,0 +1,176 @@
+from io import StringIO
+from django.core.management import call_command
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import USER_MODEL
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Country
+from crm.models import Lead
+from crm.models import MatchKey
+from crm.models import Request
+from crm.utils.matching import RequestMatcher
+from settings.models import PublicEmailDomain
+from tests.base_test_classes import BaseTestCase
+from tests.utils.helpers import get_country_instance
+
+# manage.py test tests.crm.test_request_matching --noinput
+
+
+class TestRequestMatching(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        cls.country = get_country_instance()
+        cls.company = Company.objects.create(
+            full_name='Acme Trading LLC', alternative_names='Acme, ACME Trade',
+            email='office@acme.example.com, sales@acme.example.com',
+            website='https://www.acme.example.com/en/', country=cls.country,
+            owner=cls.owner, department_id=cls.department_id
+        )
+        cls.contact = Contact.objects.create(
+            first_name='Tom', last_name='Smith', email='Tom@acme.example.com',
+            phone='+1 (800) 555-12-34', company=cls.company,
+            owner=cls.owner, department_id=cls.department_id
+        )
+        cls.lead = Lead.objects.create(
+            first_name='Tom', last_name='Brown', email='tom.brown@example.net',
+            phone='+1 (800) 555-12-34', company_name='Brown & Co',
+            owner=cls.owner, department_id=cls.department_id
+        )
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_keys(self):
+        keys = set(MatchKey.objects.filter(
+            content_type__model='company', object_id=self.company.id
+        ).values_list('kind', 'value'))
+        self.assertEqual(keys, {
+            ('name', 'acmetradingllc'), ('name', 'acme'), ('name', 'acmetrade'),
+            ('domain', 'acme.example.com'),
+        })
+        self.contact.secondary_email = 'TOM@home.example.org'
+        self.contact.save()
+        self.assertTrue(MatchKey.objects.filter(
+            content_type__model='contact', object_id=self.contact.id,
+            kind='email', value='tom@home.example.org'
+        ).exists())
+
+    def test_ranking(self):
+        # the same phone number, the email of the lead wins
+        request = self.get_request(email='"Tom" <TOM.BROWN@example.net>')
+        self.assertEqual(self.find_contact_or_lead(request), self.lead)
+        # the same phone number, the company name of the lead wins
+        request = self.get_request(company_name='BROWN & CO.')
+        self.assertEqual(self.find_contact_or_lead(request), self.lead)
+        # the same phone number, the contact wins the tie
+        request = self.get_request()
+        self.assertEqual(self.find_contact_or_lead(request), self.contact)
+        self.assertEqual(request.company, self.company)
+        # the first name does not match
+        request = self.get_request(first_name='Ann')
+        self.assertFalse(request.find_contact_or_lead())
+        # the full name only
+        request = self.get_request(phone='', last_name='brown')
+        self.assertEqual(self.find_contact_or_lead(request), self.lead)
+
+    def test_namesake_of_another_company(self):
+        # the full name only, the company name of the contact
+        request = self.get_request(
+            phone='', last_name='Smith', company_name='Acme Trading'
+        )
+        self.assertEqual(self.find_contact_or_lead(request), self.contact)
+        # the full name only, another company
+        request = self.get_request(
+            phone='', last_name='Smith', company_name='Globex Corporation'
+        )
+        self.assertFalse(request.find_contact_or_lead())
+        self.assertIsNone(request.contact)
+
+    def test_find_company(self):
+        for params in (
+            {'company_name': 'ACME - Trading, LLC.'},
+            {'company_name': 'Acme Trade'},
+            {'email': 'ann@acme.example.com'},
+            {'website': 'http://acme.example.com'},
+            {'phone': '8005551234'},
+        ):
+            request = self.get_request(**{'phone': '', **params})
+            request.find_company()
+            self.assertEqual(request.company, self.company, params)
+            self.assertTrue(request.verification_required)
+
+        PublicEmailDomain.objects.get_or_create(domain='acme.example.com')
+        request = self.get_request(phone='', email='ann@acme.example.com')
+        request.find_company()
+        self.assertIsNone(request.company)
+
+    def test_country_breaks_tie(self):
+        country = Country.objects.create(name='Sweden', url_name='Sweden')
+        company = Company.objects.create(
+            full_name='Acme Trading LLC', email='office@acme.example.se',
+            country=country, owner=self.owner, department_id=self.department_id
+        )
+        request = self.get_request(phone='', company_name='Acme Trading LLC')
+        request.find_company()
+        self.assertEqual(request.company, self.company)
+        request = self.get_request(
+            phone='', company_name='Acme Trading LLC', country=country
+        )
+        request.find_company()
+        self.assertEqual(request.company, company)
+
+    def test_number_of_queries(self):
+        requests = [
+            self.get_request(email=f'person{i}@example.net', company_name=f'Company {i}')
+            for i in range(20)
+        ]
+        requests.append(self.get_request())
+        matcher = RequestMatcher(requests)
+        # the public domains, the keys, the contacts and the leads
+        with self.assertNumQueries(4):
+            for request in requests:
+                matcher.set_contact_or_lead(request)
+                matcher.set_company(request)
+        self.assertEqual(requests[-1].contact, self.contact)
+
+    def test_rematch_requests(self):
+        unmatched = Request.objects.create(
+            request_for='Inquiry', first_name='Tom', email='tom@acme.example.com',
+            owner=self.owner, department_id=self.department_id
+        )
+        linked = Request.objects.create(
+            request_for='Inquiry', first_name='Tom', email='tom@acme.example.com',
+            lead=self.lead, company=self.company,
+            owner=self.owner, department_id=self.department_id
+        )
+        out = StringIO()
+        call_command('rematch_requests', '--dry-run', stdout=out)
+        self.assertIn('1 requests linked', out.getvalue())
+        unmatched.refresh_from_db()
+        self.assertIsNone(unmatched.contact)
+
+        call_command('rematch_requests', stdout=StringIO())
+        unmatched.refresh_from_db()
+        linked.refresh_from_db()
+        self.assertEqual(
+            (unmatched.contact, unmatched.company, unmatched.verification_required),
+            (self.contact, self.company, True)
+        )
+        self.assertEqual((linked.contact, linked.lead), (None, self.lead))
+
+    def get_request(self, **kwargs) -> Request:
+        params = {
+            'request_for': 'Inquiry', 'first_name': 'Tom', 'email': '',
+            'phone': '8005551234', 'owner': self.owner, **kwargs
+        }
+        return Request(**params)
+
+    @staticmethod
+    def find_contact_or_lead(request: Request):
+        request.find_contact_or_lead()
+        return request.contact or request.lead
@@ -0,0 +1,125 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from common.utils.helpers import get_department_id
+from common.utils.helpers import USER_MODEL
+from crm.models import Company
+from crm.models import Contact
+from crm.models import Deal
+from crm.models import SearchDocument
+from crm.models import Stage
+from crm.utils.search import get_search_backend
+from crm.utils.search import SQLiteBackend
+from tests.base_test_classes import BaseTestCase
+from tests.utils.helpers import get_country_instance
+
+# manage.py test tests.crm.test_search_index --noinput
+
+
+@override_settings(
+    SEARCH_BACKEND='auto',
+    MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage'
+)
+class TestSearchIndex(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.department_id = get_department_id(cls.owner)
+        cls.stage = Stage.objects.filter(department_id=cls.department_id).first()
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.company = Company.objects.create(
+            full_name='Acme Rockets', email='office@acme.example.com',
+            description='Supplier of jet propelled skates',
+            country=get_country_instance(), owner=self.owner,
+            department_id=self.department_id
+        )
+        self.contact = Contact.objects.create(
+            first_name='Wile', last_name='Coyote', email='wile@acme.example.com',
+            company=self.company, owner=self.owner,
+            department_id=self.department_id
+        )
+        self.deal = Deal.objects.create(
+            name='Rocket skates', next_step='Demo', stage=self.stage,
+            next_step_date='2026-01-01', company=self.company,
+            contact=self.contact, owner=self.owner,
+            department_id=self.department_id
+        )
+
+    def test_backend(self):
+        backend = get_search_backend()
+        self.assertIsInstance(backend, SQLiteBackend)
+        queryset = backend.search(Company.objects.all(), 'rockets')
+        self.assertIn('crm_searchdocument_fts MATCH', str(queryset.query))
+
+    def test_search(self):
+        self.assertEqual(self.search(Company, 'propelled'), [self.company.id])
+        self.assertEqual(self.search(Company, 'ACME jet'), [self.company.id])
+        self.assertEqual(self.search(Company, '"jet propelled"'), [self.company.id])
+        self.assertEqual(self.search(Company, 'acme gas'), [])
+        # terms shorter than trigrams are looked for with LIKE
+        self.assertEqual(self.search(Company, 'Ac Ro'), [self.company.id])
+        self.assertEqual(self.search(Contact, 'coyote rockets'), [self.contact.id])
+
+    def test_incremental_update(self):
+        self.company.full_name = 'Ajax Explosives'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+        self.assertEqual(self.search(Company, 'rockets'), [])
+        self.assertEqual(self.search(Company, 'ajax'), [self.company.id])
+        # documents of deals and contacts contain company fields
+        self.assertEqual(self.search(Deal, 'explosives'), [self.deal.id])
+        self.assertEqual(self.search(Contact, 'explosives'), [self.contact.id])
+
+        deal_id = self.deal.id
+        self.deal.delete()
+        self.assertFalse(
+            SearchDocument.objects.filter(
+                content_type__model='deal', object_id=deal_id
+            ).exists()
+        )
+
+    def test_unchanged_fields(self):
+        with CaptureQueriesContext(connection) as context, \
+                self.captureOnCommitCallbacks() as callbacks:
+            self.company.owner = USER_MODEL.objects.get(username="Adam.Admin")
+            self.company.save()
+            self.deal.save(update_fields=['next_step_date'])
+        self.assertFalse(callbacks)
+        self.assertFalse(
+            [q for q in context.captured_queries if 'crm_searchdocument' in q['sql']]
+        )
+        # the documents of the deals contain the country name
+        country = self.company.country
+        country.name = 'Atlantis'
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            country.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.search(Deal, 'atlantis'), [self.deal.id])
+
+    def test_rebuild(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.search(Deal, 'skates'), [])
+        call_command('rebuild_search_index', 'crm.Deal', stdout=StringIO())
+        self.assertEqual(self.search(Deal, 'skates'), [self.deal.id])
+
+    def test_changelist(self):
+        self.client.force_login(self.owner)
+        url = reverse('site:crm_deal_changelist')
+        response = self.client.get(url, {'q': 'acme skates', 'active': 'all'})
+        self.assertEqual(response.status_code, 200, response.reason_phrase)
+        self.assertEqual(
+            [d.id for d in response.context['cl'].result_list], [self.deal.id]
+        )
+
+    @staticmethod
+    def search(model, search_term: str) -> list:
+        queryset = get_search_backend().search(model.objects.all(), search_term)
+        return list(queryset.values_list('id', flat=True))
@@ -0,0 +1,75 @@
+import multiprocessing
+import tempfile
+import threading
+from time import sleep
+from django.test import TestCase
+from django.test import override_settings
+
+from crm.utils.crm_imap import CrmIMAP
+from crm.utils.imap_lease import lease_metrics
+from crm.utils.imap_lease import ProcessLock
+
+# manage.py test tests.crm.utils.test_crm_imap_lease --noinput
+
+
+@override_settings(REUSE_IMAP_CONNECTION=True, IMAP_LEASE_TIMEOUT=5)
+class TestCrmImapLease(TestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_lock_waits_for_release(self):
+        crmimap = CrmIMAP(f'{self._testMethodName}@example.com')
+        self.assertFalse(crmimap.try_lock())
+        holders = []
+
+        def customer():
+            crmimap.lock()
+            holders.append(threading.current_thread().name)
+            crmimap.release()
+
+        thread = threading.Thread(target=customer, name='customer')
+        thread.start()
+        sleep(0.1)
+        self.assertFalse(holders)
+        crmimap.release()
+        thread.join(2)
+        self.assertEqual(holders, ['customer'])
+        data = lease_metrics.as_dict()[crmimap.email_host_user]
+        self.assertEqual(data['leases'], 2)
+        self.assertEqual(data['contended'], 1)
+        self.assertGreater(data['max_wait'], 0.05)
+        self.assertIsNone(data['holder'])
+        self.assertTrue(crmimap.try_lock())
+
+    @override_settings(IMAP_LEASE_TIMEOUT=0.1)
+    def test_lock_timeout(self):
+        crmimap = CrmIMAP(f'{self._testMethodName}@example.com')
+        with self.assertRaises(RuntimeError):
+            crmimap.lock()
+        data = lease_metrics.as_dict()[crmimap.email_host_user]
+        self.assertEqual(data['timeouts'], 1)
+        self.assertEqual(data['holder'], threading.current_thread().name)
+
+    def test_process_lock(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with self.settings(MEDIA_ROOT=media_root):
+                ctx = multiprocessing.get_context('fork')
+                locked, release = ctx.Event(), ctx.Event()
+                child = ctx.Process(target=hold_lock, args=(locked, release))
+                child.start()
+                locked.wait(5)
+                self.assertFalse(ProcessLock('test').acquire(0.1))
+                release.set()
+                lock = ProcessLock('test')
+                self.assertTrue(lock.acquire(5))
+                lock.release()
+                child.join(5)
+
+
+def hold_lock(locked, release):
+    lock = ProcessLock('test')
+    lock.acquire(1)
+    locked.set()
+    release.wait(5)
+    lock.release()
@@ -0,0 +1,156 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Sum
+from django.test import override_settings
+
+from common.utils.helpers import get_delta_date
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Payment
+from crm.models import Rate
+from crm.utils.currency_rates import _rate_tables
+from crm.utils.currency_rates import get_amount_expression
+from crm.utils.currency_rates import get_rate_table
+from crm.utils.currency_rates import get_rate_type_expression
+from crm.utils.currency_rates import QUANTUM
+from crm.utils.currency_rates import RateTable
+from crm.utils.currency_rates import to_decimals
+from tests.base_test_classes import BaseTestCase
+
+# manage.py test tests.crm.utils.test_currency_rates --noinput
+
+FIELD = 'rate_to_state_currency'
+
+
+class TestCurrencyRates(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.today = get_today()
+        cls.currency = Currency.objects.create(
+            name='XTS', rate_to_state_currency=Decimal('2.5'),
+            rate_to_marketing_currency=Decimal('0.5')
+        )
+        Rate.objects.bulk_create([
+            Rate(
+                currency=cls.currency, payment_date=cls.today,
+                rate_to_state_currency=Decimal('1.25'),
+                rate_to_marketing_currency=Decimal('0.25'),
+                rate_type=Rate.OFFICIAL
+            ),
+            # the first rate of a date is used
+            Rate(
+                currency=cls.currency, payment_date=cls.today,
+                rate_to_state_currency=Decimal('7'),
+                rate_to_marketing_currency=Decimal('7'),
+            ),
+        ])
+        deal = Deal.objects.create(
+            name='Deal', ticket='ticket', next_step=settings.FIRST_STEP,
+            next_step_date=get_delta_date(1), owner=owner,
+            department_id=get_department_id(owner)
+        )
+        # without a rate of its date, converted at the current rate
+        cls.yesterday = cls.today - timedelta(days=1)
+        Payment.objects.bulk_create([
+            Payment(deal=deal, currency=cls.currency, amount=10,
+                    payment_date=cls.today),
+            Payment(deal=deal, currency=cls.currency, amount=20,
+                    payment_date=cls.yesterday),
+        ])
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_rate_table(self):
+        table = RateTable()
+        values = table.convert(
+            [self.currency.id, self.currency.id],
+            [self.today, self.yesterday],
+            [Decimal(10), Decimal(20)], FIELD
+        )
+        self.assertEqual(to_decimals(values), [Decimal('12.5'), Decimal('50.0')])
+        values = table.convert([self.currency.id], [self.today], [4],
+                               'rate_to_marketing_currency')
+        self.assertEqual(to_decimals(values), [Decimal('1.0')])
+        # the window without the rate of today
+        table = RateTable(end=self.yesterday)
+        values = table.convert([self.currency.id], [self.today], [10], FIELD)
+        self.assertEqual(to_decimals(values), [Decimal('25.0')])
+
+    def test_payment_without_currency(self):
+        table = RateTable()
+        values = table.convert(
+            [None, self.currency.id], [self.today, self.today], [10, 10], FIELD
+        )
+        self.assertEqual(to_decimals(values), [Decimal(0), Decimal('12.5')])
+        self.assertEqual(
+            table.get_current_rates([None], FIELD).tolist(), [0]
+        )
+
+    def test_amount_expression(self):
+        payments = Payment.objects.filter(currency=self.currency)
+        values = payments.annotate(
+            value=get_amount_expression(FIELD),
+            rate_type=get_rate_type_expression(),
+        ).order_by('-payment_date').values_list('value', 'rate_type')
+        self.assertEqual(
+            [(round(v, 2), t) for v, t in values],
+            [(Decimal('12.5'), Rate.OFFICIAL), (Decimal('50'), Rate.APPROXIMATE)]
+        )
+        total = payments.aggregate(total=Sum(get_amount_expression(FIELD)))
+        self.assertEqual(round(total['total'], 2), Decimal('62.5'))
+
+    def test_fractional_cents(self):
+        rate = Rate.objects.create(
+            currency=self.currency, payment_date=self.yesterday,
+            rate_to_state_currency=Decimal('1.23456789'),
+            rate_to_marketing_currency=Decimal('0.1'),
+        )
+        payments = Payment.objects.filter(currency=self.currency)
+        amounts = (Decimal('0.01'), Decimal('3.33'), Decimal('1234.57'))
+        for amount in amounts:
+            payments.update(amount=amount)
+            values = payments.annotate(
+                value=get_amount_expression(FIELD)
+            ).order_by('payment_date').values_list('currency_id', 'payment_date',
+                                                   'amount', 'value')
+            converted = to_decimals(RateTable().convert(
+                *zip(*(v[:3] for v in values)), FIELD
+            ))
+            self.assertEqual(
+                converted, [Decimal(v[3]).quantize(QUANTUM) for v in values]
+            )
+            self.assertEqual(
+                converted[0], (amount * rate.rate_to_state_currency).quantize(QUANTUM)
+            )
+        self.assertEqual(to_decimals(RateTable().convert(
+            [self.currency.id], [self.yesterday], [Decimal('0.1')],
+            'rate_to_marketing_currency'
+        )), [Decimal('0.0100')])
+
+    @override_settings(LOCAL_CACHE_TTL=60)
+    def test_invalidation(self):
+        self.addCleanup(_rate_tables.clear)
+        table = get_rate_table()
+        self.assertIs(get_rate_table(), table)
+        self.assertIsNot(get_rate_table(end=self.yesterday), table)
+
+        Rate.objects.create(
+            currency=self.currency, payment_date=self.yesterday,
+            rate_to_state_currency=Decimal('3'),
+            rate_to_marketing_currency=Decimal('3'),
+        )
+        table = get_rate_table()
+        values = table.convert([self.currency.id], [self.yesterday], [20], FIELD)
+        self.assertEqual(to_decimals(values), [Decimal('60.0')])
+
+        self.currency.rate_to_state_currency = Decimal('4')
+        self.currency.save()
+        self.assertIsNot(get_rate_table(), table)
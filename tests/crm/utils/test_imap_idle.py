@@ -0,0 +1,107 @@
+import asyncio
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from crm.utils.imap_idle import ImapIdleManager
+from crm.utils.import_queue import AccountQueue
+from massmail.models import EmailAccount
+from tests.utils.fake_imap import FakeImapServer
+from tests.utils.fake_imap import get_messages
+
+# manage.py test tests.crm.utils.test_imap_idle --noinput
+
+
+class TestImapIdleManager(SimpleTestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_manager(self, idle: bool) -> ImapIdleManager:
+        self.server = FakeImapServer(get_messages(3), idle=idle)
+        self.server.start()
+        return ImapIdleManager(None, port=self.server.port, use_ssl=False)
+
+    def test_idle_push(self):
+        manager = self.get_manager(idle=True)
+        ea = get_ea(1)
+        notified = asyncio.run(self.wait_notification(manager, [ea]))
+        self.assertEqual(notified, [ea])
+        self.assertEqual(manager.state[ea.email_host_user]['mode'], 'idle')
+        self.assertEqual(manager.state[ea.email_host_user]['pushes'], 1)
+        self.assertEqual(self.server.noop_count, 0)
+
+    @override_settings(IMAP_NOOP_PERIOD=0.05)
+    def test_fallback_to_polling(self):
+        manager = self.get_manager(idle=False)
+        ea = get_ea(1)
+        notified = asyncio.run(self.wait_notification(manager, [ea]))
+        self.assertEqual(notified, [ea])
+        self.assertEqual(manager.state[ea.email_host_user]['mode'], 'poll')
+
+    def test_many_accounts_in_one_loop(self):
+        manager = self.get_manager(idle=True)
+        eas = [get_ea(i) for i in range(1, 101)]
+        notified = asyncio.run(self.wait_notification(manager, eas))
+        self.assertCountEqual(notified, eas)
+
+    @override_settings(IMAP_NOOP_PERIOD=0.05)
+    def test_accounts_queued_periodically(self):
+        # the Sent box is not watched by IDLE
+        manager = self.get_manager(idle=True)
+        manager.ea_queue = AccountQueue()
+        eas = [get_ea(1), get_ea(2)]
+
+        async def run():
+            manager.loop = asyncio.get_running_loop()
+            with patch('crm.utils.imap_idle.random', return_value=0), \
+                    patch('crm.utils.imap_idle._get_accounts', return_value=eas), \
+                    patch.object(ImapIdleManager, 'watch', return_value=None):
+                task = asyncio.create_task(manager._main())
+                await asyncio.sleep(0.02)
+                self.assertEqual(manager.ea_queue.qsize(), 2)
+                manager.ea_queue.get()
+                await asyncio.sleep(0.05)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        self.assertEqual(manager.ea_queue.qsize(), 2)
+
+    async def wait_notification(self, manager: ImapIdleManager, eas: list) -> list:
+        notified = []
+        done = asyncio.Event()
+
+        def notify(ea):
+            notified.append(ea)
+            if len(notified) == len(eas):
+                done.set()
+
+        tasks = [asyncio.create_task(manager.watch(ea, notify)) for ea in eas]
+        for _ in range(100):
+            modes = [manager.state.get(ea.email_host_user, {}).get('mode') for ea in eas]
+            if all(modes):
+                break
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.1)
+        self.server.add_message(get_messages(1)[1])
+        try:
+            await asyncio.wait_for(done.wait(), 5)
+        except asyncio.TimeoutError:
+            pass
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return notified
+
+
+def get_ea(pk: int) -> EmailAccount:
+    return EmailAccount(
+        pk=pk,
+        email_host_user=f'user{pk}@example.com',
+        email_host_password='password',
+        imap_host='127.0.0.1'
+    )
@@ -0,0 +1,124 @@
+import email
+from unittest.mock import MagicMock
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import override_settings
+
+from crm.models import CrmEmail
+from crm.utils.crm_imap import get_uid_set
+from crm.utils.helpers import get_email_date
+from crm.utils.helpers import get_import_limits
+from crm.utils.import_emails import exclude_existing
+from crm.utils.import_emails import fetch_messages
+from crm.utils.import_emails import ImportWorker
+from crm.utils.import_emails import parse_fetch_response
+from crm.utils.import_emails import parse_message_bytes
+from massmail.models import EmailAccount
+from tests.utils.fake_imap import connect_crmimap
+from tests.utils.fake_imap import FakeImapServer
+from tests.utils.fake_imap import get_messages
+
+# manage.py test tests.crm.utils.test_import_emails --noinput
+
+
+class TestImportEmails(SimpleTestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.ea = EmailAccount(
+            email_host_user='andrew@example.com',
+            imap_host='127.0.0.1'
+        )
+
+    def test_get_uid_set(self):
+        self.assertEqual(get_uid_set([b'7', b'1', b'3', b'2']), '1:3,7')
+        self.assertEqual(get_uid_set([b'5']), '5')
+        self.assertEqual(get_uid_set([b'1', b'3', b'4', b'6']), '1,3:4,6')
+
+    def test_parse_fetch_response(self):
+        data = [
+            (b'1 (UID 11 RFC822 {5}', b'msg11'), b')',
+            (b'2 (RFC822 {5}', b'msg12'), b' UID 12)',
+            (b'3 (UID 13 RFC822 {5}', b'msg13'), b')',
+        ]
+        self.assertEqual(
+            parse_fetch_response(data),
+            {b'11': b'msg11', b'12': b'msg12', b'13': b'msg13'}
+        )
+        self.assertEqual(parse_message_bytes(b'12', data), b'msg12')
+        self.assertIsNone(parse_message_bytes(b'14', data))
+
+    @override_settings(
+        IMAP_FETCH_BATCH_SIZE=10, IMAP_IMPORT_LIMIT=30,
+        IMAP_IMPORT_ACCOUNTS={'andrew@example.com': {'limit': 100}}
+    )
+    def test_get_import_limits(self):
+        self.assertEqual(get_import_limits(self.ea), (10, 100))
+        self.ea.email_host_user = 'eve@example.com'
+        self.assertEqual(get_import_limits(self.ea), (10, 30))
+
+    def test_fetch_messages(self):
+        messages = get_messages(5)
+        server = FakeImapServer(messages)
+        server.start()
+        try:
+            crmimap = connect_crmimap(server, self.ea)
+            uids = [b'1', b'2', b'3', b'5', b'7']
+            fetched = fetch_messages(crmimap, uids)
+            crmimap.close_and_logout()
+        finally:
+            server.stop()
+        self.assertEqual(
+            fetched,
+            {str(uid).encode(): messages[uid] for uid in (1, 2, 3, 5)}
+        )
+        # one batch command and one retry for the missing message
+        self.assertEqual(server.fetch_count, 2)
+
+
+class TestImportWorker(SimpleTestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    @patch('crm.utils.import_emails.get_crmimap', return_value=None)
+    def test_pushed_emails_imported_at_once(self, get_crmimap):
+        ea = EmailAccount(pk=1, email_host_user='andrew@example.com',
+                          imap_host='127.0.0.1')
+        ea.refresh_from_db = MagicMock()
+        ea.save = MagicMock()
+        worker = ImportWorker(MagicMock())
+        worker.import_emails(ea, force=True)
+        self.assertEqual(get_crmimap.call_count, 1)
+        # a periodic import within control_period is skipped
+        worker.import_emails(ea)
+        self.assertEqual(get_crmimap.call_count, 1)
+        # the second push
+        worker.import_emails(ea, force=True)
+        self.assertEqual(get_crmimap.call_count, 2)
+
+
+class TestExcludeExisting(TestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_exclude_existing(self):
+        messages = {
+            str(uid).encode(): b_msg
+            for uid, b_msg in get_messages(10).items()
+        }
+        for uid in (b'2', b'5'):
+            msg = email.message_from_bytes(
+                messages[uid], policy=email.policy.default)
+            CrmEmail.objects.create(
+                message_id=msg['Message-ID'],
+                creation_date=get_email_date(msg),
+                incoming=True
+            )
+        with self.assertNumQueries(1):
+            new_messages = exclude_existing(messages)
+        self.assertEqual(len(new_messages), 8)
+        self.assertNotIn(b'2', new_messages)
+        self.assertNotIn(b'5', new_messages)
@@ -0,0 +1,74 @@
+import threading
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from crm.utils.import_queue import AccountQueue
+from crm.utils.import_queue import ImportMetrics
+from massmail.models import EmailAccount
+
+# manage.py test tests.crm.utils.test_import_queue --noinput
+
+
+@override_settings(IMAP_HOST_CONNECTIONS=1)
+class TestAccountQueue(SimpleTestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.ea1 = EmailAccount(pk=1, email_host_user='a@example.com', imap_host='imap.a.com')
+        self.ea2 = EmailAccount(pk=2, email_host_user='b@example.com', imap_host='imap.a.com')
+        self.ea3 = EmailAccount(pk=3, email_host_user='c@example.com', imap_host='imap.c.com')
+        self.queue = AccountQueue()
+
+    def test_account_queued_once(self):
+        self.assertTrue(self.queue.put(self.ea1))
+        self.assertFalse(self.queue.put(self.ea1))
+        self.assertEqual(self.queue.qsize(), 1)
+
+    def test_host_limit(self):
+        for ea in (self.ea1, self.ea2, self.ea3):
+            self.queue.put(ea)
+        ea, *_ = self.queue.get()
+        self.assertEqual(ea, self.ea1)
+        # ea2 is skipped since the host 'imap.a.com' is busy
+        ea, *_ = self.queue.get()
+        self.assertEqual(ea, self.ea3)
+        self.queue.task_done(self.ea1)
+        ea, *_ = self.queue.get()
+        self.assertEqual(ea, self.ea2)
+
+    def test_active_account_is_not_handed_out(self):
+        self.queue.put(self.ea3)
+        self.queue.get()
+        self.queue.put(self.ea3)    # queued again while importing
+        got = []
+        worker = threading.Thread(target=lambda: got.append(self.queue.get()))
+        worker.start()
+        worker.join(0.2)
+        self.assertFalse(got)
+        self.queue.task_done(self.ea3)
+        worker.join(2)
+        self.assertEqual(got[0][0], self.ea3)
+
+    def test_pushed_account(self):
+        self.queue.put(self.ea1)
+        self.queue.put(self.ea1, pushed=True)
+        self.assertEqual(self.queue.qsize(), 1)
+        ea, _, pushed = self.queue.get()
+        self.assertTrue(pushed)
+        # a push during the import queues the account again
+        self.queue.put(self.ea1, pushed=True)
+        self.queue.task_done(self.ea1)
+        self.assertEqual(self.queue.get()[2], True)
+        self.queue.task_done(self.ea1)
+        self.queue.put(self.ea1)
+        self.assertEqual(self.queue.get()[2], False)
+
+    def test_metrics(self):
+        metrics = ImportMetrics()
+        metrics.add(self.ea1, 2, 5)
+        metrics.add(self.ea1, 1, 3)
+        data = metrics.as_dict()['a@example.com']
+        self.assertEqual(data['imports'], 2)
+        self.assertEqual(data['queue_wait'], 1)
+        self.assertEqual(data['max_queue_wait'], 2)
+        self.assertEqual(data['total_duration'], 8)
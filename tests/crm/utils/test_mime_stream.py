@@ -0,0 +1,64 @@
+import email
+import os
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from crm.utils.mime_stream import parse_message
+from crm.utils.mime_stream import spool_message
+from crm.utils.mime_stream import spool_payload
+from tests.utils.helpers import get_email_message
+
+# manage.py test tests.crm.utils.test_mime_stream --noinput
+
+
+@override_settings(IMAP_MESSAGE_MEMORY_LIMIT=1000, IMAP_PARSE_CHUNK_SIZE=100)
+class TestMimeStream(SimpleTestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.msg, self.content, self.subject_str = get_email_message()
+        self.data = os.urandom(5000)
+        self.msg.add_attachment(
+            self.data, maintype='application', subtype='octet-stream',
+            filename='data.bin'
+        )
+        self.msg.add_attachment(
+            'Grüße, café. ' * 300, subtype='plain', cte='quoted-printable',
+            filename='text.txt'
+        )
+
+    def test_spool_message(self):
+        b_msg = self.msg.as_bytes()
+        self.assertEqual(spool_message(b'small message'), b'small message')
+        f = spool_message(b_msg)
+        self.assertEqual(f.read(), b_msg)
+        f.close()
+
+    def test_parse_message(self):
+        b_msg = self.msg.as_bytes()
+        expected = email.message_from_bytes(b_msg, policy=email.policy.default)
+        for source in (b_msg, spool_message(b_msg)):
+            msg = parse_message(source)
+            self.assertEqual(msg['Subject'], self.subject_str)
+            self.assertEqual(msg.as_bytes(), expected.as_bytes())
+        with self.assertRaises(TypeError):
+            parse_message(self.msg)
+
+    def test_spool_payload(self):
+        msg = parse_message(self.msg.as_bytes())
+        attachments = list(msg.iter_attachments())
+        self.assertEqual(len(attachments), 2)
+        for part in attachments:
+            expected = part.get_payload(decode=True)
+            with spool_payload(part) as f:
+                self.assertEqual(f.read(), expected)
+            self.assertEqual(part.get_payload(), '')
+        self.assertEqual(expected.decode().strip(), ('Grüße, café. ' * 300).strip())
+
+    def test_spool_defective_payload(self):
+        part = email.message.EmailMessage()
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.set_payload('aGVsbG8gd29ybGQ')     # missing padding
+        expected = part.get_payload(decode=True)
+        with spool_payload(part) as f:
+            self.assertEqual(f.read(), expected)
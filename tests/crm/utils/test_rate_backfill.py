@@ -0,0 +1,162 @@
+import tempfile
+from datetime import timedelta
+from unittest.mock import call
+from unittest.mock import patch
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from analytics.utils.rollups import compare_rollups
+from analytics.utils.rollups import rebuild_rollups
+from common.utils.helpers import get_delta_date
+from common.utils.helpers import get_department_id
+from common.utils.helpers import get_today
+from common.utils.helpers import USER_MODEL
+from crm.models import Currency
+from crm.models import Deal
+from crm.models import Payment
+from crm.models import Rate
+from crm.utils.rate_backfill import backfill_rates
+from crm.utils.rate_backfill import get_missing_rates
+from tests.base_test_classes import BaseTestCase
+from tests.utils.fake_rate_backend import FakeRangeRateBackend
+from tests.utils.fake_rate_backend import FakeRateBackend
+from tests.utils.fake_rate_backend import get_rate
+
+# manage.py test tests.crm.utils.test_rate_backfill --noinput
+
+
+class TestRateBackfill(BaseTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        owner = USER_MODEL.objects.get(username="Andrew.Manager.Global")
+        cls.usd = Currency.objects.get(name='USD')
+        cls.eur = Currency.objects.get(name='EUR')
+        cls.today = today = get_today()
+        cls.usd_dates = [today - timedelta(days=d) for d in (40, 38, 3)]
+        cls.eur_date = today - timedelta(days=11)
+        deal = Deal.objects.create(
+            name='Deal', ticket='ticket', next_step=settings.FIRST_STEP,
+            next_step_date=get_delta_date(1), owner=owner,
+            department_id=get_department_id(owner)
+        )
+        payments = [
+            (cls.usd, d, Payment.RECEIVED)
+            for d in (*cls.usd_dates, cls.usd_dates[-1], today)
+        ] + [
+            (cls.usd, today - timedelta(days=20), Payment.GUARANTEED),
+            (cls.eur, cls.eur_date, Payment.RECEIVED),
+            (cls.eur, today - timedelta(days=10), Payment.RECEIVED),
+        ]
+        Payment.objects.bulk_create(
+            Payment(deal=deal, currency=currency, amount=100,
+                    payment_date=payment_date, status=status)
+            for currency, payment_date, status in payments
+        )
+        Rate.objects.bulk_create([
+            # the approximate rates are replaced
+            *(
+                Rate(currency=cls.usd, payment_date=cls.usd_dates[0],
+                     rate_to_state_currency=0, rate_to_marketing_currency=0)
+                for _i in range(2)
+            ),
+            Rate(currency=cls.eur, payment_date=today - timedelta(days=10),
+                 rate_to_state_currency=0, rate_to_marketing_currency=0,
+                 rate_type=Rate.OFFICIAL),
+        ])
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        FakeRateBackend.requests = []
+        FakeRateBackend.failing = set()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_manager = self.settings(MEDIA_ROOT=media_root.name)
+        settings_manager.enable()
+        self.addCleanup(settings_manager.disable)
+
+    def test_missing_rates(self):
+        self.assertEqual(get_missing_rates(self.today), {
+            self.usd.id: self.usd_dates,
+            self.eur.id: [self.eur_date],
+        })
+
+    def test_backfill_rates(self):
+        with CaptureQueriesContext(connection) as context:
+            number, errors = backfill_rates(
+                self.usd, FakeRangeRateBackend, self.today, range_days=31, delay=0
+            )
+        self.assertEqual((number, errors), (4, []))
+        # up to three queries of the rates per range
+        rate_queries = [
+            q for q in context.captured_queries
+            if q['sql'].startswith(('SELECT "crm_rate"', 'UPDATE "crm_rate"',
+                                    'INSERT INTO "crm_rate"'))
+        ]
+        self.assertLessEqual(len(rate_queries), 3 * 3)
+        self.assertEqual(FakeRateBackend.requests, [
+            ('USD', self.usd_dates[0], self.usd_dates[1]),
+            ('USD', self.usd_dates[2], self.usd_dates[2]),
+            ('EUR', self.eur_date, self.eur_date),
+        ])
+        rates = Rate.objects.filter(rate_type=Rate.OFFICIAL)
+        self.assertEqual(rates.count(), 6)
+        self.assertFalse(Rate.objects.filter(rate_type=Rate.APPROXIMATE).exists())
+        for r in rates.filter(currency=self.usd):
+            self.assertAlmostEqual(
+                float(r.rate_to_state_currency), get_rate('USD', r.payment_date)
+            )
+            self.assertEqual(r.rate_to_marketing_currency, 1)
+
+        self.assertEqual(
+            backfill_rates(self.usd, FakeRangeRateBackend, self.today, delay=0),
+            (0, [])
+        )
+        self.assertEqual(len(FakeRateBackend.requests), 3)
+
+    def test_delay(self):
+        with patch('time.sleep') as sleep:
+            backfill_rates(self.usd, FakeRateBackend, self.today, delay=0.5)
+        # between the ranges and between the dates of a range
+        self.assertEqual(len(FakeRateBackend.requests), 4)
+        self.assertEqual(sleep.call_args_list, [call(0.5)] * 3)
+
+    def test_rollups(self):
+        rebuild_rollups()
+        self.assertEqual(compare_rollups(), [])
+        backfill_rates(self.usd, FakeRateBackend, self.today, delay=0)
+        # the income of the payments is converted at the official rates
+        self.assertEqual(compare_rollups(), [])
+
+    def test_resume(self):
+        FakeRateBackend.failing = {'EUR'}
+        number, errors = backfill_rates(
+            self.usd, FakeRateBackend, self.today, delay=0
+        )
+        self.assertEqual(number, 3)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('EUR', errors[0])
+        # only the needed dates are requested from a backend without ranges
+        self.assertEqual(FakeRateBackend.requests, [
+            *(('USD', d, d) for d in self.usd_dates),
+            ('EUR', self.eur_date, self.eur_date),
+        ])
+
+        # the received rates are not requested again
+        Rate.objects.filter(
+            currency=self.usd, payment_date__in=self.usd_dates[1:]
+        ).delete()
+        FakeRateBackend.requests = []
+        FakeRateBackend.failing = set()
+        number, errors = backfill_rates(
+            self.usd, FakeRateBackend, self.today, delay=0
+        )
+        self.assertEqual((number, errors), (3, []))
+        self.assertEqual(FakeRateBackend.requests, [
+            ('EUR', self.eur_date, self.eur_date),
+        ])
+        self.assertFalse(get_missing_rates(self.today))
+        rate = Rate.objects.get(currency=self.eur, payment_date=self.eur_date)
+        self.assertEqual(rate.rate_to_state_currency, 1)
@@ -1,12 +1,21 @@
 from queue import Empty
+from unittest.mock import patch
 from django.apps import apps
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core import mail
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import override_settings
 from django.test import TransactionTestCase
 
 from common.utils.helpers import get_today
+from common.models import TheFile
+from common.utils.site_cache import GENERATION_KEY
 from crm.models import CrmEmail, Deal, Request
+from crm.models import SearchDocument
 from crm.utils.restore_imap_emails import EXCEPT_SUBJECT
+from crm.utils.restore_imap_emails import RestoreImapEmails
 from crm.utils.ticketproc import get_ticket_str
 from crm.utils.ticketproc import new_ticket
 from massmail.models.email_account import EmailAccount
@@ -64,6 +73,63 @@ class TestRestoreImapEmails(TransactionTestCase):
         except CrmEmail.DoesNotExist:
             self.fail("Expected Email not created in db")
 
+    def test_restore_batch(self):
+        """Test restore a batch of emails of one deal in one write"""
+        with patch.object(RestoreImapEmails, 'save_one') as save_one:
+            deal = self._restore_batch()
+        save_one.assert_not_called()
+        self.assertEqual(CrmEmail.objects.filter(deal=deal).count(), 5)
+        self.assertEqual(TheFile.objects.count(), 5)
+        self.assertEqual(deal.workflow.count('Received an email from'), 5)
+        self.ea.refresh_from_db()
+        self.assertEqual(self.ea.start_incoming_uid, 16)
+
+    @override_settings(SEARCH_BACKEND='auto')
+    def test_restore_batch_index(self):
+        """Test the emails of a batch are indexed and the site cache is reset"""
+        key = GENERATION_KEY.format('crm.crmemail')
+        generation = cache.get(key, 0)
+        with patch.object(RestoreImapEmails, 'save_one') as save_one:
+            deal = self._restore_batch()
+        save_one.assert_not_called()
+        ids = CrmEmail.objects.filter(deal=deal).values_list('id', flat=True)
+        self.assertEqual(SearchDocument.objects.filter(
+            content_type=ContentType.objects.get_for_model(CrmEmail),
+            object_id__in=list(ids)
+        ).count(), 5)
+        self.assertGreater(cache.get(key, 0), generation)
+
+    def test_restore_batch_fallback(self):
+        """Test save emails one by one if the batch write fails"""
+        with patch.object(TheFile.objects, 'bulk_create',
+                          side_effect=DatabaseError):
+            deal = self._restore_batch()
+        self.assertEqual(CrmEmail.objects.filter(deal=deal).count(), 5)
+        self.assertEqual(TheFile.objects.count(), 5)
+        self.assertEqual(deal.workflow.count('Received an email from'), 5)
+        self.ea.refresh_from_db()
+        self.assertEqual(self.ea.start_incoming_uid, 16)
+
+    def _restore_batch(self) -> Deal:
+        ticket = new_ticket()
+        deal = Deal.objects.create(
+            name="Mock deal",
+            description=self.content,
+            next_step_date=get_today(),
+            ticket=ticket,
+            workflow=''
+        )
+        for uid in range(11, 16):
+            msg, _, _ = get_email_message()
+            msg.replace_header('Subject', get_ticket_str(ticket))
+            attach_file_to_email_msg(msg)
+            self.eml_queue.put((msg.as_bytes(), self.ea, 'incoming', uid, '', None))
+        self.eml_queue.join()
+        for the_file in TheFile.objects.all():
+            the_file.file.delete()
+        deal.refresh_from_db()
+        return deal
+
     def test_restore_inquiry_email(self):
         """Test restore in db an inquiry email with file"""
         file_name = attach_file_to_email_msg(self.msg)
@@ -124,14 +124,14 @@ class TesttestAdminActions(BaseTestCase):
             self.request._messages = default_storage(self.request)
             response = merge_mailing_outs(None, self.request, queryset)
             self.assertEqual(response.status_code, 302, response.reason_phrase)
-            self.assertTrue(
-                MailingOut.objects.filter(
+            try:
+                mailing_out = MailingOut.objects.get(
                     name="Test MO" + f' ({_("united")})',
-                    recipient_ids='1,2,3,4',
                     recipients_number=4
-                ).exists(),
-                "Mailing out not created"
-            )
+                )
+            except MailingOut.DoesNotExist:
+                self.fail("Mailing out not created")
+            self.assertEqual(mailing_out.get_recipient_ids(), [1, 2, 3, 4])
             self.assertFalse(
                 MailingOut.objects.filter(
                     id__in=(mo.id, mo1.id)
@@ -165,14 +165,16 @@ class TesttestAdminActions(BaseTestCase):
             response = make_mailing_out(None, self.request, queryset)
             self.assertEqual(response.status_code, 302, response.reason_phrase)
             corrected_qs = queryset.exclude(id=lead4.id)
-            recipient_ids = ",".join([str(x.id) for x in corrected_qs])
             try:
                 mailing_out = MailingOut.objects.get(
-                    recipient_ids=recipient_ids,
                     recipients_number=corrected_qs.count()
                 )
             except MailingOut.DoesNotExist:
                 self.fail("Mailing out not created")
+            self.assertEqual(
+                set(mailing_out.get_recipient_ids()),
+                set(corrected_qs.values_list('id', flat=True))
+            )
             change_url = reverse(
                 'site:massmail_mailingout_change', args=(mailing_out.id,)
             )
@@ -221,18 +223,18 @@ class TesttestAdminActions(BaseTestCase):
         department_id = get_department_id(self.owner)
         mo = MailingOut.objects.create(
             name="Test MO",
-            recipient_ids='1,2',
             recipients_number=2,
             content_type_id=1,
             owner=self.owner,
             department_id=department_id
         )
+        mo.add_recipients((1, 2))
         mo1 = MailingOut.objects.create(
             name="Test MO2",
-            recipient_ids='3,4',
             recipients_number=2,
             content_type_id=1,
             owner=self.owner,
             department_id=department_id
         )
+        mo1.add_recipients((3, 4))
         return mo, mo1
@@ -0,0 +1,122 @@
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.messages.storage import default_storage
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test import TransactionTestCase
+
+from crm.models import Lead
+from massmail.models import EmlMessage
+from massmail.models import MailingOut
+from massmail.models import MailingRecipient
+from massmail.views.exclude import exclude_recipients
+
+# manage.py test tests.massmail.test_mailing_recipients --noinput
+
+
+class TestMailingRecipients(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.content_type = ContentType.objects.get_for_model(Lead)
+        cls.eml = EmlMessage.objects.create(subject='Subject', content='Content')
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.mo = self.create_mailing_out((1, 2, 3, 4))
+
+    def test_state_transitions(self):
+        mo = self.mo
+        # state transitions touch one row, not the recipient list
+        with self.assertNumQueries(1):
+            mo.move_to_successful_ids(1)
+        mo.move_to_failed_ids(2)
+        mo.remove_recipient_ids(3)
+        self.assertEqual(mo.get_recipient_ids(), [4])
+        self.assertEqual(mo.get_successful_ids(), [1])
+        self.assertEqual(mo.get_failed_ids(), [2])
+        self.assertTrue(mo.has_failed())
+
+        mo.move_to_recipient_ids()
+        self.assertEqual(mo.get_recipient_ids(), [2, 4])
+        self.assertFalse(mo.has_failed())
+
+        updated = mo.set_recipients_status((2, 4), MailingRecipient.SUCCESSFUL)
+        self.assertEqual(updated, 2)
+        self.assertFalse(mo.has_recipients())
+        self.assertEqual(mo.get_successful_ids(), [1, 2, 4])
+
+    def test_add_recipients_ignores_existing(self):
+        self.mo.add_recipients((4, 5))
+        self.assertEqual(self.mo.get_recipient_ids(), [1, 2, 3, 4, 5])
+
+    def test_exclude_recipients(self):
+        sent = self.create_mailing_out((2, 3, 9))
+        sent.set_recipients_status((2, 3), MailingRecipient.SUCCESSFUL)
+        request = RequestFactory().get('/')
+        with self.settings(
+            MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage'
+        ):
+            request._messages = default_storage(request)
+            exclude_recipients(request, self.mo.id)
+        self.mo.refresh_from_db()
+        self.assertEqual(self.mo.get_recipient_ids(), [1, 4])
+        self.assertEqual(self.mo.recipients_number, 2)
+
+    def create_mailing_out(self, recipient_ids) -> MailingOut:
+        mo = MailingOut.objects.create(
+            name='Test MO',
+            message=self.eml,
+            content_type=self.content_type,
+            recipients_number=len(recipient_ids),
+        )
+        mo.add_recipients(recipient_ids)
+        return mo
+
+
+class TestMailingRecipientsMigration(TransactionTestCase):
+    migrate_from = [('massmail', '0001_initial')]
+    migrate_to = [('massmail', '0002_mailing_recipients')]
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_convert_ids(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldMailingOut = apps.get_model('massmail', 'MailingOut')
+        mo = OldMailingOut.objects.create(
+            name='Test MO',
+            recipients_number=5,
+            recipient_ids='1,2',
+            successful_ids='3,4',
+            failed_ids='5,2',
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        MailingOut = apps.get_model('massmail', 'MailingOut')
+        recipients = MailingOut.objects.get(
+            id=mo.id
+        ).mailing_recipients.order_by('object_id')
+        self.assertEqual(
+            list(recipients.values_list('object_id', 'status')),
+            [(1, 'P'), (2, 'P'), (3, 'S'), (4, 'S'), (5, 'F')]
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        mo = apps.get_model('massmail', 'MailingOut').objects.get(id=mo.id)
+        self.assertEqual(mo.recipient_ids, '1,2')
+        self.assertEqual(mo.successful_ids, '3,4')
+        self.assertEqual(mo.failed_ids, '5')
@@ -0,0 +1,75 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from crm.models import Lead
+from massmail.models import EmailAccount
+from massmail.models import EmlMessage
+from massmail.models import MassContact
+from massmail.models import Signature
+from massmail.utils.email_creators import email_creator
+from massmail.utils.email_creators import get_templates
+from massmail.utils.sendmassmail import get_extra_context
+
+# manage.py test tests.massmail.utils.test_email_creators --noinput
+
+
+class TestEmailCreators(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ea = EmailAccount.objects.create(
+            name='Email Account',
+            email_host='smtp.example.com',
+            email_host_user='andrew@example.com',
+            from_email='andrew@example.com',
+        )
+        cls.signature = Signature.objects.create(
+            name="Test signature",
+            content="Best regards",
+        )
+        cls.eml = EmlMessage.objects.create(
+            subject="Hello {{ first_name }}",
+            content="Dear {{ full_name }}",
+            signature=cls.signature,
+        )
+        cls.lead = Lead.objects.create(
+            first_name='Bruno',
+            last_name='Smith',
+            email='bruno@example.com',
+        )
+        cls.mc = MassContact.objects.create(
+            content_type=ContentType.objects.get_for_model(Lead),
+            object_id=cls.lead.id,
+            email_account=cls.ea,
+        )
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+
+    def test_templates_cache(self):
+        templates = get_templates(self.eml)
+        self.assertIs(get_templates(self.eml)[1], templates[1])
+
+        self.eml.content = "Hi {{ first_name }}"
+        self.eml.save()
+        msg = email_creator(
+            self.eml, self.ea, ['bruno@example.com'],
+            extra_context={'first_name': 'Bruno'}
+        )
+        self.assertEqual(msg.subject, 'Hello Bruno')
+        self.assertIn('Hi Bruno', msg.body)
+
+        self.signature.content = 'Kind regards'
+        self.signature.save()
+        msg = email_creator(self.eml, self.ea, ['bruno@example.com'])
+        self.assertIn('Kind regards', msg.body)
+
+    def test_get_extra_context(self):
+        get_extra_context(self.mc)
+        mc = MassContact.objects.get(id=self.mc.id)
+        # Only the recipient is queried
+        with self.assertNumQueries(1):
+            extra_context = get_extra_context(mc)
+        self.assertEqual(extra_context['to'], 'bruno@example.com')
+        self.assertEqual(extra_context['first_name'], 'Bruno')
+        self.assertIn(str(mc.uuid), extra_context['unsubscribe_url'])
@@ -98,10 +98,10 @@ class TestMassMil(BaseTestCase):
             status='A',
             content_type=self.lead_content_type,
             recipients_number=1,
-            recipient_ids=f"{self.lead1.id},{self.lead2.id}",
             owner=self.owner,
             department_id=get_department_id(self.owner)
         )
+        self.mo.add_recipients((self.lead1.id, self.lead2.id))
 
     def test_send_2_recipient(self):
         # with self.settings(TESTING=True):
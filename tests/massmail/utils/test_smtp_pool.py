@@ -0,0 +1,82 @@
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+from django.test import override_settings
+
+from massmail.models import EmailAccount
+from massmail.utils.smtp_pool import SmtpPool
+from tests.utils.fake_smtp import FakeSmtpServer
+
+# manage.py test tests.massmail.utils.test_smtp_pool --noinput
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+    MASSMAIL_MESSAGES_PER_CONNECTION=100,
+    MASSMAIL_RECONNECT_ATTEMPTS=1
+)
+class TestSmtpPool(SimpleTestCase):
+
+    def setUp(self):
+        print("Run Test Method:", self._testMethodName)
+        self.server = None
+
+    def tearDown(self):
+        if self.server:
+            self.server.stop()
+
+    def test_connection_reuse(self):
+        ea = self._get_ea()
+        with SmtpPool() as pool:
+            for _ in range(10):
+                pool.send(ea, get_message())
+        self.assertEqual(self.server.messages, 10)
+        self.assertEqual(self.server.connections, 1)
+        stats = pool.get_stats()[ea.email_host_user]
+        self.assertEqual(stats['handshakes'], 1)
+        self.assertEqual(stats['messages'], 10)
+
+    @override_settings(MASSMAIL_MESSAGES_PER_CONNECTION=3)
+    def test_messages_per_connection(self):
+        ea = self._get_ea()
+        with SmtpPool() as pool:
+            for _ in range(7):
+                pool.send(ea, get_message())
+        self.assertEqual(self.server.messages, 7)
+        self.assertEqual(self.server.connections, 3)
+
+    def test_reconnect(self):
+        ea = self._get_ea(drop_after=2)
+        with SmtpPool() as pool:
+            for _ in range(5):
+                pool.send(ea, get_message())
+        self.assertEqual(self.server.messages, 5)
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(pool.get_stats()[ea.email_host_user]['reconnects'], 2)
+
+    def test_accounts(self):
+        ea = self._get_ea()
+        ea2 = EmailAccount(
+            pk=2, email_host='127.0.0.1', email_port=self.server.port,
+            email_host_user='eve@example.com', email_host_password='password',
+        )
+        with SmtpPool() as pool:
+            for _ in range(3):
+                pool.send(ea, get_message())
+                pool.send(ea2, get_message())
+        self.assertEqual(self.server.messages, 6)
+        self.assertEqual(self.server.connections, 2)
+
+    def _get_ea(self, **kwargs) -> EmailAccount:
+        self.server = FakeSmtpServer(**kwargs)
+        self.server.start()
+        return EmailAccount(
+            pk=1, email_host='127.0.0.1', email_port=self.server.port,
+            email_host_user='andrew@example.com',
+            email_host_password='password',
+        )
+
+
+def get_message() -> EmailMessage:
+    return EmailMessage(
+        'Subject', 'Body', 'andrew@example.com', ['you@example.com']
+    )
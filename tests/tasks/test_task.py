@@ -14,6 +14,7 @@ from common.utils.helpers import get_active_users
 from common.utils.helpers import get_trans_for_lang
 from common.utils.helpers import USER_MODEL
 from common.utils.helpers import get_today
+from common.utils.user_principal import get_principal
 from common.utils.usermiddleware import set_user_groups
 from tasks.site.taskadmin import TaskAdmin
 from tasks.site.tasksbasemodeladmin import subscribers_subject
@@ -784,8 +785,7 @@ class TestTask(BaseTestCase):
             department__isnull=False).first()
         user.department_id = department.id if department else None
         request.user = user
-        groups = request.user.groups.all()
-        set_user_groups(request, groups)
+        set_user_groups(request, get_principal(user))
         request.resolver_match = resolver_match
         response = resolver_match.func(request)
         form = response.context_data['adminform'].form
@@ -0,0 +1,172 @@
+import imaplib
+import re
+import select
+import socketserver
+import threading
+from time import sleep
+from typing import Optional
+
+from crm.utils.crm_imap import CrmIMAP
+from massmail.models import EmailAccount
+from tests.utils.helpers import get_email_message
+
+# A minimal IMAP4rev1 server for tests and benchmarks.
+# It serves a single mailbox and understands only the commands used by CrmIMAP.
+
+CMD_RE = re.compile(rb'^(\S+) (?:(UID) )?(\S+)(?: (.*))?$', re.I)
+
+
+class FakeImapHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self._send(b'* OK Fake IMAP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            match = CMD_RE.match(line.rstrip(b'\r\n'))
+            if not match:
+                continue
+            tag, uid, cmd, args = match.groups()
+            cmd = cmd.upper().decode()
+            sleep(self.server.latency)
+            if cmd == 'LOGOUT':
+                self._send(b'* BYE logging out')
+                self._send(tag + b' OK LOGOUT completed')
+                return
+            handler = getattr(self, f'do_{cmd.lower()}', None)
+            if handler:
+                handler(tag, args or b'')
+            else:
+                self._send(tag + b' BAD unsupported command')
+
+    def do_capability(self, tag, args):
+        self._send(b'* CAPABILITY IMAP4rev1' + (b' IDLE' if self.server.idle else b''))
+        self._send(tag + b' OK CAPABILITY completed')
+
+    def do_login(self, tag, args):
+        self._send(tag + b' OK LOGIN completed')
+
+    def do_idle(self, tag, args):
+        if not self.server.idle:
+            self._send(tag + b' BAD unsupported command')
+            return
+        self._send(b'+ idling')
+        exists = len(self.server.messages)
+        while True:
+            if len(self.server.messages) != exists:
+                exists = len(self.server.messages)
+                self._send(b'* %d EXISTS' % exists)
+            readable, _, _ = select.select([self.connection], [], [], 0.02)
+            if not readable:
+                continue
+            line = self.rfile.readline()
+            if not line:
+                return
+            if line.strip().upper() == b'DONE':
+                self._send(tag + b' OK IDLE terminated')
+                return
+
+    def do_noop(self, tag, args):
+        self.server.noop_count += 1
+        self._send(b'* %d EXISTS' % len(self.server.messages))
+        self._send(tag + b' OK NOOP completed')
+
+    def do_select(self, tag, args):
+        uids = self.server.uids()
+        self._send(b'* %d EXISTS' % len(uids))
+        self._send(b'* OK [UIDVALIDITY 1]')
+        self._send(b'* OK [UIDNEXT %d]' % ((uids[-1] if uids else 0) + 1))
+        self._send(tag + b' OK [READ-WRITE] SELECT completed')
+
+    def do_search(self, tag, args):
+        uids = b' '.join(b'%d' % uid for uid in self.server.uids())
+        self._send(b'* SEARCH ' + uids)
+        self._send(tag + b' OK SEARCH completed')
+
+    def do_fetch(self, tag, args):
+        uid_set, _ = args.split(b' ', 1)
+        uids = self.server.uids()
+        self.server.fetch_count += 1
+        for uid in parse_uid_set(uid_set, uids[-1] if uids else 0):
+            if uid not in self.server.messages:
+                continue
+            msg = self.server.messages[uid]
+            seq = uids.index(uid) + 1
+            self.wfile.write(
+                b'* %d FETCH (UID %d RFC822 {%d}\r\n' % (seq, uid, len(msg))
+            )
+            self.wfile.write(msg)
+            self._send(b')')
+        self._send(tag + b' OK FETCH completed')
+
+    def _send(self, line: bytes) -> None:
+        self.wfile.write(line + b'\r\n')
+        self.wfile.flush()
+
+
+class FakeImapServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, messages: Optional[dict] = None, latency: float = 0,
+                 idle: bool = False):
+        super().__init__(('127.0.0.1', 0), FakeImapHandler)
+        self.idle = idle
+        self.latency = latency
+        self.messages = messages or {}
+        self.fetch_count = 0
+        self.noop_count = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def add_message(self, msg: bytes) -> int:
+        uid = (max(self.messages) if self.messages else 0) + 1
+        self.messages[uid] = msg
+        return uid
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def uids(self) -> list:
+        return sorted(self.messages)
+
+
+def connect_crmimap(server: FakeImapServer, ea: EmailAccount) -> CrmIMAP:
+    """Return CrmIMAP logged in to the fake server with selected INBOX."""
+    crmimap = CrmIMAP(ea.email_host_user)
+    crmimap._complete_init(    # NOQA
+        {'INBOX': {'name': 'INBOX', 'name on server': b'INBOX'}}, ea
+    )
+    crmimap.connection = imaplib.IMAP4('127.0.0.1', server.port)
+    crmimap._log_in()   # NOQA
+    crmimap.select_box('INBOX')
+    return crmimap
+
+
+def get_messages(count: int, size: int = 0) -> dict:
+    messages = {}
+    for uid in range(1, count + 1):
+        msg, _, _ = get_email_message()
+        if size:
+            msg.set_content('x' * size)
+        messages[uid] = msg.as_bytes()
+    return messages
+
+
+def parse_uid_set(uid_set: bytes, last_uid: int) -> list:
+    uids = []
+    for item in uid_set.decode().split(','):
+        start, _, end = item.partition(':')
+        start = last_uid if start == '*' else int(start)
+        end = start if not end else last_uid if end == '*' else int(end)
+        uids.extend(range(min(start, end), max(start, end) + 1))
+    return uids
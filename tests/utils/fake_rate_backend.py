@@ -0,0 +1,56 @@
+from datetime import date
+from datetime import timedelta
+
+from crm.backends.basebackend import BaseBackend
+
+# Currency rate backends for tests and benchmarks that make no requests.
+# The rate of a currency to the state currency (EUR) depends on its date.
+# The backends record their requests and fail for the currencies
+# in the 'failing' set.
+
+
+def get_rate(currency: str, rate_date: date) -> float:
+    if currency == BaseBackend.get_state_currency():
+        return 1
+    return 1 + rate_date.toordinal() % 8 / 8
+
+
+class FakeRateBackend(BaseBackend):
+    """Requests the rates of each date."""
+    requests = []
+    failing = set()
+
+    def __init__(self, currency: str, marketing_currency: str = 'USD',
+                 rate_date: date = None):
+        super().__init__(currency, marketing_currency, rate_date)
+
+    def get_data(self):
+        self.requests.append((self.currency, self.rate_date, self.rate_date))
+        if self.currency in self.failing:
+            self.error = "Service unavailable"
+        return {
+            'marketing_currency': get_rate(self.marketing_currency, self.rate_date)
+        }
+
+    def get_marketing_currency_rate(self):
+        return self.marketing_currency_rate
+
+    def get_rate_to_state_currency(self, currency: str = 'USD'):
+        return get_rate(currency, self.rate_date)
+
+
+class FakeRangeRateBackend(FakeRateBackend):
+    """Requests the rates of a range of dates at once."""
+
+    @classmethod
+    def get_range_rates(cls, currency, marketing_currency, start, end, dates=None,
+                        delay=0):
+        cls.requests.append((currency, start, end))
+        if currency in cls.failing:
+            return {}, "Service unavailable"
+        rates = {}
+        for i in range((end - start).days + 1):
+            day = start + timedelta(days=i)
+            rate = get_rate(currency, day)
+            rates[day] = (rate, rate / get_rate(marketing_currency, day))
+        return rates, ''
@@ -0,0 +1,79 @@
+import socketserver
+import threading
+from time import sleep
+
+# A minimal SMTP server (in the manner of aiosmtpd) for tests and benchmarks.
+# It accepts any credentials and counts connections and messages.
+
+
+class FakeSmtpHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        sleep(self.server.handshake_latency)
+        self._send(b'220 fake.smtp ESMTP ready')
+        messages = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd, _, args = line.rstrip(b'\r\n').partition(b' ')
+            cmd = cmd.upper()
+            sleep(self.server.latency)
+            if cmd in (b'EHLO', b'HELO'):
+                sleep(self.server.handshake_latency)
+                self._send(b'250-fake.smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME')
+            elif cmd == b'AUTH':
+                sleep(self.server.handshake_latency)
+                self._send(b'235 2.7.0 Authentication successful')
+            elif cmd in (b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self._send(b'250 OK')
+            elif cmd == b'DATA':
+                self._send(b'354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                messages += 1
+                self._send(b'250 OK queued')
+                if messages == self.server.drop_after:
+                    # Simulate the server closing a connection
+                    return
+            elif cmd == b'QUIT':
+                self._send(b'221 Bye')
+                return
+            else:
+                self._send(b'502 Command not implemented')
+
+    def _send(self, line: bytes) -> None:
+        self.wfile.write(line + b'\r\n')
+        self.wfile.flush()
+
+
+class FakeSmtpServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0, handshake_latency: float = 0,
+                 drop_after: int = 0):
+        super().__init__(('127.0.0.1', 0), FakeSmtpHandler)
+        self.latency = latency      # seconds per command
+        self.handshake_latency = handshake_latency  # greeting, EHLO, AUTH
+        self.drop_after = drop_after    # messages per connection, 0 - no limit
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -12,10 +12,10 @@ from django.utils.translation import gettext as _
 from typing import Optional
 from typing import Tuple
 
-from common.utils.helpers import add_phone_q_params
 from crm.models import Contact
 from crm.models import Deal
 from crm.models import Lead
+from crm.utils.phone_numbers import get_phone_q_params
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -107,7 +107,9 @@ def find_objects_by_phone(phone: str) -> \
         Tuple[Optional[Contact], Optional[Lead], Optional[Deal], str]:
     """Search Contact, Lead and active Deal by phone number"""
     params = contact = lead = deal = None
-    q_params = add_phone_q_params(phone)
+    q_params = get_phone_q_params(Contact, phone)
+    if not q_params:
+        return contact, lead, deal, ''
     try:
         contact = Contact.objects.filter(q_params).first()
     except Exception as e:
@@ -115,7 +117,7 @@ def find_objects_by_phone(phone: str) -> \
     if contact:
         params = {'contact_id': contact.id, 'active': True}
     else:
-        lead = Lead.objects.filter(q_params).first()
+        lead = Lead.objects.filter(get_phone_q_params(Lead, phone)).first()
         if lead:
             params = {'lead_id': lead.id, 'active': True}
     if any((contact, lead)):
@@ -16,6 +16,7 @@ try:
     from common.settings import *  # NOQA
     from tasks.settings import *  # NOQA
     from voip.settings import *  # NOQA
+    from massmail.settings import *  # NOQA
     from .datetime_settings import *  # NOQA
 except ImportError:
     pass
@@ -204,3 +205,7 @@ if TESTING:
     }
     IMAP_CONNECTION_IDLE = 0
     REUSE_IMAP_CONNECTION = False
+    # the test database is rolled back without resetting cached values
+    USER_PRINCIPAL_CACHE_TTL = 0
+    SITE_CACHE_TTL = 0
+    LOCAL_CACHE_TTL = 0